@@ -6,6 +6,7 @@ from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
 from agents.warren_buffett.agent import agent as warren_buffett_agent
 from agents.information_query.agent import agent as information_query_agent
 from agents.agent import agent
+from common.dataset import get_cache_stats
  
 from dotenv import load_dotenv
 load_dotenv()
@@ -40,6 +41,12 @@ add_fastapi_endpoint(app, sdk, "/api/copilotkit", use_thread_pool=False)
 def health():
     """Health check."""
     return {"status": "ok"}
+
+# cache hit/miss metrics of the remote dataset
+@app.get("/metrics/dataset_cache")
+def dataset_cache_metrics():
+    """Dataset cache metrics."""
+    return get_cache_stats()
  
 if __name__ == "__main__":
     """Run the uvicorn server."""
@@ -4,6 +4,7 @@ It defines the workflow graph, state, tools, nodes and edges.
 """
 
 from pkgutil import resolve_name
+from importlib import import_module
 from common import markdown
 from langchain_core.runnables import RunnableConfig
 from typing_extensions import Literal
@@ -17,7 +18,7 @@ from langgraph.checkpoint.memory import MemorySaver
 from common.agent_state import AgentState, StateContext
 from langgraph.types import StreamWriter
 import asyncio
-import uuid
+import time
 from common.util import get_dict_json, get_at_items, get_latest_message_content, get_array_json
 from agents.warren_buffett.agent import agent as warren_buffett_agent
 from agents.aswath_damodaran.agent import agent as aswath_damodaran_agent
@@ -39,6 +40,11 @@ from agents.trading.agent import agent as trading_agent
 from agents.valuation.agent import agent as valuation_agent
 from agents.information_query.agent import agent as information_query_agent
 from llm.llm_model import ainvoke
+from common.settings import Settings
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common.ticker_resolver import resolve_tickers
+from common.message_window import build_context
 from nodes.ticker_search import TickerSearch
 from nodes.next_step_suggestions import NextStepSuggestions
 
@@ -69,6 +75,12 @@ analysis_agents = {
     'valuation': valuation_agent
 }
 
+# data requirements declared by each analysis agent module
+analysis_data_requirements = {
+    name: getattr(import_module(f'agents.{name}.agent'), 'DATA_REQUIREMENTS', data_bundle.DataRequirements())
+    for name in analysis_agents
+}
+
 async def planner_node(state: AgentState, config: RunnableConfig) -> Command[Literal["ticker_switch", "ticker_analysis", "ticker_search", "next_step_suggestions"]]:
     """
     Initialize the planner node by setting up the context in the agent state.
@@ -93,10 +105,13 @@ async def planner_node(state: AgentState, config: RunnableConfig) -> Command[Lit
         else:
             return Command(goto='next_step_suggestions', update={'context': context})
     else:
-        tickers = await get_tickers_from_content(state, config)
+        # explicit symbols are resolved locally, the LLM extracts the tickers otherwise
+        content = get_latest_message_content(state)
+        tickers = await asyncio.to_thread(resolve_tickers, content)
+        if tickers is None:
+            tickers = await get_tickers_from_content(state, config)
         if tickers is None or len(tickers) == 0:
             return Command(goto='next_step_suggestions', update={'context': context})
-        content = get_latest_message_content(state)
         items = get_at_items(content)
         agents = []
         for item in items:
@@ -112,7 +127,10 @@ async def planner_node(state: AgentState, config: RunnableConfig) -> Command[Lit
 def ticker_analysis(state: AgentState, config: RunnableConfig):
     """
     Prepare tasks for ticker analysis by creating analysis tasks for each agent and ticker combination.
-    This function manages a loop through multiple analysis tasks.
+    This function manages a loop through multiple analysis tasks, or fans them out to run
+    concurrently when the analysis concurrency in settings is greater than 1.
+    Before the first task, the data requirements of the agents scheduled on each ticker are merged
+    into context['data_plans'] and prefetched in the background.
     
     Args:
         state (AgentState): The current state of the agent containing context, messages, and action
@@ -136,6 +154,22 @@ def ticker_analysis(state: AgentState, config: RunnableConfig):
                 })
         context['tasks'] = tasks
         context['task_index'] = 0
+
+        end_date = state.get('action').get('parameters').get('end_date')
+        end_date = end_date if end_date else time.strftime("%Y-%m-%d")
+        requirements = [analysis_data_requirements[agent_name] for agent_name in agents]
+        dataset_client = AsyncDataset(config)
+        context['data_plans'] = {}
+        for ticker in tickers:
+            symbol = ticker.get('symbol')
+            if not symbol or symbol in context['data_plans']:
+                continue
+            plan = data_bundle.plan_data(requirements, end_date)
+            context['data_plans'][symbol] = plan
+            data_bundle.prefetch(dataset_client, symbol, plan)
+
+        context['concurrency'] = Settings(config).get_analysis_concurrency()
+        context['fan_out'] = context['concurrency'] > 1 and len(tasks) > 1
     else:
         context['task_index'] += 1
     if context['task_index'] < len(context['tasks']):
@@ -153,13 +187,64 @@ def agent_conditional(state: AgentState, config: RunnableConfig):
         config (RunnableConfig): Configuration for the runnable
         
     Returns:
-        str: The name of the analysis agent to route to, or 'clear_cache' if all tasks are completed
+        str: The name of the analysis agent to route to, 'analysis_tasks' when the tasks fan out
+            concurrently, or 'clear_cache' if all tasks are completed
     """
     context = state.get('context')
+    if context.get('fan_out'):
+        return 'analysis_tasks'
     if context.get('current_task') is not None and context.get('task_index') < len(context.get('tasks')):
         return context.get('current_task')['agent']
     return 'clear_cache'
 
+async def analysis_tasks(state: AgentState, config: RunnableConfig, writer: StreamWriter):
+    """
+    Run every agent x ticker task through its analysis sub-graph concurrently, used by the fan-out mode.
+    At most context['concurrency'] sub-graphs run at once, the semaphore is local to this call so
+    nothing outlives the run. Each task gets its own context, its new messages are written to the
+    custom stream as soon as it and all the tasks before it are done, so the output stays progressive
+    and in task order. A failed task is reported by an error message in its place, the other tasks
+    keep their results, and the pending tasks are cancelled when the node itself is cancelled.
+
+    Args:
+        state (AgentState): The current state of the agent containing context with the tasks
+        config (RunnableConfig): Configuration for the runnable
+        writer (StreamWriter): Stream writer receiving the messages of each completed task in task order
+
+    Returns:
+        dict: The messages produced by the sub-graphs, in task order
+    """
+    context = state.get('context')
+    semaphore = asyncio.Semaphore(context.get('concurrency'))
+    history_size = len(state.get('messages'))
+
+    async def run_task(task: dict) -> list:
+        task_context = {
+            'current_task': task,
+            'data_plans': context.get('data_plans'),
+        }
+        sub_graph = analysis_agents[task['agent']]
+        try:
+            async with semaphore:
+                output = await sub_graph.ainvoke({**state, 'context': task_context}, config)
+        except Exception as e:
+            symbol = task['ticker'].get('symbol')
+            return [AIMessage(content=f"Error running {task['agent']} analysis of {symbol}: {str(e)}")]
+        return output.get('messages')[history_size:]
+
+    pending = [asyncio.create_task(run_task(task)) for task in context.get('tasks')]
+    messages = []
+    try:
+        for task, pending_task in zip(context.get('tasks'), pending):
+            task_messages = await pending_task
+            writer({'type': 'analysis_task', 'task': task, 'messages': task_messages})
+            messages.extend(task_messages)
+    finally:
+        for pending_task in pending:
+            pending_task.cancel()
+    return {'messages': messages}
+
+
 def ticker_switch(state: AgentState, config: RunnableConfig) -> Command[Literal['clear_cache']]:
     """
     Handle ticker switching by generating a ticker selection message and clearing the action.
@@ -195,10 +280,10 @@ async def get_tickers_from_content(state: AgentState, config: RunnableConfig):
 Example output:  
 `[{"short_name": "Apple", "en_name": "Apple Inc.", "symbol": "AAPL"}]`
 """
-    messages = state["messages"] + [SystemMessage(content=prompt)]
+    messages = build_context(state["messages"], config) + [SystemMessage(content=prompt)]
         
     # not show in ui and not save in db
-    output = await ainvoke(messages, config, stream=False)
+    output = await ainvoke(messages, config, stream=False, cache=True)
     tickers = get_array_json(output.content)
     return tickers
 
@@ -225,6 +310,7 @@ workflow.add_node("ticker_switch", ticker_switch)
 workflow.add_node("ticker_search", ticker_search)
 workflow.add_node("next_step_suggestions", next_step_suggestions)
 workflow.add_node("ticker_analysis", ticker_analysis)
+workflow.add_node("analysis_tasks", analysis_tasks)
 
 workflow.add_node("clear_cache", clear_cache)
 
@@ -241,7 +327,8 @@ workflow.set_finish_point('clear_cache')
 for name, node in analysis_agents.items():
     workflow.add_node(name, node)
     workflow.add_edge(name, 'ticker_analysis')
-workflow.add_conditional_edges("ticker_analysis", agent_conditional, list(analysis_agents.keys()) + ['clear_cache'])
+workflow.add_edge("analysis_tasks", 'clear_cache')
+workflow.add_conditional_edges("ticker_analysis", agent_conditional, list(analysis_agents.keys()) + ['analysis_tasks', 'clear_cache'])
 
 # Compile the workflow graph into a runnable agent
 agent = workflow.compile()
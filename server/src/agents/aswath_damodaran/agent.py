@@ -4,7 +4,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 """
 
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -28,7 +29,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 growth_analysis_node = GrowthAnalysis({})
@@ -37,34 +42,40 @@ intrinsic_value_analysis_node = IntrinsicValueAnalysis({})
 relative_valuation_analysis_node = RelativeValuationAnalysis({})
 story_narrative_analysis_node = StoryNarrativeAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio",
+            "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
+            "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
+            "interest_expense", "capital_expenditure", "depreciation_and_amortization",
+            "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
+            "net_income", "revenue", "gross_profit", "gross_margin"
+        ],
+    },
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
 
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     # Get required financial metrics and items for Damodaran analysis
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio", 
-        "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
-        "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
-        "interest_expense", "capital_expenditure", "depreciation_and_amortization",
-        "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
-        "net_income", "revenue", "gross_profit", "gross_margin"
-    ], end_date, period="yearly")
+    metrics = await data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly")
     
-    context['metrics'] = metrics
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics),
         'messages':[AIMessage(content=markdown.to_h2('Aswath Damodaran Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -86,8 +97,9 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     margin_of_safety = None
     intrinsic_value = analysis_data.get('intrinsic_value_analysis').get("intrinsic_value")
     market_cap = None
-    if context.get("metrics") is not None and len(context.get("metrics")) > 0:
-        market_cap = context.get("metrics")[0].get("market_cap")
+    metrics = input_store.get_input(state, 'metrics')
+    if metrics is not None and len(metrics) > 0:
+        market_cap = metrics[0].get("market_cap")
     if intrinsic_value and market_cap:
         margin_of_safety = (intrinsic_value - market_cap) / market_cap
 
@@ -107,6 +119,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
             signal = "bearish"
             confidence = max(10.0, 30.0 - (abs(margin_of_safety) * 100) / 3)  # Scale confidence
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'aswath_damodaran', config)
     messages = [
             (
                 "system",
@@ -164,7 +177,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -189,33 +202,24 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
         "action": None,
     }
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("growth_analysis", growth_analysis_node)
-workflow.add_node("risk_analysis", risk_analysis_node)
-workflow.add_node("intrinsic_value_analysis", intrinsic_value_analysis_node)
-workflow.add_node("relative_valuation_analysis", relative_valuation_analysis_node)
-workflow.add_node("story_narrative_analysis", story_narrative_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "story_narrative_analysis")
-workflow.add_edge("story_narrative_analysis", "growth_analysis")
-workflow.add_edge("growth_analysis", "risk_analysis")
-workflow.add_edge("risk_analysis", "intrinsic_value_analysis")
-workflow.add_edge("intrinsic_value_analysis", "relative_valuation_analysis")
-workflow.add_edge("relative_valuation_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "story_narrative_analysis": story_narrative_analysis_node,
+        "growth_analysis": growth_analysis_node,
+        "risk_analysis": risk_analysis_node,
+        "intrinsic_value_analysis": intrinsic_value_analysis_node,
+        "relative_valuation_analysis": relative_valuation_analysis_node,
+    },
+    end_analysis,
+    # intrinsic value discounts with the cost of equity of the risk analysis
+    dependencies={"intrinsic_value_analysis": ["risk_analysis"]},
+)
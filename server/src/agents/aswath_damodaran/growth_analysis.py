@@ -1,4 +1,4 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +6,8 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class GrowthAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, derived: DerivedMetrics) -> dict[str, any]:
         """
         Growth score (0-4):
           +2  5-yr CAGR of revenue > 8 %
@@ -23,16 +25,12 @@ class GrowthAnalysis():
         Reinvestment efficiency (ROIC > WACC proxy) adds +1
         """
         result = {"score": 0, "max_score": 4, "details": []}
-        if not metrics or len(metrics) < 2:
+        if len(frame) < 2:
             result["details"].append('Insufficient history')
             return result
 
         # Revenue CAGR (oldest to latest)
-        revs = [m.get('revenue') for m in reversed(metrics) if m.get('revenue')]
-        if len(revs) >= 2 and revs[0] and revs[0] > 0:
-            cagr = (revs[-1] / revs[0]) ** (1 / (len(revs) - 1)) - 1
-        else:
-            cagr = None
+        cagr = derived.cagr('revenue')
 
         score = 0
         details = []
@@ -50,15 +48,15 @@ class GrowthAnalysis():
             details.append("Revenue data incomplete")
 
         # FCFF growth (proxy: free_cash_flow trend)
-        fcfs = [m.get('free_cash_flow') for m in reversed(metrics) if m.get('free_cash_flow')]
-        if len(fcfs) >= 2 and fcfs[-1] and fcfs[0] and fcfs[-1] > fcfs[0]:
+        fcfs = derived.series('free_cash_flow', nonzero=True)
+        if len(fcfs) >= 2 and fcfs[0] > fcfs[-1]:
             score += 1
             details.append("Positive FCFF growth")
         else:
             details.append("Flat or declining FCFF")
 
         # Reinvestment efficiency (ROIC vs. 10% hurdle)
-        latest = metrics[0]
+        latest = frame.latest_period()
         if latest.get('return_on_invested_capital') and latest['return_on_invested_capital'] > 0.10:
             score += 1
             details.append(f"ROIC {latest['return_on_invested_capital']:.1%} (> 10%)")
@@ -74,21 +72,15 @@ class GrowthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        derived = get_derived_metrics(state, config)
+        analysis = self.analyze(derived.frame, derived)
         analysis['type'] = 'growth_analysis'
         analysis['title'] = f'Growth analysis'
 
-        analysis_data['growth_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'growth_analysis': analysis},
             "messages": [
                 ai_message
             ]
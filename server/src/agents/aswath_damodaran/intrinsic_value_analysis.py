@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, cagr, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class IntrinsicValueAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list, risk_analysis: dict) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, risk_analysis: dict) -> dict[str, any]:
         """
         FCFF DCF with:
           • Base FCFF = latest free cash flow
@@ -23,11 +25,11 @@ class IntrinsicValueAnalysis():
           • Discount @ cost of equity (no debt split given data limitations)
         """
         result = {"intrinsic_value": None, "details": []}
-        if not metrics or len(metrics) < 2:
+        if len(frame) < 2:
             result["details"].append("Insufficient data")
             return result
 
-        latest_m = metrics[0]
+        latest_m = frame.latest_period()
         fcff0 = latest_m.get('free_cash_flow')
         shares = latest_m.get('ordinary_shares_number')
         if not fcff0 or not shares:
@@ -35,9 +37,9 @@ class IntrinsicValueAnalysis():
             return result
 
         # Growth assumptions
-        revs = [m.get('revenue') for m in reversed(metrics) if m.get('revenue')]
-        if len(revs) >= 2 and revs[0] and revs[0] > 0:
-            base_growth = min((revs[-1] / revs[0]) ** (1 / (len(revs) - 1)) - 1, 0.12)
+        revenue_cagr = cagr(frame.present('revenue', nonzero=True))
+        if revenue_cagr is not None:
+            base_growth = min(revenue_cagr, 0.12)
         else:
             base_growth = 0.04  # fallback
 
@@ -87,22 +89,16 @@ class IntrinsicValueAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        risk_analysis = analysis_data.get('risk_analysis', {})
-        analysis = self.analyze(metrics, risk_analysis)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        risk_analysis = state.get('analysis_data').get('risk_analysis', {})
+        analysis = self.analyze(frame, risk_analysis)
         analysis['type'] = 'intrinsic_value_analysis'
         analysis['title'] = f'Intrinsic value analysis'
 
-        analysis_data['intrinsic_value_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'intrinsic_value_analysis': analysis},
             "messages": [
                 ai_message
             ]
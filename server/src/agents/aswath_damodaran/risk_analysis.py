@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class RiskAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Risk score (0-3):
           +1  Beta < 1.3
@@ -22,11 +24,11 @@ class RiskAnalysis():
           +1  Interest Coverage > 3×
         """
         result = {"score": 0, "max_score": 3, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
-        latest = metrics[0]
+        latest = frame.latest_period()
         score = 0
         details = []
 
@@ -88,21 +90,15 @@ class RiskAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'risk_analysis'
         analysis['title'] = f'Risk analysis'
 
-        analysis_data['risk_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'risk_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 from llm.llm_model import ainvoke
 
@@ -15,7 +17,7 @@ class StoryNarrativeAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list, ticker_data: dict) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, ticker_data: dict) -> dict[str, any]:
         """
         Analyze the business story and narrative based on Damodaran's methodology:
         - Business model and competitive positioning
@@ -24,7 +26,7 @@ class StoryNarrativeAnalysis():
         - Key risks and uncertainties
         """
         result = {"score": 0, "max_score": 10, "details": [], "narrative": ""}
-        if not metrics or not ticker_data:
+        if len(frame) == 0 or not ticker_data:
             result["details"].append('Insufficient data for narrative analysis')
             return result
 
@@ -33,8 +35,8 @@ class StoryNarrativeAnalysis():
         short_name = ticker_data.get('short_name', 'Unknown Company')
         
         # Prepare data for analysis
-        latest_metrics = metrics[0] if metrics else {}
-        previous_metrics = metrics[1] if len(metrics) > 1 else {}
+        latest_metrics = frame.latest_period()
+        previous_metrics = frame.period(1)
         
         # Key metrics for narrative analysis
         business_data = {
@@ -143,12 +145,12 @@ Based on the analysis, this appears to be {'a high-quality business with strong
         
         return result
 
-    async def analyze_with_llm(self, metrics: list, ticker_data: dict) -> dict[str, any]:
+    async def analyze_with_llm(self, frame: FinancialsFrame, ticker_data: dict) -> dict[str, any]:
         """
         Use LLM to generate a detailed business narrative analysis
         """
         result = {"score": 0, "max_score": 10, "details": [], "narrative": ""}
-        if not metrics or not ticker_data:
+        if len(frame) == 0 or not ticker_data:
             result["details"].append('Insufficient data for narrative analysis')
             return result
 
@@ -157,7 +159,7 @@ Based on the analysis, this appears to be {'a high-quality business with strong
         short_name = ticker_data.get('short_name', 'Unknown Company')
         
         # Prepare data for LLM analysis
-        latest_metrics = metrics[0] if metrics else {}
+        latest_metrics = frame.latest_period()
         
         # Key metrics for narrative analysis
         business_data = {
@@ -236,24 +238,19 @@ Based on the analysis, this appears to be {'a high-quality business with strong
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    async def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+    async def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
         context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
+        frame = get_financials_frame(get_input(state, 'metrics'))
         ticker = context.get('current_task', {}).get('ticker', {})
         
         # Use the improved analyze method
-        analysis = self.analyze(metrics, ticker)
+        analysis = self.analyze(frame, ticker)
         analysis['type'] = 'story_narrative_analysis'
         analysis['title'] = f'Story Narrative Analysis'
         
-        analysis_data['story_narrative_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'story_narrative_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class EarningsStabilityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Graham wants at least several years of consistently positive earnings (ideally 5+).
         We'll check:
@@ -22,14 +24,11 @@ class EarningsStabilityAnalysis():
         2. Growth in EPS from first to last period.
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
-        eps_vals = []
-        for item in metrics:
-            if item.get('earnings_per_share') is not None:
-                eps_vals.append(item.get('earnings_per_share'))
+        eps_vals = frame.present('earnings_per_share')
 
         if len(eps_vals) < 2:
             result["details"].append("Not enough multi-year EPS data.")
@@ -39,7 +38,7 @@ class EarningsStabilityAnalysis():
         details = []
 
         # 1. Consistently positive EPS
-        positive_eps_years = sum(1 for e in eps_vals if e > 0)
+        positive_eps_years = int((eps_vals > 0).sum())
         total_eps_years = len(eps_vals)
         if positive_eps_years == total_eps_years:
             score += 3
@@ -68,21 +67,15 @@ class EarningsStabilityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'earnings_stability_analysis'
         analysis['title'] = f'Earnings stability analysis'
 
-        analysis_data['earnings_stability_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'earnings_stability_analysis': analysis},
             "messages": [
                 ai_message
             ]
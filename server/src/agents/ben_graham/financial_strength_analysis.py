@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,21 +16,20 @@ class FinancialStrengthAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Graham checks liquidity (current ratio >= 2), manageable debt,
         and dividend record (preferably some history of dividends).
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
-        latest_item = metrics[0]
-        total_assets = latest_item.get('total_assets') or 0
-        total_liabilities = latest_item.get('total_liabilities') or 0
-        current_assets = latest_item.get('current_assets') or 0
-        current_liabilities = latest_item.get('current_liabilities') or 0
+        total_assets = frame.latest('total_assets', 0)
+        total_liabilities = frame.latest('total_liabilities', 0)
+        current_assets = frame.latest('current_assets', 0)
+        current_liabilities = frame.latest('current_liabilities', 0)
 
         score = 0
         details = []
@@ -62,11 +63,11 @@ class FinancialStrengthAnalysis():
             details.append("Cannot compute debt ratio (missing total_assets).")
 
         # 3. Dividend track record
-        div_periods = [item.get('dividends_and_other_cash_distributions') for item in metrics if item.get('dividends_and_other_cash_distributions') is not None]
-        if div_periods:
+        div_periods = frame.present('dividends_and_other_cash_distributions')
+        if len(div_periods) > 0:
             # In many data feeds, dividend outflow is shown as a negative number
             # (money going out to shareholders). We'll consider any negative as 'paid a dividend'.
-            div_paid_years = sum(1 for d in div_periods if d < 0)
+            div_paid_years = int((div_periods < 0).sum())
             if div_paid_years > 0:
                 # e.g. if at least half the periods had dividends
                 if div_paid_years >= (len(div_periods) // 2 + 1):
@@ -90,21 +91,15 @@ class FinancialStrengthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'financial_strength_analysis'
         analysis['title'] = f'Financial strength analysis'
 
-        analysis_data['financial_strength_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'financial_strength_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 import math
 from langgraph.types import StreamWriter
 
@@ -15,7 +17,7 @@ class ValuationAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Core Graham approach to valuation:
         1. Net-Net Check: (Current Assets - Total Liabilities) vs. Market Cap
@@ -23,17 +25,16 @@ class ValuationAnalysis():
         3. Compare per-share price to Graham Number => margin of safety
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append("No metrics available")
             return result
 
-        latest = metrics[0]
-        current_assets = latest.get('current_assets') or 0
-        total_liabilities = latest.get('total_liabilities') or 0
-        book_value_ps = latest.get('book_value_per_share') or 0
-        eps = latest.get('earnings_per_share') or 0
-        shares_outstanding = latest.get('outstanding_shares') or 0
-        market_cap = latest.get('market_cap') or 0
+        current_assets = frame.latest('current_assets', 0)
+        total_liabilities = frame.latest('total_liabilities', 0)
+        book_value_ps = frame.latest('book_value_per_share', 0)
+        eps = frame.latest('earnings_per_share', 0)
+        shares_outstanding = frame.latest('outstanding_shares', 0)
+        market_cap = frame.latest('market_cap', 0)
 
         details = []
         score = 0
@@ -101,21 +102,15 @@ class ValuationAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'valuation_analysis'
         analysis['title'] = f'Valuation analysis'
 
-        analysis_data['valuation_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'valuation_analysis': analysis},
             "messages": [
                 ai_message
             ]
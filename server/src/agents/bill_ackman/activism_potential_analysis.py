@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class ActivismPotentialAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Bill Ackman often engages in activism if a company has a decent brand or moat
         but is underperforming operationally.
@@ -24,21 +26,21 @@ class ActivismPotentialAnalysis():
         - That may indicate 'activism upside' if operational improvements could unlock value.
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
         # Check revenue growth vs. operating margin
-        revenues = [item.get('revenue') for item in metrics if item.get('revenue') is not None]
-        op_margins = [item.get('operating_margin') for item in metrics if item.get('operating_margin') is not None]
+        revenues = frame.present('revenue')
+        op_margins = frame.present('operating_margin')
 
-        if len(revenues) < 2 or not op_margins:
+        if len(revenues) < 2 or len(op_margins) == 0:
             result["details"].append("Not enough data to assess activism potential (need multi-year revenue + margins).")
             return result
 
         initial, final = revenues[-1], revenues[0]
         revenue_growth = (final - initial) / abs(initial) if initial else 0
-        avg_margin = sum(op_margins) / len(op_margins)
+        avg_margin = op_margins.mean()
 
         score = 0
         details = []
@@ -64,21 +66,15 @@ class ActivismPotentialAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'activism_potential_analysis'
         analysis['title'] = f'Activism potential analysis'
 
-        analysis_data['activism_potential_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'activism_potential_analysis': analysis},
             "messages": [
                 ai_message
             ]
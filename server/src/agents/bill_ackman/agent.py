@@ -4,7 +4,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 """
 
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -26,7 +27,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 business_quality_analysis_node = BusinessQualityAnalysis({})
@@ -34,7 +39,18 @@ balance_sheet_analysis_node = BalanceSheetAnalysis({})
 activism_potential_analysis_node = ActivismPotentialAnalysis({})
 valuation_analysis_node = ValuationAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "revenue", "operating_margin", "debt_to_equity", "free_cash_flow", "total_assets",
+            "total_liabilities", "dividends_and_other_cash_distributions", "outstanding_shares",
+            "return_on_equity", "market_cap", "price_to_earnings_ratio"
+        ],
+    },
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
 
@@ -42,25 +58,20 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
     # Get required financial metrics and items for Ackman analysis
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "revenue", "operating_margin", "debt_to_equity", "free_cash_flow",
-        "total_assets", "total_liabilities", "dividends_and_other_cash_distributions",
-        "outstanding_shares", "return_on_equity", "market_cap", "price_to_earnings_ratio"
-    ], end_date, period="yearly")
+    metrics = await data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly")
     
-    context['metrics'] = metrics
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics),
         'messages': [AIMessage(content=markdown.to_h2('Bill Ackman Analysis for ' + ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -96,8 +107,9 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     margin_of_safety = None
     intrinsic_value = analysis_data.get('valuation_analysis').get("intrinsic_value")
     market_cap = None
-    if context.get("metrics") is not None and len(context.get("metrics")) > 0:
-        market_cap = context.get("metrics")[0].get("market_cap")
+    metrics = input_store.get_input(state, 'metrics')
+    if metrics is not None and len(metrics) > 0:
+        market_cap = metrics[0].get("market_cap")
     if intrinsic_value and market_cap:
         margin_of_safety = (intrinsic_value - market_cap) / market_cap
 
@@ -106,6 +118,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['margin_of_safety'] = margin_of_safety
     analysis_data['signal'] = signal
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'bill_ackman', config)
     messages = [
         (
             "system",
@@ -161,7 +174,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
             f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
             COMPREHENSIVE ANALYSIS DATA:
-            {analysis_data}
+            {packed_analysis_data}
 
             Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
             ```AnalysisResult
@@ -183,31 +196,21 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
             """,
         ),
     ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
         "action": None,
     }
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("business_quality_analysis", business_quality_analysis_node)
-workflow.add_node("balance_sheet_analysis", balance_sheet_analysis_node)
-workflow.add_node("activism_potential_analysis", activism_potential_analysis_node)
-workflow.add_node("valuation_analysis", valuation_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "business_quality_analysis")
-workflow.add_edge("business_quality_analysis", "balance_sheet_analysis")
-workflow.add_edge("balance_sheet_analysis", "activism_potential_analysis")
-workflow.add_edge("activism_potential_analysis", "valuation_analysis")
-workflow.add_edge("valuation_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "business_quality_analysis": business_quality_analysis_node,
+        "balance_sheet_analysis": balance_sheet_analysis_node,
+        "activism_potential_analysis": activism_potential_analysis_node,
+        "valuation_analysis": valuation_analysis_node,
+    },
+    end_analysis,
+)
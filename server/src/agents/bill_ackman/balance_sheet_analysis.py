@@ -1,11 +1,14 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 
 import time
+import numpy as np
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,14 +17,14 @@ class BalanceSheetAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Evaluate the company's balance sheet over multiple periods:
         - Debt ratio trends
         - Capital returns to shareholders over time (dividends, buybacks)
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
@@ -29,9 +32,9 @@ class BalanceSheetAnalysis():
         details = []
 
         # 1. Multi-period debt ratio or debt_to_equity
-        debt_to_equity_vals = [item.get('debt_to_equity') for item in metrics if item.get('debt_to_equity') is not None]
-        if debt_to_equity_vals:
-            below_one_count = sum(1 for d in debt_to_equity_vals if d < 1.0)
+        debt_to_equity_vals = frame.present('debt_to_equity')
+        if len(debt_to_equity_vals) > 0:
+            below_one_count = int((debt_to_equity_vals < 1.0).sum())
             if below_one_count >= (len(debt_to_equity_vals) // 2 + 1):
                 score += 2
                 details.append("Debt-to-equity < 1.0 for the majority of periods (reasonable leverage).")
@@ -39,13 +42,11 @@ class BalanceSheetAnalysis():
                 details.append("Debt-to-equity >= 1.0 in many periods (could be high leverage).")
         else:
             # Fallback to total_liabilities / total_assets
-            liab_to_assets = []
-            for item in metrics:
-                if item.get('total_liabilities') and item.get('total_assets') and item['total_assets'] > 0:
-                    liab_to_assets.append(item['total_liabilities'] / item['total_assets'])
+            liab_to_assets = frame.ratio('total_liabilities', 'total_assets')
+            liab_to_assets = liab_to_assets[(frame.column('total_assets') > 0) & (liab_to_assets != 0) & ~np.isnan(liab_to_assets)]
 
-            if liab_to_assets:
-                below_50pct_count = sum(1 for ratio in liab_to_assets if ratio < 0.5)
+            if len(liab_to_assets) > 0:
+                below_50pct_count = int((liab_to_assets < 0.5).sum())
                 if below_50pct_count >= (len(liab_to_assets) // 2 + 1):
                     score += 2
                     details.append("Liabilities-to-assets < 50% for majority of periods.")
@@ -55,13 +56,9 @@ class BalanceSheetAnalysis():
                 details.append("No consistent leverage ratio data available.")
 
         # 2. Capital allocation approach (dividends + share counts)
-        dividends_list = [
-            item.get('dividends_and_other_cash_distributions')
-            for item in metrics
-            if item.get('dividends_and_other_cash_distributions') is not None
-        ]
-        if dividends_list:
-            paying_dividends_count = sum(1 for d in dividends_list if d < 0)
+        dividends_list = frame.present('dividends_and_other_cash_distributions')
+        if len(dividends_list) > 0:
+            paying_dividends_count = int((dividends_list < 0).sum())
             if paying_dividends_count >= (len(dividends_list) // 2 + 1):
                 score += 1
                 details.append("Company has a history of returning capital to shareholders (dividends).")
@@ -71,7 +68,7 @@ class BalanceSheetAnalysis():
             details.append("No dividend data found across periods.")
 
         # Check for decreasing share count (simple approach)
-        shares = [item.get('outstanding_shares') for item in metrics if item.get('outstanding_shares') is not None]
+        shares = frame.present('outstanding_shares')
         if len(shares) >= 2:
             # For buybacks, the newest count should be less than the oldest count
             if shares[0] and shares[-1] and shares[0] < shares[-1]:
@@ -93,21 +90,15 @@ class BalanceSheetAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'balance_sheet_analysis'
         analysis['title'] = f'Balance sheet analysis'
 
-        analysis_data['balance_sheet_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'balance_sheet_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,13 +16,13 @@ class BusinessQualityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Analyze whether the company has a high-quality business with stable or growing cash flows,
         durable competitive advantages (moats), and potential for long-term growth.
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
@@ -28,7 +30,7 @@ class BusinessQualityAnalysis():
         details = []
 
         # 1. Multi-period revenue growth analysis
-        revenues = [item.get('revenue') for item in metrics if item.get('revenue') is not None]
+        revenues = frame.present('revenue')
         if len(revenues) >= 2:
             initial, final = revenues[-1], revenues[0]
             if initial and final and final > initial:
@@ -45,11 +47,11 @@ class BusinessQualityAnalysis():
             details.append("Not enough revenue data for multi-period trend.")
 
         # 2. Operating margin and free cash flow consistency
-        fcf_vals = [item.get('free_cash_flow') for item in metrics if item.get('free_cash_flow') is not None]
-        op_margin_vals = [item.get('operating_margin') for item in metrics if item.get('operating_margin') is not None]
+        fcf_vals = frame.present('free_cash_flow')
+        op_margin_vals = frame.present('operating_margin')
 
-        if op_margin_vals:
-            above_15 = sum(1 for m in op_margin_vals if m > 0.15)
+        if len(op_margin_vals) > 0:
+            above_15 = int((op_margin_vals > 0.15).sum())
             if above_15 >= (len(op_margin_vals) // 2 + 1):
                 score += 1
                 details.append("Operating margins have often exceeded 15% (indicates good profitability).")
@@ -58,8 +60,8 @@ class BusinessQualityAnalysis():
         else:
             details.append("No operating margin data across periods.")
 
-        if fcf_vals:
-            positive_fcf_count = sum(1 for f in fcf_vals if f > 0)
+        if len(fcf_vals) > 0:
+            positive_fcf_count = int((fcf_vals > 0).sum())
             if positive_fcf_count >= (len(fcf_vals) // 2 + 1):
                 score += 1
                 details.append("Majority of periods show positive free cash flow.")
@@ -69,7 +71,7 @@ class BusinessQualityAnalysis():
             details.append("No free cash flow data across periods.")
 
         # 3. Return on Equity (ROE) check from the latest metrics
-        latest_metrics = metrics[0] if metrics else None
+        latest_metrics = frame.latest_period()
         if latest_metrics and latest_metrics.get('return_on_equity') and latest_metrics['return_on_equity'] > 0.15:
             score += 1
             details.append(f"High ROE of {latest_metrics['return_on_equity']:.1%}, indicating a competitive advantage.")
@@ -89,21 +91,15 @@ class BusinessQualityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'business_quality_analysis'
         analysis['title'] = f'Business quality analysis'
 
-        analysis_data['business_quality_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'business_quality_analysis': analysis},
             "messages": [
                 ai_message
             ]
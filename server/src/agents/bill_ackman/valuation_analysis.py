@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,21 +16,18 @@ class ValuationAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Ackman invests in companies trading at a discount to intrinsic value.
         Uses a simplified DCF with FCF as a proxy, plus margin of safety analysis.
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append("No metrics available")
             return result
 
-        # Since metrics are in descending order (newest first),
-        # the most recent period is the first element
-        latest = metrics[0] if metrics else None
-        fcf = latest.get('free_cash_flow') if latest and latest.get('free_cash_flow') else 0
-        market_cap = latest.get('market_cap') if latest and latest.get('market_cap') else 0
+        fcf = frame.latest('free_cash_flow') or 0
+        market_cap = frame.latest('market_cap') or 0
 
         if fcf <= 0:
             result["details"].append(f"No positive FCF for valuation; FCF = {fcf}")
@@ -81,21 +80,15 @@ class ValuationAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'valuation_analysis'
         analysis['title'] = f'Valuation analysis'
 
-        analysis_data['valuation_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'valuation_analysis': analysis},
             "messages": [
                 ai_message
             ]
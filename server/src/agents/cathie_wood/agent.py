@@ -5,7 +5,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 
 from pkgutil import resolve_name
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -27,14 +28,30 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 disruptive_potential_analysis_node = DisruptivePotentialAnalysis({})
 innovation_growth_analysis_node = InnovationGrowthAnalysis({})
 valuation_analysis_node = ValuationAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "revenue", "gross_margin", "operating_margin", "debt_to_equity", "free_cash_flow",
+            "total_assets", "total_liabilities", "dividends_and_other_cash_distributions",
+            "outstanding_shares", "research_and_development", "capital_expenditure",
+            "operating_expense", "market_cap"
+        ],
+    },
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -44,34 +61,19 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "revenue",
-        "gross_margin",
-        "operating_margin",
-        "debt_to_equity",
-        "free_cash_flow",
-        "total_assets",
-        "total_liabilities",
-        "dividends_and_other_cash_distributions",
-        "outstanding_shares",
-        "research_and_development",
-        "capital_expenditure",
-        "operating_expense",
-        "market_cap",
-        ], end_date, period="yearly")
+    metrics = await data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly")
     
-    context['metrics'] = metrics
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics),
         'messages':[AIMessage(content=markdown.to_h2('Cathie Wood Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -91,8 +93,9 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     margin_of_safety = None
     intrinsic_value = analysis_data.get('valuation_analysis').get("intrinsic_value")
     market_cap = None
-    if context.get("metrics") is not None and len(context.get("metrics")) > 0:
-        market_cap = context.get("metrics")[0].get("market_cap")
+    metrics = input_store.get_input(state, 'metrics')
+    if metrics is not None and len(metrics) > 0:
+        market_cap = metrics[0].get("market_cap")
     if intrinsic_value and market_cap:
         margin_of_safety = (intrinsic_value - market_cap) / market_cap
 
@@ -100,6 +103,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['max_possible_score'] = max_possible_score
     analysis_data['margin_of_safety'] = margin_of_safety
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'cathie_wood', config)
     messages = [
             (
                 "system",
@@ -161,7 +165,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -185,7 +189,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -195,22 +199,13 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("disruptive_potential_analysis", disruptive_potential_analysis_node)
-workflow.add_node("innovation_growth_analysis", innovation_growth_analysis_node)
-workflow.add_node("valuation_analysis", valuation_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "disruptive_potential_analysis")
-workflow.add_edge("disruptive_potential_analysis", "innovation_growth_analysis")
-workflow.add_edge("innovation_growth_analysis", "valuation_analysis")
-workflow.add_edge("valuation_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "disruptive_potential_analysis": disruptive_potential_analysis_node,
+        "innovation_growth_analysis": innovation_growth_analysis_node,
+        "valuation_analysis": valuation_analysis_node,
+    },
+    end_analysis,
+)
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class DisruptivePotentialAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Analyze whether the company has disruptive products, technology, or business model.
         Evaluates multiple dimensions of disruptive potential:
@@ -24,7 +26,7 @@ class DisruptivePotentialAnalysis():
         4. Operating Leverage - demonstrates business model efficiency
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
@@ -32,13 +34,9 @@ class DisruptivePotentialAnalysis():
         details = []
 
         # 1. Revenue Growth Analysis - Check for accelerating growth
-        revenues = [item.get('revenue') for item in metrics if item.get('revenue')]
+        revenues = frame.present('revenue', nonzero=True)
         if len(revenues) >= 3:  # Need at least 3 periods to check acceleration
-            growth_rates = []
-            for i in range(len(revenues) - 1):
-                if revenues[i] and revenues[i + 1]:
-                    growth_rate = (revenues[i] - revenues[i + 1]) / abs(revenues[i + 1]) if revenues[i + 1] != 0 else 0
-                    growth_rates.append(growth_rate)
+            growth_rates = (revenues[:-1] - revenues[1:]) / abs(revenues[1:])
 
             # Check if growth is accelerating (first growth rate higher than last, since they're in reverse order)
             if len(growth_rates) >= 2 and growth_rates[0] > growth_rates[-1]:
@@ -46,7 +44,7 @@ class DisruptivePotentialAnalysis():
                 details.append(f"Revenue growth is accelerating: {(growth_rates[0]*100):.1f}% vs {(growth_rates[-1]*100):.1f}%")
 
             # Check absolute growth rate (most recent growth rate is at index 0)
-            latest_growth = growth_rates[0] if growth_rates else 0
+            latest_growth = growth_rates[0] if len(growth_rates) > 0 else 0
             if latest_growth > 1.0:
                 score += 3
                 details.append(f"Exceptional revenue growth: {(latest_growth*100):.1f}%")
@@ -60,7 +58,7 @@ class DisruptivePotentialAnalysis():
             details.append("Insufficient revenue data for growth analysis")
 
         # 2. Gross Margin Analysis - Check for expanding margins
-        gross_margins = [item.get('gross_margin') for item in metrics if item.get('gross_margin') is not None]
+        gross_margins = frame.present('gross_margin')
         if len(gross_margins) >= 2:
             margin_trend = gross_margins[0] - gross_margins[-1]
             if margin_trend > 0.05:  # 5% improvement
@@ -78,8 +76,7 @@ class DisruptivePotentialAnalysis():
             details.append("Insufficient gross margin data")
 
         # 3. Operating Leverage Analysis
-        revenues = [item.get('revenue') for item in metrics if item.get('revenue')]
-        operating_expenses = [item.get('operating_expense') for item in metrics if item.get('operating_expense')]
+        operating_expenses = frame.present('operating_expense', nonzero=True)
 
         if len(revenues) >= 2 and len(operating_expenses) >= 2:
             rev_growth = (revenues[0] - revenues[-1]) / abs(revenues[-1])
@@ -92,8 +89,8 @@ class DisruptivePotentialAnalysis():
             details.append("Insufficient data for operating leverage analysis")
 
         # 4. R&D Investment Analysis
-        rd_expenses = [item.get('research_and_development') for item in metrics if item.get('research_and_development') is not None]
-        if rd_expenses and revenues:
+        rd_expenses = frame.present('research_and_development')
+        if len(rd_expenses) > 0 and len(revenues) > 0:
             rd_intensity = rd_expenses[0] / revenues[0]
             if rd_intensity > 0.15:  # High R&D intensity
                 score += 3
@@ -118,21 +115,15 @@ class DisruptivePotentialAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'disruptive_potential_analysis'
         analysis['title'] = f'Disruptive potential analysis'
 
-        analysis_data['disruptive_potential_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'disruptive_potential_analysis': analysis},
             "messages": [
                 ai_message
             ]
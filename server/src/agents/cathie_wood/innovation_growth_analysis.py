@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class InnovationGrowthAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Evaluate the company's commitment to innovation and potential for exponential growth.
         Analyzes multiple dimensions:
@@ -25,7 +27,7 @@ class InnovationGrowthAnalysis():
         5. Growth Reinvestment - demonstrates commitment to future growth
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
@@ -33,10 +35,10 @@ class InnovationGrowthAnalysis():
         details = []
 
         # 1. R&D Investment Trends
-        rd_expenses = [item.get('research_and_development') for item in metrics if item.get('research_and_development')]
-        revenues = [item.get('revenue') for item in metrics if item.get('revenue')]
+        rd_expenses = frame.present('research_and_development', nonzero=True)
+        revenues = frame.present('revenue', nonzero=True)
 
-        if rd_expenses and revenues and len(rd_expenses) >= 2:
+        if len(rd_expenses) >= 2 and len(revenues) > 0:
             rd_growth = (rd_expenses[0] - rd_expenses[-1]) / abs(rd_expenses[-1]) if rd_expenses[-1] != 0 else 0
             if rd_growth > 0.5:  # 50% growth in R&D
                 score += 3
@@ -55,10 +57,10 @@ class InnovationGrowthAnalysis():
             details.append("Insufficient R&D data for trend analysis")
 
         # 2. Free Cash Flow Analysis
-        fcf_vals = [item.get('free_cash_flow') for item in metrics if item.get('free_cash_flow')]
-        if fcf_vals and len(fcf_vals) >= 2:
+        fcf_vals = frame.present('free_cash_flow', nonzero=True)
+        if len(fcf_vals) >= 2:
             fcf_growth = (fcf_vals[0] - fcf_vals[-1]) / abs(fcf_vals[-1])
-            positive_fcf_count = sum(1 for f in fcf_vals if f > 0)
+            positive_fcf_count = int((fcf_vals > 0).sum())
 
             if fcf_growth > 0.3 and positive_fcf_count == len(fcf_vals):
                 score += 3
@@ -73,8 +75,8 @@ class InnovationGrowthAnalysis():
             details.append("Insufficient FCF data for analysis")
 
         # 3. Operating Efficiency Analysis
-        op_margin_vals = [item.get('operating_margin') for item in metrics if item.get('operating_margin')]
-        if op_margin_vals and len(op_margin_vals) >= 2:
+        op_margin_vals = frame.present('operating_margin', nonzero=True)
+        if len(op_margin_vals) >= 2:
             margin_trend = op_margin_vals[0] - op_margin_vals[-1]
 
             if op_margin_vals[0] > 0.15 and margin_trend > 0:
@@ -90,8 +92,8 @@ class InnovationGrowthAnalysis():
             details.append("Insufficient operating margin data")
 
         # 4. Capital Allocation Analysis
-        capex = [item.get('capital_expenditure') for item in metrics if item.get('capital_expenditure')]
-        if capex and revenues and len(capex) >= 2:
+        capex = frame.present('capital_expenditure', nonzero=True)
+        if len(capex) >= 2 and len(revenues) > 0:
             capex_intensity = abs(capex[0]) / revenues[0]
             capex_growth = (abs(capex[0]) - abs(capex[-1])) / abs(capex[-1]) if capex[-1] != 0 else 0
 
@@ -105,8 +107,8 @@ class InnovationGrowthAnalysis():
             details.append("Insufficient CAPEX data")
 
         # 5. Growth Reinvestment Analysis
-        dividends = [item.get('dividends_and_other_cash_distributions') for item in metrics if item.get('dividends_and_other_cash_distributions')]
-        if dividends and fcf_vals:
+        dividends = frame.present('dividends_and_other_cash_distributions', nonzero=True)
+        if len(dividends) > 0 and len(fcf_vals) > 0:
             latest_payout_ratio = dividends[0] / fcf_vals[0] if fcf_vals[0] != 0 else 1
             if latest_payout_ratio < 0.2:  # Low dividend payout ratio suggests reinvestment focus
                 score += 2
@@ -128,21 +130,15 @@ class InnovationGrowthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'innovation_growth_analysis'
         analysis['title'] = f'Innovation growth analysis'
 
-        analysis_data['innovation_growth_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'innovation_growth_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -5,7 +5,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 
 from pkgutil import resolve_name
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -28,7 +29,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 moat_strength_analysis_node = MoatStrengthAnalysis({})
@@ -36,7 +41,19 @@ management_quality_analysis_node = ManagementQualityAnalysis({})
 predictability_analysis_node = PredictabilityAnalysis({})
 valuation_analysis_node = ValuationAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "revenue", "net_income", "operating_income", "return_on_invested_capital",
+            "gross_margin", "operating_margin", "free_cash_flow", "capital_expenditure",
+            "cash_and_equivalents", "total_debt", "shareholders_equity", "outstanding_shares",
+            "research_and_development", "goodwill_and_intangible_assets", "market_cap"
+        ],
+    },
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -46,36 +63,19 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "revenue",
-        "net_income",
-        "operating_income",
-        "return_on_invested_capital",
-        "gross_margin",
-        "operating_margin",
-        "free_cash_flow",
-        "capital_expenditure",
-        "cash_and_equivalents",
-        "total_debt",
-        "shareholders_equity",
-        "outstanding_shares",
-        "research_and_development",
-        "goodwill_and_intangible_assets",
-        "market_cap",
-        ], end_date, period="yearly")
+    metrics = await data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly")
     
-    context['metrics'] = metrics
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics),
         'messages':[AIMessage(content=markdown.to_h2('Charlie Munger Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score with Munger's weighting preferences
     # Munger weights quality and predictability higher than current valuation
@@ -92,6 +92,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['total_score'] = total_score
     analysis_data['max_possible_score'] = max_possible_score
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'charlie_munger', config)
     messages = [
             (
                 "system",
@@ -151,7 +152,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -175,7 +176,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -185,24 +186,14 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("moat_strength_analysis", moat_strength_analysis_node)
-workflow.add_node("management_quality_analysis", management_quality_analysis_node)
-workflow.add_node("predictability_analysis", predictability_analysis_node)
-workflow.add_node("valuation_analysis", valuation_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "moat_strength_analysis")
-workflow.add_edge("moat_strength_analysis", "management_quality_analysis")
-workflow.add_edge("management_quality_analysis", "predictability_analysis")
-workflow.add_edge("predictability_analysis", "valuation_analysis")
-workflow.add_edge("valuation_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "moat_strength_analysis": moat_strength_analysis_node,
+        "management_quality_analysis": management_quality_analysis_node,
+        "predictability_analysis": predictability_analysis_node,
+        "valuation_analysis": valuation_analysis_node,
+    },
+    end_analysis,
+)
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, ratio
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class ManagementQualityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Evaluate management quality using Munger's criteria:
         - Capital allocation wisdom
@@ -24,7 +26,7 @@ class ManagementQualityAnalysis():
         - Long-term focus
         """
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
@@ -33,21 +35,16 @@ class ManagementQualityAnalysis():
         
         # 1. Capital allocation - Check FCF to net income ratio
         # Munger values companies that convert earnings to cash
-        fcf_values = [item.get('free_cash_flow') for item in metrics 
-                     if item.get('free_cash_flow') is not None]
+        fcf_values = frame.present('free_cash_flow')
         
-        net_income_values = [item.get('net_income') for item in metrics 
-                            if item.get('net_income') is not None]
+        net_income_values = frame.present('net_income')
         
-        if fcf_values and net_income_values and len(fcf_values) == len(net_income_values):
+        if len(fcf_values) > 0 and len(fcf_values) == len(net_income_values):
             # Calculate FCF to Net Income ratio for each period
-            fcf_to_ni_ratios = []
-            for i in range(len(fcf_values)):
-                if net_income_values[i] and net_income_values[i] > 0:
-                    fcf_to_ni_ratios.append(fcf_values[i] / net_income_values[i])
+            fcf_to_ni_ratios = ratio(fcf_values, net_income_values)[net_income_values > 0]
             
-            if fcf_to_ni_ratios:
-                avg_ratio = sum(fcf_to_ni_ratios) / len(fcf_to_ni_ratios)
+            if len(fcf_to_ni_ratios) > 0:
+                avg_ratio = fcf_to_ni_ratios.mean()
                 if avg_ratio > 1.1:  # FCF > net income suggests good accounting
                     score += 3
                     details.append(f"Excellent cash conversion: FCF/NI ratio of {avg_ratio:.2f}")
@@ -65,13 +62,11 @@ class ManagementQualityAnalysis():
             details.append("Missing FCF or Net Income data")
         
         # 2. Debt management - Munger is cautious about debt
-        debt_values = [item.get('total_debt') for item in metrics 
-                      if item.get('total_debt') is not None]
+        debt_values = frame.present('total_debt')
         
-        equity_values = [item.get('shareholders_equity') for item in metrics 
-                        if item.get('shareholders_equity') is not None]
+        equity_values = frame.present('shareholders_equity')
         
-        if debt_values and equity_values and len(debt_values) == len(equity_values):
+        if len(debt_values) > 0 and len(debt_values) == len(equity_values):
             # Calculate D/E ratio for most recent period
             recent_de_ratio = debt_values[0] / equity_values[0] if equity_values[0] > 0 else float('inf')
             
@@ -90,12 +85,10 @@ class ManagementQualityAnalysis():
             details.append("Missing debt or equity data")
         
         # 3. Cash management efficiency - Munger values appropriate cash levels
-        cash_values = [item.get('cash_and_equivalents') for item in metrics
-                      if item.get('cash_and_equivalents') is not None]
-        revenue_values = [item.get('revenue') for item in metrics
-                         if item.get('revenue') is not None]
+        cash_values = frame.present('cash_and_equivalents')
+        revenue_values = frame.present('revenue')
         
-        if cash_values and revenue_values and len(cash_values) > 0 and len(revenue_values) > 0:
+        if len(cash_values) > 0 and len(revenue_values) > 0:
             # Calculate cash to revenue ratio (Munger likes 10-20% for most businesses)
             cash_to_revenue = cash_values[0] / revenue_values[0] if revenue_values[0] > 0 else 0
             
@@ -117,10 +110,9 @@ class ManagementQualityAnalysis():
             details.append("Insufficient cash or revenue data")
         
         # 4. Consistency in share count - Munger prefers stable/decreasing shares
-        share_counts = [item.get('outstanding_shares') for item in metrics
-                       if item.get('outstanding_shares') is not None]
+        share_counts = frame.present('outstanding_shares')
         
-        if share_counts and len(share_counts) >= 3:
+        if len(share_counts) >= 3:
             if share_counts[0] < share_counts[-1] * 0.95:  # 5%+ reduction in shares
                 score += 2
                 details.append("Shareholder-friendly: Reducing share count over time")
@@ -150,21 +142,15 @@ class ManagementQualityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'management_quality_analysis'
         analysis['title'] = f'Management quality analysis'
 
-        analysis_data['management_quality_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'management_quality_analysis': analysis},
             "messages": [
                 ai_message
             ]
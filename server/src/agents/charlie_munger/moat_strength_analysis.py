@@ -1,11 +1,14 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 
 import time
+import numpy as np
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, ratio
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +17,7 @@ class MoatStrengthAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Analyze the business's competitive advantage using Munger's approach:
         - Consistent high returns on capital (ROIC)
@@ -23,7 +26,7 @@ class MoatStrengthAnalysis():
         - Network effects and intangible assets (R&D investments, goodwill)
         """
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
@@ -31,12 +34,11 @@ class MoatStrengthAnalysis():
         details = []
         
         # 1. Return on Invested Capital (ROIC) analysis - Munger's favorite metric
-        roic_values = [item.get('return_on_invested_capital') for item in metrics 
-                       if item.get('return_on_invested_capital') is not None]
+        roic_values = frame.present('return_on_invested_capital')
         
-        if roic_values:
+        if len(roic_values) > 0:
             # Check if ROIC consistently above 15% (Munger's threshold)
-            high_roic_count = sum(1 for r in roic_values if r > 0.15)
+            high_roic_count = int((roic_values > 0.15).sum())
             if high_roic_count >= len(roic_values) * 0.8:  # 80% of periods show high ROIC
                 score += 3
                 details.append(f"Excellent ROIC: >15% in {high_roic_count}/{len(roic_values)} periods")
@@ -52,35 +54,30 @@ class MoatStrengthAnalysis():
             details.append("No ROIC data available")
         
         # 2. Pricing power - check gross margin stability and trends
-        gross_margins = [item.get('gross_margin') for item in metrics 
-                        if item.get('gross_margin') is not None]
+        gross_margins = frame.present('gross_margin')
         
-        if gross_margins and len(gross_margins) >= 3:
+        if len(gross_margins) >= 3:
             # Munger likes stable or improving gross margins
-            margin_trend = sum(1 for i in range(1, len(gross_margins)) if gross_margins[i] >= gross_margins[i-1])
+            margin_trend = int((gross_margins[1:] >= gross_margins[:-1]).sum())
             if margin_trend >= len(gross_margins) * 0.7:  # Improving in 70% of periods
                 score += 2
                 details.append("Strong pricing power: Gross margins consistently improving")
-            elif sum(gross_margins) / len(gross_margins) > 0.3:  # Average margin > 30%
+            elif gross_margins.mean() > 0.3:  # Average margin > 30%
                 score += 1
-                details.append(f"Good pricing power: Average gross margin {sum(gross_margins)/len(gross_margins):.1%}")
+                details.append(f"Good pricing power: Average gross margin {gross_margins.mean():.1%}")
             else:
                 details.append("Limited pricing power: Low or declining gross margins")
         else:
             details.append("Insufficient gross margin data")
         
         # 3. Capital intensity - Munger prefers low capex businesses
-        if len(metrics) >= 3:
-            capex_to_revenue = []
-            for item in metrics:
-                if (item.get('capital_expenditure') is not None and 
-                    item.get('revenue') is not None and item.get('revenue') > 0):
-                    # Note: capital_expenditure is typically negative in financial statements
-                    capex_ratio = abs(item.get('capital_expenditure')) / item.get('revenue')
-                    capex_to_revenue.append(capex_ratio)
+        if len(frame) >= 3:
+            # Note: capital_expenditure is typically negative in financial statements
+            capex_to_revenue = ratio(np.abs(frame.column('capital_expenditure')), frame.column('revenue'))
+            capex_to_revenue = capex_to_revenue[(frame.column('revenue') > 0) & ~np.isnan(capex_to_revenue)]
             
-            if capex_to_revenue:
-                avg_capex_ratio = sum(capex_to_revenue) / len(capex_to_revenue)
+            if len(capex_to_revenue) > 0:
+                avg_capex_ratio = capex_to_revenue.mean()
                 if avg_capex_ratio < 0.05:  # Less than 5% of revenue
                     score += 2
                     details.append(f"Low capital requirements: Avg capex {avg_capex_ratio:.1%} of revenue")
@@ -95,18 +92,16 @@ class MoatStrengthAnalysis():
             details.append("Insufficient data for capital intensity analysis")
         
         # 4. Intangible assets - Munger values R&D and intellectual property
-        r_and_d = [item.get('research_and_development') for item in metrics
-                  if item.get('research_and_development') is not None]
+        r_and_d = frame.present('research_and_development')
         
-        goodwill_and_intangible_assets = [item.get('goodwill_and_intangible_assets') for item in metrics
-                   if item.get('goodwill_and_intangible_assets') is not None]
+        goodwill_and_intangible_assets = frame.present('goodwill_and_intangible_assets')
 
-        if r_and_d and len(r_and_d) > 0:
-            if sum(r_and_d) > 0:  # If company is investing in R&D
+        if len(r_and_d) > 0:
+            if r_and_d.sum() > 0:  # If company is investing in R&D
                 score += 1
                 details.append("Invests in R&D, building intellectual property")
         
-        if (goodwill_and_intangible_assets and len(goodwill_and_intangible_assets) > 0):
+        if len(goodwill_and_intangible_assets) > 0:
             score += 1
             details.append("Significant goodwill/intangible assets, suggesting brand value or IP")
         
@@ -124,21 +119,15 @@ class MoatStrengthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'moat_strength_analysis'
         analysis['title'] = f'Moat strength analysis'
 
-        analysis_data['moat_strength_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'moat_strength_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,11 +1,14 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 
 import time
+import numpy as np
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, growth, mean_absolute_deviation
 from langgraph.types import StreamWriter
 
 
@@ -14,13 +17,13 @@ class PredictabilityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Assess the predictability of the business - Munger strongly prefers businesses
         whose future operations and cashflows are relatively easy to predict.
         """
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 5:
+        if len(frame) < 5:
             result["details"].append('Insufficient data to analyze business predictability (need 5+ years)')
             return result
 
@@ -28,22 +31,18 @@ class PredictabilityAnalysis():
         details = []
         
         # 1. Revenue stability and growth
-        revenues = [item.get('revenue') for item in metrics 
-                   if item.get('revenue') is not None]
+        revenues = frame.present('revenue')
         
-        if revenues and len(revenues) >= 5:
-            # Calculate year-over-year growth rates, handling zero division
-            growth_rates = []
-            for i in range(len(revenues)-1):
-                if revenues[i+1] != 0:  # Avoid division by zero
-                    growth_rate = (revenues[i] / revenues[i+1] - 1)
-                    growth_rates.append(growth_rate)
+        if len(revenues) >= 5:
+            # Calculate year-over-year growth rates, skipping the growth from a zero revenue
+            growth_rates = growth(revenues)
+            growth_rates = growth_rates[~np.isnan(growth_rates)]
             
-            if not growth_rates:
+            if len(growth_rates) == 0:
                 details.append("Cannot calculate revenue growth: zero revenue values found")
             else:
-                avg_growth = sum(growth_rates) / len(growth_rates)
-                growth_volatility = sum(abs(r - avg_growth) for r in growth_rates) / len(growth_rates)
+                avg_growth = growth_rates.mean()
+                growth_volatility = mean_absolute_deviation(growth_rates)
                 
                 if avg_growth > 0.05 and growth_volatility < 0.1:
                     # Steady, consistent growth (Munger loves this)
@@ -63,12 +62,11 @@ class PredictabilityAnalysis():
             details.append("Insufficient revenue history for predictability analysis")
         
         # 2. Operating income stability
-        op_income = [item.get('operating_income') for item in metrics 
-                    if item.get('operating_income') is not None]
+        op_income = frame.present('operating_income')
         
-        if op_income and len(op_income) >= 5:
+        if len(op_income) >= 5:
             # Count positive operating income periods
-            positive_periods = sum(1 for income in op_income if income > 0)
+            positive_periods = int((op_income > 0).sum())
             
             if positive_periods == len(op_income):
                 # Consistently profitable operations
@@ -88,13 +86,12 @@ class PredictabilityAnalysis():
             details.append("Insufficient operating income history")
         
         # 3. Margin consistency - Munger values stable margins
-        op_margins = [item.get('operating_margin') for item in metrics 
-                     if item.get('operating_margin') is not None]
+        op_margins = frame.present('operating_margin')
         
-        if op_margins and len(op_margins) >= 5:
+        if len(op_margins) >= 5:
             # Calculate margin volatility
-            avg_margin = sum(op_margins) / len(op_margins)
-            margin_volatility = sum(abs(m - avg_margin) for m in op_margins) / len(op_margins)
+            avg_margin = op_margins.mean()
+            margin_volatility = mean_absolute_deviation(op_margins)
             
             if margin_volatility < 0.03:  # Very stable margins
                 score += 2
@@ -108,12 +105,11 @@ class PredictabilityAnalysis():
             details.append("Insufficient margin history")
         
         # 4. Cash generation reliability
-        fcf_values = [item.get('free_cash_flow') for item in metrics 
-                     if item.get('free_cash_flow') is not None]
+        fcf_values = frame.present('free_cash_flow')
         
-        if fcf_values and len(fcf_values) >= 5:
+        if len(fcf_values) >= 5:
             # Count positive FCF periods
-            positive_fcf_periods = sum(1 for fcf in fcf_values if fcf > 0)
+            positive_fcf_periods = int((fcf_values > 0).sum())
             
             if positive_fcf_periods == len(fcf_values):
                 # Consistently positive FCF
@@ -143,21 +139,15 @@ class PredictabilityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'predictability_analysis'
         analysis['title'] = f'Predictability analysis'
 
-        analysis_data['predictability_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'predictability_analysis': analysis},
             "messages": [
                 ai_message
             ]
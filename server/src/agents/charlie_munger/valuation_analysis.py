@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, trailing_mean
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class ValuationAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Calculate intrinsic value using Munger's approach:
         - Focus on owner earnings (approximated by FCF)
@@ -22,15 +24,14 @@ class ValuationAnalysis():
         - Prefer paying a fair price for a wonderful business
         """
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
         # Get FCF values (Munger's preferred "owner earnings" metric)
-        fcf_values = [item.get('free_cash_flow') for item in metrics 
-                     if item.get('free_cash_flow') is not None]
+        fcf_values = frame.present('free_cash_flow')
         
-        if not fcf_values or len(fcf_values) < 3:
+        if len(fcf_values) < 3:
             result["details"].append('Insufficient free cash flow data for valuation')
             return result
         
@@ -39,7 +40,7 @@ class ValuationAnalysis():
         
         # 1. Normalize earnings by taking average of last 3-5 years
         # (Munger prefers to normalize earnings to avoid over/under-valuation based on cyclical factors)
-        normalized_fcf = sum(fcf_values[:min(5, len(fcf_values))]) / min(5, len(fcf_values))
+        normalized_fcf = trailing_mean(fcf_values, 5)
         
         if normalized_fcf <= 0:
             result["details"].append(f"Negative or zero normalized FCF ({normalized_fcf}), cannot value")
@@ -47,10 +48,9 @@ class ValuationAnalysis():
             return result
         
         # 2. Get market cap for comparison
-        market_caps = [item.get('market_cap') for item in metrics 
-                      if item.get('market_cap') is not None]
+        market_caps = frame.present('market_cap')
         
-        if not market_caps or len(market_caps) == 0:
+        if len(market_caps) == 0:
             result["details"].append("No market cap data available for valuation")
             return result
             
@@ -102,8 +102,8 @@ class ValuationAnalysis():
         # 7. Check earnings trajectory for additional context
         # Munger likes growing owner earnings
         if len(fcf_values) >= 3:
-            recent_avg = sum(fcf_values[:3]) / 3
-            older_avg = sum(fcf_values[-3:]) / 3 if len(fcf_values) >= 6 else fcf_values[-1]
+            recent_avg = trailing_mean(fcf_values, 3)
+            older_avg = fcf_values[-3:].mean() if len(fcf_values) >= 6 else fcf_values[-1]
             
             if recent_avg > older_avg * 1.2:  # >20% growth in FCF
                 score += 3
@@ -136,21 +136,15 @@ class ValuationAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'valuation_analysis'
         analysis['title'] = f'Valuation analysis'
 
-        analysis_data['valuation_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'valuation_analysis': analysis},
             "messages": [
                 ai_message
             ]
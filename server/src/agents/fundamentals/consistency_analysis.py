@@ -1,4 +1,4 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +6,8 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame, mean_absolute_deviation
 from langgraph.types import StreamWriter
 
 
@@ -14,10 +16,10 @@ class ConsistencyAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, derived: DerivedMetrics) -> dict[str, any]:
         """Analyze financial consistency and stability over time."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 5:
+        if len(frame) < 5:
             result["details"].append('Insufficient historical data (need at least 5 years)')
             return result
 
@@ -25,28 +27,28 @@ class ConsistencyAnalysis():
         reasoning = []
 
         # Get key metrics over time
-        roes = [m.get('return_on_equity') for m in metrics if m.get('return_on_equity') is not None]
-        margins = [m.get('operating_margin') for m in metrics if m.get('operating_margin') is not None]
-        revenues = [m.get('revenue') for m in metrics if m.get('revenue') is not None]
-        net_incomes = [m.get('net_income') for m in metrics if m.get('net_income') is not None]
-        free_cash_flows = [m.get('free_cash_flow') for m in metrics if m.get('free_cash_flow') is not None]
+        roes = derived.series('return_on_equity')
+        margins = derived.series('operating_margin')
+        revenues = derived.series('revenue')
+        net_incomes = derived.series('net_income')
+        free_cash_flows = derived.series('free_cash_flow')
 
         # Check ROE consistency (at least 70% of years > 10%)
         if len(roes) >= 3:
-            strong_roe_years = sum(1 for roe in roes[:min(5, len(roes))] if roe > 0.10)
-            if strong_roe_years >= len(roes[:min(5, len(roes))]) * 0.7:
+            recent_roes = roes[:5]
+            strong_roe_years = int((recent_roes > 0.10).sum())
+            if strong_roe_years >= len(recent_roes) * 0.7:
                 score += 3
-                reasoning.append(f"Consistent strong ROE ({strong_roe_years}/{min(5, len(roes))} years > 10%)")
-            elif strong_roe_years >= len(roes[:min(5, len(roes))]) * 0.5:
+                reasoning.append(f"Consistent strong ROE ({strong_roe_years}/{len(recent_roes)} years > 10%)")
+            elif strong_roe_years >= len(recent_roes) * 0.5:
                 score += 2
-                reasoning.append(f"Moderately consistent ROE ({strong_roe_years}/{min(5, len(roes))} years > 10%)")
+                reasoning.append(f"Moderately consistent ROE ({strong_roe_years}/{len(recent_roes)} years > 10%)")
             else:
-                reasoning.append(f"Inconsistent ROE ({strong_roe_years}/{min(5, len(roes))} years > 10%)")
+                reasoning.append(f"Inconsistent ROE ({strong_roe_years}/{len(recent_roes)} years > 10%)")
 
         # Check margin stability
         if len(margins) >= 3:
-            avg_margin = sum(margins[:min(5, len(margins))]) / len(margins[:min(5, len(margins))])
-            margin_volatility = sum(abs(m - avg_margin) for m in margins[:min(5, len(margins))]) / len(margins[:min(5, len(margins))])
+            margin_volatility = mean_absolute_deviation(margins[:5])
             
             if margin_volatility < 0.03:  # Less than 3% volatility
                 score += 2
@@ -60,14 +62,10 @@ class ConsistencyAnalysis():
         # Check revenue growth consistency
         if len(revenues) >= 3:
             # Calculate year-over-year growth rates
-            growth_rates = []
-            for i in range(len(revenues[:min(5, len(revenues))])-1):
-                if revenues[i+1] != 0:
-                    growth_rate = (revenues[i] - revenues[i+1]) / revenues[i+1]
-                    growth_rates.append(growth_rate)
+            growth_rates = derived.growth_rates('revenue', periods=5)
             
             if len(growth_rates) > 0:
-                positive_growth_years = sum(1 for g in growth_rates if g > 0)
+                positive_growth_years = int((growth_rates > 0).sum())
                 if positive_growth_years >= len(growth_rates) * 0.8:
                     score += 2
                     reasoning.append(f"Consistent revenue growth ({positive_growth_years}/{len(growth_rates)} years positive)")
@@ -79,24 +77,26 @@ class ConsistencyAnalysis():
 
         # Check earnings consistency
         if len(net_incomes) >= 3:
-            positive_earnings_years = sum(1 for ni in net_incomes[:min(5, len(net_incomes))] if ni > 0)
-            if positive_earnings_years == min(5, len(net_incomes)):
+            recent_net_incomes = net_incomes[:5]
+            positive_earnings_years = int((recent_net_incomes > 0).sum())
+            if positive_earnings_years == len(recent_net_incomes):
                 score += 2
-                reasoning.append(f"Consistently profitable ({positive_earnings_years}/{min(5, len(net_incomes))} years)")
-            elif positive_earnings_years >= min(5, len(net_incomes)) * 0.8:
+                reasoning.append(f"Consistently profitable ({positive_earnings_years}/{len(recent_net_incomes)} years)")
+            elif positive_earnings_years >= len(recent_net_incomes) * 0.8:
                 score += 1
-                reasoning.append(f"Mostly profitable ({positive_earnings_years}/{min(5, len(net_incomes))} years)")
+                reasoning.append(f"Mostly profitable ({positive_earnings_years}/{len(recent_net_incomes)} years)")
             else:
-                reasoning.append(f"Erratic profitability ({positive_earnings_years}/{min(5, len(net_incomes))} years)")
+                reasoning.append(f"Erratic profitability ({positive_earnings_years}/{len(recent_net_incomes)} years)")
 
         # Check cash flow consistency
         if len(free_cash_flows) >= 3:
-            positive_fcf_years = sum(1 for fcf in free_cash_flows[:min(5, len(free_cash_flows))] if fcf > 0)
-            if positive_fcf_years == min(5, len(free_cash_flows)):
+            recent_free_cash_flows = free_cash_flows[:5]
+            positive_fcf_years = int((recent_free_cash_flows > 0).sum())
+            if positive_fcf_years == len(recent_free_cash_flows):
                 score += 1
-                reasoning.append(f"Consistently positive free cash flow ({positive_fcf_years}/{min(5, len(free_cash_flows))} years)")
-            elif positive_fcf_years >= min(5, len(free_cash_flows)) * 0.8:
-                reasoning.append(f"Mostly positive free cash flow ({positive_fcf_years}/{min(5, len(free_cash_flows))} years)")
+                reasoning.append(f"Consistently positive free cash flow ({positive_fcf_years}/{len(recent_free_cash_flows)} years)")
+            elif positive_fcf_years >= len(recent_free_cash_flows) * 0.8:
+                reasoning.append(f"Mostly positive free cash flow ({positive_fcf_years}/{len(recent_free_cash_flows)} years)")
 
         result["score"] = score
         result["details"] = reasoning
@@ -109,21 +109,15 @@ class ConsistencyAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        derived = get_derived_metrics(state, config)
+        analysis = self.analyze(derived.frame, derived)
         analysis['type'] = 'consistency_analysis'
         analysis['title'] = f'Consistency Analysis'
 
-        analysis_data['consistency_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'consistency_analysis': analysis},
             "messages": [
                 ai_message
             ]
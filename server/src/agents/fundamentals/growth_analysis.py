@@ -1,4 +1,4 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +6,8 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame
 from langgraph.types import StreamWriter
 
 
@@ -14,10 +16,10 @@ class GrowthAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, derived: DerivedMetrics) -> dict[str, any]:
         """Analyze company growth potential based on historical growth and reinvestment metrics."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient historical data (need at least 3 years)')
             return result
 
@@ -25,25 +27,13 @@ class GrowthAnalysis():
         reasoning = []
 
         # Calculate revenue CAGR (oldest to latest)
-        revs = [m.get('revenue') for m in reversed(metrics) if m.get('revenue')]
-        if len(revs) >= 2 and revs[0] and revs[0] > 0:
-            rev_cagr = (revs[-1] / revs[0]) ** (1 / (len(revs) - 1)) - 1
-        else:
-            rev_cagr = None
+        rev_cagr = derived.cagr('revenue')
 
         # Calculate earnings CAGR
-        earnings = [m.get('net_income') for m in reversed(metrics) if m.get('net_income')]
-        if len(earnings) >= 2 and earnings[0] and earnings[0] > 0:
-            earnings_cagr = (earnings[-1] / earnings[0]) ** (1 / (len(earnings) - 1)) - 1
-        else:
-            earnings_cagr = None
+        earnings_cagr = derived.cagr('net_income')
 
         # Calculate book value growth
-        book_values = [m.get('stockholders_equity') for m in reversed(metrics) if m.get('stockholders_equity')]
-        if len(book_values) >= 2 and book_values[0] and book_values[0] > 0:
-            book_cagr = (book_values[-1] / book_values[0]) ** (1 / (len(book_values) - 1)) - 1
-        else:
-            book_cagr = None
+        book_cagr = derived.cagr('stockholders_equity')
 
         # Evaluate revenue growth
         if rev_cagr is not None:
@@ -85,7 +75,7 @@ class GrowthAnalysis():
                 reasoning.append(f"Slow/negative book value growth ({book_cagr:.1%} CAGR)")
 
         # Check reinvestment efficiency (if we have data)
-        latest = metrics[0]
+        latest = frame.latest_period()
         if (latest.get('net_income') and latest.get('dividends_and_other_cash_distributions') and 
             latest.get('capital_expenditure') and latest.get('stockholders_equity')):
             
@@ -117,21 +107,15 @@ class GrowthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        derived = get_derived_metrics(state, config)
+        analysis = self.analyze(derived.frame, derived)
         analysis['type'] = 'growth_analysis'
         analysis['title'] = f'Growth Analysis'
 
-        analysis_data['growth_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'growth_analysis': analysis},
             "messages": [
                 ai_message
             ]
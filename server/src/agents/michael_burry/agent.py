@@ -4,7 +4,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 """
 
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -27,7 +28,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 financial_statement_analysis_node = FinancialStatementAnalysis({})
@@ -36,7 +41,24 @@ deep_value_analysis_node = DeepValueAnalysis({})
 risk_assessment_node = RiskAssessment({})
 contrarian_analysis_node = ContrarianAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio",
+            "return_on_invested_capital", "asset_turnover", "market_cap", "capital_expenditure",
+            "depreciation_and_amortization", "net_income", "ordinary_shares_number",
+            "total_assets", "total_liabilities", "stockholders_equity",
+            "dividends_and_other_cash_distributions", "issuance_or_purchase_of_equity_shares",
+            "gross_profit", "revenue", "free_cash_flow", "gross_margin", "ebit",
+            "interest_expense", "price_to_earnings_ratio", "price_to_book_ratio",
+            "enterprise_value", "beta", "cash_and_equivalents", "inventory", "accounts_receivable",
+            "accounts_payable", "short_term_debt", "long_term_debt", "operating_income"
+        ],
+    },
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -46,48 +68,19 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "return_on_equity","debt_to_equity","operating_margin","current_ratio","return_on_invested_capital","asset_turnover","market_cap",
-            "capital_expenditure",
-            "depreciation_and_amortization",
-            "net_income",
-            "ordinary_shares_number",
-            "total_assets",
-            "total_liabilities",
-            "stockholders_equity",
-            "dividends_and_other_cash_distributions",
-            "issuance_or_purchase_of_equity_shares",
-            "gross_profit",
-            "revenue",
-            "free_cash_flow",
-            "gross_margin",
-            "ebit",
-            "interest_expense",
-            "price_to_earnings_ratio",
-            "price_to_book_ratio",
-            "enterprise_value",
-            "beta",
-            "cash_and_equivalents",
-            "inventory",
-            "accounts_receivable",
-            "accounts_payable",
-            "short_term_debt",
-            "long_term_debt",
-            "operating_income"
-        ], end_date, period="yearly")
+    metrics = await data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly")
     
-    context['metrics'] = metrics
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics),
         'messages':[AIMessage(content=markdown.to_h2('Michael Burry Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -111,8 +104,9 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     margin_of_safety = None
     intrinsic_value = analysis_data.get('deep_value_analysis').get("intrinsic_value")
     market_cap = None
-    if context.get("metrics") is not None and len(context.get("metrics")) > 0:
-        market_cap = context.get("metrics")[0].get("market_cap")
+    metrics = input_store.get_input(state, 'metrics')
+    if metrics is not None and len(metrics) > 0:
+        market_cap = metrics[0].get("market_cap")
     if intrinsic_value and market_cap:
         margin_of_safety = (intrinsic_value - market_cap) / market_cap
 
@@ -120,6 +114,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['max_possible_score'] = max_possible_score
     analysis_data['margin_of_safety'] = margin_of_safety
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'michael_burry', config)
     messages = [
             (
                 "system",
@@ -176,7 +171,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -200,7 +195,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -209,26 +204,15 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("financial_statement_analysis", financial_statement_analysis_node)
-workflow.add_node("market_inefficiency_analysis", market_inefficiency_analysis_node)
-workflow.add_node("deep_value_analysis", deep_value_analysis_node)
-workflow.add_node("risk_assessment", risk_assessment_node)
-workflow.add_node("contrarian_analysis", contrarian_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "financial_statement_analysis")
-workflow.add_edge("financial_statement_analysis", "market_inefficiency_analysis")
-workflow.add_edge("market_inefficiency_analysis", "deep_value_analysis")
-workflow.add_edge("deep_value_analysis", "risk_assessment")
-workflow.add_edge("risk_assessment", "contrarian_analysis")
-workflow.add_edge("contrarian_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "financial_statement_analysis": financial_statement_analysis_node,
+        "market_inefficiency_analysis": market_inefficiency_analysis_node,
+        "deep_value_analysis": deep_value_analysis_node,
+        "risk_assessment": risk_assessment_node,
+        "contrarian_analysis": contrarian_analysis_node,
+    },
+    end_analysis,
+)
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,14 @@ class ContrarianAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze contrarian investment opportunities and market sentiment."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient historical data (need at least 3 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1] if len(metrics) > 1 else None
+        latest_metrics = frame.latest_period()
 
         score = 0
         reasoning = []
@@ -42,9 +43,9 @@ class ContrarianAnalysis():
 
         # 2. Sentiment contrarian indicators
         # Compare current performance to recent trends
-        if len(metrics) >= 3:
+        if len(frame) >= 3:
             # Check if earnings have been improving while market may not have recognized it
-            earnings = [m.get('net_income') for m in metrics[:3] if m.get('net_income') is not None]
+            earnings = frame.present('net_income', periods=3)
             if len(earnings) >= 3:
                 recent_trend = (earnings[0] - earnings[2]) / earnings[2] if earnings[2] != 0 else 0
                 if recent_trend > 0.2:  # 20%+ earnings improvement
@@ -83,11 +84,11 @@ class ContrarianAnalysis():
 
         # 5. Contrarian momentum analysis
         # Look for stocks that have been declining but show fundamental strength
-        if (len(metrics) >= 3 and latest_metrics.get('market_cap') and 
-            metrics[2].get('market_cap') and metrics[2].get('market_cap') > 0):
+        market_cap_past = frame.period(2).get('market_cap')
+        if (len(frame) >= 3 and latest_metrics.get('market_cap') and 
+            market_cap_past and market_cap_past > 0):
             
             market_cap_current = latest_metrics['market_cap']
-            market_cap_past = metrics[2]['market_cap']
             price_change = (market_cap_current - market_cap_past) / market_cap_past
             
             if price_change < -0.2:  # 20%+ decline
@@ -145,21 +146,15 @@ class ContrarianAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'contrarian_analysis'
         analysis['title'] = f'Contrarian Analysis'
 
-        analysis_data['contrarian_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'contrarian_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,4 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +6,8 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame
 from langgraph.types import StreamWriter
 
 
@@ -14,14 +16,14 @@ class DeepValueAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, derived: DerivedMetrics) -> dict[str, any]:
         """Analyze deep value opportunities and calculate intrinsic value."""
         result = {"score": 0, "max_score": 10, "details": [], "intrinsic_value": None}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
 
         score = 0
         reasoning = []
@@ -87,11 +89,10 @@ class DeepValueAnalysis():
 
         # 3. Free cash flow yield analysis
         if latest_metrics.get('free_cash_flow') and latest_metrics.get('market_cap'):
-            fcf = latest_metrics['free_cash_flow']
             market_cap = latest_metrics['market_cap']
             
             if market_cap > 0:
-                fcf_yield = fcf / market_cap if fcf > 0 else 0
+                fcf_yield = max(derived.fcf_yield(), 0)
                 
                 if fcf_yield > 0.08:  # 8%+ FCF yield
                     score += 2
@@ -157,21 +158,15 @@ class DeepValueAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        derived = get_derived_metrics(state, config)
+        analysis = self.analyze(derived.frame, derived)
         analysis['type'] = 'deep_value_analysis'
         analysis['title'] = f'Deep Value Analysis'
 
-        analysis_data['deep_value_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'deep_value_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, mean_absolute_deviation
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,14 @@ class FinancialStatementAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze financial statements for quality, red flags, and accounting practices."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient historical data (need at least 3 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1] if len(metrics) > 1 else None
+        latest_metrics = frame.latest_period()
 
         score = 0
         reasoning = []
@@ -88,11 +89,10 @@ class FinancialStatementAnalysis():
                 reasoning.append(f"Poor cash flow conversion ({fcf_ratio:.1%} of net income)")
 
         # Check for earnings quality - consistency over time
-        net_incomes = [m.get('net_income') for m in metrics[:3] if m.get('net_income') is not None]
+        net_incomes = frame.present('net_income', periods=3)
         if len(net_incomes) >= 3:
-            avg_income = sum(net_incomes) / len(net_incomes)
-            volatility = sum(abs(ni - avg_income) for ni in net_incomes) / len(net_incomes) if avg_income != 0 else 0
-            normalized_volatility = volatility / abs(avg_income) if avg_income != 0 else 0
+            avg_income = net_incomes.mean()
+            normalized_volatility = mean_absolute_deviation(net_incomes) / abs(avg_income) if avg_income != 0 else 0
             
             if normalized_volatility < 0.2:  # Low earnings volatility
                 score += 1
@@ -113,21 +113,15 @@ class FinancialStatementAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'financial_statement_analysis'
         analysis['title'] = f'Financial Statement Analysis'
 
-        analysis_data['financial_statement_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'financial_statement_analysis': analysis},
             "messages": [
                 ai_message
             ]
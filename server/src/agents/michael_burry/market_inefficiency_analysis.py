@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,14 @@ class MarketInefficiencyAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Identify market inefficiencies and mispricings."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient historical data (need at least 3 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1] if len(metrics) > 1 else None
+        latest_metrics = frame.latest_period()
 
         score = 0
         reasoning = []
@@ -60,10 +61,10 @@ class MarketInefficiencyAnalysis():
 
         # Check for market sentiment disconnects
         # Compare current metrics to historical averages
-        if len(metrics) >= 3:
-            historical_roes = [m.get('return_on_equity') for m in metrics[:3] if m.get('return_on_equity') is not None]
+        if len(frame) >= 3:
+            historical_roes = frame.present('return_on_equity', periods=3)
             if len(historical_roes) >= 2:
-                avg_roe = sum(historical_roes) / len(historical_roes)
+                avg_roe = historical_roes.mean()
                 current_roe = latest_metrics.get('return_on_equity', 0)
                 
                 if current_roe > avg_roe * 1.2:  # 20% above average
@@ -114,21 +115,15 @@ class MarketInefficiencyAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'market_inefficiency_analysis'
         analysis['title'] = f'Market Inefficiency Analysis'
 
-        analysis_data['market_inefficiency_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'market_inefficiency_analysis': analysis},
             "messages": [
                 ai_message
             ]
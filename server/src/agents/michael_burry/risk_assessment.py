@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, mean_absolute_deviation
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,14 @@ class RiskAssessment():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Assess investment risks and evaluate asymmetric risk-reward profiles."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient historical data (need at least 3 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1] if len(metrics) > 1 else None
+        latest_metrics = frame.latest_period()
 
         score = 0
         reasoning = []
@@ -56,11 +57,10 @@ class RiskAssessment():
 
         # 2. Business risk assessment
         # Revenue stability
-        revenues = [m.get('revenue') for m in metrics[:5] if m.get('revenue') is not None]
+        revenues = frame.present('revenue', periods=5)
         if len(revenues) >= 3:
-            avg_revenue = sum(revenues) / len(revenues)
-            volatility = sum(abs(r - avg_revenue) for r in revenues) / len(revenues) if avg_revenue != 0 else 0
-            normalized_volatility = volatility / avg_revenue if avg_revenue != 0 else 0
+            avg_revenue = revenues.mean()
+            normalized_volatility = mean_absolute_deviation(revenues) / avg_revenue if avg_revenue != 0 else 0
             
             if normalized_volatility < 0.1:  # Low revenue volatility
                 score += 2
@@ -72,11 +72,10 @@ class RiskAssessment():
                 reasoning.append(f"High revenue volatility (volatility: {normalized_volatility:.1%})")
 
         # Earnings stability
-        earnings = [m.get('net_income') for m in metrics[:5] if m.get('net_income') is not None]
+        earnings = frame.present('net_income', periods=5)
         if len(earnings) >= 3:
-            avg_earnings = sum(earnings) / len(earnings)
-            volatility = sum(abs(e - avg_earnings) for e in earnings) / len(earnings) if avg_earnings != 0 else 0
-            normalized_volatility = volatility / abs(avg_earnings) if avg_earnings != 0 else 0
+            avg_earnings = earnings.mean()
+            normalized_volatility = mean_absolute_deviation(earnings) / abs(avg_earnings) if avg_earnings != 0 else 0
             
             if normalized_volatility < 0.2:  # Low earnings volatility
                 score += 2
@@ -151,21 +150,15 @@ class RiskAssessment():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'risk_assessment'
         analysis['title'] = f'Risk Assessment'
 
-        analysis_data['risk_assessment'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'risk_assessment': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, mean_absolute_deviation
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,15 @@ class BusinessUnderstandingAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list, ticker_data: dict = None) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, ticker_data: dict = None) -> dict[str, any]:
         """Analyze business understanding based on Peter Lynch's 'invest in what you know' principle."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 2:
+        if len(frame) < 2:
             result["details"].append('Insufficient historical data (need at least 2 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1]
+        latest_metrics = frame.latest_period()
+        previous_metrics = frame.period(1)
         ticker_info = ticker_data or {}
 
         score = 0
@@ -95,13 +97,12 @@ class BusinessUnderstandingAnalysis():
                 reasoning.append("Small company with high growth - potential emerging brand")
         
         # Check for business stability
-        if len(metrics) >= 5:
-            revenues = [m.get('revenue') for m in metrics[:5] if m.get('revenue') is not None]
+        if len(frame) >= 5:
+            revenues = frame.present('revenue', periods=5)
             if len(revenues) >= 5:
                 # Check revenue stability
-                avg_revenue = sum(revenues) / len(revenues)
-                volatility = sum(abs(r - avg_revenue) for r in revenues) / len(revenues) if avg_revenue != 0 else 0
-                normalized_volatility = volatility / avg_revenue if avg_revenue != 0 else 0
+                avg_revenue = revenues.mean()
+                normalized_volatility = mean_absolute_deviation(revenues) / avg_revenue if avg_revenue != 0 else 0
                 
                 if normalized_volatility < 0.1:
                     score += 1
@@ -133,22 +134,17 @@ class BusinessUnderstandingAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
         context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
+        frame = get_financials_frame(get_input(state, 'metrics'))
         ticker = context.get('current_task', {}).get('ticker', {})
-        analysis = self.analyze(metrics, ticker)
+        analysis = self.analyze(frame, ticker)
         analysis['type'] = 'business_understanding_analysis'
         analysis['title'] = f'Business Understanding Analysis'
 
-        analysis_data['business_understanding_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'business_understanding_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,23 +16,23 @@ class EarningsQualityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze earnings quality based on Peter Lynch's criteria."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient historical data (need at least 3 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1] if len(metrics) > 1 else None
+        latest_metrics = frame.latest_period()
+        previous_metrics = frame.period(1) if len(frame) > 1 else None
 
         score = 0
         reasoning = []
 
         # Check earnings consistency - Lynch looks for companies with consistent earnings
-        earnings = [m.get('net_income') for m in metrics[:5] if m.get('net_income') is not None]
+        earnings = frame.present('net_income', periods=5)
         if len(earnings) >= 3:
-            positive_earnings = sum(1 for e in earnings if e and e > 0)
+            positive_earnings = int((earnings > 0).sum())
             if positive_earnings == len(earnings):
                 score += 2
                 reasoning.append("Consistently profitable over last 5 years")
@@ -96,8 +98,9 @@ class EarningsQualityAnalysis():
 
         # Check for share count changes (dilution/concentration)
         shares = latest_metrics.get('ordinary_shares_number')
-        if len(metrics) >= 2 and metrics[1].get('ordinary_shares_number') and shares:
-            share_change = (shares - metrics[1]['ordinary_shares_number']) / metrics[1]['ordinary_shares_number']
+        previous_shares = previous_metrics.get('ordinary_shares_number') if previous_metrics else None
+        if previous_shares and shares:
+            share_change = (shares - previous_shares) / previous_shares
             if share_change < -0.05:  # Significant share buybacks
                 score += 1
                 reasoning.append(f"Share buybacks indicate management confidence ({share_change:.1%})")
@@ -117,21 +120,15 @@ class EarningsQualityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'earnings_quality_analysis'
         analysis['title'] = f'Earnings Quality Analysis'
 
-        analysis_data['earnings_quality_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'earnings_quality_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, ratio
 from langgraph.types import StreamWriter
 
 
@@ -14,16 +16,16 @@ class GrowthAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze company growth based on Peter Lynch's criteria."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient historical data (need at least 3 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1] if len(metrics) > 1 else None
-        older_metrics = metrics[2] if len(metrics) > 2 else None
+        latest_metrics = frame.latest_period()
+        previous_metrics = frame.period(1) if len(frame) > 1 else None
+        older_metrics = frame.period(2) if len(frame) > 2 else None
 
         score = 0
         reasoning = []
@@ -49,16 +51,13 @@ class GrowthAnalysis():
             reasoning.append(f"Earnings growth data not available")
 
         # Check revenue growth consistency over multiple years
-        revenues = [m.get('revenue') for m in metrics[:5] if m.get('revenue') is not None]
+        revenues = frame.present('revenue', periods=5)
         if len(revenues) >= 3:
-            growth_rates = []
-            for i in range(1, len(revenues)):
-                if revenues[i-1] and revenues[i-1] > 0:
-                    growth_rate = (revenues[i] - revenues[i-1]) / revenues[i-1]
-                    growth_rates.append(growth_rate)
+            base = revenues[:-1]
+            growth_rates = ratio(revenues[1:] - base, base)[base > 0]
             
-            if growth_rates:
-                avg_growth = sum(growth_rates) / len(growth_rates)
+            if len(growth_rates) > 0:
+                avg_growth = growth_rates.mean()
                 if avg_growth > 0.15:
                     score += 2
                     reasoning.append(f"Consistent revenue growth ({avg_growth:.1%} avg)")
@@ -73,16 +72,13 @@ class GrowthAnalysis():
             reasoning.append("Insufficient revenue data for growth analysis")
 
         # Check net income growth consistency
-        incomes = [m.get('net_income') for m in metrics[:5] if m.get('net_income') is not None]
+        incomes = frame.present('net_income', periods=5)
         if len(incomes) >= 3:
-            growth_rates = []
-            for i in range(1, len(incomes)):
-                if incomes[i-1] and incomes[i-1] > 0:
-                    growth_rate = (incomes[i] - incomes[i-1]) / incomes[i-1]
-                    growth_rates.append(growth_rate)
+            base = incomes[:-1]
+            growth_rates = ratio(incomes[1:] - base, base)[base > 0]
             
-            if growth_rates:
-                avg_growth = sum(growth_rates) / len(growth_rates)
+            if len(growth_rates) > 0:
+                avg_growth = growth_rates.mean()
                 if avg_growth > 0.15:
                     score += 2
                     reasoning.append(f"Strong earnings consistency ({avg_growth:.1%} avg)")
@@ -97,7 +93,7 @@ class GrowthAnalysis():
             reasoning.append("Insufficient earnings data for growth analysis")
 
         # Check if growth is accelerating or decelerating
-        if len(metrics) >= 3:
+        if len(frame) >= 3:
             recent_growth = None
             older_growth = None
             
@@ -123,7 +119,7 @@ class GrowthAnalysis():
                 reasoning.append("Insufficient data for growth trend analysis")
 
         # Check free cash flow growth
-        fcf_values = [m.get('free_cash_flow') for m in metrics[:3] if m.get('free_cash_flow') is not None]
+        fcf_values = frame.present('free_cash_flow', periods=3)
         if len(fcf_values) >= 2:
             if fcf_values[0] and fcf_values[0] > 0 and len(fcf_values) > 1 and fcf_values[1] and fcf_values[1] > 0:
                 fcf_growth = (fcf_values[0] - fcf_values[1]) / fcf_values[1]
@@ -153,21 +149,15 @@ class GrowthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'growth_analysis'
         analysis['title'] = f'Growth Analysis'
 
-        analysis_data['growth_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'growth_analysis': analysis},
             "messages": [
                 ai_message
             ]
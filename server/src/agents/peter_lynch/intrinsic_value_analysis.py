@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,15 @@ class IntrinsicValueAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Calculate intrinsic value using a simplified approach aligned with Peter Lynch's methodology."""
         result = {"intrinsic_value": None, "details": []}
-        if not metrics or len(metrics) < 2:
+        if len(frame) < 2:
             result["details"].append('Insufficient historical data (need at least 2 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1]
+        latest_metrics = frame.latest_period()
+        previous_metrics = frame.period(1)
 
         intrinsic_value = None
         reasoning = []
@@ -106,21 +108,15 @@ class IntrinsicValueAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'intrinsic_value_analysis'
         analysis['title'] = f'Intrinsic Value Analysis'
 
-        analysis_data['intrinsic_value_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'intrinsic_value_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,15 @@ class StoryAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list, ticker_data: dict = None) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, ticker_data: dict = None) -> dict[str, any]:
         """Analyze the business story based on Peter Lynch's approach."""
         result = {"score": 0, "max_score": 10, "details": [], "business_category": "Unknown"}
-        if not metrics or len(metrics) < 2:
+        if len(frame) < 2:
             result["details"].append('Insufficient historical data (need at least 2 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1]
+        latest_metrics = frame.latest_period()
+        previous_metrics = frame.period(1)
         ticker_info = ticker_data or {}
 
         score = 0
@@ -63,8 +65,8 @@ class StoryAnalysis():
 
         # Check for turnaround potential
         net_income = latest_metrics.get('net_income', 0)
-        if len(metrics) >= 3:
-            previous_income = metrics[2].get('net_income', 0)
+        if len(frame) >= 3:
+            previous_income = frame.period(2).get('net_income', 0)
             if net_income > 0 and previous_income < 0:
                 business_category = "Turnaround"
                 score += 2
@@ -121,22 +123,17 @@ class StoryAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
         context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
+        frame = get_financials_frame(get_input(state, 'metrics'))
         ticker = context.get('current_task', {}).get('ticker', {})
-        analysis = self.analyze(metrics, ticker)
+        analysis = self.analyze(frame, ticker)
         analysis['type'] = 'story_analysis'
         analysis['title'] = f'Story Analysis'
 
-        analysis_data['story_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'story_analysis': analysis},
             "messages": [
                 ai_message
             ]
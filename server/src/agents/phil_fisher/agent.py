@@ -3,8 +3,10 @@ This is the main entry point for the Phil Fisher agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
+import asyncio
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -30,7 +32,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 growth_quality_analysis_node = GrowthQualityAnalysis({})
@@ -41,7 +47,23 @@ insider_activity_analysis_node = InsiderActivityAnalysis({})
 sentiment_analysis_node = SentimentAnalysis({})
 intrinsic_value_analysis_node = IntrinsicValueAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio",
+            "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
+            "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
+            "interest_expense", "capital_expenditure", "depreciation_and_amortization",
+            "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
+            "net_income", "revenue", "gross_profit", "gross_margin", "research_and_development"
+        ],
+    },
+    news=True,
+    insider_transactions=True,
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -50,35 +72,24 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
-    # Get required financial metrics and items for Phil Fisher analysis
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio", 
-        "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
-        "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
-        "interest_expense", "capital_expenditure", "depreciation_and_amortization",
-        "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
-        "net_income", "revenue", "gross_profit", "gross_margin", "research_and_development"
-    ], end_date, period="yearly")
-    
-    # Get additional data for insider activity and sentiment analysis
-    insider_transactions = dataset_client.get_insider_transactions(ticker.get('symbol'), end_date)
-    news = dataset_client.get_news(ticker.get('symbol'), end_date)
-    
-    context['metrics'] = metrics
-    context['insider_transactions'] = insider_transactions
-    context['news'] = news
+    # Get required financial metrics and items, insider activity and news for Phil Fisher analysis concurrently
+    metrics, insider_transactions, news = await asyncio.gather(
+        data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly"),
+        dataset_client.get_insider_transactions(ticker.get('symbol'), end_date),
+        dataset_client.get_news(ticker.get('symbol'), end_date),
+    )
     
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics, insider_transactions=insider_transactions, news=news),
         'messages':[AIMessage(content=markdown.to_h2('Phil Fisher Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -104,8 +115,9 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     margin_of_safety = None
     intrinsic_value = analysis_data.get('intrinsic_value_analysis').get("intrinsic_value")
     market_cap = None
-    if context.get("metrics") is not None and len(context.get("metrics")) > 0:
-        market_cap = context.get("metrics")[0].get("market_cap")
+    metrics = input_store.get_input(state, 'metrics')
+    if metrics is not None and len(metrics) > 0:
+        market_cap = metrics[0].get("market_cap")
     if intrinsic_value and market_cap:
         margin_of_safety = (intrinsic_value - market_cap) / market_cap
 
@@ -113,6 +125,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['max_possible_score'] = max_possible_score
     analysis_data['margin_of_safety'] = margin_of_safety
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'phil_fisher', config)
     messages = [
             (
                 "system",
@@ -176,7 +189,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
                 
                 COMPREHENSIVE ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
                 
                 Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -200,7 +213,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -209,30 +222,17 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("growth_quality_analysis", growth_quality_analysis_node)
-workflow.add_node("margins_stability_analysis", margins_stability_analysis_node)
-workflow.add_node("management_efficiency_analysis", management_efficiency_analysis_node)
-workflow.add_node("valuation_analysis", valuation_analysis_node)
-workflow.add_node("insider_activity_analysis", insider_activity_analysis_node)
-workflow.add_node("sentiment_analysis", sentiment_analysis_node)
-workflow.add_node("intrinsic_value_analysis", intrinsic_value_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "growth_quality_analysis")
-workflow.add_edge("growth_quality_analysis", "margins_stability_analysis")
-workflow.add_edge("margins_stability_analysis", "management_efficiency_analysis")
-workflow.add_edge("management_efficiency_analysis", "valuation_analysis")
-workflow.add_edge("valuation_analysis", "insider_activity_analysis")
-workflow.add_edge("insider_activity_analysis", "sentiment_analysis")
-workflow.add_edge("sentiment_analysis", "intrinsic_value_analysis")
-workflow.add_edge("intrinsic_value_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "growth_quality_analysis": growth_quality_analysis_node,
+        "margins_stability_analysis": margins_stability_analysis_node,
+        "management_efficiency_analysis": management_efficiency_analysis_node,
+        "valuation_analysis": valuation_analysis_node,
+        "insider_activity_analysis": insider_activity_analysis_node,
+        "sentiment_analysis": sentiment_analysis_node,
+        "intrinsic_value_analysis": intrinsic_value_analysis_node,
+    },
+    end_analysis,
+)
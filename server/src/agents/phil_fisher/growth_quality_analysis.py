@@ -1,4 +1,4 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +6,8 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame
 from langgraph.types import StreamWriter
 
 
@@ -14,26 +16,23 @@ class GrowthQualityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, derived: DerivedMetrics) -> dict[str, any]:
         """Analyze growth & quality based on Phil Fisher's criteria."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 2:
+        if len(frame) < 2:
             result["details"].append('Insufficient historical data (need at least 2 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1]
 
         score = 0
         reasoning = []
 
         # Calculate revenue growth (multi-year if possible)
-        revenues = [m.get('revenue') for m in metrics if m.get('revenue') is not None]
+        revenues = derived.series('revenue')
         if len(revenues) >= 2:
-            latest_rev = revenues[0]
             oldest_rev = revenues[-1]
-            if oldest_rev and oldest_rev > 0:
-                rev_growth = (latest_rev - oldest_rev) / abs(oldest_rev)
+            if oldest_rev > 0:
+                rev_growth = derived.total_growth('revenue')
                 if rev_growth > 0.80:
                     score += 3
                     reasoning.append(f"Very strong multi-period revenue growth: {rev_growth:.1%}")
@@ -51,12 +50,11 @@ class GrowthQualityAnalysis():
             reasoning.append("Not enough revenue data points for growth calculation.")
 
         # Calculate EPS growth (multi-year if possible)
-        eps_values = [m.get('earnings_per_share') for m in metrics if m.get('earnings_per_share') is not None]
+        eps_values = derived.series('earnings_per_share')
         if len(eps_values) >= 2:
-            latest_eps = eps_values[0]
             oldest_eps = eps_values[-1]
-            if oldest_eps and abs(oldest_eps) > 1e-9:
-                eps_growth = (latest_eps - oldest_eps) / abs(oldest_eps)
+            if abs(oldest_eps) > 1e-9:
+                eps_growth = derived.total_growth('earnings_per_share')
                 if eps_growth > 0.80:
                     score += 3
                     reasoning.append(f"Very strong multi-period EPS growth: {eps_growth:.1%}")
@@ -74,8 +72,8 @@ class GrowthQualityAnalysis():
             reasoning.append("Not enough EPS data points for growth calculation.")
 
         # R&D as % of Revenue (if we have R&D data)
-        rnd_values = [m.get('research_and_development') for m in metrics if m.get('research_and_development') is not None]
-        if rnd_values and revenues and len(rnd_values) == len(revenues) and rnd_values[0] and revenues[0]:
+        rnd_values = derived.series('research_and_development')
+        if len(rnd_values) > 0 and len(rnd_values) == len(revenues) and rnd_values[0] and revenues[0]:
             recent_rnd = rnd_values[0]
             recent_rev = revenues[0] if revenues[0] else 1e-9
             rnd_ratio = recent_rnd / recent_rev
@@ -106,21 +104,15 @@ class GrowthQualityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        derived = get_derived_metrics(state, config)
+        analysis = self.analyze(derived.frame, derived)
         analysis['type'] = 'growth_quality_analysis'
         analysis['title'] = f'Growth & Quality Analysis'
 
-        analysis_data['growth_quality_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'growth_quality_analysis': analysis},
             "messages": [
                 ai_message
             ]
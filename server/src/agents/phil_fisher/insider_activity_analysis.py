@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -72,21 +73,15 @@ class InsiderActivityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        insider_transactions = context.get('insider_transactions')
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        insider_transactions = get_input(state, 'insider_transactions')
         analysis = self.analyze(insider_transactions)
         analysis['type'] = 'insider_activity_analysis'
         analysis['title'] = f'Insider Activity Analysis'
 
-        analysis_data['insider_activity_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'insider_activity_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,22 +16,20 @@ class ManagementEfficiencyAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze management efficiency & leverage based on Phil Fisher's criteria."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No financial data for management efficiency analysis')
             return result
 
-        latest_metrics = metrics[0]
-
         score = 0
         reasoning = []
 
         # 1. Return on Equity (ROE)
-        ni_values = [m.get('net_income') for m in metrics if m.get('net_income') is not None]
-        eq_values = [m.get('stockholders_equity') for m in metrics if m.get('stockholders_equity') is not None]
-        if ni_values and eq_values and len(ni_values) == len(eq_values) and ni_values[0] and eq_values[0]:
+        ni_values = frame.present('net_income')
+        eq_values = frame.present('stockholders_equity')
+        if len(ni_values) > 0 and len(eq_values) > 0 and len(ni_values) == len(eq_values) and ni_values[0] and eq_values[0]:
             recent_ni = ni_values[0]
             recent_eq = eq_values[0] if eq_values[0] else 1e-9
             if recent_ni > 0:
@@ -51,8 +51,8 @@ class ManagementEfficiencyAnalysis():
             reasoning.append("Insufficient data for ROE calculation")
 
         # 2. Debt-to-Equity
-        debt_values = [m.get('total_liabilities') for m in metrics if m.get('total_liabilities') is not None]
-        if debt_values and eq_values and len(debt_values) == len(eq_values) and debt_values[0] and eq_values[0]:
+        debt_values = frame.present('total_liabilities')
+        if len(debt_values) > 0 and len(eq_values) > 0 and len(debt_values) == len(eq_values) and debt_values[0] and eq_values[0]:
             recent_debt = debt_values[0]
             recent_equity = eq_values[0] if eq_values[0] else 1e-9
             dte = recent_debt / recent_equity
@@ -68,10 +68,10 @@ class ManagementEfficiencyAnalysis():
             reasoning.append("Insufficient data for debt/equity analysis")
 
         # 3. FCF Consistency
-        fcf_values = [m.get('free_cash_flow') for m in metrics if m.get('free_cash_flow') is not None]
-        if fcf_values and len(fcf_values) >= 2:
+        fcf_values = frame.present('free_cash_flow')
+        if len(fcf_values) >= 2:
             # Check if FCF is positive in recent years
-            positive_fcf_count = sum(1 for x in fcf_values if x and x > 0)
+            positive_fcf_count = int((fcf_values > 0).sum())
             # We'll be simplistic: if most are positive, reward
             ratio = positive_fcf_count / len(fcf_values)
             if ratio > 0.8:
@@ -93,21 +93,15 @@ class ManagementEfficiencyAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'management_efficiency_analysis'
         analysis['title'] = f'Management Efficiency Analysis'
 
-        analysis_data['management_efficiency_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'management_efficiency_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,7 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
-import statistics
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -15,21 +16,18 @@ class MarginsStabilityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze margins stability based on Phil Fisher's criteria."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 2:
+        if len(frame) < 2:
             result["details"].append('Insufficient historical data (need at least 2 years)')
             return result
 
-        latest_metrics = metrics[0]
-        previous_metrics = metrics[1]
-
         score = 0
         reasoning = []
 
         # 1. Operating Margin Consistency
-        op_margins = [m.get('operating_margin') for m in metrics if m.get('operating_margin') is not None]
+        op_margins = frame.present('operating_margin')
         if len(op_margins) >= 2:
             # Check if margins are stable or improving (comparing oldest to newest)
             oldest_op_margin = op_margins[-1]
@@ -46,8 +44,8 @@ class MarginsStabilityAnalysis():
             reasoning.append("Not enough operating margin data points")
 
         # 2. Gross Margin Level
-        gm_values = [m.get('gross_margin') for m in metrics if m.get('gross_margin') is not None]
-        if gm_values and gm_values[0]:
+        gm_values = frame.present('gross_margin')
+        if len(gm_values) > 0 and gm_values[0]:
             # We'll just take the most recent
             recent_gm = gm_values[0]
             if recent_gm > 0.5:
@@ -64,7 +62,7 @@ class MarginsStabilityAnalysis():
         # 3. Multi-year Margin Stability
         #   e.g. if we have at least 3 data points, see if standard deviation is low.
         if len(op_margins) >= 3:
-            stdev = statistics.pstdev(op_margins)
+            stdev = op_margins.std()
             if stdev < 0.02:
                 score += 4
                 reasoning.append("Operating margin extremely stable over multiple years")
@@ -87,21 +85,15 @@ class MarginsStabilityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'margins_stability_analysis'
         analysis['title'] = f'Margins & Stability Analysis'
 
-        analysis_data['margins_stability_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'margins_stability_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -3,8 +3,10 @@ This is the main entry point for the Portfolio Manager agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
+import asyncio
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -24,12 +26,32 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 portfolio_analysis_node = PortfolioAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio",
+            "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
+            "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
+            "interest_expense", "capital_expenditure", "depreciation_and_amortization",
+            "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
+            "net_income", "revenue", "gross_profit", "gross_margin"
+        ],
+    },
+    price_days=0,
+    info=True,
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -38,36 +60,26 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
-    # Get required financial metrics and items for portfolio analysis
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio", 
-        "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
-        "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
-        "interest_expense", "capital_expenditure", "depreciation_and_amortization",
-        "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
-        "net_income", "revenue", "gross_profit", "gross_margin"
-    ], end_date, period="yearly")
-    
-    # Get additional data for portfolio analysis
-    prices = dataset_client.get_prices(ticker.get('symbol'), end_date, end_date)
-    info = dataset_client.get_info(ticker.get('symbol'))
-    
-    context['metrics'] = metrics
-    context['prices'] = prices
-    context['info'] = info
+    # Get required financial metrics and items, prices and info for portfolio analysis concurrently
+    metrics, prices, info = await asyncio.gather(
+        data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly"),
+        data_bundle.get_prices(context, dataset_client, ticker.get('symbol'), end_date, end_date),
+        dataset_client.get_info(ticker.get('symbol')),
+    )
     
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics, prices=prices, info=info),
         'messages':[AIMessage(content=markdown.to_h2('Portfolio Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'portfolio_manager', config)
     messages = [
             (
                 "system",
@@ -145,7 +157,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Based on the comprehensive analysis, make your trading decision for {ticker.get('symbol')} ({ticker.get('short_name')}):
                 
                 COMPREHENSIVE ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
                 
                 Current Portfolio Data:
                 - Cash: $100,000.00
@@ -177,7 +189,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -186,18 +198,11 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("portfolio_analysis", portfolio_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "portfolio_analysis")
-workflow.add_edge("portfolio_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "portfolio_analysis": portfolio_analysis_node,
+    },
+    end_analysis,
+)
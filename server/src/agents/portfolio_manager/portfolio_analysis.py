@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,14 +16,14 @@ class PortfolioAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list, prices: list, info: dict) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, prices: list, info: dict) -> dict[str, any]:
         """Analyze portfolio positioning based on comprehensive data."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available for portfolio analysis')
             return result
 
-        latest_metrics = metrics[0] if metrics else {}
+        latest_metrics = frame.latest_period()
         current_price = prices[0].get('close') if prices else 0
 
         score = 0
@@ -77,9 +79,9 @@ class PortfolioAnalysis():
         revenue = latest_metrics.get('revenue')
         net_income = latest_metrics.get('net_income')
         
-        if revenue and net_income and len(metrics) > 1:
-            prev_revenue = metrics[1].get('revenue')
-            prev_net_income = metrics[1].get('net_income')
+        if revenue and net_income and len(frame) > 1:
+            prev_revenue = frame.period(1).get('revenue')
+            prev_net_income = frame.period(1).get('net_income')
             
             if prev_revenue and prev_net_income:
                 revenue_growth = (revenue - prev_revenue) / prev_revenue
@@ -125,23 +127,17 @@ class PortfolioAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        prices = context.get('prices')
-        info = context.get('info')
-        analysis = self.analyze(metrics, prices, info)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        prices = get_input(state, 'prices')
+        info = get_input(state, 'info')
+        analysis = self.analyze(frame, prices, info)
         analysis['type'] = 'portfolio_analysis'
         analysis['title'] = f'Portfolio Analysis'
 
-        analysis_data['portfolio_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'portfolio_analysis': analysis},
             "messages": [
                 ai_message
             ]
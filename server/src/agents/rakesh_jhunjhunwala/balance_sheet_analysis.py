@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,17 +16,17 @@ class BalanceSheetAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Check financial strength - healthy asset/liability structure, liquidity.
         Jhunjhunwala favored companies with clean balance sheets and manageable debt.
         """
         result = {"score": 0, "max_score": 4, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No balance sheet data')
             return result
 
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
         score = 0
         reasoning = []
 
@@ -71,21 +73,15 @@ class BalanceSheetAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'balance_sheet_analysis'
         analysis['title'] = f'Balance sheet analysis'
 
-        analysis_data['balance_sheet_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'balance_sheet_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,8 +7,10 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 import statistics
+import numpy as np
 
 
 class GrowthAnalysis():
@@ -15,27 +18,21 @@ class GrowthAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze company growth based on Rakesh Jhunjhunwala's criteria."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             result["details"].append('Insufficient metrics for growth analysis (need at least 3 years)')
             return result
 
         # Get last 5 years of data if available, otherwise use what we have
-        years_to_analyze = min(5, len(metrics))
-        recent_metrics = metrics[:years_to_analyze]
+        recent_revenues = frame.column('revenue')[:5]
+        recent_net_incomes = frame.column('net_income')[:5]
         
-        # Extract revenue and net income data
-        revenues = []
-        net_incomes = []
-        years = []
-        
-        for metric in recent_metrics:
-            if metric.get('revenue') and metric.get('net_income'):
-                revenues.append(metric['revenue'])
-                net_incomes.append(metric['net_income'])
-                years.append(metric.get('date', 'N/A'))
+        # Extract revenue and net income data, of the years with both
+        reported = (np.nan_to_num(recent_revenues) != 0) & (np.nan_to_num(recent_net_incomes) != 0)
+        revenues = recent_revenues[reported].tolist()
+        net_incomes = recent_net_incomes[reported].tolist()
 
         if len(revenues) < 3:
             result["details"].append('Insufficient revenue/net income data for growth analysis')
@@ -136,21 +133,15 @@ class GrowthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'growth_analysis'
         analysis['title'] = f'Growth analysis'
 
-        analysis_data['growth_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'growth_analysis': analysis},
             "messages": [
                 ai_message
             ]
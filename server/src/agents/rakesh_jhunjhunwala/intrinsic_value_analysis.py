@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, cagr, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +16,7 @@ class IntrinsicValueAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list, prices: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, prices: list) -> dict[str, any]:
         """
         Calculate intrinsic value using Rakesh Jhunjhunwala's approach:
         - Focus on earnings power and growth
@@ -22,12 +24,12 @@ class IntrinsicValueAnalysis():
         - Quality premium for consistent performers
         """
         result = {"score": 0, "max_score": 10, "details": [], "intrinsic_value": None, "margin_of_safety": None}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available for intrinsic value calculation')
             return result
         
         try:
-            latest_metrics = metrics[0]
+            latest_metrics = frame.latest_period()
             
             # Need positive earnings as base
             if not latest_metrics.get('net_income') or latest_metrics['net_income'] <= 0:
@@ -35,8 +37,8 @@ class IntrinsicValueAnalysis():
                 return result
             
             # Get historical earnings for growth calculation
-            net_incomes = [m.get('net_income') for m in metrics[:5] 
-                           if m.get('net_income') is not None and m.get('net_income') > 0]
+            net_incomes = frame.present('net_income', periods=5)
+            net_incomes = net_incomes[net_incomes > 0]
             
             if len(net_incomes) < 2:
                 # Use current earnings with conservative multiple for stable companies
@@ -45,15 +47,8 @@ class IntrinsicValueAnalysis():
                 result["details"].append(f"Simple intrinsic value calculation: {intrinsic_value}")
             else:
                 # Calculate sustainable growth rate using historical data
-                initial_income = net_incomes[-1]  # Oldest
-                final_income = net_incomes[0]     # Latest
-                years = len(net_incomes) - 1
-                
                 # Calculate historical CAGR
-                if initial_income > 0:
-                    historical_growth = ((final_income / initial_income) ** (1/years) - 1)
-                else:
-                    historical_growth = 0.05  # Default to 5%
+                historical_growth = cagr(net_incomes)
                 
                 # Conservative growth assumptions (Jhunjhunwala style)
                 if historical_growth > 0.25:  # Cap at 25% for sustainability
@@ -66,7 +61,7 @@ class IntrinsicValueAnalysis():
                     sustainable_growth = 0.05  # Minimum 5% for inflation
                 
                 # Quality assessment affects discount rate
-                quality_score = self._assess_quality_metrics(metrics)
+                quality_score = self._assess_quality_metrics(frame)
                 
                 # Discount rate based on quality (Jhunjhunwala preferred quality)
                 if quality_score >= 8:  # High quality
@@ -130,15 +125,15 @@ class IntrinsicValueAnalysis():
         
         return result
 
-    def _assess_quality_metrics(self, metrics: list) -> float:
+    def _assess_quality_metrics(self, frame: FinancialsFrame) -> float:
         """
         Assess company quality based on Jhunjhunwala's criteria.
         Returns a score between 0 and 10.
         """
-        if not metrics:
+        if len(frame) == 0:
             return 5.0  # Neutral score
         
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
         quality_factors = []
         
         # ROE consistency and level
@@ -177,11 +172,11 @@ class IntrinsicValueAnalysis():
             quality_factors.append(5)
         
         # Growth consistency
-        net_incomes = [m.get('net_income') for m in metrics[:4] 
-                       if m.get('net_income') is not None and m.get('net_income') > 0]
+        net_incomes = frame.present('net_income', periods=4)
+        net_incomes = net_incomes[net_incomes > 0]
         
         if len(net_incomes) >= 3:
-            declining_years = sum(1 for i in range(1, len(net_incomes)) if net_incomes[i-1] > net_incomes[i])
+            declining_years = int((net_incomes[:-1] > net_incomes[1:]).sum())
             consistency = 1 - (declining_years / (len(net_incomes) - 1))
             quality_score = consistency * 10
             quality_factors.append(quality_score)
@@ -196,22 +191,16 @@ class IntrinsicValueAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        prices = context.get('prices')
-        analysis = self.analyze(metrics, prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        prices = get_input(state, 'prices')
+        analysis = self.analyze(frame, prices)
         analysis['type'] = 'intrinsic_value_analysis'
         analysis['title'] = f'Intrinsic value analysis'
 
-        analysis_data['intrinsic_value_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'intrinsic_value_analysis': analysis},
             "messages": [
                 ai_message
             ]
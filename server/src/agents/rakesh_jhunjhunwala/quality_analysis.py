@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,28 +16,25 @@ class QualityAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze company quality based on Rakesh Jhunjhunwala's criteria."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
 
         score = 0
         reasoning = []
 
         # Check ROE consistency over time (at least 3 years)
-        if len(metrics) >= 3:
-            roe_values = []
-            for metric in metrics[:min(5, len(metrics))]:  # Check up to 5 years
-                if metric.get('return_on_equity'):
-                    roe_values.append(metric['return_on_equity'])
+        if len(frame) >= 3:
+            roe_values = frame.present('return_on_equity', nonzero=True, periods=5)  # Check up to 5 years
             
             if len(roe_values) >= 3:
                 # Check if ROE has been consistently high
-                high_roe_years = sum(1 for roe in roe_values if roe > 0.15)
+                high_roe_years = int((roe_values > 0.15).sum())
                 roe_consistency = high_roe_years / len(roe_values)
                 
                 if roe_consistency >= 0.8:  # 80%+ years with high ROE
@@ -99,18 +98,15 @@ class QualityAnalysis():
             reasoning.append("Free cash flow data not available")
 
         # Check gross margin stability
-        if len(metrics) >= 3:
-            gross_margins = []
-            for metric in metrics[:min(3, len(metrics))]:  # Check up to 3 years
-                if metric.get('gross_margin'):
-                    gross_margins.append(metric['gross_margin'])
+        if len(frame) >= 3:
+            gross_margins = frame.present('gross_margin', nonzero=True, periods=3)  # Check up to 3 years
             
             if len(gross_margins) >= 3:
                 # Check margin stability (low standard deviation)
-                avg_margin = sum(gross_margins) / len(gross_margins)
+                avg_margin = gross_margins.mean()
                 if avg_margin > 0:
                     # Simple stability check - all margins within 10% of average
-                    stable = all(abs(margin - avg_margin) / avg_margin < 0.10 for margin in gross_margins if avg_margin > 0)
+                    stable = (abs(gross_margins - avg_margin) / avg_margin < 0.10).all()
                     if stable:
                         score += 1
                         reasoning.append(f"Stable gross margins (avg: {avg_margin:.1%})")
@@ -130,21 +126,15 @@ class QualityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'quality_analysis'
         analysis['title'] = f'Quality analysis'
 
-        analysis_data['quality_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'quality_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,20 +16,20 @@ class ValuationAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze company valuation based on Rakesh Jhunjhunwala's criteria."""
         result = {"score": 0, "max_score": 10, "details": [], "intrinsic_value": 0, "margin_of_safety": 0}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available')
             return result
 
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
 
         score = 0
         reasoning = []
 
         # Calculate intrinsic value using simplified DCF approach
-        intrinsic_value = self.calculate_intrinsic_value(metrics)
+        intrinsic_value = self.calculate_intrinsic_value(frame)
         if intrinsic_value <= 0:
             reasoning.append("Could not calculate intrinsic value")
             result["details"] = reasoning
@@ -88,35 +90,29 @@ class ValuationAnalysis():
         result["details"] = reasoning
         return result
 
-    def calculate_intrinsic_value(self, metrics: list) -> float:
+    def calculate_intrinsic_value(self, frame: FinancialsFrame) -> float:
         """Calculate intrinsic value using a simplified DCF model based on Jhunjhunwala's approach."""
-        if not metrics or len(metrics) < 3:
+        if len(frame) < 3:
             return 0
 
         # Get last 3 years of free cash flow data
-        fcfs = []
-        for metric in metrics[:min(3, len(metrics))]:
-            if metric.get('free_cash_flow'):
-                fcfs.append(metric['free_cash_flow'])
+        fcfs = frame.present('free_cash_flow', nonzero=True, periods=3)
 
         if len(fcfs) < 3:
             return 0
 
         # Calculate average free cash flow
-        avg_fcf = sum(fcfs) / len(fcfs)
+        avg_fcf = fcfs.mean()
         
         # Determine quality-based discount rate
         # This is a simplified approach - in reality, this would be more complex
         discount_rate = 0.15  # Default 15% discount rate
         
         # Calculate average ROE to determine quality
-        roes = []
-        for metric in metrics[:min(3, len(metrics))]:
-            if metric.get('return_on_equity'):
-                roes.append(metric['return_on_equity'])
+        roes = frame.present('return_on_equity', nonzero=True, periods=3)
         
-        if roes:
-            avg_roe = sum(roes) / len(roes)
+        if len(roes) > 0:
+            avg_roe = roes.mean()
             # Adjust discount rate based on quality
             if avg_roe > 0.20:  # High quality
                 discount_rate = 0.12
@@ -146,7 +142,7 @@ class ValuationAnalysis():
             intrinsic_value += present_terminal_value
 
         # Get shares outstanding to calculate per-share value
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
         if latest_metrics.get('ordinary_shares_number') and latest_metrics['ordinary_shares_number'] > 0:
             shares_outstanding = latest_metrics['ordinary_shares_number']
             intrinsic_value_per_share = intrinsic_value / shares_outstanding
@@ -161,21 +157,15 @@ class ValuationAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'valuation_analysis'
         analysis['title'] = f'Valuation analysis'
 
-        analysis_data['valuation_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'valuation_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -4,7 +4,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 """
 
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -24,12 +25,21 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 risk_analysis_node = RiskAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    price_days=0,
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -38,8 +48,8 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Get price data for risk analysis
-    dataset_client = Dataset(config)
-    prices = dataset_client.get_prices(ticker.get('symbol'), end_date, end_date)
+    dataset_client = AsyncDataset(config)
+    prices = await data_bundle.get_prices(context, dataset_client, ticker.get('symbol'), end_date, end_date)
     
     # Get portfolio data from context
     portfolio = context.get('portfolio', {
@@ -47,18 +57,15 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
         "positions": {}
     })
     
-    context['prices'] = prices
-    context['portfolio'] = portfolio
-    
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(prices=prices, portfolio=portfolio),
         'messages':[AIMessage(content=markdown.to_h2('Risk Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
     
     # Get risk analysis data
     risk_analysis = analysis_data.get('risk_analysis', {})
@@ -69,6 +76,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     total_score = risk_analysis.get("score", 0)
     max_possible_score = risk_analysis.get("max_score", 10)
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'risk_manager', config)
     messages = [
             (
                 "system",
@@ -114,7 +122,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Evaluate the risk profile and position sizing for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 RISK ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Portfolio Data:
                 - Cash: $100,000.00
@@ -140,7 +148,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -150,16 +158,11 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-workflow.add_node("risk_analysis", risk_analysis_node)
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "risk_analysis")
-workflow.add_edge("risk_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "risk_analysis": risk_analysis_node,
+    },
+    end_analysis,
+)
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -108,25 +109,20 @@ class RiskAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
         context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
             
-        prices = context.get('prices')
-        portfolio = context.get('portfolio', {})
+        prices = get_input(state, 'prices')
+        portfolio = get_input(state, 'portfolio', {})
         ticker = context.get('current_task').get('ticker').get('symbol')
         
         analysis = self.analyze(prices, portfolio, ticker, config)
         analysis['type'] = 'risk_analysis'
         analysis['title'] = f'Risk analysis'
 
-        analysis_data['risk_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'risk_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -3,8 +3,10 @@ This is the main entry point for the Sentiment agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
+import asyncio
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -28,7 +30,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 news_sentiment_analysis_node = NewsSentimentAnalysis({})
@@ -37,7 +43,17 @@ insider_sentiment_analysis_node = InsiderSentimentAnalysis({})
 technical_sentiment_analysis_node = TechnicalSentimentAnalysis({})
 composite_sentiment_analysis_node = CompositeSentimentAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    price_days=30,
+    news=True,
+    insider_transactions=True,
+)
+
+# the component scores of the composite analysis repeat the scores of the other analyses
+PROMPT_DROP_KEYS = ('component_scores',)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -46,32 +62,26 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
-    
-    # Get news data for sentiment analysis
-    news = dataset_client.get_news(ticker.get('symbol'), end_date)
+    dataset_client = AsyncDataset(config)
     
-    # Get insider transactions data
-    insider_transactions = dataset_client.get_insider_transactions(ticker.get('symbol'), end_date)
-    
-    # Get price data for technical analysis
     # Get 30 days of price data for technical indicators
-    start_date = time.strftime("%Y-%m-%d", time.localtime(time.time() - 30*24*60*60))
-    prices = dataset_client.get_prices(ticker.get('symbol'), start_date, end_date)
-    
-    context['news'] = news
-    context['insider_transactions'] = insider_transactions
-    context['prices'] = prices
+    start_date = data_bundle.get_price_start_date(end_date, DATA_REQUIREMENTS.price_days)
+    # Get news, insider transactions and prices for sentiment analysis concurrently
+    news, insider_transactions, prices = await asyncio.gather(
+        dataset_client.get_news(ticker.get('symbol'), end_date),
+        dataset_client.get_insider_transactions(ticker.get('symbol'), end_date),
+        data_bundle.get_prices(context, dataset_client, ticker.get('symbol'), start_date, end_date),
+    )
     
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(news=news, insider_transactions=insider_transactions, prices=prices),
         'messages':[AIMessage(content=markdown.to_h2('Sentiment Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total sentiment score
     total_score = 0
@@ -96,6 +106,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['total_score'] = total_score
     analysis_data['max_possible_score'] = max_possible_score
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'sentiment', config, drop=PROMPT_DROP_KEYS)
     messages = [
             (
                 "system",
@@ -138,7 +149,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze market sentiment for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE SENTIMENT ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your sentiment assessment in exactly this JSON format, notice to use 'SentimentResult' before json:
                 ```SentimentResult
@@ -161,7 +172,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -170,26 +181,24 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("news_sentiment_analysis", news_sentiment_analysis_node)
-workflow.add_node("social_sentiment_analysis", social_sentiment_analysis_node)
-workflow.add_node("insider_sentiment_analysis", insider_sentiment_analysis_node)
-workflow.add_node("technical_sentiment_analysis", technical_sentiment_analysis_node)
-workflow.add_node("composite_sentiment_analysis", composite_sentiment_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "news_sentiment_analysis")
-workflow.add_edge("news_sentiment_analysis", "social_sentiment_analysis")
-workflow.add_edge("social_sentiment_analysis", "insider_sentiment_analysis")
-workflow.add_edge("insider_sentiment_analysis", "technical_sentiment_analysis")
-workflow.add_edge("technical_sentiment_analysis", "composite_sentiment_analysis")
-workflow.add_edge("composite_sentiment_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "news_sentiment_analysis": news_sentiment_analysis_node,
+        "social_sentiment_analysis": social_sentiment_analysis_node,
+        "insider_sentiment_analysis": insider_sentiment_analysis_node,
+        "technical_sentiment_analysis": technical_sentiment_analysis_node,
+        "composite_sentiment_analysis": composite_sentiment_analysis_node,
+    },
+    end_analysis,
+    # the composite sentiment weights the results of the other sentiment analyses
+    dependencies={
+        "composite_sentiment_analysis": [
+            "news_sentiment_analysis",
+            "social_sentiment_analysis",
+            "insider_sentiment_analysis",
+            "technical_sentiment_analysis",
+        ],
+    },
+)
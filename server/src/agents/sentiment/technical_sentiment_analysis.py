@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.price_frame import PriceFrame, get_price_frame
 from langgraph.types import StreamWriter
 import re
 
@@ -15,53 +17,46 @@ class TechnicalSentimentAnalysis():
         self.options = options
 
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, frame: PriceFrame) -> dict[str, any]:
         """Analyze technical sentiment based on price action and momentum indicators."""
         result = {"score": 0, "max_score": 10, "details": [], "technical_indicators": {}}
-        if not prices or len(prices) < 10:
+        if len(frame) < 10:
             result["details"].append('Insufficient price data for technical analysis (need at least 10 days)')
             return result
 
         # Calculate simple moving averages
-        closes = [price.get('close', 0) for price in prices if price.get('close')]
+        closes = frame.present('close')
         if len(closes) < 10:
             result["details"].append('Insufficient closing price data')
             return result
 
         # Calculate 5-day and 20-day moving averages
-        if len(closes) >= 5:
-            ma5 = sum(closes[-5:]) / 5
-        else:
-            ma5 = closes[-1] if closes else 0
-            
-        if len(closes) >= 20:
-            ma20 = sum(closes[-20:]) / 20
-        else:
-            ma20 = sum(closes) / len(closes) if closes else 0
+        ma5 = float(closes[-5:].mean())
+        ma20 = float(closes[-20:].mean())
 
-        current_price = closes[-1] if closes else 0
+        current_price = float(closes[-1])
 
         # Calculate price momentum (percent change over last 5 days)
         momentum = 0
-        if len(closes) >= 5 and closes[-5] != 0:
-            momentum = (current_price - closes[-5]) / closes[-5] * 100
+        if closes[-5] != 0:
+            momentum = float((current_price - closes[-5]) / closes[-5] * 100)
 
         # Calculate volume trend (if volume data available)
-        volumes = [price.get('volume', 0) for price in prices if price.get('volume')]
+        volumes = frame.present('volume')
         avg_volume = 0
         volume_trend = 0
         
-        if volumes and len(volumes) >= 5:
-            avg_volume = sum(volumes[-10:]) / 10 if len(volumes) >= 10 else sum(volumes) / len(volumes)
+        if len(volumes) >= 5:
+            avg_volume = float(volumes[-10:].mean())
             if avg_volume > 0 and volumes[-1] > 0:
-                volume_trend = (volumes[-1] - avg_volume) / avg_volume * 100
+                volume_trend = float((volumes[-1] - avg_volume) / avg_volume * 100)
 
         result["technical_indicators"] = {
             "current_price": current_price,
             "moving_average_5": ma5,
             "moving_average_20": ma20,
             "momentum_5d": momentum,
-            "current_volume": volumes[-1] if volumes else 0,
+            "current_volume": float(volumes[-1]) if len(volumes) > 0 else 0,
             "average_volume": avg_volume,
             "volume_trend": volume_trend
         }
@@ -125,21 +120,15 @@ class TechnicalSentimentAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_price_frame(get_input(state, 'prices'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'technical_sentiment_analysis'
         analysis['title'] = f'Technical Sentiment Analysis'
 
-        analysis_data['technical_sentiment_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'technical_sentiment_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,11 +1,14 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 
 import time
+import numpy as np
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, growth
 from langgraph.types import StreamWriter
 
 
@@ -14,28 +17,26 @@ class AdaptiveStrategyAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list, prices: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, prices: list) -> dict[str, any]:
         """Analyze the company's adaptive strategy and business model flexibility."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available for adaptive strategy analysis')
             return result
 
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
         score = 0
         reasoning = []
         
         # Revenue growth consistency (ability to adapt to market changes)
         if latest_metrics.get('revenue'):
             # Calculate revenue growth rate over multiple years
-            revenue_growth_scores = []
-            for i in range(min(5, len(metrics))):  # Check up to 5 years
-                if metrics[i].get('revenue') and i+1 < len(metrics) and metrics[i+1].get('revenue'):
-                    growth = (metrics[i]['revenue'] - metrics[i+1]['revenue']) / metrics[i+1]['revenue'] * 100
-                    revenue_growth_scores.append(growth)
+            revenues = frame.column('revenue')[:6]  # Check up to 5 years
+            revenue_growth_scores = growth(revenues) * 100
+            revenue_growth_scores = revenue_growth_scores[(revenues[:-1] != 0) & ~np.isnan(revenue_growth_scores)]
             
             if len(revenue_growth_scores) >= 3:
-                avg_growth = sum(revenue_growth_scores) / len(revenue_growth_scores)
+                avg_growth = revenue_growth_scores.mean()
                 if avg_growth > 10:
                     score += 2
                     reasoning.append(f"Strong consistent revenue growth: {avg_growth:.1f}% annually")
@@ -110,22 +111,16 @@ class AdaptiveStrategyAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        prices = context.get('prices')
-        analysis = self.analyze(metrics, prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        prices = get_input(state, 'prices')
+        analysis = self.analyze(frame, prices)
         analysis['type'] = 'adaptive_strategy_analysis'
         analysis['title'] = f'Adaptive Strategy Analysis'
 
-        analysis_data['adaptive_strategy_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'adaptive_strategy_analysis': analysis},
             "messages": [
                 ai_message
             ]
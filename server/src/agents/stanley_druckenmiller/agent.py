@@ -3,8 +3,10 @@ This is the main entry point for the Stanley Druckenmiller agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
+import asyncio
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -29,7 +31,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 macro_analysis_node = MacroAnalysis({})
@@ -39,7 +45,23 @@ risk_analysis_node = RiskAnalysis({})
 valuation_analysis_node = ValuationAnalysis({})
 flexibility_analysis_node = FlexibilityAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio",
+            "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
+            "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
+            "interest_expense", "capital_expenditure", "depreciation_and_amortization",
+            "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
+            "net_income", "revenue", "gross_profit", "gross_margin",
+            "dividends_and_other_cash_distributions", "issuance_or_purchase_of_equity_shares"
+        ],
+    },
+    price_days=365,
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -48,35 +70,24 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
-    # Get required financial metrics and items for Stanley Druckenmiller analysis
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio", 
-        "return_on_invested_capital", "asset_turnover", "market_cap", "beta",
-        "price_to_earnings_ratio", "enterprise_value", "free_cash_flow", "ebit",
-        "interest_expense", "capital_expenditure", "depreciation_and_amortization",
-        "ordinary_shares_number", "total_assets", "total_liabilities", "stockholders_equity",
-        "net_income", "revenue", "gross_profit", "gross_margin",
-        "dividends_and_other_cash_distributions", "issuance_or_purchase_of_equity_shares"
-    ], end_date, period="yearly")
-    
-    # Get additional data for macro analysis
-    prices = dataset_client.get_prices(ticker.get('symbol'), 
-                                      time.strftime("%Y-%m-%d", time.localtime(time.time() - 365*24*60*60)), 
-                                      end_date)
+    # Get required financial metrics and items, and prices for macro analysis concurrently
+    start_date = data_bundle.get_price_start_date(end_date, DATA_REQUIREMENTS.price_days)
+    metrics, prices = await asyncio.gather(
+        data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly"),
+        data_bundle.get_prices(context, dataset_client, ticker.get('symbol'), start_date, end_date),
+    )
     
-    context['metrics'] = metrics
-    context['prices'] = prices
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics, prices=prices),
         'messages':[AIMessage(content=markdown.to_h2('Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -101,6 +112,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['total_score'] = total_score
     analysis_data['max_possible_score'] = max_possible_score
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'stanley_druckenmiller', config)
     messages = [
             (
                 "system",
@@ -147,7 +159,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -171,7 +183,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -180,28 +192,16 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("macro_analysis", macro_analysis_node)
-workflow.add_node("global_market_analysis", global_market_analysis_node)
-workflow.add_node("adaptive_strategy_analysis", adaptive_strategy_analysis_node)
-workflow.add_node("risk_analysis", risk_analysis_node)
-workflow.add_node("valuation_analysis", valuation_analysis_node)
-workflow.add_node("flexibility_analysis", flexibility_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "macro_analysis")
-workflow.add_edge("macro_analysis", "global_market_analysis")
-workflow.add_edge("global_market_analysis", "adaptive_strategy_analysis")
-workflow.add_edge("adaptive_strategy_analysis", "risk_analysis")
-workflow.add_edge("risk_analysis", "valuation_analysis")
-workflow.add_edge("valuation_analysis", "flexibility_analysis")
-workflow.add_edge("flexibility_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "macro_analysis": macro_analysis_node,
+        "global_market_analysis": global_market_analysis_node,
+        "adaptive_strategy_analysis": adaptive_strategy_analysis_node,
+        "risk_analysis": risk_analysis_node,
+        "valuation_analysis": valuation_analysis_node,
+        "flexibility_analysis": flexibility_analysis_node,
+    },
+    end_analysis,
+)
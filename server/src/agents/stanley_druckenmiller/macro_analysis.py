@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.price_frame import PriceFrame, get_price_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,15 +16,15 @@ class MacroAnalysis():
         self.options = options
 
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, frame: PriceFrame) -> dict[str, any]:
         """Analyze macroeconomic factors affecting the investment."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not prices or len(prices) < 20:
+        if len(frame) < 20:
             result["details"].append('Insufficient price data for macro analysis')
             return result
 
         # Calculate price trends over different time periods
-        closes = [price.get('close', 0) for price in prices if price.get('close')]
+        closes = frame.present('close')
         if len(closes) < 20:
             result["details"].append('Insufficient closing price data')
             return result
@@ -32,7 +34,7 @@ class MacroAnalysis():
         
         # Short-term trend (20-day)
         if len(closes) >= 20:
-            short_term_trend = (closes[-1] - closes[-20]) / closes[-20] * 100
+            short_term_trend = float((closes[-1] - closes[-20]) / closes[-20] * 100)
             if short_term_trend > 10:
                 score += 2
                 reasoning.append(f"Strong short-term momentum: {short_term_trend:+.1f}% (20-day)")
@@ -50,7 +52,7 @@ class MacroAnalysis():
 
         # Medium-term trend (60-day)
         if len(closes) >= 60:
-            medium_term_trend = (closes[-1] - closes[-60]) / closes[-60] * 100
+            medium_term_trend = float((closes[-1] - closes[-60]) / closes[-60] * 100)
             if medium_term_trend > 15:
                 score += 2
                 reasoning.append(f"Strong medium-term trend: {medium_term_trend:+.1f}% (60-day)")
@@ -68,7 +70,7 @@ class MacroAnalysis():
 
         # Long-term trend (120-day)
         if len(closes) >= 120:
-            long_term_trend = (closes[-1] - closes[-120]) / closes[-120] * 100
+            long_term_trend = float((closes[-1] - closes[-120]) / closes[-120] * 100)
             if long_term_trend > 20:
                 score += 2
                 reasoning.append(f"Strong long-term trend: {long_term_trend:+.1f}% (120-day)")
@@ -86,8 +88,7 @@ class MacroAnalysis():
 
         # Volatility analysis
         if len(closes) >= 20:
-            avg_price = sum(closes[-20:]) / 20
-            volatility = (sum((p - avg_price) ** 2 for p in closes[-20:]) / 20) ** 0.5 / avg_price * 100
+            volatility = float(closes[-20:].std() / closes[-20:].mean() * 100)
             if volatility < 2:
                 score += 1
                 reasoning.append(f"Low volatility environment: {volatility:.1f}% (20-day)")
@@ -108,21 +109,15 @@ class MacroAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_price_frame(get_input(state, 'prices'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'macro_analysis'
         analysis['title'] = f'Macro Analysis'
 
-        analysis_data['macro_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'macro_analysis': analysis},
             "messages": [
                 ai_message
             ]
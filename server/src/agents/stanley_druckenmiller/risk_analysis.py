@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame, mean_absolute_deviation
 from langgraph.types import StreamWriter
 
 
@@ -14,14 +16,14 @@ class RiskAnalysis():
         self.options = options
 
     
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze risk factors based on Druckenmiller's risk management principles."""
         result = {"score": 0, "max_score": 10, "details": []}
-        if not metrics:
+        if len(frame) == 0:
             result["details"].append('No metrics available for risk analysis')
             return result
 
-        latest_metrics = metrics[0]
+        latest_metrics = frame.latest_period()
         score = 10  # Start with maximum score and subtract for risks
         reasoning = []
         
@@ -71,12 +73,12 @@ class RiskAnalysis():
                 reasoning.append(f"Moderate market risk: Beta of {beta:.2f}")
         
         # Business risk - Volatility in earnings
-        if len(metrics) >= 3:
-            earnings = [m.get('net_income', 0) for m in metrics[:3] if m.get('net_income') is not None]
+        if len(frame) >= 3:
+            earnings = frame.present('net_income', periods=3)
             if len(earnings) >= 2:
-                avg_earnings = sum(earnings) / len(earnings)
+                avg_earnings = earnings.mean()
                 if avg_earnings > 0:
-                    volatility = sum(abs(e - avg_earnings) for e in earnings) / len(earnings) / avg_earnings * 100
+                    volatility = mean_absolute_deviation(earnings) / avg_earnings * 100
                     if volatility > 50:
                         score -= 2
                         reasoning.append(f"High earnings volatility: {volatility:.1f}%")
@@ -108,21 +110,15 @@ class RiskAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'risk_analysis'
         analysis['title'] = f'Risk Analysis'
 
-        analysis_data['risk_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'risk_analysis': analysis},
             "messages": [
                 ai_message
             ]
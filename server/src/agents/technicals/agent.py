@@ -4,7 +4,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 """
 
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -28,7 +29,12 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common import price_history
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 trend_analysis_node = TrendAnalysis({})
@@ -37,7 +43,15 @@ momentum_analysis_node = MomentumAnalysis({})
 volatility_analysis_node = VolatilityAnalysis({})
 statistical_arbitrage_analysis_node = StatisticalArbitrageAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    price_days=365,
+)
+
+# the chart series of the trend analysis (include_series option) are not sent to the analyzer
+PROMPT_DROP_KEYS = ('series',)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -46,22 +60,23 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
     # Get price data for technical analysis
-    start_date = time.strftime("%Y-%m-%d", time.localtime(time.time() - 365*24*60*60))  # 1 year of data
-    prices = dataset_client.get_prices(ticker.get('symbol'), start_date, end_date)
+    start_date = data_bundle.get_price_start_date(end_date, DATA_REQUIREMENTS.price_days)  # 1 year of data
+    prices = await data_bundle.get_prices(context, dataset_client, ticker.get('symbol'), start_date, end_date)
     
-    context['prices'] = prices
+    # EMA, RSI, ATR and ADX from the persisted indicator state, advanced by the new bars only
+    indicators = await price_history.get_indicators(dataset_client, ticker.get('symbol'), prices)
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(prices=prices, indicators=indicators),
         'messages':[AIMessage(content=markdown.to_h2('Technical Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -84,6 +99,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['total_score'] = total_score
     analysis_data['max_possible_score'] = max_possible_score
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'technicals', config, drop=PROMPT_DROP_KEYS)
     messages = [
             (
                 "system",
@@ -126,7 +142,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this technical opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE TECHNICAL ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your trading decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -150,7 +166,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -159,26 +175,15 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("trend_analysis", trend_analysis_node)
-workflow.add_node("mean_reversion_analysis", mean_reversion_analysis_node)
-workflow.add_node("momentum_analysis", momentum_analysis_node)
-workflow.add_node("volatility_analysis", volatility_analysis_node)
-workflow.add_node("statistical_arbitrage_analysis", statistical_arbitrage_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "trend_analysis")
-workflow.add_edge("trend_analysis", "mean_reversion_analysis")
-workflow.add_edge("mean_reversion_analysis", "momentum_analysis")
-workflow.add_edge("momentum_analysis", "volatility_analysis")
-workflow.add_edge("volatility_analysis", "statistical_arbitrage_analysis")
-workflow.add_edge("statistical_arbitrage_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "trend_analysis": trend_analysis_node,
+        "mean_reversion_analysis": mean_reversion_analysis_node,
+        "momentum_analysis": momentum_analysis_node,
+        "volatility_analysis": volatility_analysis_node,
+        "statistical_arbitrage_analysis": statistical_arbitrage_analysis_node,
+    },
+    end_analysis,
+)
@@ -1,12 +1,15 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.price_frame import PriceFrame, get_price_frame
+from common.rolling import RollingWindow, last
+from common.indicator_state import get_state_indicators
 from langgraph.types import StreamWriter
-import math
 
 
 class MeanReversionAnalysis():
@@ -14,88 +17,38 @@ class MeanReversionAnalysis():
         self.options = options
 
     
-    def calculate_sma(self, prices: list, period: int) -> float:
-        """Calculate Simple Moving Average"""
-        if len(prices) < period:
-            return 0
-        
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
-        if len(closes) < period:
-            return 0
-            
-        return sum(closes) / len(closes)
-    
-    def calculate_std(self, prices: list, period: int) -> float:
-        """Calculate Standard Deviation"""
-        if len(prices) < period:
-            return 0
-        
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
-        if len(closes) < period:
-            return 0
-            
-        mean = sum(closes) / len(closes)
-        variance = sum((x - mean) ** 2 for x in closes) / len(closes)
-        return math.sqrt(variance)
-    
-    def calculate_rsi(self, prices: list, period: int = 14) -> float:
-        """Calculate Relative Strength Index"""
-        if len(prices) < period + 1:
-            return 50  # Neutral RSI
-        
-        closes = [price.get('close', 0) for price in prices[-(period+1):] if price.get('close')]
-        if len(closes) < period + 1:
-            return 50
-        
-        # Calculate price changes
-        gains = []
-        losses = []
-        
-        for i in range(1, len(closes)):
-            change = closes[i] - closes[i-1]
-            if change > 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
-        
-        # Calculate average gains and losses
-        avg_gain = sum(gains) / len(gains)
-        avg_loss = sum(losses) / len(losses)
-        
-        if avg_loss == 0:
-            return 100  # No losses, perfect RSI
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+    def calculate_close_stats(self, frame: PriceFrame, period: int) -> RollingWindow:
+        """Calculate rolling statistics of close, windows with a missing close are NaN"""
+        return RollingWindow(frame.masked('close'), period)
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, frame: PriceFrame, indicators: dict) -> dict[str, any]:
         """Analyze mean reversion strategy using statistical measures and Bollinger Bands."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 50:
+        if len(frame) < 50:
             result["details"].append('Insufficient price data for mean reversion analysis (need at least 50 days)')
             return result
 
         # Calculate moving averages and standard deviation
-        ma_50 = self.calculate_sma(prices, 50)
-        std_50 = self.calculate_std(prices, 50)
+        close_stats = self.calculate_close_stats(frame, 50)
+        ma_50 = last(close_stats.mean())
+        std_50 = last(close_stats.std())
         
         # Calculate Bollinger Bands
         bb_upper = ma_50 + (2 * std_50)
         bb_lower = ma_50 - (2 * std_50)
         
         # Calculate z-score of price relative to moving average
-        current_price = prices[-1].get('close', 0) if prices else 0
+        current_price = frame.latest('close')
         z_score = (current_price - ma_50) / std_50 if std_50 > 0 else 0
         
         # Calculate price position within Bollinger Bands
         price_vs_bb = (current_price - bb_lower) / (bb_upper - bb_lower) if (bb_upper - bb_lower) > 0 else 0.5
         
-        # Calculate RSI with multiple timeframes
-        rsi_14 = self.calculate_rsi(prices, 14)
-        rsi_28 = self.calculate_rsi(prices, 28)
+        # RSI (Wilder smoothing) with multiple timeframes
+        rsi_14 = indicators.get('rsi_14')
+        rsi_14 = rsi_14 if rsi_14 is not None else 50  # Neutral RSI
+        rsi_28 = indicators.get('rsi_28')
+        rsi_28 = rsi_28 if rsi_28 is not None else 50
         
         # Store indicators
         result["indicators"] = {
@@ -157,21 +110,15 @@ class MeanReversionAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_price_frame(get_input(state, 'prices'))
+        analysis = self.analyze(frame, get_state_indicators(state))
         analysis['type'] = 'mean_reversion_analysis'
         analysis['title'] = f'Mean Reversion Analysis'
 
-        analysis_data['mean_reversion_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'mean_reversion_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,12 +1,14 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.price_frame import PriceFrame, get_price_frame
 from langgraph.types import StreamWriter
-import math
+import numpy as np
 
 
 class MomentumAnalysis():
@@ -14,56 +16,37 @@ class MomentumAnalysis():
         self.options = options
 
     
-    def calculate_returns(self, prices: list) -> list:
-        """Calculate daily percentage returns"""
-        if len(prices) < 2:
-            return []
-        
-        returns = []
-        for i in range(1, len(prices)):
-            prev_close = prices[i-1].get('close', 0)
-            curr_close = prices[i].get('close', 0)
-            if prev_close > 0:
-                ret = (curr_close - prev_close) / prev_close * 100
-                returns.append(ret)
-            else:
-                returns.append(0)
-        return returns
-    
-    def calculate_momentum(self, returns: list, period: int) -> float:
+    def calculate_momentum(self, returns: np.ndarray, period: int) -> float:
         """Calculate momentum over a given period"""
         if len(returns) < period:
             return 0
         
         # Sum returns over the period
-        momentum = sum(returns[-period:])
-        return momentum
+        momentum = returns[-period:].sum()
+        return float(momentum)
     
-    def calculate_volume_momentum(self, prices: list, period: int = 21) -> float:
+    def calculate_volume_momentum(self, frame: PriceFrame, period: int = 21) -> float:
         """Calculate volume momentum relative to moving average"""
-        if len(prices) < period:
-            return 1  # Neutral
-        
-        volumes = [price.get('volume', 0) for price in prices[-period:] if price.get('volume')]
-        if len(volumes) < period:
+        volumes = frame.tail('volume', period)
+        if volumes is None:
             return 1  # Neutral
         
         current_volume = volumes[-1]
-        avg_volume = sum(volumes) / len(volumes)
+        avg_volume = volumes.mean()
         
         if avg_volume > 0:
-            return current_volume / avg_volume
+            return float(current_volume / avg_volume)
         return 1  # Neutral
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, frame: PriceFrame) -> dict[str, any]:
         """Analyze multi-factor momentum strategy."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 63:  # Need at least 63 days for 3M momentum
+        if len(frame) < 63:  # Need at least 63 days for 3M momentum
             result["details"].append('Insufficient price data for momentum analysis (need at least 63 days)')
             return result
 
         # Calculate returns
-        returns = self.calculate_returns(prices)
+        returns = frame.returns()
         if len(returns) < 63:
             result["details"].append('Insufficient return data for momentum analysis')
             return result
@@ -74,7 +57,7 @@ class MomentumAnalysis():
         mom_6m = self.calculate_momentum(returns, 126) # 6 months
         
         # Volume momentum
-        volume_momentum = self.calculate_volume_momentum(prices, 21)
+        volume_momentum = self.calculate_volume_momentum(frame, 21)
         
         # Store indicators
         result["indicators"] = {
@@ -124,8 +107,8 @@ class MomentumAnalysis():
         
         # Recent momentum acceleration
         if len(returns) >= 42:  # Need at least 42 days for comparison
-            recent_mom = sum(returns[-21:])  # Last 1 month
-            prior_mom = sum(returns[-42:-21])  # Prior 1 month
+            recent_mom = returns[-21:].sum()  # Last 1 month
+            prior_mom = returns[-42:-21].sum()  # Prior 1 month
             if recent_mom > prior_mom and recent_mom > 0:
                 score += 0.5  # Momentum acceleration
                 reasoning.append(f"Momentum accelerating in recent period")
@@ -144,21 +127,15 @@ class MomentumAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_price_frame(get_input(state, 'prices'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'momentum_analysis'
         analysis['title'] = f'Momentum Analysis'
 
-        analysis_data['momentum_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'momentum_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -0,0 +1,332 @@
+"""
+Batch technical screening of many tickers, e.g. the constituents of an index.
+
+The prices of all the tickers are loaded in one PriceMatrix (tickers x bars, each row holding the
+bars of its own market calendar). The indicators run along the bar axis of the matrix, and the
+scoring rules of the five technical analyses (trend, mean reversion, momentum, volatility,
+statistical arbitrage) are applied with array operations over the ticker axis, mirroring the rules
+of the analysis modules (tests/test_screening.py fails when a module rule and its copy here drift
+apart). The tickers are ranked by total score, and only the top ones go through the technicals
+agent for the detailed analysis and the LLM narrative.
+
+The graph reads action.parameters:
+    tickers: symbols, or tickers with a symbol, to screen
+    top_k: number of top ranked tickers narrated by the technicals agent, default TOP_K
+    end_date: last date of the prices, default today
+"""
+
+import asyncio
+import logging
+import time
+
+import numpy as np
+from langchain.schema import AIMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph
+
+from agents.technicals.agent import DATA_REQUIREMENTS, agent as technicals_agent
+from agents.technicals.volatility_analysis import VolatilityAnalysis
+from common import data_bundle, indicators, markdown, price_history
+from common.agent_state import AgentState
+from common.dataset import AsyncDataset
+from common.hurst import hurst_exponent
+from common.price_matrix import PriceMatrix
+from common.rolling import RollingWindow, last_column
+from common.settings import Settings
+
+# tickers narrated by default
+TOP_K = 10
+ANALYSES = (
+    'trend_analysis',
+    'mean_reversion_analysis',
+    'momentum_analysis',
+    'volatility_analysis',
+    'statistical_arbitrage_analysis',
+)
+MAX_SCORE = 10
+
+volatility_analysis = VolatilityAnalysis({})
+
+logger = logging.getLogger(__name__)
+
+
+def _trailing_sum(returns: np.ndarray, period: int, offset: int = 0) -> np.ndarray:
+    """
+    Sum of the `period` returns of each row ending `offset` days from the end.
+    """
+    end = returns.shape[-1] - offset
+    return np.nansum(returns[..., max(0, end - period):end], axis=-1)
+
+
+def _clamp(score: np.ndarray, enough_data: np.ndarray) -> np.ndarray:
+    # the analyses score 0 when the ticker has not enough bars
+    return np.where(enough_data, np.clip(score, 0, MAX_SCORE), 0)
+
+
+def score_trend(matrix: PriceMatrix, lengths: np.ndarray) -> np.ndarray:
+    """
+    Scores of TrendAnalysis: EMA 8/21/55 alignment, ADX strength and price vs the EMAs.
+    """
+    ema_8, ema_21, ema_55 = (last_column(indicators.ema(matrix.close, period)) for period in (8, 21, 55))
+    adx = last_column(indicators.adx(matrix.high, matrix.low, matrix.close, 14)[0])
+    price = last_column(matrix.close)
+
+    short_trend = (ema_8 > 0) & (ema_21 > 0) & (ema_8 > ema_21)
+    medium_trend = (ema_21 > 0) & (ema_55 > 0) & (ema_21 > ema_55)
+    score = 5.0 + np.select(
+        [short_trend & medium_trend, ~short_trend & ~medium_trend, short_trend & ~medium_trend, ~short_trend & medium_trend],
+        [2, -2, 1, 0.5],
+        0,
+    )
+    score += np.select([(adx > 25) & short_trend & medium_trend, (adx > 25) & ~short_trend & ~medium_trend], [1, -1], 0)
+    positioned = (price > 0) & (ema_8 > 0) & (ema_21 > 0)
+    score += np.select(
+        [positioned & (price > ema_8) & (ema_8 > ema_21), positioned & (price < ema_8) & (ema_8 < ema_21)],
+        [0.5, -0.5],
+        0,
+    )
+    return _clamp(score, lengths >= 55)
+
+
+def score_mean_reversion(matrix: PriceMatrix, lengths: np.ndarray) -> np.ndarray:
+    """
+    Scores of MeanReversionAnalysis: z-score and Bollinger position on 50 days, RSI 14/28.
+    """
+    close_stats = RollingWindow(matrix.close, 50)
+    ma_50 = last_column(close_stats.mean())
+    std_50 = last_column(close_stats.std())
+    bb_upper = ma_50 + 2 * std_50
+    bb_lower = ma_50 - 2 * std_50
+    price = last_column(matrix.close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = np.where(std_50 > 0, (price - ma_50) / std_50, 0)
+        price_vs_bb = np.where(bb_upper - bb_lower > 0, (price - bb_lower) / (bb_upper - bb_lower), 0.5)
+    rsi_14 = last_column(indicators.rsi(matrix.close, 14), default=50)
+    rsi_28 = last_column(indicators.rsi(matrix.close, 28), default=50)
+
+    score = 5.0 + np.select(
+        [
+            (z_score < -2) & (price_vs_bb < 0.2),
+            (z_score > 2) & (price_vs_bb > 0.8),
+            (z_score < -1) & (price_vs_bb < 0.3),
+            (z_score > 1) & (price_vs_bb > 0.7),
+        ],
+        [2, -2, 1, -1],
+        0,
+    )
+    score += np.select([rsi_14 < 30, rsi_14 > 70], [1, -1], 0)
+    score += np.where(np.abs(rsi_14 - rsi_28) > 10, np.where(rsi_14 < rsi_28, 0.5, -0.5), 0)
+    return _clamp(score, lengths >= 50)
+
+
+def score_momentum(matrix: PriceMatrix, returns: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Scores of MomentumAnalysis: 1/3/6 month momentum, volume confirmation and acceleration.
+    """
+    return_counts = lengths - 1
+    mom_1m, mom_3m, mom_6m = (
+        np.where(return_counts >= period, _trailing_sum(returns, period), 0) for period in (21, 63, 126)
+    )
+    volumes = matrix.volume[:, -21:]
+    # the module's volume momentum is neutral when a volume of the last 21 days is missing
+    complete = (lengths >= 21) & (volumes.shape[-1] == 21) & (np.nan_to_num(volumes) > 0).all(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_momentum = np.where(complete, volumes[:, -1] / volumes.mean(axis=-1), 1)
+    volume_momentum = np.where(np.isnan(volume_momentum), 1, volume_momentum)
+
+    momentum_score = 0.4 * mom_1m + 0.3 * mom_3m + 0.3 * mom_6m
+    volume_confirmation = volume_momentum > 1.0
+    score = 5.0 + np.select(
+        [
+            (momentum_score > 5) & volume_confirmation,
+            momentum_score > 2,
+            (momentum_score < -5) & volume_confirmation,
+            momentum_score < -2,
+        ],
+        [2, 1, -2, -1],
+        0,
+    )
+    score += np.where(volume_momentum > 1.5, np.where(momentum_score > 0, 0.5, -0.5), 0)
+    recent_mom = _trailing_sum(returns, 21)
+    prior_mom = _trailing_sum(returns, 21, offset=21)
+    score += np.where(
+        return_counts >= 42,
+        np.select([(recent_mom > prior_mom) & (recent_mom > 0), (recent_mom < prior_mom) & (recent_mom < 0)], [0.5, -0.5], 0),
+        0,
+    )
+    return _clamp(score, return_counts >= 63)
+
+
+def score_volatility(matrix: PriceMatrix, returns: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Scores of VolatilityAnalysis: volatility regime and z-score, ATR ratio and volatility trend.
+    """
+    return_counts = lengths - 1
+    vol_21 = volatility_analysis.calculate_volatility(returns, 21)
+    vol_63 = volatility_analysis.calculate_volatility(returns, 63)
+    hist_vol_21 = last_column(vol_21)
+    vol_ma_63 = last_column(vol_63, offset=22)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_regime = np.where((return_counts >= 84) & (vol_ma_63 > 0), hist_vol_21 / vol_ma_63, 1)
+    vol_z_score = last_column(volatility_analysis.calculate_volatility_z_scores(vol_21, 63))
+    atr = last_column(indicators.atr(matrix.high, matrix.low, matrix.close, 14))
+    price = last_column(matrix.close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        atr_ratio = np.where((price > 0) & (atr > 0), atr / price, 0)
+
+    score = 5.0 + np.select(
+        [
+            (vol_regime < 0.8) & (vol_z_score < -1),
+            (vol_regime > 1.2) & (vol_z_score > 1),
+            vol_regime < 0.9,
+            vol_regime > 1.1,
+        ],
+        [2, -2, 1, -1],
+        0,
+    )
+    score += np.where(atr_ratio > 0.02, np.where(score > 5, 0.5, -0.5), 0)
+    prior_vol = last_column(vol_21, offset=22)
+    score += np.where(
+        return_counts >= 42,
+        np.select([hist_vol_21 > prior_vol * 1.2, hist_vol_21 < prior_vol * 0.8], [-0.5, 0.5], 0),
+        0,
+    )
+    return _clamp(score, (lengths >= 63) & (return_counts >= 21))
+
+
+def score_statistical_arbitrage(matrix: PriceMatrix, returns: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Scores of StatisticalArbitrageAnalysis: Hurst exponent, return skewness and kurtosis.
+    """
+    return_counts = lengths - 1
+    return_stats = RollingWindow(returns, 63)
+    skew = last_column(return_stats.skew())
+    kurt = last_column(return_stats.kurt(), default=3)
+    # the tickers have different lengths, the Hurst exponent is estimated per ticker
+    hurst = np.array([
+        hurst_exponent(matrix.close[i][~np.isnan(matrix.close[i])]) if lengths[i] >= 40 else 0.5
+        for i in range(len(matrix))
+    ])
+
+    score = 5.0 + np.select(
+        [(hurst < 0.4) & (skew > 1), (hurst < 0.4) & (skew < -1), hurst < 0.45, hurst > 0.55],
+        [2, -2, 1, -1],
+        0,
+    )
+    score += np.select([skew > 2, skew < -2], [1, -1], 0)
+    score += np.select([kurt > 6, kurt < 2], [-0.5, 0.5], 0)
+    score += np.where((hurst < 0.3) & (np.abs(skew) > 2), np.where(skew > 0, 0.5, -0.5), 0)
+    return _clamp(score, return_counts >= 63)
+
+
+def screen(matrix: PriceMatrix) -> list[dict]:
+    """
+    Score the tickers of the matrix and rank them by total score, best first.
+    """
+    if len(matrix) == 0:
+        return []
+    lengths = matrix.lengths()
+    returns = indicators.returns(matrix.close)
+    scores = {
+        'trend_analysis': score_trend(matrix, lengths),
+        'mean_reversion_analysis': score_mean_reversion(matrix, lengths),
+        'momentum_analysis': score_momentum(matrix, returns, lengths),
+        'volatility_analysis': score_volatility(matrix, returns, lengths),
+        'statistical_arbitrage_analysis': score_statistical_arbitrage(matrix, returns, lengths),
+    }
+    total_scores = sum(scores.values())
+    ranked = []
+    for i in np.argsort(-total_scores, kind='stable'):
+        ranked.append({
+            'symbol': matrix.symbols[i],
+            'total_score': float(total_scores[i]),
+            'max_possible_score': MAX_SCORE * len(ANALYSES),
+            'scores': {name: float(values[i]) for name, values in scores.items()},
+            'days': int(lengths[i]),
+        })
+    return ranked
+
+
+async def load_price_matrix(config: RunnableConfig, symbols: list[str], end_date: str) -> PriceMatrix:
+    """
+    Load the prices of the technicals analysis window of all the symbols, from the persisted
+    price history, downloading only the bars it does not hold yet.
+    """
+    dataset_client = AsyncDataset(config)
+    start_date = data_bundle.get_price_start_date(end_date, DATA_REQUIREMENTS.price_days)
+
+    async def get_prices(symbol: str) -> list[dict]:
+        try:
+            return await price_history.get_prices(dataset_client, symbol, start_date, end_date)
+        except Exception as e:
+            logger.warning('Failed to get prices of %s: %s', symbol, e)
+            return []
+
+    prices = await asyncio.gather(*[get_prices(symbol) for symbol in symbols])
+    return PriceMatrix.from_prices({symbol: symbol_prices for symbol, symbol_prices in zip(symbols, prices) if len(symbol_prices) > 0})
+
+
+def _get_parameters(state: AgentState) -> dict:
+    return (state.get('action') or {}).get('parameters') or {}
+
+
+async def screen_tickers(state: AgentState, config: RunnableConfig):
+    parameters = _get_parameters(state)
+    tickers = [ticker if isinstance(ticker, dict) else {'symbol': ticker} for ticker in parameters.get('tickers') or []]
+    symbols = list(dict.fromkeys(ticker.get('symbol') for ticker in tickers if ticker.get('symbol')))
+    end_date = parameters.get('end_date') or time.strftime("%Y-%m-%d")
+
+    matrix = await load_price_matrix(config, symbols, end_date)
+    ranked = screen(matrix)
+    top_k = int(parameters.get('top_k') or TOP_K)
+    rows = [
+        {'rank': rank, 'symbol': item['symbol'], 'total_score': item['total_score'], **item['scores']}
+        for rank, item in enumerate(ranked, start=1)
+    ]
+    content = markdown.to_h2(f'Technical Screening of {len(symbols)} tickers')
+    if len(rows) > 0:
+        content += markdown.list_dict_to_table(rows)
+    missing = [symbol for symbol in symbols if symbol not in matrix.symbols]
+    if len(missing) > 0:
+        content += f"\nNo prices for {', '.join(missing)}\n"
+
+    names = {ticker.get('symbol'): ticker for ticker in tickers}
+    context = {
+        'end_date': end_date,
+        'top_tickers': [names.get(item['symbol']) for item in ranked[:top_k]],
+    }
+    return {'messages': [AIMessage(content=content)], 'context': context}
+
+
+async def narrate_top_tickers(state: AgentState, config: RunnableConfig):
+    """
+    Run the technicals agent on the top ranked tickers, for their analysis and LLM narrative.
+    """
+    context = state.get('context') or {}
+    semaphore = asyncio.Semaphore(Settings(config).get_analysis_concurrency())
+
+    async def narrate(ticker: dict) -> list:
+        task_state = {
+            'messages': [],
+            'context': {'current_task': {'agent': 'technicals', 'ticker': ticker}},
+            'action': {'type': 'ticker_analysis', 'parameters': {'end_date': context.get('end_date')}},
+        }
+        async with semaphore:
+            output = await technicals_agent.ainvoke(task_state, config)
+        return output.get('messages')
+
+    outputs = await asyncio.gather(*[narrate(ticker) for ticker in context.get('top_tickers') or []])
+    return {
+        'messages': [message for messages in outputs for message in messages],
+        'action': None,
+        'context': {},
+    }
+
+
+workflow = StateGraph(AgentState)
+workflow.add_node('screen_tickers', screen_tickers)
+workflow.add_node('narrate_top_tickers', narrate_top_tickers)
+workflow.add_edge('screen_tickers', 'narrate_top_tickers')
+workflow.set_entry_point('screen_tickers')
+workflow.set_finish_point('narrate_top_tickers')
+agent = workflow.compile()
@@ -1,12 +1,16 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.price_frame import PriceFrame, get_price_frame
+from common.rolling import RollingWindow, last
+from common.hurst import hurst_exponent, rolling_hurst
 from langgraph.types import StreamWriter
-import math
+import numpy as np
 
 
 class StatisticalArbitrageAnalysis():
@@ -14,133 +18,57 @@ class StatisticalArbitrageAnalysis():
         self.options = options
 
     
-    def calculate_returns(self, prices: list) -> list:
-        """Calculate daily percentage returns"""
-        if len(prices) < 2:
-            return []
-        
-        returns = []
-        for i in range(1, len(prices)):
-            prev_close = prices[i-1].get('close', 0)
-            curr_close = prices[i].get('close', 0)
-            if prev_close > 0:
-                ret = (curr_close - prev_close) / prev_close * 100
-                returns.append(ret)
-            else:
-                returns.append(0)
-        return returns
-    
-    def calculate_skewness(self, data: list) -> float:
-        """Calculate skewness of a dataset"""
-        if len(data) < 3:
-            return 0
-            
-        n = len(data)
-        mean = sum(data) / n
-        std = math.sqrt(sum((x - mean) ** 2 for x in data) / (n - 1)) if n > 1 else 0
-        
-        if std == 0:
-            return 0
-            
-        # Calculate skewness
-        skew = sum(((x - mean) / std) ** 3 for x in data) * n / ((n - 1) * (n - 2))
-        return skew
-    
-    def calculate_kurtosis(self, data: list) -> float:
-        """Calculate kurtosis of a dataset"""
-        if len(data) < 4:
-            return 3  # Normal distribution kurtosis
-            
-        n = len(data)
-        mean = sum(data) / n
-        std = math.sqrt(sum((x - mean) ** 2 for x in data) / (n - 1)) if n > 1 else 0
-        
-        if std == 0:
-            return 3
-            
-        # Calculate kurtosis
-        kurt = sum(((x - mean) / std) ** 4 for x in data) * n * (n + 1) / ((n - 1) * (n - 2) * (n - 3)) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
-        return kurt
-    
-    def calculate_hurst_exponent(self, prices: list, max_lag: int = 20) -> float:
+    def calculate_hurst_exponent(self, frame: PriceFrame, max_lag: int = 20, method: str = 'variance') -> float:
         """Calculate Hurst Exponent to determine long-term memory of time series
         H < 0.5: Mean reverting series
         H = 0.5: Random walk
         H > 0.5: Trending series
         """
-        if len(prices) < max_lag * 2:
+        if len(frame) < max_lag * 2:
             return 0.5  # Default to random walk
         
-        closes = [price.get('close', 0) for price in prices if price.get('close')]
-        if len(closes) < max_lag * 2:
-            return 0.5  # Default to random walk
-        
-        # Simplified Hurst exponent calculation
-        lags = range(2, min(max_lag, len(closes) // 4))
-        if len(lags) < 2:
-            return 0.5
-            
-        # Calculate tau values
-        tau = []
-        for lag in lags:
-            if lag < len(closes):
-                diffs = [abs(closes[i] - closes[i-lag]) for i in range(lag, len(closes))]
-                if diffs:
-                    std_dev = math.sqrt(sum((x - sum(diffs)/len(diffs))**2 for x in diffs) / (len(diffs) - 1)) if len(diffs) > 1 else 0
-                    if std_dev > 0:
-                        tau.append(max(1e-8, std_dev))
-                    else:
-                        tau.append(1e-8)
-                else:
-                    tau.append(1e-8)
-            else:
-                tau.append(1e-8)
-        
-        # Estimate Hurst exponent from log-log regression
-        if len(lags) >= 2 and len(tau) >= 2:
-            log_lags = [math.log(lag) for lag in lags if lag > 0]
-            log_tau = [math.log(t) for t in tau if t > 0]
-            
-            if len(log_lags) >= 2 and len(log_tau) >= 2:
-                # Simple linear regression to estimate slope (Hurst exponent)
-                n = min(len(log_lags), len(log_tau))
-                if n >= 2:
-                    sum_x = sum(log_lags[:n])
-                    sum_y = sum(log_tau[:n])
-                    sum_xy = sum(log_lags[i] * log_tau[i] for i in range(n))
-                    sum_xx = sum(log_lags[i] ** 2 for i in range(n))
-                    
-                    denominator = n * sum_xx - sum_x ** 2
-                    if abs(denominator) > 1e-10:  # Avoid division by zero
-                        hurst = (n * sum_xy - sum_x * sum_y) / denominator
-                        return max(0, min(1, hurst))  # Clamp between 0 and 1
-        
-        return 0.5  # Default to random walk
+        return hurst_exponent(frame.present('close'), method, max_lag)
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def calculate_rolling_hurst(self, frame: PriceFrame, window: int = 126) -> np.ndarray:
+        """Calculate Hurst Exponent series over a rolling window of closes"""
+        return rolling_hurst(frame.present('close'), window)
+    
+    def analyze(self, frame: PriceFrame) -> dict[str, any]:
         """Analyze statistical arbitrage signals based on price action analysis."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 63:  # Need at least 63 days for statistical analysis
+        if len(frame) < 63:  # Need at least 63 days for statistical analysis
             result["details"].append('Insufficient price data for statistical arbitrage analysis (need at least 63 days)')
             return result
 
         # Calculate returns
-        returns = self.calculate_returns(prices)
+        returns = frame.returns()
         if len(returns) < 63:
             result["details"].append('Insufficient return data for statistical arbitrage analysis')
             return result
         
         # Calculate price distribution statistics
         # Skewness and kurtosis (63-day window)
-        skew = self.calculate_skewness(returns[-63:]) if len(returns) >= 63 else 0
-        kurt = self.calculate_kurtosis(returns[-63:]) if len(returns) >= 63 else 3
+        return_stats = RollingWindow(returns, 63)
+        skew = last(return_stats.skew())
+        kurt = last(return_stats.kurt(), default=3)
         
         # Test for mean reversion using Hurst exponent
-        hurst = self.calculate_hurst_exponent(prices)
+        hurst = self.calculate_hurst_exponent(frame)
+        hurst_rs = self.calculate_hurst_exponent(frame, method='rescaled_range')
+        hurst_dfa = self.calculate_hurst_exponent(frame, method='dfa')
+        
+        # Hurst regime over time, now and 63 days ago (126-day rolling window)
+        rolling = self.calculate_rolling_hurst(frame, 126)
+        hurst_recent = last(rolling, default=None)
+        hurst_prior = last(rolling, default=None, offset=64)
         
         # Store indicators
         result["indicators"] = {
             "hurst_exponent": hurst,
+            "hurst_rescaled_range": hurst_rs,
+            "hurst_dfa": hurst_dfa,
+            "rolling_hurst_126d": hurst_recent,
+            "rolling_hurst_126d_63d_ago": hurst_prior,
             "skewness": skew,
             "kurtosis": kurt
         }
@@ -164,6 +92,13 @@ class StatisticalArbitrageAnalysis():
         else:
             reasoning.append(f"Random walk characteristics (Hurst: {hurst:.3f})")
         
+        # Hurst regime change
+        if hurst_recent is not None and hurst_prior is not None:
+            if hurst_prior >= 0.5 > hurst_recent:
+                reasoning.append(f"Hurst regime shifted from trending to mean reverting ({hurst_prior:.3f} -> {hurst_recent:.3f}, 126-day rolling)")
+            elif hurst_prior < 0.5 <= hurst_recent:
+                reasoning.append(f"Hurst regime shifted from mean reverting to trending ({hurst_prior:.3f} -> {hurst_recent:.3f}, 126-day rolling)")
+        
         # Skewness analysis
         if skew > 2:
             score += 1  # Positive skew - more positive outliers
@@ -200,21 +135,15 @@ class StatisticalArbitrageAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_price_frame(get_input(state, 'prices'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'statistical_arbitrage_analysis'
         analysis['title'] = f'Statistical Arbitrage Analysis'
 
-        analysis_data['statistical_arbitrage_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'statistical_arbitrage_analysis': analysis},
             "messages": [
                 ai_message
             ]
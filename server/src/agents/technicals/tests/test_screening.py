@@ -0,0 +1,86 @@
+"""
+The screening scores are hand vectorized copies of the rules of the technical analysis modules,
+these tests fail when a module rule and its copy drift apart.
+"""
+
+import numpy as np
+import pytest
+
+from agents.technicals import screening
+from agents.technicals.mean_reversion_analysis import MeanReversionAnalysis
+from agents.technicals.momentum_analysis import MomentumAnalysis
+from agents.technicals.statistical_arbitrage_analysis import StatisticalArbitrageAnalysis
+from agents.technicals.trend_analysis import TrendAnalysis
+from agents.technicals.volatility_analysis import VolatilityAnalysis
+from common.indicators import compute_indicators
+from common.price_frame import PriceFrame
+from common.price_matrix import PriceMatrix
+
+DATES = np.arange(np.datetime64('2020-01-01'), np.datetime64('2021-06-01'))
+
+
+def _prices(rng: np.random.Generator, length: int, dates: np.ndarray = DATES) -> list[dict]:
+    # drift and volatility regimes spread the tickers over the branches of the rules
+    drift = rng.normal(0, 0.003)
+    volatility = rng.uniform(0.005, 0.04)
+    close = 50 * np.exp(np.cumsum(rng.normal(drift, volatility, length)))
+    high = close * (1 + rng.uniform(0, 0.02, length))
+    low = close * (1 - rng.uniform(0, 0.02, length))
+    volume = rng.integers(1000, 5000, length).astype(float)
+    return [
+        {'date': str(date), 'open': float(c), 'high': float(h), 'low': float(l), 'close': float(c), 'volume': float(v)}
+        for date, c, h, l, v in zip(dates[-length:], close, high, low, volume)
+    ]
+
+
+def _module_scores(prices: list[dict]) -> dict[str, float]:
+    frame = PriceFrame.from_prices(prices)
+    indicators = compute_indicators(frame).latest()
+    return {
+        'trend_analysis': TrendAnalysis({}).analyze(frame, indicators)['score'],
+        'mean_reversion_analysis': MeanReversionAnalysis({}).analyze(frame, indicators)['score'],
+        'momentum_analysis': MomentumAnalysis({}).analyze(frame)['score'],
+        'volatility_analysis': VolatilityAnalysis({}).analyze(frame, indicators)['score'],
+        'statistical_arbitrage_analysis': StatisticalArbitrageAnalysis({}).analyze(frame)['score'],
+    }
+
+
+def _assert_parity(prices: dict[str, list[dict]]):
+    ranked = screening.screen(PriceMatrix.from_prices(prices))
+    assert len(ranked) == len(prices)
+    for entry in ranked:
+        expected = _module_scores(prices[entry['symbol']])
+        assert entry['scores'] == pytest.approx(expected, abs=1e-9), entry['symbol']
+        assert entry['total_score'] == pytest.approx(sum(expected.values()), abs=1e-9)
+    totals = [entry['total_score'] for entry in ranked]
+    assert totals == sorted(totals, reverse=True)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_scores_match_the_modules_on_complete_histories(seed):
+    rng = np.random.default_rng(seed)
+    _assert_parity({f'T{i}': _prices(rng, len(DATES)) for i in range(100)})
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_scores_match_the_modules_on_ragged_histories(seed):
+    # listed at different dates, some too short for part of the analyses
+    rng = np.random.default_rng(100 + seed)
+    _assert_parity({f'T{i}': _prices(rng, int(rng.integers(30, len(DATES)))) for i in range(40)})
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_scores_match_the_modules_on_different_calendars(seed):
+    # weekday markets with their own holidays, and a market trading every day
+    rng = np.random.default_rng(200 + seed)
+    weekdays = DATES[np.is_busday(DATES)]
+    calendars = [DATES] + [np.sort(rng.choice(weekdays, len(weekdays) - holidays, replace=False)) for holidays in (5, 12, 20)]
+    prices = {}
+    for i in range(40):
+        dates = calendars[i % len(calendars)]
+        prices[f'T{i}'] = _prices(rng, int(rng.integers(30, len(dates))), dates)
+    _assert_parity(prices)
+
+
+def test_empty_matrix():
+    assert screening.screen(PriceMatrix.from_prices({})) == []
@@ -1,119 +1,56 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.price_frame import PriceFrame, get_price_frame
+from common.indicator_state import get_state_indicators
+from common.indicators import DMI_PERIOD, Indicators, directional_movement
 from langgraph.types import StreamWriter
-import math
+import numpy as np
 
 
 class TrendAnalysis():
+    """
+    options:
+        include_series: add the ADX, +DI and -DI series of all the bars to the analysis, for charting
+    """
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
     
-    def calculate_ema(self, prices: list, period: int) -> float:
-        """Calculate Exponential Moving Average"""
-        if len(prices) < period:
-            return 0
-        
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
-        if len(closes) < period:
-            return 0
-            
-        # Simple EMA calculation
-        multiplier = 2 / (period + 1)
-        ema = closes[0]
-        for i in range(1, len(closes)):
-            ema = (closes[i] * multiplier) + (ema * (1 - multiplier))
-        return ema
+    def calculate_adx(self, frame: PriceFrame, period: int = DMI_PERIOD) -> Indicators:
+        """Calculate ADX, +DI and -DI series (Wilder smoothing) aligned with the rows, NaN on the rows without a close"""
+        return directional_movement(frame, period)
     
-    def calculate_adx(self, prices: list, period: int = 14) -> dict:
-        """Calculate Average Directional Index (simplified version)"""
-        if len(prices) < period + 1:
-            return {"adx": 0, "+di": 0, "-di": 0}
-        
-        # Simplified ADX calculation
-        closes = [price.get('close', 0) for price in prices[-(period+1):] if price.get('close')]
-        highs = [price.get('high', 0) for price in prices[-(period+1):] if price.get('high')]
-        lows = [price.get('low', 0) for price in prices[-(period+1):] if price.get('low')]
-        
-        if len(closes) < period + 1:
-            return {"adx": 0, "+di": 0, "-di": 0}
-        
-        # Calculate True Range and Directional Movement (simplified)
-        tr_values = []
-        plus_dm_values = []
-        minus_dm_values = []
-        
-        for i in range(1, len(closes)):
-            high = highs[i]
-            low = lows[i]
-            prev_close = closes[i-1]
-            prev_high = highs[i-1]
-            prev_low = lows[i-1]
-            
-            # True Range
-            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-            tr_values.append(tr)
-            
-            # Directional Movement
-            up_move = high - prev_high
-            down_move = prev_low - low
-            
-            if up_move > down_move and up_move > 0:
-                plus_dm = up_move
-                minus_dm = 0
-            elif down_move > up_move and down_move > 0:
-                plus_dm = 0
-                minus_dm = down_move
-            else:
-                plus_dm = 0
-                minus_dm = 0
-                
-            plus_dm_values.append(plus_dm)
-            minus_dm_values.append(minus_dm)
-        
-        if len(tr_values) == 0:
-            return {"adx": 0, "+di": 0, "-di": 0}
-        
-        # Calculate averages
-        avg_tr = sum(tr_values) / len(tr_values)
-        avg_plus_dm = sum(plus_dm_values) / len(plus_dm_values)
-        avg_minus_dm = sum(minus_dm_values) / len(minus_dm_values)
-        
-        if avg_tr == 0:
-            return {"adx": 0, "+di": 0, "-di": 0}
-        
-        # Calculate DI+/DI-
-        plus_di = 100 * (avg_plus_dm / avg_tr)
-        minus_di = 100 * (avg_minus_dm / avg_tr)
-        
-        # Calculate DX
-        dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di) if (plus_di + minus_di) != 0 else 0
-        
-        # ADX is smoothed DX
-        adx = dx  # Simplified - in reality, this would be smoothed over multiple periods
-        
-        return {"adx": adx, "+di": plus_di, "-di": minus_di}
+    def get_adx_series(self, frame: PriceFrame, period: int = DMI_PERIOD) -> dict[str, list]:
+        """ADX, +DI and -DI series with the dates of the rows, None where there is no value"""
+        dmi = self.calculate_adx(frame, period)
+        series = {"date": [str(date) if not np.isnat(date) else None for date in frame.date]}
+        for name in ("adx", "plus_di", "minus_di"):
+            values = np.round(dmi[f'{name}_{period}'], 2)
+            series[name] = [None if np.isnan(value) else float(value) for value in values]
+        return series
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, frame: PriceFrame, indicators: dict) -> dict[str, any]:
         """Analyze trend following strategy using multiple timeframes and indicators."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 55:
+        if len(frame) < 55:
             result["details"].append('Insufficient price data for trend analysis (need at least 55 days)')
             return result
 
-        # Calculate EMAs for multiple timeframes
-        ema_8 = self.calculate_ema(prices, 8)
-        ema_21 = self.calculate_ema(prices, 21)
-        ema_55 = self.calculate_ema(prices, 55)
+        # EMAs for multiple timeframes
+        ema_8 = indicators.get('ema_8') or 0
+        ema_21 = indicators.get('ema_21') or 0
+        ema_55 = indicators.get('ema_55') or 0
         
-        # Calculate ADX for trend strength
-        adx_data = self.calculate_adx(prices, 14)
-        adx = adx_data["adx"]
+        # ADX (Wilder smoothing) for trend strength
+        adx = indicators.get('adx_14') or 0
+        plus_di = indicators.get('plus_di_14') or 0
+        minus_di = indicators.get('minus_di_14') or 0
         
         # Store indicators
         result["indicators"] = {
@@ -121,12 +58,12 @@ class TrendAnalysis():
             "ema_21": ema_21,
             "ema_55": ema_55,
             "adx": adx,
-            "plus_di": adx_data["+di"],
-            "minus_di": adx_data["-di"]
+            "plus_di": plus_di,
+            "minus_di": minus_di
         }
         
         # Determine trend direction and strength
-        current_price = prices[-1].get('close', 0) if prices else 0
+        current_price = frame.latest('close')
         short_trend = ema_8 > ema_21 if ema_8 > 0 and ema_21 > 0 else False
         medium_trend = ema_21 > ema_55 if ema_21 > 0 and ema_55 > 0 else False
         
@@ -174,6 +111,8 @@ class TrendAnalysis():
         
         result["score"] = max(0, min(10, score))  # Clamp between 0-10
         result["details"] = reasoning
+        if self.options.get("include_series"):
+            result["series"] = self.get_adx_series(frame)
         return result
 
     def get_markdown(self, analysis:dict):
@@ -183,21 +122,15 @@ class TrendAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_price_frame(get_input(state, 'prices'))
+        analysis = self.analyze(frame, get_state_indicators(state))
         analysis['type'] = 'trend_analysis'
         analysis['title'] = f'Trend Analysis'
 
-        analysis_data['trend_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'trend_analysis': analysis},
             "messages": [
                 ai_message
             ]
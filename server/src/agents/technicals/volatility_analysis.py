@@ -1,12 +1,17 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.price_frame import PriceFrame, get_price_frame
+from common.rolling import RollingWindow, last, shift
+from common.indicator_state import get_state_indicators
 from langgraph.types import StreamWriter
 import math
+import numpy as np
 
 
 class VolatilityAnalysis():
@@ -14,95 +19,57 @@ class VolatilityAnalysis():
         self.options = options
 
     
-    def calculate_returns(self, prices: list) -> list:
-        """Calculate daily percentage returns"""
-        if len(prices) < 2:
-            return []
-        
-        returns = []
-        for i in range(1, len(prices)):
-            prev_close = prices[i-1].get('close', 0)
-            curr_close = prices[i].get('close', 0)
-            if prev_close > 0:
-                ret = (curr_close - prev_close) / prev_close * 100
-                returns.append(ret)
-            else:
-                returns.append(0)
-        return returns
-    
-    def calculate_std(self, data: list) -> float:
-        """Calculate Standard Deviation"""
-        if len(data) < 2:
-            return 0
-            
-        mean = sum(data) / len(data)
-        variance = sum((x - mean) ** 2 for x in data) / (len(data) - 1)
-        return math.sqrt(variance)
+    def calculate_volatility(self, returns: np.ndarray, period: int) -> np.ndarray:
+        """Calculate historical volatility series (sample standard deviation of returns over the period)"""
+        return RollingWindow(returns, period).std(ddof=1)
     
-    def calculate_atr(self, prices: list, period: int = 14) -> float:
-        """Calculate Average True Range"""
-        if len(prices) < period + 1:
-            return 0
-        
-        tr_values = []
-        for i in range(1, len(prices)):
-            high = prices[i].get('high', 0)
-            low = prices[i].get('low', 0)
-            prev_close = prices[i-1].get('close', 0)
-            
-            # True Range
-            tr1 = high - low
-            tr2 = abs(high - prev_close)
-            tr3 = abs(low - prev_close)
-            tr = max(tr1, tr2, tr3)
-            tr_values.append(tr)
-        
-        if len(tr_values) < period:
-            return 0
-            
-        # Simple moving average of TR values
-        atr = sum(tr_values[-period:]) / period
-        return atr
+    def calculate_volatility_z_scores(self, volatility: np.ndarray, lookback: int = 63) -> np.ndarray:
+        """Calculate z-score series of volatility against its previous `lookback` values"""
+        baseline = RollingWindow(volatility, lookback)
+        # statistics of the window ending the day before
+        mean = shift(baseline.mean())
+        std = shift(baseline.std(ddof=1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = (volatility - mean) / std
+        return np.where(std > 0, z_scores, np.where(np.isnan(std), np.nan, 0.0))
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, frame: PriceFrame, indicators: dict) -> dict[str, any]:
         """Analyze volatility-based trading strategy."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 63:  # Need at least 63 days for volatility analysis
+        if len(frame) < 63:  # Need at least 63 days for volatility analysis
             result["details"].append('Insufficient price data for volatility analysis (need at least 63 days)')
             return result
 
         # Calculate returns
-        returns = self.calculate_returns(prices)
+        returns = frame.returns()
         if len(returns) < 21:
             result["details"].append('Insufficient return data for volatility analysis')
             return result
         
         # Calculate various volatility metrics
+        vol_21 = self.calculate_volatility(returns, 21)
+        vol_63 = self.calculate_volatility(returns, 63)
         # Historical volatility (21-day)
-        hist_vol_21 = self.calculate_std(returns[-21:]) if len(returns) >= 21 else 0
+        hist_vol_21 = last(vol_21)
         # Historical volatility (63-day)
-        hist_vol_63 = self.calculate_std(returns[-63:]) if len(returns) >= 63 else 0
+        hist_vol_63 = last(vol_63)
         
         # Annualized volatility
         annualized_vol = hist_vol_21 * math.sqrt(252) if hist_vol_21 > 0 else 0
         
         # Volatility regime detection
         if len(returns) >= 84:  # Need 84 days for 63-day MA + 21-day current
-            vol_ma_63 = self.calculate_std(returns[-84:-21]) if len(returns) >= 84 else 0
+            vol_ma_63 = last(vol_63, offset=22)
             vol_regime = hist_vol_21 / vol_ma_63 if vol_ma_63 > 0 else 1
         else:
             vol_regime = 1
         
-        # Volatility mean reversion (z-score)
-        if len(returns) >= 84:
-            vol_std_63 = self.calculate_std([self.calculate_std(returns[i:i+21]) for i in range(len(returns)-84, len(returns)-21, 1)]) if len(returns) >= 84 else 0
-            vol_z_score = (hist_vol_21 - (sum([self.calculate_std(returns[i:i+21]) for i in range(len(returns)-84, len(returns)-21, 1)]) / 63)) / vol_std_63 if vol_std_63 > 0 else 0
-        else:
-            vol_z_score = 0
+        # Volatility mean reversion (z-score of the 21-day volatility against the prior 63 days)
+        vol_z_score = last(self.calculate_volatility_z_scores(vol_21, 63))
         
-        # ATR ratio
-        atr = self.calculate_atr(prices, 14)
-        current_price = prices[-1].get('close', 0) if prices else 0
+        # ATR (Wilder smoothing) ratio
+        atr = indicators.get('atr_14') or 0
+        current_price = frame.latest('close')
         atr_ratio = atr / current_price if current_price > 0 and atr > 0 else 0
         
         # Store indicators
@@ -150,8 +117,8 @@ class VolatilityAnalysis():
         
         # Volatility trend
         if len(returns) >= 42:
-            recent_vol = self.calculate_std(returns[-21:])  # Last 21 days
-            prior_vol = self.calculate_std(returns[-42:-21])  # Prior 21 days
+            recent_vol = hist_vol_21  # Last 21 days
+            prior_vol = last(vol_21, offset=22)  # Prior 21 days
             if recent_vol > prior_vol * 1.2:
                 score -= 0.5  # Volatility increasing
                 reasoning.append(f"Volatility increasing rapidly")
@@ -170,21 +137,15 @@ class VolatilityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_price_frame(get_input(state, 'prices'))
+        analysis = self.analyze(frame, get_state_indicators(state))
         analysis['type'] = 'volatility_analysis'
         analysis['title'] = f'Volatility Analysis'
 
-        analysis_data['volatility_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'volatility_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents import agent
+
+
+class SubGraph():
+    """
+    Analysis sub-graph answering after a delay, recording which tasks started and finished.
+    """
+    def __init__(self, delays: dict[str, float], events: list, error: str | None = None):
+        self.delays = delays
+        self.events = events
+        self.error = error
+
+    async def ainvoke(self, state: dict, config: dict) -> dict:
+        symbol = state['context']['current_task']['ticker']['symbol']
+        self.events.append(('start', symbol))
+        await asyncio.sleep(self.delays[symbol])
+        if symbol == self.error:
+            raise ValueError('no data')
+        self.events.append(('done', symbol))
+        return {'messages': state['messages'] + [AIMessage(content=symbol)]}
+
+
+def _state(symbols: list[str], concurrency: int = 4) -> dict:
+    return {
+        'messages': [HumanMessage(content='@technicals ' + ' '.join(symbols))],
+        'context': {
+            'tasks': [{'agent': 'technicals', 'ticker': {'symbol': symbol}} for symbol in symbols],
+            'concurrency': concurrency,
+            'data_plans': {},
+        },
+    }
+
+
+def test_completed_prefixes_are_written_in_task_order(monkeypatch):
+    events = []
+    monkeypatch.setitem(agent.analysis_agents, 'technicals', SubGraph({'AAPL': 0.05, 'MSFT': 0.01, 'NVDA': 0.02}, events))
+
+    def writer(chunk: dict):
+        events.append(('write', chunk['task']['ticker']['symbol']))
+
+    result = asyncio.run(agent.analysis_tasks(_state(['AAPL', 'MSFT', 'NVDA']), {}, writer))
+    assert [message.content for message in result['messages']] == ['AAPL', 'MSFT', 'NVDA']
+    writes = [event for event in events if event[0] == 'write']
+    assert writes == [('write', 'AAPL'), ('write', 'MSFT'), ('write', 'NVDA')]
+    # the later tasks ran concurrently and finished first, they are written once AAPL is done
+    assert events.index(('done', 'MSFT')) < events.index(('done', 'AAPL')) < events.index(('write', 'AAPL'))
+
+
+def test_failed_task_is_reported_next_to_the_other_results(monkeypatch):
+    monkeypatch.setitem(agent.analysis_agents, 'technicals', SubGraph({'AAPL': 0.01, 'MSFT': 0, 'NVDA': 0.02}, [], error='MSFT'))
+    written = []
+    result = asyncio.run(agent.analysis_tasks(_state(['AAPL', 'MSFT', 'NVDA']), {}, written.append))
+    contents = [message.content for message in result['messages']]
+    assert contents[0] == 'AAPL' and contents[2] == 'NVDA'
+    assert 'MSFT' in contents[1] and 'no data' in contents[1]
+    assert [chunk['messages'] for chunk in written] == [[message] for message in result['messages']]
+
+
+def test_cancelled_run_cancels_the_pending_tasks(monkeypatch):
+    events = []
+    monkeypatch.setitem(agent.analysis_agents, 'technicals', SubGraph({'AAPL': 10, 'MSFT': 10}, events))
+
+    async def run():
+        node = asyncio.create_task(agent.analysis_tasks(_state(['AAPL', 'MSFT']), {}, lambda chunk: None))
+        await asyncio.sleep(0.01)
+        node.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await node
+        # nothing is left running after the node
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(run())
+    assert events == [('start', 'AAPL'), ('start', 'MSFT')]
@@ -3,17 +3,22 @@ This is the main entry point for the trading agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
+import asyncio
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain_core.messages import AIMessage
 from langchain_core.runnables import RunnableConfig
 from llm.llm_model import ainvoke
-from langgraph.graph import END, StateGraph
 
 from nodes.next_step_suggestions import NextStepSuggestions
 
 from common import markdown
-from common.dataset import Dataset
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.analysis_graph import build_analysis_graph
+from common.data_bundle import DataRequirements
+from common.price_frame import get_price_frame
 
 # Import technical analysis module
 from agents.trading.technical_analysis import TechnicalAnalysis
@@ -21,7 +26,24 @@ from agents.trading.technical_analysis import TechnicalAnalysis
 next_step_suggestions_node = NextStepSuggestions({})
 
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'yearly': [
+            "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio",
+            "return_on_invested_capital", "asset_turnover", "market_cap", "capital_expenditure",
+            "depreciation_and_amortization", "net_income", "ordinary_shares_number",
+            "total_assets", "total_liabilities", "stockholders_equity",
+            "dividends_and_other_cash_distributions", "issuance_or_purchase_of_equity_shares",
+            "gross_profit", "revenue", "free_cash_flow", "gross_margin"
+        ],
+    },
+    price_days=200,
+    news=True,
+    insider_transactions=True,
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
 
@@ -30,59 +52,36 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Create dataset client
-    dataset_client = Dataset(config)
+    dataset_client = AsyncDataset(config)
     
     # Get market data for technical analysis (last 200 days)
-    start_date = time.strftime("%Y-%m-%d", time.localtime(time.time() - 200*24*60*60))
-    prices = dataset_client.get_prices(ticker.get('symbol'), start_date, end_date)
-    
-    # Get financial metrics
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio", 
-        "return_on_invested_capital", "asset_turnover", "market_cap",
-        "capital_expenditure",
-        "depreciation_and_amortization",
-        "net_income",
-        "ordinary_shares_number",
-        "total_assets",
-        "total_liabilities", 
-        "stockholders_equity",
-        "dividends_and_other_cash_distributions",
-        "issuance_or_purchase_of_equity_shares",
-        "gross_profit",
-        "revenue",
-        "free_cash_flow",
-        "gross_margin"
-    ], end_date, period="yearly")
-    
-    # Get news data
-    news = dataset_client.get_news(ticker.get('symbol'), end_date)
-    
-    # Get insider transactions
-    insider_transactions = dataset_client.get_insider_transactions(ticker.get('symbol'), end_date)
-    
-    context['prices'] = prices
-    context['metrics'] = metrics
-    context['news'] = news
-    context['insider_transactions'] = insider_transactions
+    start_date = data_bundle.get_price_start_date(end_date, DATA_REQUIREMENTS.price_days)
+    # Get prices, financial metrics, news and insider transactions concurrently
+    prices, metrics, news, insider_transactions = await asyncio.gather(
+        data_bundle.get_prices(context, dataset_client, ticker.get('symbol'), start_date, end_date),
+        data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly"),
+        dataset_client.get_news(ticker.get('symbol'), end_date),
+        dataset_client.get_insider_transactions(ticker.get('symbol'), end_date),
+    )
     
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(prices=prices, metrics=metrics, news=news, insider_transactions=insider_transactions),
         'messages': [AIMessage(content=markdown.to_h2('Trading Analysis for '+ ticker.get('symbol')))]
     }
 
 
-async def market_analysis(state: AgentState, config: RunnableConfig):
+async def market_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    prices = context.get('prices', [])
-    metrics = context.get('metrics', [])
+    prices = input_store.get_input(state, 'prices', [])
+    metrics = input_store.get_input(state, 'metrics', [])
     
     # Perform technical analysis
+    frame = get_price_frame(prices)
     technical_analyzer = TechnicalAnalysis(config)
-    trend_analysis = technical_analyzer.analyze_trend(prices)
-    momentum_analysis = technical_analyzer.analyze_momentum(prices)
-    volatility_analysis = technical_analyzer.analyze_volatility(prices)
+    trend_analysis = technical_analyzer.analyze_trend(frame)
+    momentum_analysis = technical_analyzer.analyze_momentum(frame)
+    volatility_analysis = technical_analyzer.analyze_volatility(frame)
     
     # Prepare data for analysis
     price_data = ""
@@ -151,29 +150,27 @@ Volatility Analysis:
         ),
     ]
     
-    response = await ainvoke(messages, config)
-    
-    # Store analysis in context
-    analysis_data = context.get('analysis_data', {})
-    analysis_data['market_analysis'] = response.content
-    analysis_data['technical_analysis'] = {
-        'trend': trend_analysis,
-        'momentum': momentum_analysis,
-        'volatility': volatility_analysis
-    }
-    context['analysis_data'] = analysis_data
+    # runs at the same time as the other analyses, buffered so that their tokens do not interleave
+    response = await ainvoke(messages, config, stream=False)
     
     return {
         "messages": [response],
-        "context": context
+        "analysis_data": {
+            'market_analysis': response.content,
+            'technical_analysis': {
+                'trend': trend_analysis,
+                'momentum': momentum_analysis,
+                'volatility': volatility_analysis
+            },
+        }
     }
 
 
-async def sentiment_analysis(state: AgentState, config: RunnableConfig):
+async def sentiment_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    news = context.get('news', [])
-    insider_transactions = context.get('insider_transactions', [])
+    news = input_store.get_input(state, 'news', [])
+    insider_transactions = input_store.get_input(state, 'insider_transactions', [])
     
     # Prepare news data
     news_data = ""
@@ -221,23 +218,19 @@ async def sentiment_analysis(state: AgentState, config: RunnableConfig):
         ),
     ]
     
-    response = await ainvoke(messages, config)
-    
-    # Store analysis in context
-    analysis_data = context.get('analysis_data', {})
-    analysis_data['sentiment_analysis'] = response.content
-    context['analysis_data'] = analysis_data
+    # runs at the same time as the other analyses, buffered so that their tokens do not interleave
+    response = await ainvoke(messages, config, stream=False)
     
     return {
         "messages": [response],
-        "context": context
+        "analysis_data": {'sentiment_analysis': response.content}
     }
 
 
-async def risk_analysis(state: AgentState, config: RunnableConfig):
+async def risk_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    metrics = context.get('metrics', [])
+    metrics = input_store.get_input(state, 'metrics', [])
     
     metrics_data = ""
     if metrics and len(metrics) > 0:
@@ -273,23 +266,19 @@ async def risk_analysis(state: AgentState, config: RunnableConfig):
         ),
     ]
     
-    response = await ainvoke(messages, config)
-    
-    # Store analysis in context
-    analysis_data = context.get('analysis_data', {})
-    analysis_data['risk_analysis'] = response.content
-    context['analysis_data'] = analysis_data
+    # runs at the same time as the other analyses, buffered so that their tokens do not interleave
+    response = await ainvoke(messages, config, stream=False)
     
     return {
         "messages": [response],
-        "context": context
+        "analysis_data": {'risk_analysis': response.content}
     }
 
 
-async def generate_trading_signal(state: AgentState, config: RunnableConfig):
+async def generate_trading_signal(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data', {})
+    analysis_data = state.get('analysis_data') or {}
     
     market_analysis = analysis_data.get('market_analysis', '')
     sentiment_analysis = analysis_data.get('sentiment_analysis', '')
@@ -366,21 +355,15 @@ Volatility: {volatility.get('volatility', 'unknown')} (Bandwidth: {volatility.ge
     }
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-workflow.add_node("market_analysis", market_analysis)
-workflow.add_node("sentiment_analysis", sentiment_analysis)
-workflow.add_node("risk_analysis", risk_analysis)
-workflow.add_node("generate_trading_signal", generate_trading_signal)
-
-workflow.add_edge("start_analysis", "market_analysis")
-workflow.add_edge("market_analysis", "sentiment_analysis")
-workflow.add_edge("sentiment_analysis", "risk_analysis")
-workflow.add_edge("risk_analysis", "generate_trading_signal")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("generate_trading_signal")
-
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the market, sentiment and risk analyses run in parallel, each answer
+# shown whole as a message of its own, and the trading signal generated from their results streams
+# after them
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "market_analysis": market_analysis,
+        "sentiment_analysis": sentiment_analysis,
+        "risk_analysis": risk_analysis,
+    },
+    generate_trading_signal,
+)
@@ -1,8 +1,11 @@
 """Technical analysis module for calculating financial indicators."""
 
 from typing import Dict, Any
-import math
+import numpy as np
 from langchain_core.runnables import RunnableConfig
+from common import indicators
+from common.price_frame import PriceFrame
+from common.rolling import last
 
 
 class TechnicalAnalysis:
@@ -12,129 +15,55 @@ class TechnicalAnalysis:
         """Initialize TechnicalAnalysis."""
         self.config = config
     
-    def calculate_sma(self, prices: list, period: int) -> float:
+    def calculate_sma(self, frame: PriceFrame, period: int) -> float:
         """Calculate Simple Moving Average."""
-        if len(prices) < period:
-            return 0
-        
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
-        if len(closes) < period:
-            return 0
-            
-        return sum(closes) / len(closes)
+        return last(indicators.sma(frame.masked('close'), period))
     
-    def calculate_ema(self, prices: list, period: int) -> float:
+    def calculate_ema(self, frame: PriceFrame, period: int) -> float:
         """Calculate Exponential Moving Average."""
-        if len(prices) < period:
-            return 0
-        
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
-        if len(closes) < period:
-            return 0
-            
-        # Simple EMA calculation
-        multiplier = 2 / (period + 1)
-        ema = closes[0]
-        for i in range(1, len(closes)):
-            ema = (closes[i] * multiplier) + (ema * (1 - multiplier))
-        return ema
+        return last(indicators.ema(frame.present('close'), period))
     
-    def calculate_rsi(self, prices: list, period: int = 14) -> float:
-        """Calculate Relative Strength Index."""
-        if len(prices) < period + 1:
-            return 50  # Neutral RSI
-        
-        closes = [price.get('close', 0) for price in prices[-(period+1):] if price.get('close')]
-        if len(closes) < period + 1:
-            return 50
-        
-        # Calculate price changes
-        gains = []
-        losses = []
-        
-        for i in range(1, len(closes)):
-            change = closes[i] - closes[i-1]
-            if change > 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
-        
-        # Calculate average gains and losses
-        avg_gain = sum(gains) / len(gains)
-        avg_loss = sum(losses) / len(losses)
-        
-        if avg_loss == 0:
-            return 100  # No losses, perfect RSI
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+    def calculate_rsi(self, frame: PriceFrame, period: int = 14) -> float:
+        """Calculate Relative Strength Index (Wilder smoothing)."""
+        return last(indicators.rsi(frame.present('close'), period), default=50)  # Neutral RSI
     
-    def calculate_bollinger_bands(self, prices: list, period: int = 20) -> Dict[str, float]:
+    def calculate_bollinger_bands(self, frame: PriceFrame, period: int = 20) -> Dict[str, float]:
         """Calculate Bollinger Bands."""
-        if len(prices) < period:
-            return {"upper": 0, "middle": 0, "lower": 0}
-        
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
-        if len(closes) < period:
-            return {"upper": 0, "middle": 0, "lower": 0}
-            
-        # Calculate moving average
-        ma = sum(closes) / len(closes)
-        
-        # Calculate standard deviation
-        variance = sum((x - ma) ** 2 for x in closes) / len(closes)
-        std_dev = math.sqrt(variance)
-        
-        # Calculate bands
-        upper_band = ma + (2 * std_dev)
-        lower_band = ma - (2 * std_dev)
-        
+        upper, middle, lower = indicators.bollinger_bands(frame.masked('close'), period)
         return {
-            "upper": upper_band,
-            "middle": ma,
-            "lower": lower_band
+            "upper": last(upper),
+            "middle": last(middle),
+            "lower": last(lower)
         }
     
-    def calculate_macd(self, prices: list) -> Dict[str, float]:
-        """Calculate MACD (12-day EMA - 26-day EMA)."""
-        if len(prices) < 26:
+    def calculate_macd(self, frame: PriceFrame) -> Dict[str, float]:
+        """Calculate MACD (12-day EMA - 26-day EMA) and its 9-day EMA signal line."""
+        if len(frame) < 26:
             return {"macd": 0, "signal": 0, "histogram": 0}
         
-        # Calculate 12-day and 26-day EMAs
-        ema_12 = self.calculate_ema(prices, 12)
-        ema_26 = self.calculate_ema(prices, 26)
-        
-        # Calculate MACD line
-        macd_line = ema_12 - ema_26
-        
-        # Calculate signal line (9-day EMA of MACD line)
-        # For simplicity, we'll approximate this
-        signal_line = macd_line * 0.8  # Simplified approximation
-        
-        # Calculate histogram
-        histogram = macd_line - signal_line
+        macd, signal, _ = indicators.macd(frame.present('close'))
+        macd_line = last(macd)
+        # the signal line needs 9 more days, the MACD line stands for it until then
+        signal_line = last(signal, default=macd_line)
         
         return {
             "macd": macd_line,
             "signal": signal_line,
-            "histogram": histogram
+            "histogram": macd_line - signal_line
         }
     
-    def analyze_trend(self, prices: list) -> Dict[str, Any]:
+    def analyze_trend(self, frame: PriceFrame) -> Dict[str, Any]:
         """Analyze trend using multiple indicators."""
-        if not prices or len(prices) < 50:
+        if len(frame) < 50:
             return {"trend": "unknown", "strength": 0, "confidence": 0}
         
         # Calculate moving averages
-        sma_20 = self.calculate_sma(prices, 20)
-        sma_50 = self.calculate_sma(prices, 50)
-        ema_12 = self.calculate_ema(prices, 12)
-        ema_26 = self.calculate_ema(prices, 26)
+        sma_20 = self.calculate_sma(frame, 20)
+        sma_50 = self.calculate_sma(frame, 50)
+        ema_12 = self.calculate_ema(frame, 12)
+        ema_26 = self.calculate_ema(frame, 26)
         
-        current_price = prices[-1].get('close', 0)
+        current_price = frame.latest('close')
         
         # Determine trend direction
         trend = "neutral"
@@ -149,7 +78,7 @@ class TechnicalAnalysis:
             strength = abs(sma_20 - sma_50) / sma_50 * 100
         
         # Calculate confidence based on MACD
-        macd_data = self.calculate_macd(prices)
+        macd_data = self.calculate_macd(frame)
         macd = macd_data["macd"]
         signal = macd_data["signal"]
         
@@ -173,19 +102,19 @@ class TechnicalAnalysis:
             }
         }
     
-    def analyze_momentum(self, prices: list) -> Dict[str, Any]:
+    def analyze_momentum(self, frame: PriceFrame) -> Dict[str, Any]:
         """Analyze momentum using RSI and price changes."""
-        if not prices or len(prices) < 14:
+        if len(frame) < 14:
             return {"momentum": "unknown", "rsi": 50, "price_change": 0}
         
         # Calculate RSI
-        rsi = self.calculate_rsi(prices, 14)
+        rsi = self.calculate_rsi(frame, 14)
         
         # Calculate price change over last 14 days
         price_change = 0
-        if len(prices) >= 14:
-            current_price = prices[-1].get('close', 0)
-            past_price = prices[-14].get('close', current_price)
+        if len(frame) >= 14:
+            current_price = frame.latest('close')
+            past_price = float(frame.close[-14]) if not np.isnan(frame.close[-14]) else current_price
             if past_price > 0:
                 price_change = ((current_price / past_price) - 1) * 100
         
@@ -202,18 +131,18 @@ class TechnicalAnalysis:
             "price_change": price_change
         }
     
-    def analyze_volatility(self, prices: list) -> Dict[str, Any]:
+    def analyze_volatility(self, frame: PriceFrame) -> Dict[str, Any]:
         """Analyze volatility using Bollinger Bands."""
-        if not prices or len(prices) < 20:
+        if len(frame) < 20:
             return {"volatility": "unknown", "bandwidth": 0, "position": 0}
         
         # Calculate Bollinger Bands
-        bb = self.calculate_bollinger_bands(prices, 20)
+        bb = self.calculate_bollinger_bands(frame, 20)
         upper = bb["upper"]
         middle = bb["middle"]
         lower = bb["lower"]
         
-        current_price = prices[-1].get('close', middle)
+        current_price = frame.latest('close', middle)
         
         # Calculate bandwidth (volatility measure)
         bandwidth = 0
@@ -0,0 +1,42 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+
+from agents.trading import agent
+from common import input_store
+
+
+def test_parallel_analyses_are_buffered_and_the_signal_streams(monkeypatch):
+    calls = []
+
+    async def ainvoke(messages, config, stream=True, analyzer=False, **kwargs):
+        calls.append(stream)
+        return AIMessage(content=f'answer {len(calls)}', id=f'run-{len(calls)}')
+
+    monkeypatch.setattr(agent, 'ainvoke', ainvoke)
+
+    async def run() -> list:
+        inputs = await input_store.put_inputs(prices=[], metrics=[], news=[], insider_transactions=[])
+        state = {
+            'context': {'current_task': {'ticker': {'symbol': 'AAPL', 'short_name': 'Apple'}}},
+            'inputs': inputs,
+        }
+        outputs = await asyncio.gather(
+            agent.market_analysis(state, {}),
+            agent.sentiment_analysis(state, {}),
+            agent.risk_analysis(state, {}),
+        )
+        input_store.release(inputs.values())
+        return outputs
+
+    outputs = asyncio.run(run())
+    assert calls == [False, False, False]
+    # one whole message for each analysis
+    assert len({output['messages'][0].id for output in outputs}) == 3
+
+    state = {
+        'context': {'current_task': {'ticker': {'symbol': 'AAPL', 'short_name': 'Apple'}}},
+        'analysis_data': {key: value for output in outputs for key, value in output['analysis_data'].items()},
+    }
+    asyncio.run(agent.generate_trading_signal(state, {}))
+    assert calls[-1] is True
@@ -3,8 +3,10 @@ This is the main entry point for the valuation agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
+import asyncio
 import time
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.analysis_graph import build_analysis_graph
 from common.util import get_dict_json
 from langchain.tools import tool
 from langchain_core.messages import AIMessage, SystemMessage
@@ -27,7 +29,11 @@ from nodes.next_step_suggestions import NextStepSuggestions
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
-from common.dataset import Dataset
+from common import prompt_pack
+from common.dataset import AsyncDataset
+from common import data_bundle
+from common import input_store
+from common.data_bundle import DataRequirements
 
 next_step_suggestions_node = NextStepSuggestions({})
 dcf_analysis_node = DCFAnalysis({})
@@ -35,7 +41,22 @@ owner_earnings_analysis_node = OwnerEarningsAnalysis({})
 ev_ebitda_analysis_node = EVEBITDAAnalysis({})
 residual_income_analysis_node = ResidualIncomeAnalysis({})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
+# data used by the analysis, planned and prefetched together with the other scheduled agents
+DATA_REQUIREMENTS = DataRequirements(
+    financial_items={
+        'ttm': [
+            "free_cash_flow", "net_income", "depreciation_and_amortization", "capital_expenditure",
+            "working_capital", "enterprise_value", "enterprise_value_to_ebitda_ratio",
+            "market_cap", "book_value", "earnings_growth", "price_to_book_ratio",
+            "return_on_equity"
+        ],
+        'yearly': [
+            "enterprise_value_to_ebitda_ratio", "price_to_book_ratio", "return_on_equity"
+        ],
+    },
+)
+
+async def start_analysis(state: AnalysisState, config: RunnableConfig):
     
     end_date = state.get('action').get('parameters').get('end_date')
     end_date = end_date if end_date else time.strftime("%Y-%m-%d")
@@ -44,32 +65,22 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     ticker = context.get('current_task').get('ticker')
     
     # Get financial metrics for valuation analysis
-    dataset_client = Dataset(config)
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "free_cash_flow", "net_income", "depreciation_and_amortization", 
-        "capital_expenditure", "working_capital", "enterprise_value",
-        "enterprise_value_to_ebitda_ratio", "market_cap", "book_value",
-        "earnings_growth", "price_to_book_ratio", "return_on_equity"
-    ], end_date, period="ttm")
-    
-    context['metrics'] = metrics
-    
-    # Get additional historical data for median calculations
-    historical_metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "enterprise_value_to_ebitda_ratio", "price_to_book_ratio", "return_on_equity"
-    ], end_date, period="yearly")
-    
-    context['historical_metrics'] = historical_metrics
+    dataset_client = AsyncDataset(config)
+    # Get ttm metrics and additional historical data for median calculations concurrently
+    metrics, historical_metrics = await asyncio.gather(
+        data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['ttm'], end_date, period="ttm"),
+        data_bundle.get_financial_items(context, dataset_client, ticker.get('symbol'), DATA_REQUIREMENTS.financial_items['yearly'], end_date, period="yearly"),
+    )
     
     return {
-        'context': context,
+        'inputs': await input_store.put_inputs(metrics=metrics, historical_metrics=historical_metrics),
         'messages':[AIMessage(content=markdown.to_h2('Valuation Analysis for '+ ticker.get('symbol')))]
     }
 
-async def end_analysis(state: AgentState, config: RunnableConfig):
+async def end_analysis(state: AnalysisState, config: RunnableConfig):
     context = state.get('context')
     ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
+    analysis_data = dict(state.get('analysis_data'))
 
     # Calculate total score
     total_score = (
@@ -90,6 +101,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     analysis_data['total_score'] = total_score
     analysis_data['max_possible_score'] = max_possible_score
 
+    packed_analysis_data = prompt_pack.pack_analysis_data(analysis_data, 'valuation', config)
     messages = [
             (
                 "system",
@@ -131,7 +143,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 f"""Analyze this valuation opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
 
                 COMPREHENSIVE VALUATION ANALYSIS DATA:
-                {analysis_data}
+                {packed_analysis_data}
 
                 Please provide your investment decision in exactly this JSON format, notice to use 'AnalysisResult' before json:
                 ```AnalysisResult
@@ -155,7 +167,7 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 """,
             ),
         ]
-    response = await ainvoke(messages, config, analyzer=True)
+    response = await ainvoke(messages, config, analyzer=True, cache=True)
     
     return {
         "messages": response,
@@ -163,24 +175,14 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
     }
 
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
-workflow.add_node("start_analysis", start_analysis)
-
-workflow.add_node("dcf_analysis", dcf_analysis_node)
-workflow.add_node("owner_earnings_analysis", owner_earnings_analysis_node)
-workflow.add_node("ev_ebitda_analysis", ev_ebitda_analysis_node)
-workflow.add_node("residual_income_analysis", residual_income_analysis_node)
-
-workflow.add_node("end_analysis", end_analysis)
-
-workflow.add_edge("start_analysis", "dcf_analysis")
-workflow.add_edge("dcf_analysis", "owner_earnings_analysis")
-workflow.add_edge("owner_earnings_analysis", "ev_ebitda_analysis")
-workflow.add_edge("ev_ebitda_analysis", "residual_income_analysis")
-workflow.add_edge("residual_income_analysis", "end_analysis")
-
-workflow.set_entry_point("start_analysis")
-workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
-agent = workflow.compile()
\ No newline at end of file
+# Define the workflow graph, the analysis nodes run in parallel between start_analysis and end_analysis
+agent = build_analysis_graph(
+    start_analysis,
+    {
+        "dcf_analysis": dcf_analysis_node,
+        "owner_earnings_analysis": owner_earnings_analysis_node,
+        "ev_ebitda_analysis": ev_ebitda_analysis_node,
+        "residual_income_analysis": residual_income_analysis_node,
+    },
+    end_analysis,
+)
@@ -1,23 +1,23 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 import math
-from statistics import median
+import numpy as np
 
 class EVEBITDAAnalysis():
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
-    def calculate_ev_ebitda_value(self, financial_metrics: list):
+    def calculate_ev_ebitda_value(self, frame: FinancialsFrame, historical_frame: FinancialsFrame):
         """Implied equity value via median EV/EBITDA multiple."""
-        if not financial_metrics:
-            return 0
-        m0 = financial_metrics[0]
+        m0 = frame.latest_period()
         if not (m0.get('enterprise_value') and m0.get('enterprise_value_to_ebitda_ratio')):
             return 0
         if m0.get('enterprise_value_to_ebitda_ratio') == 0:
@@ -25,24 +25,28 @@ class EVEBITDAAnalysis():
 
         ebitda_now = m0.get('enterprise_value') / m0.get('enterprise_value_to_ebitda_ratio')
         # Get median multiple from historical data
-        ev_ebitda_ratios = [m.get('enterprise_value_to_ebitda_ratio') for m in financial_metrics if m.get('enterprise_value_to_ebitda_ratio')]
-        if not ev_ebitda_ratios:
+        ev_ebitda_ratios = np.concatenate([
+            frame.present('enterprise_value_to_ebitda_ratio'),
+            historical_frame.present('enterprise_value_to_ebitda_ratio'),
+        ])
+        ev_ebitda_ratios = ev_ebitda_ratios[ev_ebitda_ratios > 0]
+        if len(ev_ebitda_ratios) == 0:
             return 0
             
-        med_mult = median([r for r in ev_ebitda_ratios if r > 0])
+        med_mult = float(np.median(ev_ebitda_ratios))
         ev_implied = med_mult * ebitda_now
         net_debt = (m0.get('enterprise_value') or 0) - (m0.get('market_cap') or 0)
         return max(ev_implied - net_debt, 0)
 
-    def analyze(self, metrics: list, historical_metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, historical_frame: FinancialsFrame) -> dict[str, any]:
         """Analyze EV/EBITDA valuation."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not metrics or len(metrics) == 0:
+        if len(frame) == 0:
             result["details"].append('Insufficient financial data for EV/EBITDA analysis')
             return result
 
         # Get the most recent metrics
-        m0 = metrics[0] if metrics else None
+        m0 = frame.latest_period()
         if not m0:
             result["details"].append('No financial metrics available')
             return result
@@ -60,18 +64,19 @@ class EVEBITDAAnalysis():
         ebitda = enterprise_value / ev_ebitda_ratio
         
         # Get historical EV/EBITDA ratios for comparison
-        historical_ratios = [m.get('enterprise_value_to_ebitda_ratio') for m in historical_metrics if m.get('enterprise_value_to_ebitda_ratio') and m.get('enterprise_value_to_ebitda_ratio') > 0]
+        historical_ratios = historical_frame.present('enterprise_value_to_ebitda_ratio')
+        historical_ratios = historical_ratios[historical_ratios > 0]
         
-        if not historical_ratios:
+        if len(historical_ratios) == 0:
             result["details"].append('Insufficient historical data for EV/EBITDA analysis')
             return result
             
         # Calculate median and compare
-        median_ratio = median(historical_ratios)
+        median_ratio = float(np.median(historical_ratios))
         current_ratio = ev_ebitda_ratio
         
         # Calculate implied equity value using median multiple
-        implied_equity_value = self.calculate_ev_ebitda_value(metrics + historical_metrics)
+        implied_equity_value = self.calculate_ev_ebitda_value(frame, historical_frame)
         
         # Store indicators
         result["indicators"] = {
@@ -147,22 +152,16 @@ class EVEBITDAAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        historical_metrics = context.get('historical_metrics')
-        analysis = self.analyze(metrics, historical_metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        historical_frame = get_financials_frame(get_input(state, 'historical_metrics'))
+        analysis = self.analyze(frame, historical_frame)
         analysis['type'] = 'ev_ebitda_analysis'
         analysis['title'] = f'EV/EBITDA Analysis'
 
-        analysis_data['ev_ebitda_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'ev_ebitda_analysis': analysis},
             "messages": [
                 ai_message
             ]
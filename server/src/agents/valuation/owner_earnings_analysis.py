@@ -1,10 +1,12 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame
 from langgraph.types import StreamWriter
 import math
 
@@ -14,21 +16,14 @@ class OwnerEarningsAnalysis():
 
     def calculate_owner_earnings_value(
         self,
-        net_income: float,
-        depreciation: float,
-        capex: float,
-        working_capital_change: float,
+        owner_earnings: float,
         growth_rate: float = 0.05,
         required_return: float = 0.15,
         margin_of_safety: float = 0.25,
         num_years: int = 5,
     ) -> float:
         """Buffett owner-earnings valuation with margin-of-safety."""
-        if not all(isinstance(x, (int, float)) for x in [net_income, depreciation, capex, working_capital_change]):
-            return 0
-
-        owner_earnings = net_income + depreciation - capex - working_capital_change
-        if owner_earnings <= 0:
+        if owner_earnings is None or owner_earnings <= 0:
             return 0
 
         pv = 0.0
@@ -45,15 +40,15 @@ class OwnerEarningsAnalysis():
         intrinsic = pv + pv_term
         return intrinsic * (1 - margin_of_safety)
 
-    def analyze(self, metrics: list, historical_metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, derived: DerivedMetrics) -> dict[str, any]:
         """Analyze owner earnings valuation."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not metrics or len(metrics) == 0:
+        if len(frame) == 0:
             result["details"].append('Insufficient financial data for owner earnings analysis')
             return result
 
         # Get the most recent metrics
-        m0 = metrics[0] if metrics else None
+        m0 = frame.latest_period()
         if not m0:
             result["details"].append('No financial metrics available')
             return result
@@ -62,32 +57,22 @@ class OwnerEarningsAnalysis():
         net_income = m0.get('net_income')
         depreciation = m0.get('depreciation_and_amortization')
         capex = m0.get('capital_expenditure')
-        working_capital = m0.get('working_capital')
         market_cap = m0.get('market_cap')
         earnings_growth = m0.get('earnings_growth', 0.05)  # Default to 5%
         
-        # Calculate working capital change (need at least 2 periods)
-        working_capital_change = 0
-        if len(metrics) >= 2 and working_capital is not None:
-            working_capital_prev = metrics[1].get('working_capital')
-            if working_capital_prev is not None:
-                working_capital_change = working_capital - working_capital_prev
-
-        # Check if we have all required data
-        if not all(v is not None for v in [net_income, depreciation, capex, working_capital]):
+        # Calculate owner earnings, with the working capital change from the previous period
+        owner_earnings = derived.owner_earnings()
+        if owner_earnings is None:
             result["details"].append('Insufficient financial data for owner earnings calculation')
             return result
-
-        # Calculate owner earnings
-        owner_earnings = net_income + depreciation - capex - working_capital_change
+        working_capital_change = derived.working_capital_change()
         
         # Calculate intrinsic value using owner earnings
         # Use conservative assumptions
         growth_rate = min(earnings_growth, 0.10)  # Cap at 10%
         required_return = 0.15  # 15% required return
         intrinsic_value = self.calculate_owner_earnings_value(
-            net_income, depreciation, capex, working_capital_change,
-            growth_rate, required_return
+            owner_earnings, growth_rate, required_return
         )
 
         # Store indicators
@@ -172,22 +157,15 @@ class OwnerEarningsAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        historical_metrics = context.get('historical_metrics')
-        analysis = self.analyze(metrics, historical_metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        derived = get_derived_metrics(state, config, period='ttm')
+        analysis = self.analyze(derived.frame, derived)
         analysis['type'] = 'owner_earnings_analysis'
         analysis['title'] = f'Owner Earnings Analysis'
 
-        analysis_data['owner_earnings_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'owner_earnings_analysis': analysis},
             "messages": [
                 ai_message
             ]
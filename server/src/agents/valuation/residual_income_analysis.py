@@ -1,10 +1,12 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 import math
 
@@ -44,15 +46,15 @@ class ResidualIncomeAnalysis():
         intrinsic = book_val + pv_ri + pv_term
         return intrinsic * 0.8  # 20% margin of safety
 
-    def analyze(self, metrics: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze residual income valuation."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not metrics or len(metrics) == 0:
+        if len(frame) == 0:
             result["details"].append('Insufficient financial data for residual income analysis')
             return result
 
         # Get the most recent metrics
-        m0 = metrics[0] if metrics else None
+        m0 = frame.latest_period()
         if not m0:
             result["details"].append('No financial metrics available')
             return result
@@ -174,21 +176,15 @@ class ResidualIncomeAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'residual_income_analysis'
         analysis['title'] = f'Residual Income Analysis'
 
-        analysis_data['residual_income_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'residual_income_analysis': analysis},
             "messages": [
                 ai_message
             ]
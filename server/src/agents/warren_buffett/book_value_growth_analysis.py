@@ -1,11 +1,14 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 
 import time
+import numpy as np
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -14,7 +17,7 @@ class BookValueGrowthAnalysis():
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
-    def _calculate_book_value_cagr(self,book_values: list) -> tuple[int, str]:
+    def _calculate_book_value_cagr(self,book_values: np.ndarray) -> tuple[int, str]:
         """Helper function to safely calculate book value CAGR and return score + reasoning."""
         if len(book_values) < 2:
             return 0, "Insufficient data for CAGR calculation"
@@ -39,20 +42,16 @@ class BookValueGrowthAnalysis():
             return 0, "Unable to calculate meaningful book value CAGR due to negative values"
 
     
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """Analyze book value per share growth - a key Buffett metric."""
         result = {"score": 0, "max_score": 6, "details": []}
-        if len(financial_line_items) < 3:
+        if len(frame) < 3:
             result["details"].append("Insufficient data for book value analysis")
             return result
         
         # Extract book values per share
-        book_values = [
-            item.get('stockholders_equity') / item.get('ordinary_shares_number')
-            for item in financial_line_items
-            if hasattr(item, 'stockholders_equity') and hasattr(item, 'ordinary_shares_number')
-            and item.get('stockholders_equity') and item.get('ordinary_shares_number')
-        ]
+        book_values = frame.ratio('stockholders_equity', 'ordinary_shares_number')
+        book_values = book_values[~np.isnan(book_values) & (book_values != 0)]
         
         if len(book_values) < 3:
             result["details"].append("Insufficient book value data for growth analysis")
@@ -62,7 +61,7 @@ class BookValueGrowthAnalysis():
         reasoning = []
         
         # Analyze growth consistency
-        growth_periods = sum(1 for i in range(len(book_values) - 1) if book_values[i] > book_values[i + 1])
+        growth_periods = int((book_values[:-1] > book_values[1:]).sum())
         growth_rate = growth_periods / (len(book_values) - 1)
         
         # Score based on consistency
@@ -94,21 +93,15 @@ class BookValueGrowthAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'book_value_growth_analysis'
         analysis['title'] = 'Book value growth analysis'
 
-        analysis_data['book_value_growth_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'book_value_growth_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,4 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +6,8 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame
 from langgraph.types import StreamWriter
 
 
@@ -14,10 +16,10 @@ class ConsistencyAnalysis():
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame, derived: DerivedMetrics) -> dict[str, any]:
         """Analyze earnings consistency and growth."""
         result = {"score": 0, "max_score": 3, "details": []}
-        if len(financial_line_items) < 4:  # Need at least 4 periods for trend analysis
+        if len(frame) < 4:  # Need at least 4 periods for trend analysis
             result["details"].append("Insufficient historical data")
             return result
 
@@ -25,10 +27,10 @@ class ConsistencyAnalysis():
         reasoning = []
 
         # Check earnings growth trend
-        earnings_values = [item.get('net_income') for item in financial_line_items if item.get('net_income')]
+        earnings_values = derived.series('net_income', nonzero=True)
         if len(earnings_values) >= 4:
             # Simple check: is each period's earnings bigger than the next?
-            earnings_growth = all(earnings_values[i] > earnings_values[i + 1] for i in range(len(earnings_values) - 1))
+            earnings_growth = bool((earnings_values[:-1] > earnings_values[1:]).all())
 
             if earnings_growth:
                 score += 3
@@ -37,8 +39,8 @@ class ConsistencyAnalysis():
                 reasoning.append("Inconsistent earnings growth pattern")
 
             # Calculate total growth rate from oldest to latest
-            if len(earnings_values) >= 2 and earnings_values[-1] != 0:
-                growth_rate = (earnings_values[0] - earnings_values[-1]) / abs(earnings_values[-1])
+            growth_rate = derived.total_growth('net_income', nonzero=True)
+            if growth_rate is not None:
                 reasoning.append(f"Total earnings growth of {growth_rate:.1%} over past {len(earnings_values)} periods")
         else:
             reasoning.append("Insufficient earnings data for trend analysis")
@@ -54,21 +56,15 @@ class ConsistencyAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        derived = get_derived_metrics(state, config)
+        analysis = self.analyze(derived.frame, derived)
         analysis['type'] = 'consistency_analysis'
         analysis['title'] = 'Consistency analysis'
 
-        analysis_data['consistency_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'consistency_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,11 +1,14 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 
 import time
+import numpy as np
 from common import markdown
+from common.financials_frame import FinancialsFrame, cagr, get_financials_frame, ratio
 from langgraph.types import StreamWriter
 
 
@@ -14,32 +17,24 @@ class IntrinsicValueAnalysis():
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
-    def estimate_maintenance_capex(self, financial_line_items: list) -> float:
+    def estimate_maintenance_capex(self, frame: FinancialsFrame) -> float:
         """
         Estimate maintenance capital expenditure using multiple approaches.
         Buffett considers this crucial for understanding true owner earnings.
         """
-        if not financial_line_items:
+        if len(frame) == 0:
             return 0
         
         # Approach 1: Historical average as % of revenue
-        capex_ratios = []
-        depreciation_values = []
-        
-        for item in financial_line_items[:5]:  # Last 5 periods
-            if item.get('capital_expenditure') and item.get('revenue'):
-                if item.get('capital_expenditure') and item.get('revenue') and item.get('revenue') > 0:
-                    capex_ratio = abs(item.get('capital_expenditure')) / item.get('revenue')
-                    capex_ratios.append(capex_ratio)
-            
-            if item.get('depreciation_and_amortization') and item.get('depreciation_and_amortization'):
-                depreciation_values.append(item.get('depreciation_and_amortization'))
+        capex = frame.column('capital_expenditure')[:5]  # Last 5 periods
+        revenue = frame.column('revenue')[:5]
+        capex_ratios = ratio(np.abs(capex), revenue)[(capex != 0) & ~np.isnan(capex) & (revenue > 0)]
         
         # Approach 2: Percentage of depreciation (typically 80-120% for maintenance)
-        latest_depreciation = financial_line_items[0].get('depreciation_and_amortization') if financial_line_items[0].get('depreciation_and_amortization') else 0
+        latest_depreciation = frame.latest('depreciation_and_amortization') or 0
         
         # Approach 3: Industry-specific heuristics
-        latest_capex = abs(financial_line_items[0].get('capital_expenditure')) if financial_line_items[0].get('capital_expenditure') else 0
+        latest_capex = abs(frame.latest('capital_expenditure') or 0)
         
         # Conservative estimate: Use the higher of:
         # 1. 85% of total capex (assuming 15% is growth capex)
@@ -51,8 +46,8 @@ class IntrinsicValueAnalysis():
         
         # If we have historical data, use average capex ratio
         if len(capex_ratios) >= 3:
-            avg_capex_ratio = sum(capex_ratios) / len(capex_ratios)
-            latest_revenue = financial_line_items[0].get('revenue') if financial_line_items[0].get('revenue') else 0
+            avg_capex_ratio = capex_ratios.mean()
+            latest_revenue = frame.latest('revenue') or 0
             method_3 = avg_capex_ratio * latest_revenue if latest_revenue else 0
             
             # Use the median of the three approaches for conservatism
@@ -63,16 +58,16 @@ class IntrinsicValueAnalysis():
             return max(method_1, method_2)
 
 
-    def calculate_owner_earnings(self, financial_line_items: list) -> dict[str, any]:
+    def calculate_owner_earnings(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Calculate owner earnings (Buffett's preferred measure of true earnings power).
         Enhanced methodology: Net Income + Depreciation/Amortization - Maintenance CapEx - Working Capital Changes
         Uses multi-period analysis for better maintenance capex estimation.
         """
-        if not financial_line_items or len(financial_line_items) < 2:
+        if len(frame) < 2:
             return {"owner_earnings": None, "details": ["Insufficient data for owner earnings calculation"]}
 
-        latest = financial_line_items[0]
+        latest = frame.latest_period()
         details = []
 
         # Core components
@@ -88,16 +83,16 @@ class IntrinsicValueAnalysis():
             return {"owner_earnings": None, "details": [f"Missing components: {', '.join(missing)}"]}
 
         # Enhanced maintenance capex estimation using historical analysis
-        maintenance_capex = self.estimate_maintenance_capex(financial_line_items)
+        maintenance_capex = self.estimate_maintenance_capex(frame)
         
         # Working capital change analysis (if data available)
         working_capital_change = 0
-        if len(financial_line_items) >= 2:
+        if len(frame) >= 2:
             try:
                 current_assets_current = latest.get('current_assets')
                 current_liab_current = latest.get('current_liabilities')
                 
-                previous = financial_line_items[1]
+                previous = frame.period(1)
                 current_assets_previous = previous.get('current_assets')
                 current_liab_previous = previous.get('current_liabilities')
                 
@@ -138,24 +133,24 @@ class IntrinsicValueAnalysis():
             "details": details,
         }
 
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Calculate intrinsic value using enhanced DCF with owner earnings.
         Uses more sophisticated assumptions and conservative approach like Buffett.
         """
         result = {"intrinsic_value": None, "score": 0, "max_score": 6, "details": []}
-        if not financial_line_items or len(financial_line_items) < 3:
+        if len(frame) < 3:
             result["details"].append("Insufficient data for reliable valuation")
             return result
 
         # Calculate owner earnings with better methodology
-        earnings_data = self.calculate_owner_earnings(financial_line_items)
+        earnings_data = self.calculate_owner_earnings(frame)
         if not earnings_data["owner_earnings"]:
             result["details"].append(earnings_data["details"])
             return result
 
         owner_earnings = earnings_data["owner_earnings"]
-        latest_financial_line_items = financial_line_items[0]
+        latest_financial_line_items = frame.latest_period()
         shares_outstanding = latest_financial_line_items.get('ordinary_shares_number')
 
         if not shares_outstanding or shares_outstanding <= 0:
@@ -166,24 +161,14 @@ class IntrinsicValueAnalysis():
         details = []
         
         # Estimate growth rate based on historical performance (more conservative)
-        historical_earnings = []
-        for item in financial_line_items[:5]:  # Last 5 years
-            if hasattr(item, 'net_income') and item.net_income:
-                historical_earnings.append(item.net_income)
+        historical_earnings = frame.present('net_income', nonzero=True, periods=5)  # Last 5 years
         
-        # Calculate historical growth rate
-        if len(historical_earnings) >= 3:
-            oldest_earnings = historical_earnings[-1]
-            latest_earnings = historical_earnings[0]
-            years = len(historical_earnings) - 1
-            
-            if oldest_earnings > 0:
-                historical_growth = ((latest_earnings / oldest_earnings) ** (1/years)) - 1
-                # Conservative adjustment - cap growth and apply haircut
-                historical_growth = max(-0.05, min(historical_growth, 0.15))  # Cap between -5% and 15%
-                conservative_growth = historical_growth * 0.7  # Apply 30% haircut for conservatism
-            else:
-                conservative_growth = 0.03  # Default 3% if negative base
+        # Calculate historical growth rate, None without 3 years of earnings or with a negative base
+        historical_growth = cagr(historical_earnings) if len(historical_earnings) >= 3 else None
+        if historical_growth is not None:
+            # Conservative adjustment - cap growth and apply haircut
+            historical_growth = max(-0.05, min(historical_growth, 0.15))  # Cap between -5% and 15%
+            conservative_growth = historical_growth * 0.7  # Apply 30% haircut for conservatism
         else:
             conservative_growth = 0.03  # Default conservative growth
         
@@ -273,21 +258,15 @@ class IntrinsicValueAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'intrinsic_value_analysis'
         analysis['title'] = 'Intrinsic value analysis'
 
-        analysis_data['intrinsic_value_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'intrinsic_value_analysis': analysis},
             "messages": [
                 ai_message
             ]
@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -15,7 +17,7 @@ class ManagementQualityAnalysis():
         self.options = options
 
     
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Checks for share dilution or consistent buybacks, and some dividend track record.
         A simplified approach:
@@ -24,14 +26,14 @@ class ManagementQualityAnalysis():
         - if there's a big new issuance, it might be a negative sign (dilution).
         """
         result = {"score": 0, "max_score": 2, "details": []}
-        if not financial_line_items:
+        if len(frame) == 0:
             result["details"].append("Insufficient data for management analysis")
             return result
 
         reasoning = []
         mgmt_score = 0
 
-        latest = financial_line_items[0]
+        latest = frame.latest_period()
         if latest.get('issuance_or_purchase_of_equity_shares') and latest.get('issuance_or_purchase_of_equity_shares') < 0:
             # Negative means the company spent money on buybacks
             mgmt_score += 1
@@ -61,21 +63,15 @@ class ManagementQualityAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'management_quality_analysis'
         analysis['title'] = 'Management quality analysis'
 
-        analysis_data['management_quality_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'management_quality_analysis': analysis},
             "messages": [
                 ai_message
             ]
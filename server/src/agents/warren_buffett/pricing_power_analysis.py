@@ -1,4 +1,5 @@
-from common.agent_state import AgentState
+from common.agent_state import AnalysisState
+from common.input_store import get_input
 from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
 from langchain_core.runnables import RunnableConfig
@@ -6,6 +7,7 @@ from typing import Dict, Any
 
 import time
 from common import markdown
+from common.financials_frame import FinancialsFrame, get_financials_frame
 from langgraph.types import StreamWriter
 
 
@@ -15,13 +17,13 @@ class PricingPowerAnalysis():
         self.options = options
 
     
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
+    def analyze(self, frame: FinancialsFrame) -> dict[str, any]:
         """
         Analyze pricing power - Buffett's key indicator of a business moat.
         Looks at ability to raise prices without losing customers (margin expansion during inflation).
         """
         result = {"score": 0, "max_score": 5, "details": []}
-        if not financial_line_items:
+        if len(frame) == 0:
             result["details"].append("Insufficient data for pricing power analysis")
             return result
         
@@ -29,15 +31,12 @@ class PricingPowerAnalysis():
         reasoning = []
         
         # Check gross margin trends (ability to maintain/expand margins)
-        gross_margins = []
-        for item in financial_line_items:
-            if item.get('gross_margin') is not None:
-                gross_margins.append(item.get('gross_margin'))
+        gross_margins = frame.present('gross_margin')
         
         if len(gross_margins) >= 3:
             # Check margin stability/improvement
-            recent_avg = sum(gross_margins[:2]) / 2 if len(gross_margins) >= 2 else gross_margins[0]
-            older_avg = sum(gross_margins[-2:]) / 2 if len(gross_margins) >= 2 else gross_margins[-1]
+            recent_avg = gross_margins[:2].mean()
+            older_avg = gross_margins[-2:].mean()
             
             if recent_avg > older_avg + 0.02:  # 2%+ improvement
                 score += 3
@@ -52,8 +51,8 @@ class PricingPowerAnalysis():
                 reasoning.append("Declining gross margins may indicate pricing pressure")
         
         # Check if company has been able to maintain high margins consistently
-        if gross_margins:
-            avg_margin = sum(gross_margins) / len(gross_margins)
+        if len(gross_margins) > 0:
+            avg_margin = gross_margins.mean()
             if avg_margin > 0.5:  # 50%+ gross margins
                 score += 2
                 reasoning.append(f"Consistently high gross margins ({avg_margin:.1%}) indicate strong pricing power")
@@ -72,21 +71,15 @@ class PricingPowerAnalysis():
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
 
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
+    def __call__(self, state: AnalysisState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        frame = get_financials_frame(get_input(state, 'metrics'))
+        analysis = self.analyze(frame)
         analysis['type'] = 'pricing_power_analysis'
         analysis['title'] = 'Pricing power analysis'
 
-        analysis_data['pricing_power_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
         return {
-            "context": context,
+            "analysis_data": {'pricing_power_analysis': analysis},
             "messages": [
                 ai_message
             ]
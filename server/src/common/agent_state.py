@@ -1,6 +1,6 @@
 from langgraph.graph import MessagesState
 from dataclasses import dataclass
-from typing import Optional, TypedDict
+from typing import Annotated, Optional, TypedDict
 
 @dataclass
 class StateAction(TypedDict):
@@ -9,8 +9,6 @@ class StateAction(TypedDict):
 
 @dataclass
 class StateContext(TypedDict):
-    analysis_data: dict[str, any]
-    metrics: list[dict[str, any]]
     tasks: list[dict[str, any]]
     current_task: dict[str, any]
     task_index: int
@@ -45,3 +43,26 @@ class AgentState(MessagesState):
     settings: Optional[dict[str, any]] = None
 
 
+def merge_analysis_data(left: Optional[dict[str, any]], right: Optional[dict[str, any]]) -> dict[str, any]:
+    """
+    Reducer of analysis_data, merges the keys written by the analysis nodes.
+    """
+    return {**(left or {}), **(right or {})}
+
+def merge_inputs(left: Optional[dict[str, str]], right: Optional[dict[str, str]]) -> dict[str, str]:
+    """
+    Reducer of inputs, each input is written once per analysis.
+    """
+    inputs = dict(left or {})
+    for name, handle in (right or {}).items():
+        if inputs.get(name, handle) != handle:
+            raise Exception(f'Input {name} is already set')
+        inputs[name] = handle
+    return inputs
+
+@dataclass
+class AnalysisState(AgentState):
+    # results of the analysis nodes of a persona sub-graph, each node writes its own keys
+    analysis_data: Annotated[Optional[dict[str, any]], merge_analysis_data] = None
+    # content addressed handles of the raw inputs loaded by start_analysis, see common.input_store
+    inputs: Annotated[Optional[dict[str, str]], merge_inputs] = None
@@ -0,0 +1,71 @@
+"""
+Graph builder of the persona analysis sub-graphs.
+
+The analysis nodes of a persona only read the inputs loaded by start_analysis and write their own
+key of analysis_data, so they do not need to run one after another: the nodes fan out from
+start_analysis, a node reading the results of other nodes waits for them, and all branches join
+before end_analysis. Each node returns only its own analysis_data entry, which the reducer of the
+channel merges, and its message is streamed as soon as it is done.
+"""
+
+from typing import Callable
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph
+
+from common import input_store
+from common.agent_state import AgentState, AnalysisState
+
+
+def release_inputs(state: AnalysisState, config: RunnableConfig):
+    """
+    Release the raw inputs of the analysis once it is done.
+    """
+    input_store.release((state.get('inputs') or {}).values())
+    return {}
+
+
+def build_analysis_graph(
+    start_analysis: Callable,
+    analysis_nodes: dict[str, Callable],
+    end_analysis: Callable,
+    dependencies: dict[str, list[str]] | None = None,
+):
+    """
+    Build and compile an analysis sub-graph.
+
+    Args:
+        start_analysis: Node loading the inputs of the analysis
+        analysis_nodes: Analysis nodes by name, in display order
+        end_analysis: Node scoring the analysis data and calling the LLM
+        dependencies: Names of the analysis nodes whose results a node reads, by node name
+
+    Returns:
+        The compiled graph, taking and returning AgentState
+    """
+    dependencies = dependencies or {}
+    workflow = StateGraph(AnalysisState, output=AgentState)
+    workflow.add_node("start_analysis", start_analysis)
+    for name, node in analysis_nodes.items():
+        workflow.add_node(name, node)
+    workflow.add_node("end_analysis", end_analysis)
+    workflow.add_node("release_inputs", release_inputs)
+
+    required = set()
+    for name in analysis_nodes:
+        sources = dependencies.get(name)
+        if sources:
+            for source in sources:
+                if source not in analysis_nodes:
+                    raise Exception(f'Unknown analysis node {source} required by {name}')
+            required.update(sources)
+            workflow.add_edge(list(sources), name)
+        else:
+            workflow.add_edge("start_analysis", name)
+    # nodes no other node waits for, end_analysis runs when all of them are done
+    workflow.add_edge([name for name in analysis_nodes if name not in required], "end_analysis")
+    workflow.add_edge("end_analysis", "release_inputs")
+
+    workflow.set_entry_point("start_analysis")
+    workflow.set_finish_point("release_inputs")
+    return workflow.compile()
@@ -0,0 +1,149 @@
+"""
+Content addressed blob store for the bulky data of a run (prices, metrics, news).
+
+A value is serialized to json once and stored under the sha256 of its content, on disk in the
+data directory and in an in-memory LRU of the decoded values. The graph state only holds the
+handle, which is resolved when a node reads the value, and the same data loaded by several
+analyses (the prices of a ticker for the technicals and the sentiment agents) is one blob.
+
+Values are pinned in memory from `put` to `release`, unpinned values are evicted beyond
+MAX_MEMORY_SIZE and read back from disk when needed. A pin expires PIN_TTL after its last `put`,
+so the values of a run which failed before releasing its inputs become evictable. Blobs not stored again for BLOB_MAX_AGE
+are pruned from disk.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from common.storage import get_data_dir, write_text
+
+# max size of the unpinned values kept in memory, in bytes of their json
+MAX_MEMORY_SIZE = 64 * 1024 * 1024
+# seconds a blob is kept on disk after it was last stored
+BLOB_MAX_AGE = 24 * 60 * 60
+PRUNE_INTERVAL = 60 * 60
+# seconds a value stays pinned after it was last stored, if it is not released
+PIN_TTL = 60 * 60
+
+# handle -> (size, value), ordered from least to most recently used
+_values: OrderedDict[str, tuple[int, Any]] = OrderedDict()
+# handle -> (number of puts not released yet, time the pin expires)
+_pins: dict[str, tuple[int, float]] = {}
+_size = 0
+_last_prune = 0.0
+_lock = threading.Lock()
+
+
+def _get_path(handle: str) -> str:
+    return os.path.join(get_data_dir('blobs', handle[:2]), f'{handle}.json')
+
+
+def _pinned(handle: str, now: float) -> bool:
+    pin = _pins.get(handle)
+    if pin is None:
+        return False
+    if pin[1] <= now:
+        # expired, the run holding it did not release it
+        del _pins[handle]
+        return False
+    return True
+
+
+def _remember(handle: str, size: int, value: Any, now: float):
+    global _size
+    if handle in _values:
+        _values.move_to_end(handle)
+    else:
+        _values[handle] = (size, value)
+        _size += size
+    for oldest in list(_values):
+        if _size <= MAX_MEMORY_SIZE:
+            break
+        if _pinned(oldest, now):
+            continue
+        oldest_size, _ = _values.pop(oldest)
+        _size -= oldest_size
+
+
+def _prune(now: float):
+    """
+    Remove the blobs not stored again for BLOB_MAX_AGE.
+    """
+    root = get_data_dir('blobs')
+    for directory in os.listdir(root):
+        path = os.path.join(root, directory)
+        if not os.path.isdir(path):
+            continue
+        for name in os.listdir(path):
+            try:
+                if now - os.path.getmtime(os.path.join(path, name)) > BLOB_MAX_AGE:
+                    os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+
+def put(value: Any) -> str:
+    """
+    Store a json serializable value and pin it in memory, returning its handle.
+    Values are shared and must be treated as read-only. Blocks on the file system, async code
+    calls it in a thread.
+    """
+    global _last_prune
+    content = json.dumps(value, separators=(',', ':'), sort_keys=True)
+    handle = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    now = time.time()
+    with _lock:
+        count, _ = _pins.get(handle, (0, 0.0))
+        _pins[handle] = (count + 1, now + PIN_TTL)
+        _remember(handle, len(content), value, now)
+        prune = now - _last_prune > PRUNE_INTERVAL
+        if prune:
+            _last_prune = now
+    if prune:
+        _prune(now)
+
+    path = _get_path(handle)
+    if os.path.exists(path):
+        # stored again, keeps it from being pruned
+        os.utime(path)
+    else:
+        write_text(path, content)
+    return handle
+
+
+def get(handle: str) -> Any:
+    """
+    Resolve a handle, from memory or from disk.
+    """
+    with _lock:
+        entry = _values.get(handle)
+        if entry is not None:
+            _values.move_to_end(handle)
+            return entry[1]
+    try:
+        with open(_get_path(handle), 'r', encoding='utf-8') as f:
+            content = f.read()
+    except FileNotFoundError:
+        raise Exception(f'Blob {handle} does not exist')
+    value = json.loads(content)
+    with _lock:
+        _remember(handle, len(content), value, time.time())
+    return value
+
+
+def release(handles: Iterable[str]):
+    """
+    Unpin the values of the handles, they stay in memory until evicted and on disk until pruned.
+    """
+    with _lock:
+        for handle in handles:
+            count, expires_at = _pins.get(handle, (0, 0.0))
+            if count > 1:
+                _pins[handle] = (count - 1, expires_at)
+            else:
+                _pins.pop(handle, None)
@@ -0,0 +1,104 @@
+"""
+Process wide TTL cache for remote dataset responses.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+# default max size of all cached values, in bytes of the raw response
+MAX_CACHE_SIZE = 256 * 1024 * 1024
+
+
+class TTLCache():
+    """
+    LRU cache with a per entry TTL, bounded by the total size of the cached values.
+    Concurrent `get_or_fetch` calls with the same key share one in-flight fetch.
+
+    Not thread safe, all calls must be made on the same event loop (the http client loop).
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_size: int = MAX_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        # key -> (expires_at, size, value), ordered from least to most recently used
+        self.entries: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self.in_flight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return False, None
+        self.entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any, ttl: float, size: int):
+        if size > self.max_size:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + ttl, size, value)
+        self.size += size
+        while self.size > self.max_size:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: Hashable, ttl: float, fetch: Callable[[], Awaitable[tuple[Any, int]]]) -> Any:
+        """
+        Return the cached value of key, or call fetch() once for all concurrent callers.
+        fetch returns (value, size), errors are not cached.
+        """
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # run as its own task, so cancelling the first caller does not fail the others
+            future = asyncio.ensure_future(self._fetch(key, ttl, fetch))
+            self.in_flight[key] = future
+        return await asyncio.shield(future)
+
+    async def _fetch(self, key: Hashable, ttl: float, fetch: Callable[[], Awaitable[tuple[Any, int]]]) -> Any:
+        try:
+            value, size = await fetch()
+            self.set(key, value, ttl, size)
+            return value
+        finally:
+            self.in_flight.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self.entries),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.coalesced) / requests if requests > 0 else 0,
+        }
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
@@ -0,0 +1,133 @@
+"""
+Per-run ticker data bundle.
+
+Each analysis agent module declares the data it needs as DATA_REQUIREMENTS. Before the tasks
+run, the orchestrator merges the requirements of all scheduled agents into a data plan per
+ticker, one request per (symbol, endpoint) with the union of financial items and the widest
+price window, and starts prefetching it into the dataset cache without waiting for it.
+Agents then read their data through this module, their requests are served by (or coalesced
+with) the prefetched responses and projected down to what the agent declared. Prices go
+through the persisted price history, which only downloads the bars it does not hold yet.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from common.dataset import AsyncDataset
+from common import price_history
+
+
+@dataclass(frozen=True)
+class DataRequirements:
+    # {period: items} of ticker/financial_items
+    financial_items: dict[str, list[str]] = field(default_factory=dict)
+    # days of daily prices before end_date, None if prices are not needed, 0 for end_date only
+    price_days: int | None = None
+    news: bool = False
+    insider_transactions: bool = False
+    info: bool = False
+
+
+def get_price_start_date(end_date: str, price_days: int) -> str:
+    end_time = time.mktime(time.strptime(end_date, "%Y-%m-%d"))
+    return time.strftime("%Y-%m-%d", time.localtime(end_time - price_days*24*60*60))
+
+
+def merge_financial_items(declarations: list[dict[str, list[str]]]) -> dict[str, list[str]]:
+    """
+    Merge the {period: items} declarations of agents into one {period: items} union, keeping order.
+    """
+    merged = {}
+    for declaration in declarations:
+        for period, items in declaration.items():
+            period_items = merged.setdefault(period, [])
+            for item in items:
+                if item not in period_items:
+                    period_items.append(item)
+    return merged
+
+
+def plan_data(requirements: list[DataRequirements], end_date: str) -> dict:
+    """
+    Merge the requirements of the agents scheduled on one ticker into its data plan.
+    The plan is a plain dict, so it can be kept in the graph state.
+    """
+    price_days = [r.price_days for r in requirements if r.price_days is not None]
+    return {
+        'end_date': end_date,
+        'financial_items': merge_financial_items([r.financial_items for r in requirements]),
+        'price_start_date': get_price_start_date(end_date, max(price_days)) if len(price_days) > 0 else None,
+        'news': any(r.news for r in requirements),
+        'insider_transactions': any(r.insider_transactions for r in requirements),
+        'info': any(r.info for r in requirements),
+    }
+
+
+def prefetch(dataset_client: AsyncDataset, symbol: str, plan: dict):
+    """
+    Start fetching everything in the plan of a ticker on the http client loop and return at once.
+    Errors are ignored here, the agent requesting the data will retry and report them.
+    """
+    end_date = plan['end_date']
+    coros = [
+        dataset_client.get_financial_items(symbol, items, end_date, period=period)
+        for period, items in plan['financial_items'].items()
+    ]
+    if plan['price_start_date'] is not None:
+        coros.append(price_history.get_prices(dataset_client, symbol, plan['price_start_date'], end_date))
+    if plan['news']:
+        coros.append(dataset_client.get_news(symbol, end_date))
+    if plan['insider_transactions']:
+        coros.append(dataset_client.get_insider_transactions(symbol, end_date))
+    if plan['info']:
+        coros.append(dataset_client.get_info(symbol))
+    if len(coros) > 0:
+        dataset_client.http_client.submit(_gather(coros))
+
+
+async def _gather(coros: list):
+    await asyncio.gather(*coros, return_exceptions=True)
+
+
+def get_plan(context: dict, symbol: str, end_date: str) -> dict | None:
+    plan = (context.get('data_plans') or {}).get(symbol)
+    if plan is None or plan['end_date'] != end_date:
+        return None
+    return plan
+
+
+def project(rows: list[dict], bundle_items: list[str], items: list[str]) -> list[dict]:
+    """
+    Copy the bundle rows with only the given items, other agents' items are dropped and
+    non item fields (date, period, ...) are kept.
+    """
+    dropped = set(bundle_items) - set(items)
+    return [{key: value for key, value in row.items() if key not in dropped} for row in rows]
+
+
+async def get_financial_items(context: dict, dataset_client: AsyncDataset, symbol: str, items: list[str], end_date: str, period: str) -> list[dict]:
+    """
+    Read the items from the run's bundle of the ticker, or fetch them directly when the agent
+    runs alone or the plan does not cover them.
+    """
+    plan = get_plan(context, symbol, end_date)
+    bundle_items = plan['financial_items'].get(period) if plan is not None else None
+    if bundle_items is None or not set(items) <= set(bundle_items):
+        return await dataset_client.get_financial_items(symbol, items, end_date, period=period)
+    rows = await dataset_client.get_financial_items(symbol, bundle_items, end_date, period=period)
+    return project(rows, bundle_items, items)
+
+
+async def get_prices(context: dict, dataset_client: AsyncDataset, symbol: str, start_date: str, end_date: str) -> list[dict]:
+    """
+    Read the prices from the run's widest price window of the ticker, or fetch them directly
+    when the agent runs alone or the window does not cover them.
+    """
+    plan = get_plan(context, symbol, end_date)
+    plan_start_date = plan['price_start_date'] if plan is not None else None
+    if plan_start_date is None or plan_start_date > start_date:
+        return await price_history.get_prices(dataset_client, symbol, start_date, end_date)
+    prices = await price_history.get_prices(dataset_client, symbol, plan_start_date, end_date)
+    if any(price.get('date') is None for price in prices):
+        return await price_history.get_prices(dataset_client, symbol, start_date, end_date)
+    return [price for price in prices if price['date'] >= start_date]
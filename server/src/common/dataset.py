@@ -1,82 +1,195 @@
-import requests
-import time
+import asyncio
+import hashlib
+import httpx
 from urllib.parse import urlencode
 from common.settings import Settings
+from common.cache import TTLCache
+from common.http_client import get_http_client
+from common.retry import RetryPolicy, get_circuit_breaker
 from langchain_core.runnables import RunnableConfig
 
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
 
-class Dataset:
-    def __init__(self, config: RunnableConfig):
+# cache ttl in seconds of each endpoint, endpoints not listed here are not cached
+CACHE_TTLS = {
+    'ticker/prices': 15 * MINUTE,
+    'ticker/info': 15 * MINUTE,
+    'ticker/news': 5 * MINUTE,
+    'ticker/financial_items': DAY,
+    'ticker/financial_metrics': DAY,
+    'ticker/insider_transactions': DAY,
+    'ticker/insider_roster_holders': DAY,
+    'ticker/lookup': DAY,
+}
+
+# shared by all dataset clients of the process, only used on the http client loop
+_cache = TTLCache()
+
+
+def get_cache_stats() -> dict:
+    """
+    Hit/miss metrics of the dataset cache.
+    """
+    return _cache.stats()
+
+
+class AsyncDataset:
+    def __init__(self, config: RunnableConfig, retry_policy: RetryPolicy = None, use_cache: bool = True):
         self.settings = Settings(config)
         self.remote_dataset_url = self.settings.get_remote_financial_data_api_url().rstrip("/")
         self.remote_dataset_token = self.settings.get_remote_financial_data_api_key()
-    
-    def get_financial_metrics(self, symbol, end_date=None, period='quarterly'):
-        data = self._request(f'ticker/financial_metrics', query={'symbol': symbol, 'freq': period})
+        self.http_client = get_http_client()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.use_cache = use_cache
+
+    async def get_financial_metrics(self, symbol, end_date=None, period='quarterly'):
+        data = await self._request(f'ticker/financial_metrics', query={'symbol': symbol, 'freq': period})
         # filter end_date <= data['date']
         if end_date:
             data = [item for item in data if item['date'] <= end_date]
         return data
-    
-    def get_financial_items(self, symbol, items: list[str], end_date=None, period='quarterly'):
+
+    async def get_financial_items(self, symbol, items: list[str], end_date=None, period='quarterly'):
         if items is not None and len(items) > 0:
             items = ','.join(items)
         else:
             items = None
-        data = self._request(f'ticker/financial_items', query={'symbol': symbol, 'items':items, 'freq': period})
+        data = await self._request(f'ticker/financial_items', query={'symbol': symbol, 'items':items, 'freq': period})
         if end_date:
             data = [item for item in data if item['date'] <= end_date]
         return data
-    
-    def get_prices(self, symbol: str, start_date: str, end_date: str) -> list[dict]:
-        return self._request(f'ticker/prices', query={'symbol': symbol, 'interval':'1d', 'start_date': start_date, 'end_date': end_date})
-    
-    def get_insider_transactions(self, symbol: str, end_date: str = None) -> list[dict]:
-        data = self._request(f'ticker/insider_transactions', query={'symbol': symbol})
+
+    async def get_prices(self, symbol: str, start_date: str, end_date: str) -> list[dict]:
+        return await self._request(f'ticker/prices', query={'symbol': symbol, 'interval':'1d', 'start_date': start_date, 'end_date': end_date})
+
+    async def get_insider_transactions(self, symbol: str, end_date: str = None) -> list[dict]:
+        data = await self._request(f'ticker/insider_transactions', query={'symbol': symbol})
         # filter start_date <= end_date
         if end_date:
             data = [item for item in data if item['start_date'] <= end_date]
         return data
-    
-    def get_insider_roster_holders(self, symbol: str, end_date: str = None) -> list[dict]:
-        data = self._request(f'ticker/insider_roster_holders', query={'symbol': symbol})
+
+    async def get_insider_roster_holders(self, symbol: str, end_date: str = None) -> list[dict]:
+        data = await self._request(f'ticker/insider_roster_holders', query={'symbol': symbol})
         # filter start_date <= end_date
         if end_date:
             data = [item for item in data if item['latest_transaction_date'] <= end_date]
         return data
-    
-    def get_news(self, symbol: str, end_date: str = None) -> list[dict]:
-        data = self._request(f'ticker/news', query={'symbol': symbol, 'count': 200})
+
+    async def get_news(self, symbol: str, end_date: str = None) -> list[dict]:
+        data = await self._request(f'ticker/news', query={'symbol': symbol, 'count': 200})
         # filter end_date <= data['pub_date']
         if end_date:
             data = [item for item in data if item['pub_date'] <= end_date]
         return data
-    
-    def get_info(self, symbol: str) -> dict:
-        return self._request(f'ticker/info', query={'symbol': symbol})
-    
-    def lookup_ticker(self, query: str) -> dict:
-        return self._request(f'ticker/lookup', query={'query': query})
-    
-    def _request(self, url: str, query: dict = None, max_retries: int = 3) -> requests.Response:
+
+    async def get_info(self, symbol: str) -> dict:
+        return await self._request(f'ticker/info', query={'symbol': symbol})
+
+    async def lookup_ticker(self, query: str) -> dict:
+        return await self._request(f'ticker/lookup', query={'query': query})
+
+    async def _request(self, url: str, query: dict = None):
+        """
+        Get data of the endpoint, from the cache when it is fresh. The cache key does not
+        include end_date, as it is filtered locally, so all end dates share one response.
+        """
+        endpoint = url.lstrip('/')
+        ttl = CACHE_TTLS.get(endpoint)
+        if not self.use_cache or ttl is None:
+            data, _ = await self._fetch(endpoint, query)
+            return data
+        token_hash = hashlib.sha256(self.remote_dataset_token.encode('utf-8')).hexdigest()
+        key = (self.remote_dataset_url, token_hash, endpoint, tuple(sorted((query or {}).items())))
+        return await self.http_client.run(_cache.get_or_fetch(key, ttl, lambda: self._fetch(endpoint, query)))
+
+    async def _fetch(self, url: str, query: dict = None) -> tuple[any, int]:
+        """
+        Request the remote dataset, returns the data and the response size in bytes.
+        """
         # format url, trim leading '/'
         url = f'{self.remote_dataset_url}/api/v1/{url.lstrip("/")}'
+        breaker = get_circuit_breaker(url.split('://', 1)[-1])
         # format query string in url, and encode special characters
         if query:
             url += f'?{urlencode(query)}'
-        
+
         headers = {
             'Authorization': f'Bearer {self.remote_dataset_token}'
         }
-        
-        for attempt in range(max_retries + 1):  # +1 for initial attempt
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200 and attempt < max_retries:
-                delay = 10 + (5 * attempt)
-                print(f"Request Failed. Attempt {attempt + 1}/{max_retries + 1}. Waiting {delay}s before retrying...")
-                time.sleep(delay)
-                continue
-            result = response.json()
-            if result['code'] != 0:
-                raise Exception(f'Failed to get data from remote dataset. Url: {url}, Error: {result["code"]}, Msg: {result["msg"]}')
-            return result['data']
\ No newline at end of file
+
+        policy = self.retry_policy
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.deadline
+        for attempt in range(policy.max_retries + 1):  # +1 for initial attempt
+            if not breaker.allow_request():
+                raise Exception(f'Remote dataset circuit is open, skip request. Url: {url}')
+            response = None
+            try:
+                response = await self.http_client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                error = f'{type(e).__name__}: {e}'
+            except BaseException:
+                # cancelled or failed before reaching the endpoint, no verdict on its health
+                breaker.release_trial()
+                raise
+            else:
+                error = f'HTTP {response.status_code}'
+
+            status_code = response.status_code if response is not None else None
+            if status_code == 200 or not policy.is_retryable(status_code):
+                # the endpoint answered, client errors are not counted as endpoint failures
+                breaker.record_success()
+                if status_code != 200:
+                    raise Exception(f'Failed to get data from remote dataset. Url: {url}, Error: {error}, Msg: {response.text[:200]}')
+                break
+
+            breaker.record_failure()
+            delay = policy.get_delay(attempt, response.headers.get('Retry-After') if response is not None else None)
+            if attempt >= policy.max_retries or loop.time() + delay > deadline:
+                raise Exception(f'Failed to get data from remote dataset after {attempt + 1} attempts. Url: {url}, Error: {error}')
+            print(f"Request Failed ({error}). Attempt {attempt + 1}/{policy.max_retries + 1}. Waiting {delay:.1f}s before retrying...")
+            await asyncio.sleep(delay)
+
+        result = response.json()
+        if result['code'] != 0:
+            raise Exception(f'Failed to get data from remote dataset. Url: {url}, Error: {result["code"]}, Msg: {result["msg"]}')
+        return result['data'], len(response.content)
+
+
+class Dataset:
+    """
+    Blocking wrapper of AsyncDataset for sync callers, requests share the same connection pool.
+    """
+    def __init__(self, config: RunnableConfig, retry_policy: RetryPolicy = None, use_cache: bool = True):
+        self.async_dataset = AsyncDataset(config, retry_policy, use_cache)
+        self.settings = self.async_dataset.settings
+
+    def get_financial_metrics(self, symbol, end_date=None, period='quarterly'):
+        return self._run(self.async_dataset.get_financial_metrics(symbol, end_date, period))
+
+    def get_financial_items(self, symbol, items: list[str], end_date=None, period='quarterly'):
+        return self._run(self.async_dataset.get_financial_items(symbol, items, end_date, period))
+
+    def get_prices(self, symbol: str, start_date: str, end_date: str) -> list[dict]:
+        return self._run(self.async_dataset.get_prices(symbol, start_date, end_date))
+
+    def get_insider_transactions(self, symbol: str, end_date: str = None) -> list[dict]:
+        return self._run(self.async_dataset.get_insider_transactions(symbol, end_date))
+
+    def get_insider_roster_holders(self, symbol: str, end_date: str = None) -> list[dict]:
+        return self._run(self.async_dataset.get_insider_roster_holders(symbol, end_date))
+
+    def get_news(self, symbol: str, end_date: str = None) -> list[dict]:
+        return self._run(self.async_dataset.get_news(symbol, end_date))
+
+    def get_info(self, symbol: str) -> dict:
+        return self._run(self.async_dataset.get_info(symbol))
+
+    def lookup_ticker(self, query: str) -> dict:
+        return self._run(self.async_dataset.lookup_ticker(query))
+
+    def _run(self, coro):
+        return self.async_dataset.http_client.run_sync(coro)
@@ -0,0 +1,174 @@
+"""
+Metrics derived from the financial items of a ticker, shared by the persona agents.
+
+Several personas derive the same metrics from the same financial items: the CAGR of revenue and
+net income, the total growth of earnings, the growth rates of revenue, owner earnings, ...
+DerivedMetrics computes them from the FinancialsFrame of an analysis and memoizes each one process
+wide, so that a metric is computed once per ticker and run and read by every persona using it.
+
+A metric is keyed by the identity of the frame it is computed from, the settings fingerprint and
+remote dataset of the run, the (symbol, period, end_date) of the analysis, the metric and its
+arguments. The frames are immutable and shared by all the nodes reading the same financial items
+input (get_financials_frame), so the nodes of an analysis compute a metric once, while another
+dataset, or financial items loaded again, get their own frame and metrics. A metric is only
+memoized when the frame holds all its items.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+import numpy as np
+
+from common.financials_frame import FinancialsFrame, cagr, coefficient_of_variation, get_financials_frame, growth
+from common.input_store import get_input
+from common.settings import Settings
+from langchain_core.runnables import RunnableConfig
+
+# max number of memoized metrics
+MAX_CACHED_METRICS = 4096
+# seconds a metric is kept, as long as the dataset caches the financial items
+METRICS_TTL = 24 * 60 * 60
+
+# (frame id,) + key -> (frame, expires_at, value), ordered from least to most recently used
+_metrics: OrderedDict[tuple, tuple[FinancialsFrame, float, Any]] = OrderedDict()
+_metrics_lock = threading.Lock()
+
+
+def _memoize(frame: FinancialsFrame, key: tuple, compute: Callable[[], Any]) -> Any:
+    key = (id(frame),) + key
+    now = time.monotonic()
+    with _metrics_lock:
+        entry = _metrics.get(key)
+        # the entry holds the frame, so its id can not be reused by another frame while cached
+        if entry is not None and entry[0] is frame and entry[1] > now:
+            _metrics.move_to_end(key)
+            return entry[2]
+    value = compute()
+    if isinstance(value, np.ndarray):
+        # shared between the analyses
+        value.flags.writeable = False
+    with _metrics_lock:
+        _metrics[key] = (frame, now + METRICS_TTL, value)
+        _metrics.move_to_end(key)
+        while len(_metrics) > MAX_CACHED_METRICS:
+            _metrics.popitem(last=False)
+    return value
+
+
+def total_growth(values: np.ndarray) -> float | None:
+    """
+    Growth from the oldest to the latest value of a latest first series, relative to the absolute
+    oldest value, None with fewer than 2 values or an oldest value of 0.
+    """
+    if len(values) < 2 or values[-1] == 0:
+        return None
+    return float((values[0] - values[-1]) / abs(values[-1]))
+
+
+class DerivedMetrics():
+    """
+    Derived metrics of the financial items of an analysis, series are latest period first and
+    read-only.
+    """
+    def __init__(self, key: tuple, frame: FinancialsFrame):
+        # (settings fingerprint, remote dataset url, symbol, period, end_date)
+        self.key = key
+        self.frame = frame
+
+    def _get(self, items: tuple[str, ...], metric: tuple, compute: Callable[[], Any]) -> Any:
+        if not all(item in self.frame for item in items):
+            return compute()
+        return _memoize(self.frame, self.key + metric, compute)
+
+    def series(self, name: str, nonzero: bool = False) -> np.ndarray:
+        """
+        Values of an item with the missing values dropped, and the 0 values if nonzero.
+        """
+        return self._get((name,), ('series', name, nonzero), lambda: self.frame.present(name, nonzero))
+
+    def cagr(self, name: str) -> float | None:
+        """
+        Compound growth rate per period of the non-zero values of an item, from the oldest to the
+        latest.
+        """
+        return self._get((name,), ('cagr', name), lambda: cagr(self.series(name, nonzero=True)))
+
+    def total_growth(self, name: str, nonzero: bool = False) -> float | None:
+        """
+        Growth of an item from its oldest to its latest value.
+        """
+        return self._get((name,), ('total_growth', name, nonzero), lambda: total_growth(self.series(name, nonzero)))
+
+    def growth_rates(self, name: str, periods: int | None = None, nonzero: bool = False) -> np.ndarray:
+        """
+        Growth of each of the latest `periods` values of an item from the value before it, skipping
+        the values after a 0.
+        """
+        def compute() -> np.ndarray:
+            rates = growth(self.series(name, nonzero)[:periods])
+            return rates[~np.isnan(rates)]
+        return self._get((name,), ('growth_rates', name, periods, nonzero), compute)
+
+    def working_capital_change(self) -> float:
+        """
+        Change of the working capital of the latest period from the previous one, 0 if one is missing.
+        """
+        def compute() -> float:
+            working_capital = self.frame.column('working_capital')[:2]
+            if len(working_capital) < 2 or np.isnan(working_capital).any():
+                return 0
+            return float(working_capital[0] - working_capital[1])
+        return self._get(('working_capital',), ('working_capital_change',), compute)
+
+    def owner_earnings(self) -> float | None:
+        """
+        Owner earnings of the latest period: net income plus depreciation and amortization, less
+        capital expenditure and the working capital change. None if one of the items of the latest
+        period is missing.
+        """
+        items = ('net_income', 'depreciation_and_amortization', 'capital_expenditure', 'working_capital')
+        def compute() -> float | None:
+            net_income, depreciation, capex, working_capital = (self.frame.latest(item) for item in items)
+            if net_income is None or depreciation is None or capex is None or working_capital is None:
+                return None
+            return net_income + depreciation - capex - self.working_capital_change()
+        return self._get(items, ('owner_earnings',), compute)
+
+    def fcf_yield(self) -> float | None:
+        """
+        Free cash flow of the latest period over its market cap, None if one is missing or the
+        market cap is not positive.
+        """
+        def compute() -> float | None:
+            free_cash_flow = self.frame.latest('free_cash_flow')
+            market_cap = self.frame.latest('market_cap')
+            if free_cash_flow is None or market_cap is None or market_cap <= 0:
+                return None
+            return free_cash_flow / market_cap
+        return self._get(('free_cash_flow', 'market_cap'), ('fcf_yield',), compute)
+
+    def margin_stability(self, name: str = 'operating_margin') -> float | None:
+        """
+        1 less the coefficient of variation of a margin over the periods, 1 for a constant margin.
+        None without values or with a mean margin which is not positive.
+        """
+        def compute() -> float | None:
+            margins = self.series(name)
+            if len(margins) == 0 or not margins.mean() > 0:
+                return None
+            return 1 - coefficient_of_variation(margins)
+        return self._get((name,), ('margin_stability', name), compute)
+
+
+def get_derived_metrics(state: dict, config: RunnableConfig, name: str = 'metrics', period: str = 'yearly') -> DerivedMetrics:
+    """
+    DerivedMetrics of the financial items input `name` of an analysis, loaded for `period`.
+    """
+    settings = Settings(config)
+    symbol = state.get('context').get('current_task').get('ticker').get('symbol')
+    end_date = state.get('action').get('parameters').get('end_date')
+    end_date = end_date if end_date else time.strftime("%Y-%m-%d")
+    key = (settings.fingerprint, settings.get_remote_financial_data_api_url(), symbol, period, end_date)
+    return DerivedMetrics(key, get_financials_frame(get_input(state, name)))
@@ -0,0 +1,202 @@
+"""
+Columnar financial statements for the fundamentals-driven analysis modules.
+
+The dataset returns financial items as a list of dicts, one per period, latest period first.
+FinancialsFrame stores them as one float64 array of periods x items with NaN where an item is
+missing, and an index of the item columns, so the modules read a column once and compute
+growth, CAGR, ratios and stability with array operations instead of rebuilding
+`[m.get('revenue') for m in metrics if m.get('revenue')]` lists in every calculation.
+
+Series read from the frame keep the row order, latest period first.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# number of metric lists whose frame is kept by get_financials_frame
+MAX_CACHED_FRAMES = 64
+# fields of a period which are not financial items
+PERIOD_FIELDS = ('date', 'period', 'symbol')
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@dataclass(frozen=True, eq=False)
+class FinancialsFrame:
+    # datetime64[D] of the periods, NaT where missing
+    date: np.ndarray
+    # names of the item columns
+    items: tuple[str, ...]
+    # float64, periods x items, NaN where missing
+    values: np.ndarray
+    # item name -> column
+    index: dict[str, int] = field(repr=False)
+
+    @classmethod
+    def from_metrics(cls, metrics: list[dict] | None) -> 'FinancialsFrame':
+        metrics = metrics or []
+        items = {}
+        for period in metrics:
+            for name, value in period.items():
+                if name not in PERIOD_FIELDS and _is_number(value):
+                    items.setdefault(name, len(items))
+        values = np.full((len(metrics), len(items)), np.nan)
+        for row, period in enumerate(metrics):
+            for name, value in period.items():
+                column = items.get(name)
+                if column is not None and _is_number(value):
+                    values[row, column] = value
+        return cls(
+            date=np.array([(str(period.get('date') or 'NaT'))[:10] for period in metrics], dtype='datetime64[D]'),
+            items=tuple(items),
+            values=values,
+            index=items,
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    @property
+    def mask(self) -> np.ndarray:
+        """
+        True where an item of a period is present.
+        """
+        return ~np.isnan(self.values)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Values of an item aligned with the periods, NaN where missing (all NaN for an unknown item).
+        """
+        column = self.index.get(name)
+        if column is None:
+            return np.full(len(self), np.nan)
+        return self.values[:, column]
+
+    def present(self, name: str, nonzero: bool = False, periods: int | None = None) -> np.ndarray:
+        """
+        Values of an item in the latest `periods` periods (all if None) with the missing values
+        dropped, and the 0 values if nonzero.
+        """
+        values = self.column(name)[:periods]
+        keep = ~np.isnan(values)
+        if nonzero:
+            keep &= values != 0
+        return values[keep]
+
+    def latest(self, name: str, default: float | None = None) -> float | None:
+        """
+        Value of an item in the latest period, default if there is no period or it is missing.
+        """
+        if len(self) == 0:
+            return default
+        value = self.column(name)[0]
+        return default if np.isnan(value) else float(value)
+
+    def period(self, row: int) -> dict[str, float]:
+        """
+        Items present in a period by name, row 0 is the latest period, empty if there is no such
+        period.
+        """
+        if not -len(self) <= row < len(self):
+            return {}
+        return {name: float(value) for name, value in zip(self.items, self.values[row]) if not np.isnan(value)}
+
+    def latest_period(self) -> dict[str, float]:
+        """
+        Items present in the latest period by name, empty if there is no period.
+        """
+        return self.period(0)
+
+    def ratio(self, numerator: str, denominator: str) -> np.ndarray:
+        """
+        Ratio of two items per period, NaN where one is missing or the denominator is 0.
+        """
+        return ratio(self.column(numerator), self.column(denominator))
+
+
+def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def growth(values: np.ndarray) -> np.ndarray:
+    """
+    Growth of each value of a latest first series from the value after it (the previous period),
+    NaN where the previous value is 0. One value shorter than the series.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return ratio(values[:-1] - values[1:], values[1:])
+
+
+def cagr(values: np.ndarray) -> float | None:
+    """
+    Compound growth rate per period from the oldest to the latest value of a latest first series,
+    None with fewer than 2 values, an oldest value which is not positive, or no real rate (a
+    negative latest value over more than one period).
+    """
+    if len(values) < 2 or not values[-1] > 0:
+        return None
+    with np.errstate(invalid='ignore'):
+        rate = np.float64(values[0] / values[-1]) ** (1 / (len(values) - 1)) - 1
+    return None if np.isnan(rate) else float(rate)
+
+
+def trailing_mean(values: np.ndarray, periods: int) -> float | None:
+    """
+    Mean of the latest `periods` values, None if there is none.
+    """
+    values = values[:periods]
+    if len(values) == 0:
+        return None
+    return float(values.mean())
+
+
+def mean_absolute_deviation(values: np.ndarray) -> float | None:
+    if len(values) == 0:
+        return None
+    return float(np.abs(values - values.mean()).mean())
+
+
+def coefficient_of_variation(values: np.ndarray) -> float | None:
+    """
+    Population standard deviation over the absolute mean, None without values or with a 0 mean.
+    """
+    if len(values) == 0 or values.mean() == 0:
+        return None
+    return float(values.std() / abs(values.mean()))
+
+
+_frames: OrderedDict[int, tuple[list, FinancialsFrame]] = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def get_financials_frame(metrics: list[dict] | None) -> FinancialsFrame:
+    """
+    Get the FinancialsFrame of a metric list, built once and shared by all the analysis nodes
+    reading the same list from the inputs. Like get_price_frame, the frame is kept out of the
+    graph state and looked up by the identity of the list.
+    """
+    if not metrics:
+        return FinancialsFrame.from_metrics(metrics)
+    key = id(metrics)
+    with _frames_lock:
+        entry = _frames.get(key)
+        # the entry holds the list, so its id can not be reused by another list while cached
+        if entry is not None and entry[0] is metrics and len(entry[1]) == len(metrics):
+            _frames.move_to_end(key)
+            return entry[1]
+    frame = FinancialsFrame.from_metrics(metrics)
+    with _frames_lock:
+        _frames[key] = (metrics, frame)
+        _frames.move_to_end(key)
+        while len(_frames) > MAX_CACHED_FRAMES:
+            _frames.popitem(last=False)
+    return frame
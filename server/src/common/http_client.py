@@ -0,0 +1,120 @@
+"""
+Shared HTTP connection pool for the remote data APIs.
+
+All requests go through one httpx.AsyncClient (keep-alive, HTTP/2 when h2 is installed
+and the server supports it) that lives on a dedicated event loop thread, so async graph
+nodes, sync callers and different event loops all reuse the same connections.
+"""
+
+import asyncio
+import atexit
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+MAX_CONNECTIONS_PER_HOST = 10
+KEEPALIVE_EXPIRY = 30
+TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+
+class HttpClient():
+    """
+    A pooled async HTTP client running on its own event loop thread.
+    Use `get` from async code and `run_sync` to drive a coroutine from sync code.
+    """
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS,
+                 max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+                 max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST):
+        self.max_connections_per_host = max_connections_per_host
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='http-client', daemon=True)
+        self.thread.start()
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        # only touched on self.loop
+        self.host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def _get(self, url: str, headers: dict = None) -> httpx.Response:
+        host = urlsplit(url).netloc
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self.host_semaphores[host] = semaphore
+        async with semaphore:
+            return await self.client.get(url, headers=headers)
+
+    async def get(self, url: str, headers: dict = None) -> httpx.Response:
+        """
+        GET the url through the shared pool, can be awaited from any event loop.
+        """
+        return await self.run(self._get(url, headers))
+
+    async def run(self, coro):
+        """
+        Await a coroutine on the pool loop from any event loop.
+        """
+        if self._on_pool_loop():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def run_sync(self, coro):
+        """
+        Run a coroutine on the pool loop and block until it is done, used by the sync wrappers.
+        """
+        if self._on_pool_loop():
+            raise RuntimeError('run_sync can not be called from the http client loop')
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the pool loop without waiting for it, returns a concurrent Future.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def _on_pool_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+
+_http_client: HttpClient | None = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """
+    Get the process wide HttpClient, created on first use.
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HttpClient()
+                atexit.register(_http_client.close)
+    return _http_client
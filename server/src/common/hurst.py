@@ -0,0 +1,162 @@
+"""
+Hurst exponent estimators on numpy arrays of prices.
+
+H < 0.5: mean reverting series
+H = 0.5: random walk
+H > 0.5: trending series
+
+Three estimators are available, all return 0.5 (random walk) when the series is too short:
+- variance: slope of log std(|x[t] - x[t-lag]|) against log lag, over lags 2..max_lag
+- rescaled_range: classic R/S analysis of the log returns over non-overlapping windows
+- dfa: detrended fluctuation analysis of the log returns with linear detrending
+"""
+
+import numpy as np
+
+from common.rolling import RollingWindow
+
+METHODS = ('variance', 'rescaled_range', 'dfa')
+
+# floor of the lag statistics, so their log is defined
+_MIN_TAU = 1e-8
+
+
+def _slope(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Least squares slope of y against x, along the last axis of y.
+    """
+    x_centered = x - x.mean()
+    denominator = (x_centered ** 2).sum()
+    if denominator <= 1e-10:
+        return np.full(y.shape[:-1], np.nan)
+    return ((y - y.mean(axis=-1, keepdims=True)) * x_centered).sum(axis=-1) / denominator
+
+
+def _clamp(hurst: float) -> float:
+    if np.isnan(hurst):
+        return 0.5
+    return float(max(0, min(1, hurst)))
+
+
+def _scales(low: int, high: int, count: int = 10) -> np.ndarray:
+    """
+    Log spaced integer window sizes between low and high.
+    """
+    if high < low:
+        return np.empty(0, dtype=int)
+    return np.unique(np.logspace(np.log10(low), np.log10(high), count).astype(int))
+
+
+def _log_returns(prices: np.ndarray) -> np.ndarray:
+    prices = prices[prices > 0]
+    return np.diff(np.log(prices))
+
+
+def _variance_lags(length: int, max_lag: int) -> np.ndarray:
+    return np.arange(2, min(max_lag, length // 4))
+
+
+def hurst_variance(prices: np.ndarray, max_lag: int = 20) -> float:
+    """
+    Hurst exponent from the scaling of the std of the absolute lagged differences.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) < max_lag * 2:
+        return 0.5
+    lags = _variance_lags(len(prices), max_lag)
+    if len(lags) < 2:
+        return 0.5
+    tau = np.array([np.abs(prices[lag:] - prices[:-lag]).std(ddof=1) for lag in lags])
+    tau = np.maximum(_MIN_TAU, np.nan_to_num(tau, nan=0.0))
+    return _clamp(_slope(np.log(lags), np.log(tau)))
+
+
+def hurst_rescaled_range(prices: np.ndarray, min_window: int = 8) -> float:
+    """
+    Hurst exponent from the rescaled range (R/S) of the log returns.
+    """
+    returns = _log_returns(np.asarray(prices, dtype=np.float64))
+    windows = _scales(min_window, len(returns) // 2)
+    if len(windows) < 2:
+        return 0.5
+    log_windows, log_rs = [], []
+    for window in windows:
+        chunks = returns[:len(returns) // window * window].reshape(-1, window)
+        deviations = np.cumsum(chunks - chunks.mean(axis=1, keepdims=True), axis=1)
+        ranges = deviations.max(axis=1) - deviations.min(axis=1)
+        stds = chunks.std(axis=1)
+        valid = stds > 0
+        if not valid.any():
+            continue
+        log_windows.append(np.log(window))
+        log_rs.append(np.log((ranges[valid] / stds[valid]).mean()))
+    if len(log_windows) < 2:
+        return 0.5
+    return _clamp(_slope(np.array(log_windows), np.array(log_rs)))
+
+
+def hurst_dfa(prices: np.ndarray, min_scale: int = 4) -> float:
+    """
+    Hurst exponent from detrended fluctuation analysis of the log returns.
+    """
+    returns = _log_returns(np.asarray(prices, dtype=np.float64))
+    scales = _scales(min_scale, len(returns) // 4)
+    if len(scales) < 2:
+        return 0.5
+    profile = np.cumsum(returns - returns.mean())
+    log_scales, log_fluctuations = [], []
+    for scale in scales:
+        segments = profile[:len(profile) // scale * scale].reshape(-1, scale)
+        # residuals of the least squares line of each segment
+        t = np.arange(scale) - (scale - 1) / 2
+        centered = segments - segments.mean(axis=1, keepdims=True)
+        slopes = (centered * t).sum(axis=1, keepdims=True) / (t ** 2).sum()
+        fluctuation = np.sqrt(((centered - slopes * t) ** 2).mean())
+        if fluctuation <= 0:
+            continue
+        log_scales.append(np.log(scale))
+        log_fluctuations.append(np.log(fluctuation))
+    if len(log_scales) < 2:
+        return 0.5
+    return _clamp(_slope(np.array(log_scales), np.array(log_fluctuations)))
+
+
+def hurst_exponent(prices: np.ndarray, method: str = 'variance', max_lag: int = 20) -> float:
+    if method == 'variance':
+        return hurst_variance(prices, max_lag)
+    if method == 'rescaled_range':
+        return hurst_rescaled_range(prices)
+    if method == 'dfa':
+        return hurst_dfa(prices)
+    raise Exception(f'Unknown hurst method: {method}')
+
+
+def rolling_hurst(prices: np.ndarray, window: int, method: str = 'variance', max_lag: int = 20) -> np.ndarray:
+    """
+    Hurst exponent of each window of prices ending at i, NaN while the window is incomplete.
+    The variance method runs in O(n) per lag over all windows at once, the other methods
+    estimate each window separately.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    series = np.full(len(prices), np.nan)
+    if len(prices) < window:
+        return series
+    if method != 'variance':
+        for end in range(window, len(prices) + 1):
+            series[end - 1] = hurst_exponent(prices[end - window:end], method, max_lag)
+        return series
+    if window < max_lag * 2:
+        series[window - 1:] = 0.5
+        return series
+    lags = _variance_lags(window, max_lag)
+    if len(lags) < 2:
+        series[window - 1:] = 0.5
+        return series
+    # log tau per (window end, lag); the window ending at i holds the differences ending at lag..i
+    log_tau = np.full((len(prices), len(lags)), np.nan)
+    for column, lag in enumerate(lags):
+        stds = RollingWindow(np.abs(prices[lag:] - prices[:-lag]), window - lag).std(ddof=1)
+        log_tau[lag:, column] = np.log(np.maximum(_MIN_TAU, np.where(np.isnan(stds), np.nan, stds)))
+    hurst = _slope(np.log(lags), log_tau[window - 1:])
+    series[window - 1:] = np.clip(np.where(np.isnan(hurst), 0.5, hurst), 0, 1)
+    return series
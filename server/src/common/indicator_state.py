@@ -0,0 +1,166 @@
+"""
+Incremental indicator state of a daily price series.
+
+The state keeps only the running values of the indicators (EMAs, Wilder smoothed averages,
+previous bar), so it is advanced in O(1) per new bar instead of recomputing the whole
+history, and it is small enough to be persisted per symbol with the price history.
+"""
+
+from dataclasses import asdict, dataclass, field
+
+from common.indicators import DMI_PERIOD, EMA_PERIODS, RSI_PERIODS, compute_indicators
+from common.input_store import get_input
+from common.price_frame import get_price_frame
+
+
+@dataclass
+class SmoothedAverage:
+    """
+    Exponential average seeded with the simple average of the first `period` values.
+    EMA uses alpha 2 / (period + 1), Wilder's smoothing uses alpha 1 / period.
+    """
+    period: int
+    alpha: float
+    value: float | None = None
+    count: int = 0
+    seed_sum: float = 0.0
+
+    @classmethod
+    def ema(cls, period: int) -> 'SmoothedAverage':
+        return cls(period, 2 / (period + 1))
+
+    @classmethod
+    def wilder(cls, period: int) -> 'SmoothedAverage':
+        return cls(period, 1 / period)
+
+    def update(self, x: float):
+        self.count += 1
+        if self.value is not None:
+            self.value += self.alpha * (x - self.value)
+            return
+        self.seed_sum += x
+        if self.count >= self.period:
+            self.value = self.seed_sum / self.period
+
+
+def _default_averages() -> dict[str, SmoothedAverage]:
+    averages = {f'ema_{period}': SmoothedAverage.ema(period) for period in EMA_PERIODS}
+    for period in RSI_PERIODS:
+        averages[f'gain_{period}'] = SmoothedAverage.wilder(period)
+        averages[f'loss_{period}'] = SmoothedAverage.wilder(period)
+    for name in ('tr', 'plus_dm', 'minus_dm', 'adx'):
+        averages[f'{name}_{DMI_PERIOD}'] = SmoothedAverage.wilder(DMI_PERIOD)
+    return averages
+
+
+@dataclass
+class IndicatorState:
+    # date of the last bar applied
+    last_date: str | None = None
+    prev_close: float | None = None
+    prev_high: float | None = None
+    prev_low: float | None = None
+    averages: dict[str, SmoothedAverage] = field(default_factory=_default_averages)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'IndicatorState':
+        state = cls(**{key: value for key, value in data.items() if key != 'averages'})
+        for name, average in data.get('averages', {}).items():
+            if name in state.averages:
+                state.averages[name] = SmoothedAverage(**average)
+        return state
+
+    @classmethod
+    def from_prices(cls, prices: list[dict]) -> 'IndicatorState':
+        state = cls()
+        state.advance(prices)
+        return state
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def advance(self, prices: list[dict]):
+        """
+        Apply the bars dated after the last applied bar, in order.
+        """
+        for price in prices:
+            date = price.get('date')
+            if self.last_date is not None and (date is None or date <= self.last_date):
+                continue
+            self.update(price)
+
+    def update(self, price: dict):
+        close = price.get('close')
+        if not close:
+            return
+        high = price.get('high') or close
+        low = price.get('low') or close
+        averages = self.averages
+
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            for period in RSI_PERIODS:
+                averages[f'gain_{period}'].update(max(change, 0))
+                averages[f'loss_{period}'].update(max(-change, 0))
+
+            # True Range and Directional Movement
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+            up_move = high - self.prev_high
+            down_move = self.prev_low - low
+            averages[f'tr_{DMI_PERIOD}'].update(tr)
+            averages[f'plus_dm_{DMI_PERIOD}'].update(up_move if up_move > down_move and up_move > 0 else 0)
+            averages[f'minus_dm_{DMI_PERIOD}'].update(down_move if down_move > up_move and down_move > 0 else 0)
+            plus_di, minus_di = self._directional_indicators()
+            if plus_di is not None:
+                dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di) if (plus_di + minus_di) != 0 else 0
+                averages[f'adx_{DMI_PERIOD}'].update(dx)
+
+        for period in EMA_PERIODS:
+            averages[f'ema_{period}'].update(close)
+
+        self.prev_close, self.prev_high, self.prev_low = close, high, low
+        self.last_date = price.get('date')
+
+    def _directional_indicators(self) -> tuple[float | None, float | None]:
+        tr = self.averages[f'tr_{DMI_PERIOD}'].value
+        if not tr:
+            return None, None
+        plus_dm = self.averages[f'plus_dm_{DMI_PERIOD}'].value
+        minus_dm = self.averages[f'minus_dm_{DMI_PERIOD}'].value
+        return 100 * plus_dm / tr, 100 * minus_dm / tr
+
+    def _rsi(self, period: int) -> float | None:
+        avg_gain = self.averages[f'gain_{period}'].value
+        avg_loss = self.averages[f'loss_{period}'].value
+        if avg_gain is None or avg_loss is None:
+            return None
+        if avg_loss == 0:
+            return 100
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def values(self) -> dict[str, float | None]:
+        """
+        Current indicator values, None while an indicator has fewer bars than its period.
+        """
+        plus_di, minus_di = self._directional_indicators()
+        values = {f'ema_{period}': self.averages[f'ema_{period}'].value for period in EMA_PERIODS}
+        values.update({f'rsi_{period}': self._rsi(period) for period in RSI_PERIODS})
+        values.update({
+            f'atr_{DMI_PERIOD}': self.averages[f'tr_{DMI_PERIOD}'].value,
+            f'adx_{DMI_PERIOD}': self.averages[f'adx_{DMI_PERIOD}'].value,
+            f'plus_di_{DMI_PERIOD}': plus_di,
+            f'minus_di_{DMI_PERIOD}': minus_di,
+            'last_date': self.last_date,
+        })
+        return values
+
+
+def get_state_indicators(state: dict) -> dict:
+    """
+    Indicator values of the ticker prices of the analysis, computed by start_analysis from the
+    persisted state, or computed over the prices input when they are not there.
+    """
+    indicators = get_input(state, 'indicators')
+    if indicators is None:
+        indicators = compute_indicators(get_price_frame(get_input(state, 'prices', []))).latest()
+    return indicators
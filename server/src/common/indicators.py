@@ -0,0 +1,243 @@
+"""
+Vectorized technical indicators over whole price series.
+
+Every indicator returns its full series, aligned with the input: the value at i is the
+indicator on the bar i, NaN while the indicator has fewer bars than its period. A 2-D input
+holds one series per row (a ticker x day matrix), the indicators run along the last axis. Moving
+averages are seeded like the incremental IndicatorState (the simple average of the first
+`period` values), so the last values of a series match the persisted indicator state.
+
+Exponential smoothing is recursive, it is computed in blocks of SMOOTHING_BLOCK values: inside
+a block every value is the weighted sum of the block values and of the value before the block,
+one matrix product, so the Python loop runs once per block instead of once per bar.
+
+compute_indicators computes the indicator set of the analysis modules in one pass over the
+arrays of a PriceFrame.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from common.price_frame import PriceFrame
+from common.rolling import RollingWindow, last, shift
+
+EMA_PERIODS = (8, 12, 21, 26, 55)
+SMA_PERIODS = (5, 20, 50)
+RSI_PERIODS = (14, 28)
+# period of ATR and ADX / DI
+DMI_PERIOD = 14
+BOLLINGER_PERIOD = 20
+# values per matrix product of the exponential smoothing
+SMOOTHING_BLOCK = 64
+
+
+@lru_cache(maxsize=32)
+def _smoothing_weights(alpha: float, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    weights[i, j], the weight of the value j of a block in its smoothed value i, and carry[i],
+    the weight of the smoothed value before the block.
+    """
+    decay = 1 - alpha
+    lags = np.subtract.outer(np.arange(size), np.arange(size))
+    weights = np.where(lags >= 0, alpha * decay ** np.maximum(lags, 0), 0.0)
+    carry = decay ** np.arange(1, size + 1)
+    return weights, carry
+
+
+def exponential_smoothing(values, period: int, alpha: float) -> np.ndarray:
+    """
+    Exponential average of the values, seeded with the simple average of the first `period`
+    values after the leading NaNs (the warm-up of another indicator).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rows = values.reshape(-1, values.shape[-1])
+    length = rows.shape[-1]
+    smoothed = np.full(rows.shape, np.nan)
+    finite = ~np.isnan(rows)
+    first = np.where(finite.any(axis=-1), finite.argmax(axis=-1), length)
+    seed_index = first + period - 1
+    seeded = np.flatnonzero((period > 0) & (seed_index < length))
+    if len(seeded) == 0:
+        return smoothed.reshape(values.shape)
+
+    # the recursion s[t] = (1 - alpha) * s[t - 1] + alpha * x[t] runs from 0 on every row, the
+    # input at the seed index is the one that makes s there the average of the first values
+    columns = np.arange(length)
+    cumulative = np.concatenate((np.zeros((len(rows), 1)), np.cumsum(np.where(finite, rows, 0.0), axis=-1)), axis=-1)
+    seeds = (cumulative[seeded, seed_index[seeded] + 1] - cumulative[seeded, first[seeded]]) / period
+    inputs = np.where(columns > seed_index[:, None], rows, 0.0)
+    inputs[seeded, seed_index[seeded]] = seeds / alpha
+
+    weights, carry = _smoothing_weights(alpha, SMOOTHING_BLOCK)
+    previous = np.zeros(len(rows))
+    for start in range(seed_index[seeded].min(), length, SMOOTHING_BLOCK):
+        block = inputs[:, start:start + SMOOTHING_BLOCK]
+        size = block.shape[-1]
+        smoothed[:, start:start + size] = block @ weights[:size, :size].T + previous[:, None] * carry[:size]
+        previous = smoothed[:, start + size - 1]
+    smoothed[columns < seed_index[:, None]] = np.nan
+    return smoothed.reshape(values.shape)
+
+
+def _previous(values: np.ndarray) -> np.ndarray:
+    return shift(values, 1)
+
+
+def sma(values, period: int) -> np.ndarray:
+    return RollingWindow(values, period).mean()
+
+
+def ema(values, period: int) -> np.ndarray:
+    return exponential_smoothing(values, period, 2 / (period + 1))
+
+
+def wilder(values, period: int) -> np.ndarray:
+    """
+    Wilder's smoothing, an exponential average with alpha 1 / period.
+    """
+    return exponential_smoothing(values, period, 1 / period)
+
+
+def returns(close) -> np.ndarray:
+    """
+    Percentage change of each value from the previous one, NaN for the first value and where
+    the previous value is not positive.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    previous = _previous(close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = (close - previous) / previous
+    return np.where(previous > 0, changes, np.nan) * 100
+
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    """
+    Relative Strength Index with Wilder's smoothing of the gains and losses.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    changes = close - _previous(close)
+    avg_gain = wilder(np.clip(changes, 0, None), period)
+    avg_loss = wilder(np.clip(-changes, 0, None), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, values)
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    MACD line (fast EMA - slow EMA), signal line (EMA of the MACD line) and histogram.
+    """
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger_bands(close, period: int = 20, width: float = 2) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Upper, middle (SMA) and lower bands, `width` population standard deviations from the middle.
+    """
+    window = RollingWindow(close, period)
+    middle = window.mean()
+    std = window.std()
+    return middle + width * std, middle, middle - width * std
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low, close = (np.asarray(values, dtype=np.float64) for values in (high, low, close))
+    previous = _previous(close)
+    ranges = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+    # a bar without a previous close has no true range
+    return np.where(np.isnan(previous), np.nan, ranges)
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    return wilder(true_range(high, low, close), period)
+
+
+def adx(high, low, close, period: int = 14) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Average Directional Index, +DI and -DI, with Wilder's smoothing.
+    """
+    high, low = np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64)
+    up_move = high - _previous(high)
+    down_move = _previous(low) - low
+    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    first = np.isnan(up_move) | np.isnan(down_move)
+    plus_dm[first] = minus_dm[first] = np.nan
+    tr = wilder(true_range(high, low, close), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = 100 * wilder(plus_dm, period) / tr
+        minus_di = 100 * wilder(minus_dm, period) / tr
+        dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    dx = np.where(plus_di + minus_di == 0, 0.0, dx)
+    return wilder(dx, period), plus_di, minus_di
+
+
+@dataclass(frozen=True)
+class Indicators:
+    """
+    Indicator series of a price frame by name (ema_8, rsi_14, adx_14, ...), aligned with its rows.
+    """
+    series: dict[str, np.ndarray]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.series[name]
+
+    def latest(self) -> dict[str, float | None]:
+        """
+        Last value of each indicator, None while it has fewer bars than its period.
+        """
+        return {name: last(values[~np.isnan(values)], default=None) for name, values in self.series.items()}
+
+
+def _bars(frame: PriceFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Rows of the frame with a close, and their high, low and close, a missing high or low is the
+    close.
+    """
+    close = frame.masked('close')
+    rows = ~np.isnan(close)
+    close = close[rows]
+    high = np.where(np.isnan(frame.masked('high')[rows]), close, frame.masked('high')[rows])
+    low = np.where(np.isnan(frame.masked('low')[rows]), close, frame.masked('low')[rows])
+    return rows, high, low, close
+
+
+def _aligned(series: dict[str, np.ndarray], rows: np.ndarray) -> Indicators:
+    aligned = {}
+    for name, values in series.items():
+        aligned[name] = np.full(len(rows), np.nan)
+        aligned[name][rows] = values
+    return Indicators(aligned)
+
+
+def directional_movement(frame: PriceFrame, period: int = DMI_PERIOD) -> Indicators:
+    """
+    ADX, +DI and -DI series of the frame (adx_14, plus_di_14, minus_di_14), aligned with its
+    rows like compute_indicators.
+    """
+    rows, high, low, close = _bars(frame)
+    series = dict(zip((f'adx_{period}', f'plus_di_{period}', f'minus_di_{period}'), adx(high, low, close, period)))
+    return _aligned(series, rows)
+
+
+def compute_indicators(frame: PriceFrame) -> Indicators:
+    """
+    Compute the indicators over the rows of the frame with a close, like the incremental
+    indicator state the rows without a close are skipped (their values are NaN) and a missing
+    high or low is the close.
+    """
+    rows, high, low, close = _bars(frame)
+
+    series = {f'ema_{period}': ema(close, period) for period in EMA_PERIODS}
+    series.update({f'sma_{period}': sma(close, period) for period in SMA_PERIODS})
+    series.update({f'rsi_{period}': rsi(close, period) for period in RSI_PERIODS})
+    series['macd'], series['macd_signal'], series['macd_histogram'] = macd(close)
+    series['bb_upper'], series['bb_middle'], series['bb_lower'] = bollinger_bands(close, BOLLINGER_PERIOD)
+    series[f'atr_{DMI_PERIOD}'] = atr(high, low, close, DMI_PERIOD)
+    series[f'adx_{DMI_PERIOD}'], series[f'plus_di_{DMI_PERIOD}'], series[f'minus_di_{DMI_PERIOD}'] = adx(high, low, close, DMI_PERIOD)
+    series['returns'] = returns(close)
+    return _aligned(series, rows)
@@ -0,0 +1,41 @@
+"""
+Raw inputs of an analysis (prices, metrics, news, insider transactions) referenced from the state.
+
+The raw inputs are large and only read by the analysis nodes, so the graph state holds their
+content addressed handles in the `inputs` channel instead of the data itself, and neither the
+checkpoints nor the state sent to the front end grow with the length of the history. A node
+resolves an input from the blob store when it reads it. The inputs of a sub-graph run are
+released (unpinned from memory) when it ends.
+"""
+
+import asyncio
+from typing import Any, Iterable
+
+from common import blob_store
+
+
+def _put_all(values: dict[str, Any]) -> dict[str, str]:
+    return {name: blob_store.put(value) for name, value in values.items()}
+
+
+async def put_inputs(**values: Any) -> dict[str, str]:
+    """
+    Store the inputs of an analysis, returning the update of the `inputs` channel.
+    The values are serialized and written in a thread, off the event loop.
+    """
+    return await asyncio.to_thread(_put_all, values)
+
+
+def get_input(state: dict, name: str, default: Any = None) -> Any:
+    """
+    Resolve an input of the state by name, default if the analysis did not load it.
+    """
+    handle = (state.get('inputs') or {}).get(name)
+    if handle is None:
+        return default
+    value = blob_store.get(handle)
+    return default if value is None else value
+
+
+def release(handles: Iterable[str]):
+    blob_store.release(handles)
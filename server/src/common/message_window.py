@@ -0,0 +1,165 @@
+"""
+Bounded conversation context for the intent and suggestion prompts.
+
+The prompts only need the recent turns of the thread, not every analysis report and data fence
+of it. The context keeps the last MAX_HISTORY_TURNS turns (a user message and the replies to it),
+with the AnalysisData fences removed, the TickerSelect fences reduced to the selected ticker and
+each message cut to MAX_MESSAGE_CHARS. The older turns are folded into a rolling summary of the
+user questions and of the tickers they were about, kept per thread so that each turn is only
+summarized once, and bounded to MAX_SUMMARY_TURNS lines.
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+# recent turns sent as messages
+MAX_HISTORY_TURNS = 4
+# max chars of a recent message
+MAX_MESSAGE_CHARS = 3000
+# older turns kept in the summary
+MAX_SUMMARY_TURNS = 20
+# max chars of a user question in the summary
+MAX_SUMMARY_QUESTION_CHARS = 200
+# threads with a cached summary
+MAX_THREADS = 256
+
+ANALYSIS_DATA_PATTERN = re.compile(r'```AnalysisData\s*\n.*?(?:```|$)', re.DOTALL)
+TICKER_SELECT_PATTERN = re.compile(r'```TickerSelect\s*\n(.*?)(?:```|$)', re.DOTALL)
+
+
+def get_message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict):
+            parts.append(part.get('text', part.get('content', '')) or '')
+    return '\n'.join(parts)
+
+
+def _selected_ticker(data: str) -> dict | None:
+    try:
+        data = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    selected = data.get('selected') or data
+    return selected if isinstance(selected, dict) and selected.get('symbol') else None
+
+
+def _ticker_label(ticker: dict) -> str:
+    name = ticker.get('short_name') or ticker.get('en_name')
+    return f"{name} ({ticker['symbol']})" if name else ticker['symbol']
+
+
+def strip_fences(text: str) -> str:
+    """
+    Remove the AnalysisData fences and replace the TickerSelect fences with the selected ticker.
+    """
+    text = ANALYSIS_DATA_PATTERN.sub('', text)
+
+    def replace_ticker_select(match: re.Match) -> str:
+        ticker = _selected_ticker(match.group(1))
+        return f'Selected ticker: {_ticker_label(ticker)}' if ticker is not None else ''
+
+    text = TICKER_SELECT_PATTERN.sub(replace_ticker_select, text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + ' ...'
+
+
+def split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """
+    Split the messages in turns, each starting at a user message.
+    """
+    turns = []
+    for message in messages:
+        if message.type == 'human' or len(turns) == 0:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def summarize_turn(turn: list[BaseMessage]) -> str:
+    question = ''
+    if turn[0].type == 'human':
+        question = ' '.join(strip_fences(get_message_text(turn[0])).split())
+    tickers = []
+    for message in turn:
+        for match in TICKER_SELECT_PATTERN.finditer(get_message_text(message)):
+            ticker = _selected_ticker(match.group(1))
+            if ticker is not None and _ticker_label(ticker) not in tickers:
+                tickers.append(_ticker_label(ticker))
+    line = f'- User: {_truncate(question, MAX_SUMMARY_QUESTION_CHARS)}' if question else '- Assistant reply'
+    if len(tickers) > 0:
+        line += f" (tickers: {', '.join(tickers)})"
+    return line
+
+
+class SummaryCache():
+    """
+    Rolling summaries of the older turns by thread id, LRU bounded to MAX_THREADS threads.
+    """
+
+    def __init__(self, max_threads: int = MAX_THREADS):
+        self.max_threads = max_threads
+        # thread id -> (summarized message count, id of the last summarized message, summary lines)
+        self.entries: OrderedDict[str, tuple[int, str | None, list[str]]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def summarize(self, thread_id: str | None, messages: list[BaseMessage]) -> list[str]:
+        """
+        Summary lines of messages, the older turns of the thread.
+        """
+        count, lines = 0, []
+        with self.lock:
+            entry = self.entries.get(thread_id) if thread_id is not None else None
+        # the cached summary is extended when the thread only grew since
+        if entry is not None and entry[0] <= len(messages) and entry[0] > 0 and messages[entry[0] - 1].id == entry[1]:
+            count, lines = entry[0], list(entry[2])
+        for turn in split_turns(messages[count:]):
+            lines.append(summarize_turn(turn))
+        lines = lines[-MAX_SUMMARY_TURNS:]
+        if thread_id is not None and len(messages) > 0:
+            with self.lock:
+                self.entries.pop(thread_id, None)
+                self.entries[thread_id] = (len(messages), messages[-1].id, lines)
+                while len(self.entries) > self.max_threads:
+                    self.entries.popitem(last=False)
+        return lines
+
+
+summary_cache = SummaryCache()
+
+
+def build_context(messages: list[BaseMessage], config: RunnableConfig = None, max_turns: int = MAX_HISTORY_TURNS) -> list[BaseMessage]:
+    """
+    Bounded context of the conversation: a summary of the older turns, then the recent turns
+    with their fences stripped.
+    """
+    turns = split_turns(messages or [])
+    older = [message for turn in turns[:-max_turns] for message in turn]
+    recent = [message for turn in turns[-max_turns:] for message in turn]
+
+    context = []
+    if len(older) > 0:
+        thread_id = (config or {}).get('configurable', {}).get('thread_id')
+        lines = summary_cache.summarize(thread_id, older)
+        context.append(SystemMessage(content='Summary of the earlier conversation:\n' + '\n'.join(lines)))
+    for message in recent:
+        text = _truncate(strip_fences(get_message_text(message)), MAX_MESSAGE_CHARS)
+        if text == '':
+            continue
+        context.append(message.model_copy(update={'content': text}))
+    return context
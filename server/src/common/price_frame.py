@@ -0,0 +1,124 @@
+"""
+Columnar daily price series for the technical analysis modules.
+
+The dataset returns prices as a list of dicts. PriceFrame stores them as contiguous numpy
+arrays, one per field, so indicators are computed with array operations instead of
+rebuilding `[p.get('close') for p in prices]` lists in every calculation.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+# number of price lists whose frame is kept by get_price_frame
+MAX_CACHED_FRAMES = 64
+
+
+@dataclass(frozen=True, eq=False)
+class PriceFrame:
+    # datetime64[D], NaT where missing
+    date: np.ndarray
+    # float64, NaN where missing
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_prices(cls, prices: list[dict] | None) -> 'PriceFrame':
+        prices = prices or []
+        return cls(
+            date=np.array([(price.get('date') or 'NaT')[:10] for price in prices], dtype='datetime64[D]'),
+            **{
+                name: np.array([price.get(name) for price in prices], dtype=np.float64)
+                for name in ('open', 'high', 'low', 'close', 'volume')
+            },
+        )
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+    def tail(self, name: str, n: int) -> np.ndarray | None:
+        """
+        Values of the last n rows, None if there are fewer rows or one of them is missing or 0.
+        """
+        if n <= 0 or len(self) < n:
+            return None
+        values = self.column(name)[-n:]
+        if np.isnan(values).any() or (values == 0).any():
+            return None
+        return values
+
+    def present(self, name: str) -> np.ndarray:
+        """
+        Values of the column with the missing and 0 values dropped.
+        """
+        values = self.column(name)
+        return values[~np.isnan(values) & (values != 0)]
+
+    def masked(self, name: str) -> np.ndarray:
+        """
+        Values of the column with 0 values as missing (NaN), aligned with the rows.
+        """
+        values = self.column(name)
+        return np.where(values == 0, np.nan, values)
+
+    def latest(self, name: str, default: float = 0) -> float:
+        """
+        Value of the last row, default if there are no rows or it is missing.
+        """
+        if len(self) == 0 or np.isnan(self.column(name)[-1]):
+            return default
+        return float(self.column(name)[-1])
+
+    def filled(self, name: str) -> np.ndarray:
+        """
+        Values of the column with missing values as 0.
+        """
+        return np.nan_to_num(self.column(name), nan=0.0)
+
+    def returns(self) -> np.ndarray:
+        """
+        Daily percentage returns of close, 0 where the previous close is missing or not positive.
+        """
+        close = self.filled('close')
+        if len(close) < 2:
+            return np.empty(0)
+        prev_close = close[:-1]
+        returns = np.zeros(len(prev_close))
+        np.divide(close[1:] - prev_close, prev_close, out=returns, where=prev_close > 0)
+        return returns * 100
+
+
+_frames: OrderedDict[int, tuple[list, PriceFrame]] = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def get_price_frame(prices: list[dict] | None) -> PriceFrame:
+    """
+    Get the PriceFrame of a price list, built once and shared by all the analysis nodes reading
+    the same list from the context. The frame is kept out of the graph state, which has to stay
+    serializable, and is looked up by the identity of the list instead.
+    """
+    if not prices:
+        return PriceFrame.from_prices(prices)
+    key = id(prices)
+    with _frames_lock:
+        entry = _frames.get(key)
+        # the entry holds the list, so its id can not be reused by another list while cached
+        if entry is not None and entry[0] is prices and len(entry[1]) == len(prices):
+            _frames.move_to_end(key)
+            return entry[1]
+    frame = PriceFrame.from_prices(prices)
+    with _frames_lock:
+        _frames[key] = (prices, frame)
+        _frames.move_to_end(key)
+        while len(_frames) > MAX_CACHED_FRAMES:
+            _frames.popitem(last=False)
+    return frame
@@ -0,0 +1,195 @@
+"""
+Persisted daily price history per symbol.
+
+Final bars (dated before today) of each symbol are kept in memory and on disk together with
+the indicator state advanced over them. A request for a price window already covered by the
+history only downloads the bars after the last stored bar, and the indicators of the window
+are the stored state advanced by the bars that are not in it yet, so a repeat analysis of a
+ticker on the next day costs O(new bars) in both fetch and compute.
+
+The indicator state is seeded at the first day of the month INDICATOR_LOOKBACK_DAYS before the
+end of the history, not at its first bar, so the stored indicators depend only on the bars and
+not on how long the server has kept the history. A new history is downloaded from that seed
+date, and the state is seeded again from the stored bars when the seed date moves.
+
+Histories are kept in memory for the MAX_CACHED_HISTORIES most recently used symbols.
+
+All functions run on the http client loop, where the per symbol locks live.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from common.dataset import AsyncDataset
+from common.indicator_state import IndicatorState
+from common.storage import get_data_dir, read_json, write_json
+
+# days of history kept per symbol, older bars are dropped
+MAX_HISTORY_DAYS = 2 * 365
+# days of bars the indicator state is seeded from, covers the longest indicator period
+INDICATOR_LOOKBACK_DAYS = 365
+# number of symbols whose history is kept in memory
+MAX_CACHED_HISTORIES = 256
+
+# (remote dataset url, symbol) -> history, least recently used first, only used on the http client loop
+_histories: OrderedDict[tuple[str, str], dict | None] = OrderedDict()
+_locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+
+def _shift_date(date: str, days: int) -> str:
+    # from noon, so a daylight saving change can not move the result to another day
+    return time.strftime("%Y-%m-%d", time.localtime(time.mktime(time.strptime(date[:10], "%Y-%m-%d")) + 12*60*60 + days*24*60*60))
+
+
+def _get_path(key: tuple[str, str]) -> str:
+    remote_url, symbol = key
+    directory = get_data_dir('price_history', hashlib.sha256(remote_url.encode('utf-8')).hexdigest()[:16])
+    return os.path.join(directory, f"{quote(symbol, safe='')}.json")
+
+
+def _seed_date(end_date: str) -> str:
+    """
+    Date the indicator state of a history ending at end_date is seeded from.
+    """
+    return _shift_date(end_date, -INDICATOR_LOOKBACK_DAYS)[:8] + '01'
+
+
+def _cache(key: tuple[str, str], history: dict | None):
+    _histories[key] = history
+    _histories.move_to_end(key)
+    while len(_histories) > MAX_CACHED_HISTORIES:
+        evicted, _ = _histories.popitem(last=False)
+        lock = _locks.get(evicted)
+        if lock is not None and not lock.locked():
+            del _locks[evicted]
+
+
+async def _load(key: tuple[str, str]) -> dict | None:
+    if key in _histories:
+        _histories.move_to_end(key)
+        return _histories[key]
+    history = await asyncio.to_thread(read_json, _get_path(key))
+    _cache(key, history)
+    return history
+
+
+async def _save(key: tuple[str, str], history: dict):
+    _cache(key, history)
+    await asyncio.to_thread(write_json, _get_path(key), history)
+
+
+def _seed(prices: list[dict], seed_date: str) -> dict:
+    return IndicatorState.from_prices([price for price in prices if price['date'][:10] >= seed_date]).to_dict()
+
+
+def _new_history(prices: list[dict], start_date: str, today: str) -> dict | None:
+    """
+    Build a history from a downloaded window, None if it holds no final bar.
+    """
+    final_prices = [price for price in prices if price.get('date') is not None and price['date'][:10] < today]
+    if len(final_prices) == 0:
+        return None
+    end_date = final_prices[-1]['date'][:10]
+    seed_date = max(_seed_date(end_date), start_date)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'seed_date': seed_date,
+        'prices': final_prices,
+        'indicators': _seed(final_prices, seed_date),
+    }
+
+
+def _append(history: dict, prices: list[dict], today: str) -> dict:
+    """
+    Append the final bars after the end of the history, trimming bars older than MAX_HISTORY_DAYS.
+    """
+    final_prices = [price for price in prices if history['end_date'] < price['date'][:10] < today]
+    if len(final_prices) == 0:
+        return history
+    end_date = final_prices[-1]['date'][:10]
+    start_date = max(history['start_date'], _shift_date(today, -MAX_HISTORY_DAYS))
+    all_prices = [price for price in history['prices'] if price['date'][:10] >= start_date] + final_prices
+    seed_date = max(_seed_date(end_date), start_date)
+    if history.get('seed_date') == seed_date:
+        state = IndicatorState.from_dict(history['indicators'])
+        state.advance(final_prices)
+        indicators = state.to_dict()
+    else:
+        indicators = _seed(all_prices, seed_date)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'seed_date': seed_date,
+        'prices': all_prices,
+        'indicators': indicators,
+    }
+
+
+async def _get_prices(dataset_client: AsyncDataset, symbol: str, start_date: str, end_date: str) -> list[dict]:
+    key = (dataset_client.remote_dataset_url, symbol)
+    lock = _locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        today = time.strftime("%Y-%m-%d")
+        history = await _load(key)
+        covered = (
+            history is not None
+            and history['start_date'] <= start_date
+            and start_date <= _shift_date(history['end_date'], 1)
+        )
+        if not covered:
+            # from the seed date of the indicator state, a week early for a last bar before a weekend
+            fetch_start_date = min(start_date, _seed_date(_shift_date(min(end_date, today), -7)))
+            prices = await dataset_client.get_prices(symbol, fetch_start_date, end_date)
+            if any(price.get('date') is None for price in prices):
+                if fetch_start_date < start_date:
+                    return await dataset_client.get_prices(symbol, start_date, end_date)
+                return prices
+            new_history = _new_history(prices, fetch_start_date, today)
+            # a window ending before the stored one (a backtest) does not replace it
+            if new_history is not None and (history is None or new_history['end_date'] >= history['end_date']):
+                await _save(key, new_history)
+            return [price for price in prices if price['date'][:10] >= start_date]
+
+        stored = [price for price in history['prices'] if start_date <= price['date'][:10] <= end_date]
+        if end_date <= history['end_date']:
+            return stored
+        new_prices = await dataset_client.get_prices(symbol, _shift_date(history['end_date'], 1), end_date)
+        if any(price.get('date') is None for price in new_prices):
+            return await dataset_client.get_prices(symbol, start_date, end_date)
+        new_history = _append(history, new_prices, today)
+        if new_history is not history:
+            await _save(key, new_history)
+        return stored + [price for price in new_prices if history['end_date'] < price['date'][:10] <= end_date]
+
+
+async def get_prices(dataset_client: AsyncDataset, symbol: str, start_date: str, end_date: str) -> list[dict]:
+    """
+    Get daily prices of the window, downloading only the bars the history does not hold yet.
+    """
+    return await dataset_client.http_client.run(_get_prices(dataset_client, symbol, start_date, end_date))
+
+
+async def _get_indicators(dataset_client: AsyncDataset, symbol: str, prices: list[dict]) -> dict:
+    key = (dataset_client.remote_dataset_url, symbol)
+    history = await _load(key)
+    dates = [price.get('date') for price in prices]
+    if history is not None and len(prices) > 0 and None not in dates:
+        state = IndicatorState.from_dict(history['indicators'])
+        # the stored state is reused when the window reaches its last bar
+        if state.last_date is not None and state.last_date in dates:
+            state.advance(prices)
+            return state.values()
+    return IndicatorState.from_prices(prices).values()
+
+
+async def get_indicators(dataset_client: AsyncDataset, symbol: str, prices: list[dict]) -> dict:
+    """
+    Indicator values at the last bar of prices, from the stored indicator state advanced by
+    the bars after it, or computed over prices when the state does not match the window.
+    """
+    return await dataset_client.http_client.run(_get_indicators(dataset_client, symbol, prices))
@@ -0,0 +1,70 @@
+"""
+Daily prices of many tickers as 2-D arrays, one row per ticker and one column per bar.
+
+Each row holds the bars of its ticker only, aligned on the last column and NaN before the first
+bar, so the tickers of markets with different calendars (holidays, suspensions) are not padded
+with the bars of the others: the indicators of a row are those of the ticker's own series, and
+they still run over all the rows at once.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from common.price_frame import PriceFrame
+
+
+@dataclass(frozen=True, eq=False)
+class PriceMatrix:
+    symbols: list[str]
+    # datetime64[D], tickers x bars, NaT before the first bar
+    date: np.ndarray
+    # float64, tickers x dates
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_prices(cls, prices_by_symbol: dict[str, list[dict]]) -> 'PriceMatrix':
+        symbols = list(prices_by_symbol)
+        frames = [PriceFrame.from_prices(prices_by_symbol[symbol]) for symbol in symbols]
+        # bars with a date and a close
+        rows = [~np.isnat(frame.date) & ~np.isnan(frame.masked('close')) for frame in frames]
+        shape = (len(symbols), max((int(present.sum()) for present in rows), default=0))
+
+        date = np.full(shape, np.datetime64('NaT'), dtype='datetime64[D]')
+        columns = {name: np.full(shape, np.nan) for name in ('open', 'high', 'low', 'close', 'volume')}
+        for i, (frame, present) in enumerate(zip(frames, rows)):
+            start = shape[1] - int(present.sum())
+            date[i, start:] = frame.date[present]
+            for name, values in columns.items():
+                values[i, start:] = frame.masked(name)[present]
+
+        close = columns['close']
+        started = ~np.isnan(close)
+        # a missing open, high or low is the close, a missing volume is 0
+        for name in ('open', 'high', 'low'):
+            columns[name] = np.where(np.isnan(columns[name]) & started, close, columns[name])
+        columns['volume'] = np.where(np.isnan(columns['volume']) & started, 0.0, columns['volume'])
+        return cls(symbols=symbols, date=date, **columns)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def lengths(self) -> np.ndarray:
+        """
+        Number of bars of each ticker, from its first bar.
+        """
+        return (~np.isnan(self.close)).sum(axis=-1)
+
+    def frame(self, i: int) -> PriceFrame:
+        """
+        PriceFrame of the ticker of row i, from its first bar.
+        """
+        present = ~np.isnan(self.close[i])
+        return PriceFrame(
+            date=self.date[i][present],
+            **{name: getattr(self, name)[i][present] for name in ('open', 'high', 'low', 'close', 'volume')},
+        )
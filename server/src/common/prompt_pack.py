@@ -0,0 +1,127 @@
+"""
+Compact serialization of analysis data for the analyzer prompts.
+
+The repr of the analysis dicts spends prompt tokens on quotes, braces, full precision floats and
+on keys repeated in every entry (the type and title of each analysis, the markdown _id_). The
+packed format is an indented `key: value` text with numbers rounded to PRECISION significant
+digits, lists of dicts with the same keys written as a table (the keys once, then one row per
+item). The keys of DROP_KEYS, plus the drop keys of the agent, are left out of the top level of
+each analysis, the keys of the same names nested in the analysis data are kept.
+"""
+
+import logging
+import math
+from typing import Any, Iterable
+
+from langchain_core.runnables import RunnableConfig
+from litellm import token_counter
+
+from common.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# significant digits of the floats
+PRECISION = 4
+# keys not sent to the analyzer: the markdown id, and type/title which repeat the analysis key
+DROP_KEYS = ('_id_', 'type', 'title')
+
+
+def format_number(value: float, precision: int = PRECISION) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value) or math.isinf(value):
+        return 'null'
+    text = f'{value:.{precision}g}'
+    if 'e' in text and abs(value) >= 1:
+        # large values stay plain numbers, rounded to the significant digits
+        text = str(int(float(text)))
+    return text
+
+
+def format_scalar(value: Any, precision: int = PRECISION) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, (int, float)):
+        return format_number(value, precision)
+    return ' '.join(str(value).split())
+
+
+def _is_scalar(value: Any) -> bool:
+    return not isinstance(value, (dict, list, tuple))
+
+
+def _pack(value: Any, precision: int, indent: str, lines: list[str]):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if _is_scalar(item):
+                lines.append(f'{indent}{key}: {format_scalar(item, precision)}')
+            elif len(item) == 0:
+                continue
+            elif isinstance(item, (list, tuple)) and all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in item):
+                lines.append(f"{indent}{key}: [{', '.join(format_number(x, precision) for x in item)}]")
+            else:
+                lines.append(f'{indent}{key}:')
+                _pack(item, precision, indent + '  ', lines)
+        return
+    if isinstance(value, (list, tuple)):
+        rows = [item for item in value if isinstance(item, dict)]
+        columns = list(rows[0]) if len(rows) > 0 else []
+        if len(rows) == len(value) and len(columns) > 0 and all(
+            list(row) == columns and all(_is_scalar(row[key]) for key in columns)
+            for row in rows
+        ):
+            # same keys in every item, one table
+            lines.append(f"{indent}{' | '.join(columns)}")
+            for row in rows:
+                lines.append(f"{indent}- {' | '.join(format_scalar(row[key], precision) for key in columns)}")
+            return
+        for item in value:
+            if _is_scalar(item):
+                lines.append(f'{indent}- {format_scalar(item, precision)}')
+            else:
+                lines.append(f'{indent}-')
+                _pack(item, precision, indent + '  ', lines)
+        return
+    lines.append(f'{indent}{format_scalar(value, precision)}')
+
+
+def pack(value: Any, precision: int = PRECISION) -> str:
+    """
+    Pack a value in the compact prompt format.
+    """
+    lines = []
+    _pack(value, precision, '', lines)
+    return '\n'.join(lines)
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """
+    Prompt tokens of the text, with the tokenizer of model when litellm knows it.
+    """
+    try:
+        return token_counter(model=model or '', text=text)
+    except Exception:
+        # about 4 chars per token
+        return len(text) // 4
+
+
+def pack_analysis_data(analysis_data: dict, name: str, config: RunnableConfig, drop: Iterable[str] = ()) -> str:
+    """
+    Pack the analysis data of an end_analysis prompt, analyses in key order so that the same
+    data always gives the same prompt, and log its token count for the analysis model.
+    The keys of DROP_KEYS and drop are left out of the top level of each analysis.
+    """
+    drop = frozenset(DROP_KEYS).union(drop)
+    blocks = {}
+    for key in sorted(analysis_data):
+        block = analysis_data[key]
+        if isinstance(block, dict):
+            block = {item: value for item, value in block.items() if item not in drop}
+        blocks[key] = block
+    text = pack(blocks)
+    if logger.isEnabledFor(logging.INFO):
+        model = Settings(config).get_analysis_model().get('model')
+        logger.info('%s analysis data: %d prompt tokens', name, count_tokens(text, model))
+    return text
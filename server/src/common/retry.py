@@ -0,0 +1,121 @@
+"""
+Retry policy and circuit breaker for requests to the remote data APIs.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+# status codes worth retrying, other 4xx responses will fail the same way again
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryPolicy():
+    """
+    Exponential backoff with full jitter, honoring Retry-After, bounded by a total deadline.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 20.0,
+                 multiplier: float = 2.0, deadline: float = 60.0,
+                 retryable_status_codes: set[int] = RETRYABLE_STATUS_CODES):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.deadline = deadline
+        self.retryable_status_codes = retryable_status_codes
+
+    def is_retryable(self, status_code: int | None) -> bool:
+        """
+        None means the request failed before getting a response (timeout, connection error).
+        """
+        return status_code is None or status_code in self.retryable_status_codes
+
+    def get_delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """
+        Delay before the next attempt, attempt starts from 0.
+        """
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(server_delay, self.max_delay)
+        backoff = min(self.max_delay, self.base_delay * (self.multiplier ** attempt))
+        return random.uniform(0, backoff)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse a Retry-After header, in seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker():
+    """
+    Stop calling an endpoint after `failure_threshold` consecutive failures, then let one
+    trial request through after `reset_timeout` seconds (half open) to check if it recovered.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_running or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def release_trial(self):
+        """
+        End a request which got no answer from the endpoint (cancelled, or failed in the client)
+        without counting it, so a half open trial ending that way lets the next request try again.
+        """
+        with self.lock:
+            self.trial_running = False
+
+
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """
+    Get the process wide circuit breaker of an endpoint, e.g. 'data.aostock.com/api/v1/ticker/prices'.
+    """
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _circuit_breakers[endpoint] = breaker
+        return breaker
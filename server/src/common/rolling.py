@@ -0,0 +1,134 @@
+"""
+Rolling window statistics over a whole series in O(n).
+
+Window sums of x, x^2, x^3 and x^4 are taken from cumulative sums, once per series, and the
+rolling mean, standard deviation, skewness and kurtosis are derived from them for every
+window at once. Series are aligned with the input: the value at i is the statistic of the
+window ending at i, NaN while the window is incomplete or holds a missing (NaN) value.
+A 2-D input holds one series per row, the windows run along the last axis.
+"""
+
+import numpy as np
+
+# central moments below this fraction of the raw sum of squares are rounding noise
+_CANCELLATION_TOLERANCE = 1e-10
+
+
+class RollingWindow():
+    """
+    Rolling statistics of a series over a fixed window.
+    """
+
+    def __init__(self, values, window: int):
+        values = np.asarray(values, dtype=np.float64)
+        self.window = window
+        self.shape = values.shape
+        self.length = values.shape[-1]
+        missing = np.isnan(values)
+        # sums are taken around the series mean, to limit cancellation in the central moments
+        counts = (~missing).sum(axis=-1, keepdims=True)
+        self.shift = np.where(missing, 0.0, values).sum(axis=-1, keepdims=True) / np.maximum(counts, 1)
+        self.values = np.where(missing, 0.0, values - self.shift)
+        self.complete = self._window_sums(missing.astype(np.float64)) == 0
+        self.power_sums: dict[int, np.ndarray] = {}
+
+    def _window_sums(self, values: np.ndarray) -> np.ndarray:
+        sums = np.full(self.shape, np.nan)
+        if self.window <= 0 or self.length < self.window:
+            return sums
+        cumulative = np.concatenate((np.zeros(self.shape[:-1] + (1,)), np.cumsum(values, axis=-1)), axis=-1)
+        sums[..., self.window - 1:] = cumulative[..., self.window:] - cumulative[..., :-self.window]
+        return sums
+
+    def _sum(self, power: int) -> np.ndarray:
+        sums = self.power_sums.get(power)
+        if sums is None:
+            sums = np.where(self.complete, self._window_sums(self.values ** power), np.nan)
+            self.power_sums[power] = sums
+        return sums
+
+    def _central_moments(self, order: int) -> list[np.ndarray]:
+        """
+        Sums of (x - mean)^k over each window, for k from 2 to order.
+        """
+        n = self.window
+        s1, s2 = self._sum(1), self._sum(2)
+        m = s1 / n
+        m2 = s2 - n * m ** 2
+        m2 = np.where(m2 > _CANCELLATION_TOLERANCE * s2, m2, np.where(np.isnan(m2), np.nan, 0.0))
+        moments = [m2]
+        if order >= 3:
+            s3 = self._sum(3)
+            moments.append(s3 - 3 * m * s2 + 2 * n * m ** 3)
+        if order >= 4:
+            s4 = self._sum(4)
+            moments.append(s4 - 4 * m * s3 + 6 * m ** 2 * s2 - 3 * n * m ** 4)
+        return moments
+
+    def mean(self) -> np.ndarray:
+        return self._sum(1) / self.window + self.shift
+
+    def var(self, ddof: int = 0) -> np.ndarray:
+        if self.window - ddof <= 0:
+            return np.full(self.shape, np.nan)
+        m2, = self._central_moments(2)
+        return m2 / (self.window - ddof)
+
+    def std(self, ddof: int = 0) -> np.ndarray:
+        return np.sqrt(self.var(ddof))
+
+    def skew(self) -> np.ndarray:
+        """
+        Sample skewness, 0 for windows with no variation.
+        """
+        n = self.window
+        if n < 3:
+            return np.where(self.complete, 0.0, np.nan)
+        m2, m3 = self._central_moments(3)
+        std = np.sqrt(m2 / (n - 1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            skew = m3 / std ** 3 * n / ((n - 1) * (n - 2))
+        return np.where(std > 0, skew, np.where(np.isnan(std), np.nan, 0.0))
+
+    def kurt(self) -> np.ndarray:
+        """
+        Sample kurtosis (bias corrected excess kurtosis), 3 for windows with no variation.
+        """
+        n = self.window
+        if n < 4:
+            return np.where(self.complete, 3.0, np.nan)
+        m2, m3, m4 = self._central_moments(4)
+        std = np.sqrt(m2 / (n - 1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kurt = m4 / std ** 4 * n * (n + 1) / ((n - 1) * (n - 2) * (n - 3)) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        return np.where(std > 0, kurt, np.where(np.isnan(std), np.nan, 3.0))
+
+
+def last(series: np.ndarray, default: float | None = 0, offset: int = 1) -> float | None:
+    """
+    Value of the series `offset` rows from the end, default if there is none or it is NaN.
+    """
+    if len(series) < offset or np.isnan(series[-offset]):
+        return default
+    return float(series[-offset])
+
+
+def last_column(series: np.ndarray, default: float = 0, offset: int = 1) -> np.ndarray:
+    """
+    Value of each row of a 2-D series `offset` columns from the end, default where there is
+    none or it is NaN.
+    """
+    if series.shape[-1] < offset:
+        return np.full(series.shape[:-1], default, dtype=np.float64)
+    values = series[..., -offset]
+    return np.where(np.isnan(values), default, values)
+
+
+def shift(series: np.ndarray, periods: int = 1) -> np.ndarray:
+    """
+    Series moved `periods` values later along the last axis, NaN for the first values.
+    """
+    shifted = np.full(series.shape, np.nan)
+    if periods < series.shape[-1]:
+        shifted[..., periods:] = series[..., :series.shape[-1] - periods]
+    return shifted
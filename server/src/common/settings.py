@@ -1,27 +1,117 @@
 import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping
 from langchain_core.runnables import RunnableConfig
 import json
 
+# decoded settings kept for the most recently used x-settings values
+MAX_CACHED_SNAPSHOTS = 64
+# secret fields left out of the fingerprint
+SECRET_FIELDS = ('api_key', 'remoteFinancialDataApiKey')
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _without_secrets(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _without_secrets(item) for key, item in value.items() if key not in SECRET_FIELDS}
+    if isinstance(value, list):
+        return [_without_secrets(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot():
+    """
+    Immutable decoded x-settings of a run.
+    fingerprint is the sha256 of the settings json without the secret fields, a stable key for
+    caches depending on the settings.
+    """
+    data: Mapping[str, Any]
+    fingerprint: str
+
+
+EMPTY_SETTINGS = SettingsSnapshot(MappingProxyType({}), hashlib.sha256(b'').hexdigest())
+
+
+def decode_settings(value: str) -> SettingsSnapshot:
+    """
+    Decode a base64 x-settings value.
+    """
+    if value == "":
+        return EMPTY_SETTINGS
+    data = json.loads(base64.b64decode(value).decode('utf-8'))
+    content = json.dumps(_without_secrets(data), sort_keys=True)
+    return SettingsSnapshot(_freeze(data), hashlib.sha256(content.encode('utf-8')).hexdigest())
+
+
+_snapshots: OrderedDict[str, SettingsSnapshot] = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def get_settings_snapshot(value: str) -> SettingsSnapshot:
+    """
+    Decoded x-settings value, decoded once and shared by all the nodes of the runs sending the same
+    header. LangGraph copies the configurable for each node, so the snapshot is looked up by the
+    sha256 of the header instead of being stored in the config.
+    """
+    if value == "":
+        return EMPTY_SETTINGS
+    key = hashlib.sha256(value.encode('utf-8')).hexdigest()
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots.move_to_end(key)
+            return snapshot
+    snapshot = decode_settings(value)
+    with _snapshots_lock:
+        _snapshots[key] = snapshot
+        _snapshots.move_to_end(key)
+        while len(_snapshots) > MAX_CACHED_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return snapshot
+
 
 class Settings():
     def __init__(self, config: RunnableConfig):
         self.config = config
-        self.dict = self.get_settings(config)
+        self.snapshot = self.get_settings(config)
+        self.dict = self.snapshot.data
+        self.fingerprint = self.snapshot.fingerprint
 
 
-    def get_settings(self, config: RunnableConfig) -> dict:
-        settings = config.get("configurable", {}).get("x-settings", "")
-        if settings == "":
-            return None
-        # base64 decode
-        settings = base64.b64decode(settings).decode('utf-8')
-        return json.loads(settings)
+    def get_settings(self, config: RunnableConfig) -> SettingsSnapshot:
+        """
+        Decoded x-settings of the run.
+        """
+        configurable = (config or {}).get("configurable")
+        if configurable is None:
+            return EMPTY_SETTINGS
+        return get_settings_snapshot(configurable.get("x-settings", ""))
 
     def get_intent_recognition_model(self) -> dict:
-        return self.dict.get("intentRecognitionModel", {})
-    
+        return _thaw(self.dict.get("intentRecognitionModel", {}))
+
     def get_analysis_model(self) -> dict:
-        return self.dict.get("analysisModel", {})
+        return _thaw(self.dict.get("analysisModel", {}))
 
     def get_model_list(self) -> list:
         intent_recognition_model = self.get_intent_recognition_model()
@@ -39,6 +129,16 @@ class Settings():
 
     def get_remote_financial_data_api_url(self) -> str:
         return self.dict.get("remoteFinancialDataApiUrl", "")
-    
+
     def get_remote_financial_data_api_key(self) -> str:
         return self.dict.get("remoteFinancialDataApiKey", "")
+
+    def get_analysis_concurrency(self) -> int:
+        """
+        Max number of agent x ticker analysis tasks running at the same time, 1 means run one by one.
+        """
+        concurrency = self.dict.get("analysisConcurrency", 4)
+        try:
+            return max(1, int(concurrency))
+        except (TypeError, ValueError):
+            return 4
@@ -0,0 +1,58 @@
+"""
+Local data directory of the server, for state kept between runs.
+"""
+
+import json
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATA_DIR = os.getenv('AI_FINANCE_DATA_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ai-finance-agents'))
+
+
+def get_data_dir(*names: str) -> str:
+    """
+    Get (and create) a directory under the data directory.
+    """
+    path = os.path.join(DATA_DIR, *names)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def read_json(path: str) -> any:
+    """
+    Read a json file, None if it does not exist or can not be read.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f'Failed to read {path}: {e}')
+        return None
+
+
+def write_text(path: str, text: str):
+    """
+    Write a file atomically, so readers never see a partial file. Errors are only logged.
+    """
+    try:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f'Failed to write {path}: {e}')
+
+
+def write_json(path: str, data: any):
+    """
+    Write a json file atomically, errors are only logged.
+    """
+    write_text(path, json.dumps(data))
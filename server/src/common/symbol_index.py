@@ -0,0 +1,283 @@
+"""
+Local index of tickers, for symbol and company name lookups without the remote dataset.
+
+Tickers are persisted by symbol in the data directory, filled from a bulk symbol list (the json
+or csv file of AI_FINANCE_SYMBOL_LIST, merged again whenever the file changes) and refreshed
+incrementally with the results of the remote ticker lookup. In memory the index keeps a sorted
+array of the lower case symbols, names and name words for prefix search (bisect), and a trigram
+index of the symbols and names for fuzzy search, so a lookup takes microseconds and works offline.
+
+Tickers added by the lookups are indexed in place, and the index file is saved SAVE_DELAY seconds
+after the first unsaved change in a timer thread, so a burst of lookups writes it once.
+"""
+
+import atexit
+import csv
+import os
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from common.storage import get_data_dir, read_json, write_json
+
+load_dotenv()
+
+SYMBOL_LIST_FILE = os.getenv('AI_FINANCE_SYMBOL_LIST', '')
+
+# fields of a ticker searched by name
+NAME_FIELDS = ('short_name', 'long_name', 'en_name', 'name')
+# min fraction of the query trigrams a fuzzy match must have
+MIN_TRIGRAM_SCORE = 0.7
+# seconds between the first unsaved change and the save of the index file
+SAVE_DELAY = 5.0
+
+_NORMALIZE_PATTERN = re.compile(r'[^0-9a-z㐀-鿿]+')
+
+
+def normalize(text: str) -> str:
+    return _NORMALIZE_PATTERN.sub(' ', str(text).lower()).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    text = f' {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def read_symbol_list(path: str) -> list[dict]:
+    """
+    Read a bulk symbol list, a json list of tickers or a csv file with a header row.
+    """
+    if path.endswith('.csv'):
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                return [dict(row) for row in csv.DictReader(f)]
+        except OSError as e:
+            print(f'Failed to read {path}: {e}')
+            return []
+    tickers = read_json(path)
+    return tickers if isinstance(tickers, list) else []
+
+
+class SymbolIndex():
+    """
+    Tickers by upper case symbol, with prefix and fuzzy search over symbols and names.
+    Loaded on first use, saved shortly after new tickers are added. The methods block on the
+    file system when the index is loaded, async code calls them in a thread.
+    """
+
+    def __init__(self, path: str = None, symbol_list_path: str = SYMBOL_LIST_FILE):
+        self.path = path or os.path.join(get_data_dir(), 'symbols.json')
+        self.symbol_list_path = symbol_list_path
+        self.tickers: dict[str, dict] | None = None
+        # mtime of the symbol list last merged
+        self.symbol_list_modified: float | None = None
+        # sorted (key, symbol) pairs of the prefix search
+        self.keys: list[tuple[str, str]] = []
+        # trigram -> symbols
+        self.trigrams: dict[str, set[str]] = {}
+        # symbol -> trigrams of its symbol and names
+        self.ticker_trigrams: dict[str, set[str]] = {}
+        self.lock = threading.Lock()
+        # serializes the writes of the index file
+        self.save_lock = threading.Lock()
+        self.save_timer: threading.Timer | None = None
+        self.dirty = False
+        atexit.register(self.flush)
+
+    def _load(self) -> dict[str, dict]:
+        if self.tickers is not None:
+            return self.tickers
+        data = read_json(self.path) or {}
+        # older index files only hold the tickers
+        self.tickers = data.get('tickers', {}) if 'tickers' in data else data
+        self.symbol_list_modified = data.get('symbol_list_modified')
+        if self.symbol_list_path and os.path.exists(self.symbol_list_path):
+            modified = os.path.getmtime(self.symbol_list_path)
+            if modified != self.symbol_list_modified:
+                self._merge(read_symbol_list(self.symbol_list_path))
+                self.symbol_list_modified = modified
+                self._save()
+        self._build()
+        return self.tickers
+
+    def _save(self):
+        write_json(self.path, {'symbol_list_modified': self.symbol_list_modified, 'tickers': self.tickers})
+
+    def _schedule_save(self):
+        self.dirty = True
+        if self.save_timer is None:
+            self.save_timer = threading.Timer(SAVE_DELAY, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        """
+        Save the index file if it has unsaved changes.
+        """
+        with self.save_lock:
+            with self.lock:
+                if self.save_timer is not None:
+                    self.save_timer.cancel()
+                    self.save_timer = None
+                if not self.dirty:
+                    return
+                self.dirty = False
+                # the tickers are replaced and never modified, a shallow copy is a consistent snapshot
+                data = {'symbol_list_modified': self.symbol_list_modified, 'tickers': dict(self.tickers)}
+            write_json(self.path, data)
+
+    def _merge(self, tickers: list[dict], incremental: bool = False) -> list[str]:
+        """
+        Merge tickers into the index, returning the new or changed symbols. When incremental, the
+        search index is updated with them, otherwise it must be built again.
+        """
+        merged = []
+        for ticker in tickers:
+            if not isinstance(ticker, dict):
+                continue
+            symbol = (ticker.get('symbol') or '').upper()
+            if symbol == '':
+                continue
+            known = self.tickers.get(symbol)
+            if known == ticker:
+                continue
+            if incremental and known is not None:
+                self._unindex(symbol)
+            self.tickers[symbol] = ticker
+            if incremental:
+                self._index(symbol, sorted_insert=True)
+            merged.append(symbol)
+        return merged
+
+    def _names(self, symbol: str) -> list[str]:
+        ticker = self.tickers[symbol]
+        names = [symbol.lower()]
+        for field in NAME_FIELDS:
+            name = normalize(ticker.get(field) or '')
+            if name != '' and name not in names:
+                names.append(name)
+        return names
+
+    def _keys(self, names: list[str]) -> set[str]:
+        # the symbol, the names and the words of the names are prefix search keys
+        keys = set(names)
+        for name in names:
+            keys.update(name.split(' '))
+        return keys
+
+    def _index(self, symbol: str, sorted_insert: bool):
+        names = self._names(symbol)
+        for key in self._keys(names):
+            if sorted_insert:
+                insort(self.keys, (key, symbol))
+            else:
+                self.keys.append((key, symbol))
+        grams = set()
+        for name in names:
+            grams.update(trigrams(name))
+        self.ticker_trigrams[symbol] = grams
+        for gram in grams:
+            self.trigrams.setdefault(gram, set()).add(symbol)
+
+    def _unindex(self, symbol: str):
+        for key in self._keys(self._names(symbol)):
+            position = bisect_left(self.keys, (key, symbol))
+            if position < len(self.keys) and self.keys[position] == (key, symbol):
+                del self.keys[position]
+        for gram in self.ticker_trigrams.pop(symbol, ()):
+            symbols = self.trigrams.get(gram)
+            if symbols is not None:
+                symbols.discard(symbol)
+                if len(symbols) == 0:
+                    del self.trigrams[gram]
+
+    def _build(self):
+        self.keys = []
+        self.trigrams = {}
+        self.ticker_trigrams = {}
+        for symbol in self.tickers:
+            self._index(symbol, sorted_insert=False)
+        self.keys.sort()
+
+    def get(self, symbol: str) -> dict | None:
+        with self.lock:
+            return self._load().get(symbol.upper())
+
+    def add(self, tickers: list[dict]):
+        """
+        Add the tickers of a lookup result, scheduling a save of the index if any of them is new or
+        changed.
+        """
+        with self.lock:
+            self._load()
+            if len(self._merge(tickers, incremental=True)) > 0:
+                self._schedule_save()
+
+    def _prefix_search(self, query: str, limit: int) -> list[str]:
+        symbols = []
+        start = bisect_left(self.keys, (query, ''))
+        for key, symbol in self.keys[start:]:
+            if not key.startswith(query) or len(symbols) >= limit:
+                break
+            if symbol not in symbols:
+                symbols.append(symbol)
+        return symbols
+
+    def _fuzzy_search(self, query: str, limit: int) -> list[str]:
+        query_grams = trigrams(query)
+        counts = Counter()
+        for gram in query_grams:
+            counts.update(self.trigrams.get(gram, ()))
+        scored = []
+        for symbol, count in counts.items():
+            score = count / len(query_grams)
+            if score >= MIN_TRIGRAM_SCORE:
+                # ties prefer the ticker whose names have the fewest other trigrams
+                similarity = count / (len(query_grams) + len(self.ticker_trigrams[symbol]) - count)
+                scored.append((score, similarity, symbol))
+        scored.sort(reverse=True)
+        return [symbol for _, _, symbol in scored[:limit]]
+
+    def match(self, query: str, limit: int = 10) -> tuple[list[dict], bool]:
+        """
+        Tickers matching the query: the exact symbol, then symbol and name prefix matches,
+        or the fuzzy (trigram) matches when no prefix matches. The flag is True when one of them
+        is an exact match of the query, its symbol or one of its full names.
+        """
+        query = normalize(query)
+        if query == '':
+            return [], False
+        with self.lock:
+            tickers = self._load()
+            symbols = []
+            exact = query.upper().replace(' ', '.')
+            if exact in tickers:
+                symbols.append(exact)
+            for symbol in self._prefix_search(query, limit):
+                if symbol not in symbols:
+                    symbols.append(symbol)
+            if len(symbols) == 0:
+                symbols = self._fuzzy_search(query, limit)
+            symbols = symbols[:limit]
+            # the keys equal to the query sort first among the prefix matches
+            matched = exact in tickers or any(query in self._names(symbol) for symbol in symbols)
+            return [tickers[symbol] for symbol in symbols], matched
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """
+        Tickers matching the query, see match.
+        """
+        return self.match(query, limit)[0]
+
+
+_symbol_index: SymbolIndex | None = None
+
+
+def get_symbol_index() -> SymbolIndex:
+    global _symbol_index
+    if _symbol_index is None:
+        _symbol_index = SymbolIndex()
+    return _symbol_index
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from common import cache
+from common.cache import TTLCache
+
+
+class Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+def test_entries_expire(clock):
+    ttl_cache = TTLCache()
+    ttl_cache.set('a', 1, ttl=10, size=1)
+    assert ttl_cache.get('a') == (True, 1)
+    clock.now += 10
+    assert ttl_cache.get('a') == (False, None)
+    assert ttl_cache.size == 0
+
+
+def test_least_recently_used_entries_are_evicted_by_size(clock):
+    ttl_cache = TTLCache(max_size=10)
+    ttl_cache.set('a', 'a', ttl=60, size=4)
+    ttl_cache.set('b', 'b', ttl=60, size=4)
+    ttl_cache.get('a')
+    ttl_cache.set('c', 'c', ttl=60, size=4)
+    assert ttl_cache.get('b') == (False, None)
+    assert ttl_cache.get('a') == (True, 'a')
+    assert ttl_cache.size == 8
+    assert ttl_cache.evictions == 1
+    # larger than the whole cache, not cached
+    ttl_cache.set('d', 'd', ttl=60, size=11)
+    assert ttl_cache.get('d') == (False, None)
+    assert ttl_cache.get('c') == (True, 'c')
+
+
+def test_set_replaces_an_entry(clock):
+    ttl_cache = TTLCache()
+    ttl_cache.set('a', 1, ttl=10, size=3)
+    ttl_cache.set('a', 2, ttl=10, size=5)
+    assert ttl_cache.get('a') == (True, 2)
+    assert ttl_cache.size == 5
+
+
+def test_concurrent_fetches_are_coalesced(clock):
+    ttl_cache = TTLCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'value', 5
+
+    async def main():
+        values = await asyncio.gather(*(ttl_cache.get_or_fetch('key', 60, fetch) for _ in range(5)))
+        values.append(await ttl_cache.get_or_fetch('key', 60, fetch))
+        return values
+
+    assert asyncio.run(main()) == ['value'] * 6
+    assert len(calls) == 1
+    stats = ttl_cache.stats()
+    assert (stats['misses'], stats['coalesced'], stats['hits']) == (1, 4, 1)
+    assert stats['hit_rate'] == pytest.approx(5 / 6)
+
+
+def test_errors_are_not_cached(clock):
+    ttl_cache = TTLCache()
+    results = iter([ValueError('failed'), ('value', 1)])
+
+    async def fetch():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def main():
+        with pytest.raises(ValueError):
+            await ttl_cache.get_or_fetch('key', 60, fetch)
+        assert ttl_cache.in_flight == {}
+        return await ttl_cache.get_or_fetch('key', 60, fetch)
+
+    assert asyncio.run(main()) == 'value'
+
+
+def test_cancelling_a_caller_does_not_fail_the_others(clock):
+    ttl_cache = TTLCache()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'value', 1
+
+    async def main():
+        first = asyncio.ensure_future(ttl_cache.get_or_fetch('key', 60, fetch))
+        second = asyncio.ensure_future(ttl_cache.get_or_fetch('key', 60, fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == 'value'
+        assert first.cancelled()
+
+    asyncio.run(main())
+    assert ttl_cache.get('key') == (True, 'value')
@@ -0,0 +1,80 @@
+import base64
+import json
+
+import pytest
+
+from common import derived_metrics
+from common.derived_metrics import DerivedMetrics, get_derived_metrics
+from common.financials_frame import FinancialsFrame
+
+KEY = ('fingerprint', 'https://example.com', 'AAPL', 'yearly', '2024-12-31')
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    derived_metrics._metrics.clear()
+    yield
+    derived_metrics._metrics.clear()
+
+
+def frame(**items: list) -> FinancialsFrame:
+    periods = max(len(values) for values in items.values())
+    return FinancialsFrame.from_metrics([
+        {'date': f'{2024 - row}-12-31', **{name: values[row] for name, values in items.items()}}
+        for row in range(periods)
+    ])
+
+
+def test_metrics_of_other_values_are_not_shared():
+    assert DerivedMetrics(KEY, frame(revenue=[200, 100])).cagr('revenue') == 1.0
+    # same ticker, period and end date, the financial items changed
+    assert DerivedMetrics(KEY, frame(revenue=[50, 100])).cagr('revenue') == -0.5
+
+
+def test_metrics_of_a_frame_are_shared():
+    revenue = frame(revenue=[200, 100], net_income=[20, 10])
+    first = DerivedMetrics(KEY, revenue)
+    assert DerivedMetrics(KEY, revenue).series('revenue') is first.series('revenue')
+    assert not first.series('revenue').flags.writeable
+    # another frame, or other settings, get their own metrics
+    assert DerivedMetrics(KEY, frame(revenue=[200, 100])).series('revenue') is not first.series('revenue')
+    assert DerivedMetrics(('other',) + KEY[1:], revenue).series('revenue') is not first.series('revenue')
+
+
+def test_owner_earnings():
+    derived = DerivedMetrics(KEY, frame(
+        net_income=[100, 90],
+        depreciation_and_amortization=[20, 20],
+        capital_expenditure=[30, 25],
+        working_capital=[50, 40],
+    ))
+    assert derived.working_capital_change() == 10
+    assert derived.owner_earnings() == 80
+    assert DerivedMetrics(KEY, frame(net_income=[100], depreciation_and_amortization=[20])).owner_earnings() is None
+
+
+def test_fcf_yield():
+    assert DerivedMetrics(KEY, frame(free_cash_flow=[50], market_cap=[1000])).fcf_yield() == 0.05
+    assert DerivedMetrics(KEY, frame(free_cash_flow=[50], market_cap=[0])).fcf_yield() is None
+
+
+def test_margin_stability():
+    assert DerivedMetrics(KEY, frame(operating_margin=[0.2, 0.2, 0.2])).margin_stability() == pytest.approx(1)
+    assert DerivedMetrics(KEY, frame(operating_margin=[0.3, 0.1])).margin_stability() == pytest.approx(0.5)
+    assert DerivedMetrics(KEY, frame(operating_margin=[-0.1, 0.05])).margin_stability() is None
+
+
+def test_get_derived_metrics_is_keyed_by_the_settings_without_secrets(monkeypatch):
+    monkeypatch.setattr(derived_metrics, 'get_input', lambda state, name: [{'date': '2024-12-31', 'revenue': 1}])
+    state = {
+        'context': {'current_task': {'ticker': {'symbol': 'AAPL'}}},
+        'action': {'parameters': {'end_date': '2024-12-31'}},
+    }
+
+    def config(settings: dict) -> dict:
+        return {'configurable': {'x-settings': base64.b64encode(json.dumps(settings).encode('utf-8')).decode('ascii')}}
+
+    key = get_derived_metrics(state, config({'remoteFinancialDataApiUrl': 'https://a.example.com', 'remoteFinancialDataApiKey': 'a'})).key
+    assert key[1:] == ('https://a.example.com', 'AAPL', 'yearly', '2024-12-31')
+    assert get_derived_metrics(state, config({'remoteFinancialDataApiUrl': 'https://a.example.com', 'remoteFinancialDataApiKey': 'b'})).key == key
+    assert get_derived_metrics(state, config({'remoteFinancialDataApiUrl': 'https://b.example.com', 'remoteFinancialDataApiKey': 'a'})).key != key
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from common.hurst import METHODS, hurst_exponent, hurst_variance, rolling_hurst
+
+
+@pytest.fixture
+def random_walk() -> np.ndarray:
+    rng = np.random.default_rng(11)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 2000)))
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_random_walk_is_close_to_one_half(random_walk, method):
+    assert hurst_exponent(random_walk, method) == pytest.approx(0.5, abs=0.1)
+
+
+def test_trending_series_is_above_mean_reverting_series():
+    rng = np.random.default_rng(5)
+    noise = rng.normal(0, 1, 1000)
+    mean_reverting = 100 + np.convolve(noise, np.ones(2) / 2, mode='same')
+    trending = 100 + np.cumsum(np.cumsum(noise) * 0.01 + noise * 0.1)
+    assert hurst_variance(trending) > 0.6
+    assert hurst_variance(mean_reverting) < 0.3
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_short_series_is_a_random_walk(method):
+    assert hurst_exponent(np.linspace(1, 2, 10), method) == 0.5
+
+
+def test_unknown_method():
+    with pytest.raises(Exception):
+        hurst_exponent(np.ones(100), 'periodogram')
+
+
+@pytest.mark.parametrize('window', [30, 63, 126])
+def test_rolling_variance_matches_each_window(random_walk, window):
+    prices = random_walk[:400]
+    series = rolling_hurst(prices, window)
+    assert np.isnan(series[:window - 1]).all()
+    expected = [hurst_variance(prices[end - window:end]) for end in range(window, len(prices) + 1)]
+    np.testing.assert_allclose(series[window - 1:], expected, rtol=1e-6, atol=1e-9)
+
+
+@pytest.mark.parametrize('method', ['rescaled_range', 'dfa'])
+def test_rolling_matches_each_window(random_walk, method):
+    prices = random_walk[:160]
+    series = rolling_hurst(prices, 120, method)
+    expected = [hurst_exponent(prices[end - 120:end], method) for end in range(120, len(prices) + 1)]
+    np.testing.assert_allclose(series[119:], expected)
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from common.indicator_state import IndicatorState
+from common.indicators import (
+    DMI_PERIOD, EMA_PERIODS, RSI_PERIODS, SMOOTHING_BLOCK, adx, bollinger_bands, compute_indicators, ema, macd,
+    rsi, sma, wilder,
+)
+from common.price_frame import PriceFrame
+
+
+def _smoothing(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """
+    Bar by bar exponential average seeded with the simple average of the first `period` values.
+    """
+    series = np.full(len(values), np.nan)
+    finite = np.flatnonzero(~np.isnan(values))
+    if len(finite) == 0 or finite[0] + period > len(values):
+        return series
+    seed = finite[0] + period - 1
+    series[seed] = values[finite[0]:seed + 1].mean()
+    for i in range(seed + 1, len(values)):
+        series[i] = series[i - 1] + alpha * (values[i] - series[i - 1])
+    return series
+
+
+def _rsi(close: np.ndarray, period: int) -> np.ndarray:
+    changes = np.diff(close, prepend=np.nan)
+    gains = _smoothing(np.where(np.isnan(changes), np.nan, np.maximum(changes, 0)), period, 1 / period)
+    losses = _smoothing(np.where(np.isnan(changes), np.nan, np.maximum(-changes, 0)), period, 1 / period)
+    series = np.full(len(close), np.nan)
+    for i in range(len(close)):
+        if np.isnan(losses[i]):
+            continue
+        series[i] = 100.0 if losses[i] == 0 else 100 - 100 / (1 + gains[i] / losses[i])
+    return series
+
+
+def _bars(length: int, seed: int = 3) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    close = 50 * np.cumprod(1 + rng.normal(0, 0.015, length))
+    prices = []
+    for day, value in enumerate(close):
+        spread = abs(rng.normal(0, 0.01)) * value
+        prices.append({
+            'date': str(np.datetime64('2020-01-01') + day),
+            'open': value,
+            'high': value + spread,
+            'low': value - spread,
+            'close': float(value),
+            'volume': 1000,
+        })
+    return prices
+
+
+@pytest.fixture
+def close() -> np.ndarray:
+    return np.array([price['close'] for price in _bars(4 * SMOOTHING_BLOCK + 17)])
+
+
+@pytest.mark.parametrize('period', [1, 2, 9, 14, 26, 55])
+def test_ema_and_wilder_match_the_recursion(close, period):
+    np.testing.assert_allclose(ema(close, period), _smoothing(close, period, 2 / (period + 1)), rtol=1e-10)
+    np.testing.assert_allclose(wilder(close, period), _smoothing(close, period, 1 / period), rtol=1e-10)
+
+
+def test_smoothing_is_seeded_after_leading_nans(close):
+    values = close.copy()
+    values[:30] = np.nan
+    np.testing.assert_allclose(ema(values, 12), _smoothing(values, 12, 2 / 13), rtol=1e-10)
+
+
+def test_smoothing_of_a_short_series_is_nan():
+    assert np.isnan(ema(np.arange(5.0), 10)).all()
+    assert np.isnan(ema(np.full(20, np.nan), 3)).all()
+
+
+@pytest.mark.parametrize('period', RSI_PERIODS)
+def test_rsi_matches_the_recursion(close, period):
+    np.testing.assert_allclose(rsi(close, period), _rsi(close, period), rtol=1e-9)
+
+
+def test_macd_and_bollinger_bands(close):
+    line, signal, histogram = macd(close)
+    np.testing.assert_allclose(line, ema(close, 12) - ema(close, 26), rtol=1e-12)
+    np.testing.assert_allclose(signal, _smoothing(line, 9, 0.2), rtol=1e-9)
+    np.testing.assert_allclose(histogram, line - signal, rtol=1e-12)
+    upper, middle, lower = bollinger_bands(close, 20)
+    np.testing.assert_allclose(middle, sma(close, 20), rtol=1e-12)
+    for i in range(19, len(close)):
+        std = close[i - 19:i + 1].std()
+        assert upper[i] == pytest.approx(middle[i] + 2 * std, rel=1e-9)
+        assert lower[i] == pytest.approx(middle[i] - 2 * std, rel=1e-9)
+
+
+def test_rows_match_single_series():
+    prices = [_bars(300, seed) for seed in range(4)]
+    high, low, close = (np.array([[price[name] for price in bars] for bars in prices]) for name in ('high', 'low', 'close'))
+    np.testing.assert_allclose(ema(close, 21), np.vstack([ema(row, 21) for row in close]), rtol=1e-12)
+    matrix = adx(high, low, close, DMI_PERIOD)
+    for row in range(len(close)):
+        single = adx(high[row], low[row], close[row], DMI_PERIOD)
+        for series, expected in zip(matrix, single):
+            np.testing.assert_allclose(series[row], expected, rtol=1e-12)
+
+
+def test_latest_values_match_the_incremental_state():
+    prices = _bars(3 * SMOOTHING_BLOCK)
+    # a bar without a close is skipped, a missing high or low is the close
+    prices[100]['close'] = None
+    prices[120]['high'] = None
+    prices[121]['low'] = None
+    indicators = compute_indicators(PriceFrame.from_prices(prices))
+    assert np.isnan(indicators[f'ema_{EMA_PERIODS[0]}'][100])
+
+    latest = indicators.latest()
+    expected = IndicatorState.from_prices(prices).values()
+    names = [f'ema_{period}' for period in EMA_PERIODS] + [f'rsi_{period}' for period in RSI_PERIODS]
+    names += [f'atr_{DMI_PERIOD}', f'adx_{DMI_PERIOD}', f'plus_di_{DMI_PERIOD}', f'minus_di_{DMI_PERIOD}']
+    for name in names:
+        assert latest[name] == pytest.approx(expected[name], rel=1e-9), name
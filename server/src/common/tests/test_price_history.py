@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from common import price_history, storage
+from common.indicator_state import IndicatorState
+
+
+def _day(days_ago: int) -> str:
+    return time.strftime('%Y-%m-%d', time.localtime(time.time() - days_ago * 24 * 60 * 60))
+
+
+class HttpClient():
+    async def run(self, coro):
+        return await coro
+
+
+class Dataset():
+    """
+    Dataset client serving daily bars of the last 1200 days, recording the requested windows.
+    """
+    def __init__(self, remote_dataset_url: str = 'https://example.com'):
+        self.remote_dataset_url = remote_dataset_url
+        self.http_client = HttpClient()
+        self.requests = []
+        rng = np.random.default_rng(1)
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.01, 1200))
+        self.prices = [
+            {'date': _day(days_ago), 'open': value, 'high': value * 1.01, 'low': value * 0.99, 'close': float(value), 'volume': 1}
+            for days_ago, value in zip(range(1200, 0, -1), close)
+        ]
+
+    async def get_prices(self, symbol: str, start_date: str, end_date: str) -> list[dict]:
+        self.requests.append((start_date, end_date))
+        return [price for price in self.prices if start_date <= price['date'] <= end_date]
+
+
+@pytest.fixture(autouse=True)
+def histories(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(price_history, '_histories', OrderedDict())
+    monkeypatch.setattr(price_history, '_locks', {})
+    return price_history._histories
+
+
+def _get_prices(dataset: Dataset, symbol: str, start_date: str, end_date: str) -> list[dict]:
+    return asyncio.run(price_history.get_prices(dataset, symbol, start_date, end_date))
+
+
+def test_returns_the_requested_window():
+    dataset = Dataset()
+    prices = _get_prices(dataset, 'AAPL', _day(60), _day(1))
+    assert prices == [price for price in dataset.prices if _day(60) <= price['date'] <= _day(1)]
+    # the first download reaches back to the seed date of the indicator state
+    assert dataset.requests[0][0] < _day(365)
+
+
+def test_repeat_requests_only_download_new_bars(histories):
+    dataset = Dataset()
+    _get_prices(dataset, 'AAPL', _day(100), _day(20))
+    prices = _get_prices(dataset, 'AAPL', _day(100), _day(1))
+    assert prices == [price for price in dataset.prices if _day(100) <= price['date'] <= _day(1)]
+    assert dataset.requests[-1] == (_day(19), _day(1))
+    assert _get_prices(dataset, 'AAPL', _day(50), _day(10)) == [
+        price for price in dataset.prices if _day(50) <= price['date'] <= _day(10)
+    ]
+    assert len(dataset.requests) == 2
+
+
+def test_indicators_do_not_depend_on_the_age_of_the_history(histories):
+    # one server kept the history for two years, another downloads it today
+    old = Dataset('https://old.example.com')
+    _get_prices(old, 'AAPL', _day(1100), _day(700))
+    for days_ago in range(680, 0, -20):
+        _get_prices(old, 'AAPL', _day(500), _day(days_ago))
+    _get_prices(old, 'AAPL', _day(500), _day(1))
+    new = Dataset('https://new.example.com')
+    _get_prices(new, 'AAPL', _day(30), _day(1))
+
+    old_history = histories[('https://old.example.com', 'AAPL')]
+    new_history = histories[('https://new.example.com', 'AAPL')]
+    assert old_history['end_date'] == new_history['end_date']
+    assert old_history['seed_date'] == new_history['seed_date']
+    old_values = IndicatorState.from_dict(old_history['indicators']).values()
+    new_values = IndicatorState.from_dict(new_history['indicators']).values()
+    for name, value in new_values.items():
+        if isinstance(value, float):
+            assert old_values[name] == pytest.approx(value, rel=1e-12), name
+
+
+def test_stored_indicators_match_the_window(histories):
+    dataset = Dataset()
+    prices = _get_prices(dataset, 'AAPL', _day(60), _day(1))
+    indicators = asyncio.run(price_history.get_indicators(dataset, 'AAPL', prices))
+    history = histories[(dataset.remote_dataset_url, 'AAPL')]
+    assert indicators == IndicatorState.from_dict(history['indicators']).values()
+
+
+def test_cached_histories_are_bounded(monkeypatch, histories):
+    monkeypatch.setattr(price_history, 'MAX_CACHED_HISTORIES', 2)
+    dataset = Dataset()
+    for symbol in ('A', 'B', 'C'):
+        _get_prices(dataset, symbol, _day(30), _day(1))
+    assert list(histories) == [(dataset.remote_dataset_url, 'B'), (dataset.remote_dataset_url, 'C')]
+    assert (dataset.remote_dataset_url, 'A') not in price_history._locks
+    # evicted from memory, read back from disk
+    requests = len(dataset.requests)
+    _get_prices(dataset, 'A', _day(30), _day(1))
+    assert len(dataset.requests) == requests
@@ -0,0 +1,83 @@
+import base64
+import json
+import logging
+
+from common import prompt_pack
+from common.prompt_pack import pack, pack_analysis_data
+
+
+def _config(model: str) -> dict:
+    settings = {'analysisModel': {'model': model}}
+    return {'configurable': {'x-settings': base64.b64encode(json.dumps(settings).encode('utf-8')).decode('ascii')}}
+
+
+def test_pack():
+    packed = pack({
+        'score': 3,
+        'ratio': 0.123456,
+        'market_cap': 2.5e12,
+        'signal': 'bullish\n trend',
+        'closes': [1.0, 2.25, float('nan')],
+        'empty': [],
+        'rows': [{'year': 2024, 'eps': 6.08}, {'year': 2023, 'eps': 6.13}],
+        'details': ['strong margin', {'note': None}],
+    })
+    assert packed == '\n'.join([
+        'score: 3',
+        'ratio: 0.1235',
+        'market_cap: 2500000000000',
+        'signal: bullish trend',
+        'closes: [1, 2.25, null]',
+        'rows:',
+        '  year | eps',
+        '  - 2024 | 6.08',
+        '  - 2023 | 6.13',
+        'details:',
+        '  - strong margin',
+        '  -',
+        '    note: null',
+    ])
+
+
+def test_drop_keys_are_left_out_of_the_top_level_of_each_analysis():
+    analysis_data = {
+        'trend_analysis': {
+            '_id_': 'c0ffee',
+            'type': 'trend_analysis',
+            'title': 'Trend',
+            'score': 2,
+            'series': [1, 2, 3],
+            'signals': [{'type': 'ema_cross', 'title': 'EMA 8/21', 'value': 1}],
+            'regime': {'type': 'trending', 'series': 'adx'},
+        },
+        'total_score': 2,
+    }
+    packed = pack_analysis_data(analysis_data, 'technicals', {}, drop=('series',))
+    assert packed == '\n'.join([
+        'total_score: 2',
+        'trend_analysis:',
+        '  score: 2',
+        '  signals:',
+        '    type | title | value',
+        '    - ema_cross | EMA 8/21 | 1',
+        '  regime:',
+        '    type: trending',
+        '    series: adx',
+    ])
+    # the analysis data of the state is left as it is
+    assert analysis_data['trend_analysis']['_id_'] == 'c0ffee'
+
+
+def test_token_count_uses_the_analysis_model(monkeypatch, caplog):
+    models = []
+
+    def token_counter(model: str, text: str) -> int:
+        models.append(model)
+        return 42
+
+    monkeypatch.setattr(prompt_pack, 'token_counter', token_counter)
+    with caplog.at_level(logging.INFO, logger=prompt_pack.__name__):
+        pack_analysis_data({'a': {'score': 1}}, 'fundamentals', _config('gpt-4o'))
+    assert models == ['gpt-4o']
+    assert 'fundamentals analysis data: 42 prompt tokens' in caplog.text
+    assert prompt_pack.count_tokens('x' * 40, 'gpt-4o') == 42
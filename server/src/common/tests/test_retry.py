@@ -0,0 +1,134 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+from common import dataset, retry
+from common.dataset import AsyncDataset
+from common.retry import CircuitBreaker, RetryPolicy, get_circuit_breaker, parse_retry_after
+
+
+class Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return time.time()
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(retry, 'time', clock)
+    return clock
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+
+def test_retryable_status_codes():
+    policy = RetryPolicy()
+    assert policy.is_retryable(None)
+    assert policy.is_retryable(429)
+    assert policy.is_retryable(503)
+    assert not policy.is_retryable(404)
+    assert not policy.is_retryable(400)
+
+
+def test_backoff_has_full_jitter_up_to_the_max_delay():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, multiplier=2.0)
+    for attempt, bound in ((0, 1.0), (1, 2.0), (2, 4.0), (3, 5.0), (10, 5.0)):
+        delays = [policy.get_delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= bound for delay in delays)
+        assert max(delays) > bound / 2
+
+
+def test_retry_after_overrides_the_backoff():
+    policy = RetryPolicy(max_delay=20.0)
+    assert policy.get_delay(0, '12') == 12.0
+    assert policy.get_delay(0, '120') == 20.0
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow_request()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+    clock.now += 29
+    assert not breaker.allow_request()
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    # only one trial at a time
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    # the failed trial opens the circuit again for a full timeout
+    clock.now += 29
+    assert not breaker.allow_request()
+    clock.now += 1
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+
+
+def test_circuit_breaker_per_endpoint():
+    breaker = get_circuit_breaker('example.com/api/v1/a')
+    assert get_circuit_breaker('example.com/api/v1/a') is breaker
+    assert get_circuit_breaker('example.com/api/v1/b') is not breaker
+
+
+class HangingHttpClient():
+    """
+    HTTP client whose requests never get an answer.
+    """
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def get(self, url: str, headers: dict = None):
+        self.started.set()
+        await asyncio.Event().wait()
+
+
+def test_cancelled_half_open_trial_lets_the_next_request_try(monkeypatch, clock):
+    http_client = HangingHttpClient()
+    monkeypatch.setattr(dataset, 'get_http_client', lambda: http_client)
+    client = AsyncDataset(None, use_cache=False)
+    client.remote_dataset_url = 'https://trial.example.com'
+    breaker = get_circuit_breaker('trial.example.com/api/v1/ticker/info')
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    clock.now += breaker.reset_timeout
+
+    async def cancel_trial():
+        task = asyncio.create_task(client.get_info('AAPL'))
+        await http_client.started.wait()
+        # the trial is running, other requests are still refused
+        assert not breaker.allow_request()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert breaker.allow_request()
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from common.rolling import RollingWindow, last, last_column, shift
+
+
+def _reference(values: np.ndarray, window: int, statistic) -> np.ndarray:
+    series = np.full(len(values), np.nan)
+    for end in range(window, len(values) + 1):
+        chunk = values[end - window:end]
+        if not np.isnan(chunk).any():
+            series[end - 1] = statistic(chunk)
+    return series
+
+
+def _skew(chunk: np.ndarray) -> float:
+    n = len(chunk)
+    std = chunk.std(ddof=1)
+    if std == 0:
+        return 0.0
+    return ((chunk - chunk.mean()) ** 3).sum() / std ** 3 * n / ((n - 1) * (n - 2))
+
+
+def _kurt(chunk: np.ndarray) -> float:
+    n = len(chunk)
+    std = chunk.std(ddof=1)
+    if std == 0:
+        return 3.0
+    m4 = ((chunk - chunk.mean()) ** 4).sum()
+    return m4 / std ** 4 * n * (n + 1) / ((n - 1) * (n - 2) * (n - 3)) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+
+
+@pytest.fixture
+def prices() -> np.ndarray:
+    rng = np.random.default_rng(7)
+    values = 1000 * np.cumprod(1 + rng.normal(0, 0.02, 300))
+    values[[40, 41, 200]] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('window', [1, 3, 5, 20, 60])
+def test_matches_window_by_window(prices, window):
+    rolling = RollingWindow(prices, window)
+    np.testing.assert_allclose(rolling.mean(), _reference(prices, window, np.mean), rtol=1e-9)
+    # the window sums come from cumulative sums, a std of 0 may be rounding noise of 1e-8 of the prices
+    np.testing.assert_allclose(rolling.std(), _reference(prices, window, np.std), rtol=1e-6, atol=1e-4)
+    if window > 1:
+        np.testing.assert_allclose(
+            rolling.std(ddof=1), _reference(prices, window, lambda chunk: chunk.std(ddof=1)), rtol=1e-6, atol=1e-4
+        )
+    # the higher moments of short windows amplify the rounding noise
+    rtol = 1e-5 if window >= 20 else 1e-2
+    if window >= 3:
+        np.testing.assert_allclose(rolling.skew(), _reference(prices, window, _skew), rtol=rtol, atol=rtol)
+    if window >= 4:
+        np.testing.assert_allclose(rolling.kurt(), _reference(prices, window, _kurt), rtol=rtol, atol=rtol)
+
+
+def test_constant_windows():
+    rolling = RollingWindow(np.full(30, 12.5), 10)
+    assert np.all(rolling.std()[9:] == 0)
+    assert np.all(rolling.skew()[9:] == 0)
+    assert np.all(rolling.kurt()[9:] == 3)
+
+
+def test_window_longer_than_series():
+    rolling = RollingWindow(np.arange(5.0), 10)
+    assert np.isnan(rolling.mean()).all()
+    assert np.isnan(rolling.std()).all()
+
+
+def test_rows_match_single_series(prices):
+    matrix = np.vstack([prices, prices[::-1] * 0.5, np.linspace(1, 2, len(prices))])
+    rolling = RollingWindow(matrix, 20)
+    for row, values in enumerate(matrix):
+        single = RollingWindow(values, 20)
+        np.testing.assert_allclose(rolling.mean()[row], single.mean(), rtol=1e-9)
+        np.testing.assert_allclose(rolling.std(ddof=1)[row], single.std(ddof=1), rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(rolling.skew()[row], single.skew(), rtol=1e-5, atol=1e-6)
+
+
+def test_last():
+    series = np.array([1.0, 2.0, np.nan])
+    assert last(series) == 0
+    assert last(series, default=None) is None
+    assert last(series, offset=2) == 2.0
+    assert last(np.array([]), default=5) == 5
+
+
+def test_last_column():
+    series = np.array([[1.0, 2.0], [3.0, np.nan]])
+    np.testing.assert_array_equal(last_column(series), [2.0, 0.0])
+    np.testing.assert_array_equal(last_column(series, offset=2), [1.0, 3.0])
+    np.testing.assert_array_equal(last_column(series, default=-1, offset=3), [-1.0, -1.0])
+
+
+def test_shift():
+    np.testing.assert_array_equal(shift(np.array([1.0, 2.0, 3.0])), [np.nan, 1.0, 2.0])
+    np.testing.assert_array_equal(shift(np.array([[1.0, 2.0], [3.0, 4.0]]), 2), np.full((2, 2), np.nan))
@@ -0,0 +1,57 @@
+import base64
+import json
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import StateGraph
+
+from common import settings
+from common.settings import Settings
+
+
+class State(TypedDict):
+    fingerprints: list[str]
+
+
+@pytest.fixture
+def decodes(monkeypatch) -> list[str]:
+    decoded = []
+    decode_settings = settings.decode_settings
+
+    def counting_decode(value: str):
+        decoded.append(value)
+        return decode_settings(value)
+
+    monkeypatch.setattr(settings, 'decode_settings', counting_decode)
+    monkeypatch.setattr(settings, '_snapshots', settings.OrderedDict())
+    return decoded
+
+
+def _header(data: dict) -> str:
+    return base64.b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+
+
+def test_header_is_decoded_once_across_the_nodes_of_a_run(decodes):
+    def node(state: State, config) -> dict:
+        return {'fingerprints': state['fingerprints'] + [Settings(config).fingerprint]}
+
+    workflow = StateGraph(State)
+    workflow.add_node('first', node)
+    workflow.add_node('second', node)
+    workflow.add_edge('first', 'second')
+    workflow.set_entry_point('first')
+    workflow.set_finish_point('second')
+    graph = workflow.compile()
+
+    header = _header({'analysisModel': {'model': 'gpt-4o'}})
+    output = graph.invoke({'fingerprints': []}, {'configurable': {'x-settings': header}})
+    assert len(output['fingerprints']) == 2 and output['fingerprints'][0] == output['fingerprints'][1]
+    assert decodes == [header]
+
+
+def test_other_headers_are_decoded_on_their_own(decodes):
+    first = Settings({'configurable': {'x-settings': _header({'analysisConcurrency': 2})}})
+    second = Settings({'configurable': {'x-settings': _header({'analysisConcurrency': 8})}})
+    assert (first.get_analysis_concurrency(), second.get_analysis_concurrency()) == (2, 8)
+    assert Settings({'configurable': {'x-settings': _header({'analysisConcurrency': 2})}}).snapshot is first.snapshot
+    assert len(decodes) == 2
@@ -0,0 +1,42 @@
+import pytest
+
+from common.symbol_index import SymbolIndex
+
+TICKERS = [
+    {'symbol': 'AAPL.MX', 'short_name': 'Apple Inc.'},
+    {'symbol': 'TSLA', 'short_name': 'Tesla, Inc.'},
+    {'symbol': 'TM', 'short_name': 'Toyota Motor Corporation'},
+    {'symbol': 'BRK.B', 'short_name': 'Berkshire Hathaway Inc.'},
+]
+
+
+@pytest.fixture
+def index(tmp_path) -> SymbolIndex:
+    index = SymbolIndex(path=str(tmp_path / 'symbols.json'), symbol_list_path='')
+    index.add(TICKERS)
+    yield index
+    index.flush()
+
+
+def _symbols(tickers: list[dict]) -> list[str]:
+    return [ticker['symbol'] for ticker in tickers]
+
+
+def test_exact_symbol_and_name_matches(index):
+    assert _symbols(index.match('TSLA')[0]) == ['TSLA']
+    assert index.match('TSLA')[1]
+    assert index.match('brk.b') == ([TICKERS[3]], True)
+    assert index.match('Toyota Motor Corporation') == ([TICKERS[2]], True)
+
+
+def test_prefix_and_fuzzy_matches_are_not_exact(index):
+    tickers, exact = index.match('T')
+    assert sorted(_symbols(tickers)) == ['TM', 'TSLA']
+    assert not exact
+    # another listing of the symbol
+    assert index.match('AAPL') == ([TICKERS[0]], False)
+    # a word of the name
+    assert index.match('Toyota') == ([TICKERS[2]], False)
+    assert index.match('Berkshire Hathaway Inc') == ([TICKERS[3]], True)
+    assert index.match('Berkshire Hathawey Inc') == ([TICKERS[3]], False)
+    assert index.match('') == ([], False)
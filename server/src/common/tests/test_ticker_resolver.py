@@ -0,0 +1,56 @@
+import pytest
+
+from common import ticker_resolver
+from common.symbol_index import SymbolIndex
+from common.ticker_resolver import resolve_tickers
+
+
+@pytest.fixture(autouse=True)
+def index(monkeypatch, tmp_path) -> SymbolIndex:
+    index = SymbolIndex(path=str(tmp_path / 'symbols.json'), symbol_list_path='')
+    index.add([
+        {'symbol': '600519.SS', 'short_name': 'Kweichow Moutai'},
+        {'symbol': '000001.SZ', 'short_name': 'Ping An Bank'},
+        {'symbol': '600000.SS', 'short_name': 'Shanghai Pudong Development Bank'},
+        {'symbol': 'MSFT', 'short_name': 'Microsoft Corporation'},
+    ])
+    monkeypatch.setattr(ticker_resolver, 'get_symbol_index', lambda: index)
+    yield index
+    index.flush()
+
+
+def _symbols(content: str) -> list[str] | None:
+    tickers = resolve_tickers(content)
+    return None if tickers is None else [ticker['symbol'] for ticker in tickers]
+
+
+def test_explicit_symbols():
+    assert _symbols('compare 601398.SS and 0700.hk') == ['601398.SS', '0700.HK']
+    assert _symbols('analyze $aapl and MSFT') == ['AAPL', 'MSFT']
+    assert _symbols('@technicals 600519 vs 000001') == ['600519.SS', '000001.SZ']
+
+
+def test_unknown_upper_case_word_is_unsure():
+    assert _symbols('compare MSFT with XYZW') is None
+    assert _symbols('Compare AAPL with Microsoft') is None
+
+
+@pytest.mark.parametrize('content', [
+    'buy 300000 shares',
+    'should I buy 600000 shares of MSFT',
+    'buy MSFT for 600000 yuan',
+    'buy MSFT for 600000元',
+    'buy 300001 MSFT',
+])
+def test_numbers_read_as_amounts_are_unsure(content):
+    # the LLM extracts the tickers
+    assert _symbols(content) is None
+
+
+@pytest.mark.parametrize('content', [
+    'buy MSFT for ¥600000',
+    'buy MSFT for 600000.50',
+    'buy 1,600000 of MSFT',
+])
+def test_parts_of_amounts_are_not_a_share_codes(content):
+    assert _symbols(content) == ['MSFT']
@@ -0,0 +1,137 @@
+"""
+Local resolver of the explicit ticker symbols of a message.
+
+Symbols with an exchange suffix (601398.SS, 0700.HK) and cash tags ($AAPL) are resolved without
+the LLM, as are the six digit A-share codes and bare upper case symbols already in the local
+symbol index. The resolver is unsure, and returns None so that the LLM extracts the tickers, when
+the message has no explicit symbol, has an upper case word or six digit number it can not tell
+from a symbol ("buy 300000 shares", "600000 yuan"), or may name another company or refer back to
+one: a word left besides the symbols that is not a request or financial term ("Compare AAPL with
+Microsoft"), CJK text ("AAPL vs 腾讯") or a pronoun ("how does it compare to MSFT?").
+"""
+
+import re
+
+from common.symbol_index import get_symbol_index
+
+# exchange suffixes of the symbols of the remote dataset
+EXCHANGE_SUFFIXES = (
+    'SS', 'SZ', 'BJ', 'HK', 'T', 'L', 'TO', 'V', 'AX', 'NS', 'BO', 'KS', 'KQ', 'TW', 'TWO', 'SI',
+    'DE', 'F', 'PA', 'AS', 'MI', 'SW', 'ST', 'OL', 'CO', 'HE', 'MC', 'BR', 'LS', 'VI', 'IR', 'SA',
+    'MX', 'JK', 'KL', 'BK', 'NZ',
+)
+
+# upper case words of financial chat that are not symbols
+STOP_WORDS = {
+    'A', 'I', 'AI', 'AND', 'API', 'CEO', 'CFO', 'CNY', 'COO', 'CTO', 'DCF', 'EBIT', 'EBITDA', 'ETF',
+    'EU', 'EUR', 'EPS', 'EV', 'FCF', 'FED', 'GDP', 'HKD', 'IPO', 'IT', 'JPY', 'MA', 'MACD', 'NAV',
+    'OK', 'OR', 'PB', 'PE', 'PEG', 'PS', 'Q1', 'Q2', 'Q3', 'Q4', 'RMB', 'ROA', 'ROE', 'ROI', 'ROIC',
+    'RSI', 'SEC', 'THE', 'TTM', 'UK', 'US', 'USA', 'USD', 'VS', 'YOY', 'YTD',
+}
+
+# words of a request about explicit symbols, any other word may name a company
+REQUEST_WORDS = {
+    'a', 'about', 'against', 'an', 'analyse', 'analysis', 'analyze', 'and', 'are', 'at', 'buy',
+    'can', 'chart', 'check', 'compare', 'comparison', 'do', 'evaluate', 'for', 'fundamentals',
+    'give', 'hold', 'how', 'in', 'is', 'latest', 'look', 'me', 'now', 'of', 'on', 'please',
+    'price', 'prices', 'report', 'run', 'sell', 'share', 'shares', 'should', 'show', 'stock',
+    'stocks', 'technicals', 'the', 'ticker', 'tickers', 'to', 'today', 'valuation', 'versus',
+    'vs', 'what', 'with', 'you',
+} | {word.lower() for word in STOP_WORDS if word != 'IT'}
+
+# words referring back to a company of the conversation
+PRONOUNS = {
+    'he', 'her', 'him', 'his', 'it', 'its', 'latter', 'former', 'same', 'she', 'that', 'their',
+    'them', 'these', 'they', 'this', 'those',
+}
+
+_BOUNDARY_BEFORE = r'(?<![A-Za-z0-9.$@])'
+_BOUNDARY_AFTER = r'(?![A-Za-z0-9])'
+SUFFIX_PATTERN = re.compile(
+    _BOUNDARY_BEFORE + r'([A-Z0-9]{1,6}(?:-[A-Z])?\.(?i:' + '|'.join(EXCHANGE_SUFFIXES) + r'))' + _BOUNDARY_AFTER
+)
+CASH_TAG_PATTERN = re.compile(r'\$([A-Za-z]{1,5}(?:[.-][A-Za-z])?)' + _BOUNDARY_AFTER)
+A_SHARE_PATTERN = re.compile(r'(?<![A-Za-z0-9.,$@¥])((?:60|68|00|30)\d{4})(?![A-Za-z0-9]|[.,]\d)')
+# units after a six digit number making it an amount rather than an A-share code
+AMOUNT_PATTERN = re.compile(
+    r'\s*(?:%|元|股|万|块|(?i:shares?|yuan|rmb|cny|usd|dollars?|units?|lots?)(?![A-Za-z]))'
+)
+BARE_SYMBOL_PATTERN = re.compile(_BOUNDARY_BEFORE + r'([A-Z]{1,5}(?:[.-][A-Z])?)' + _BOUNDARY_AFTER)
+AT_ITEM_PATTERN = re.compile(r'@\w+')
+WORD_PATTERN = re.compile(r'[A-Za-z]+')
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+
+
+def _a_share_symbol(code: str) -> str:
+    return f'{code}.SS' if code.startswith('6') else f'{code}.SZ'
+
+
+def _a_share_symbols(text: str) -> list[str] | None:
+    """
+    A-share symbols of the six digit codes of the text, or None when one of them is not confirmed
+    by the symbol index or reads as an amount.
+    """
+    index = get_symbol_index()
+    symbols = []
+    for match in A_SHARE_PATTERN.finditer(text):
+        symbol = _a_share_symbol(match.group(1))
+        if AMOUNT_PATTERN.match(text, match.end()) or index.get(symbol) is None:
+            return None
+        symbols.append(symbol)
+    return symbols
+
+
+def _ticker(symbol: str) -> dict:
+    known = get_symbol_index().get(symbol)
+    if known is not None:
+        return {
+            'symbol': known.get('symbol', symbol),
+            'short_name': known.get('short_name') or symbol,
+            'en_name': known.get('en_name') or known.get('short_name') or symbol,
+        }
+    return {'symbol': symbol, 'short_name': symbol, 'en_name': symbol}
+
+
+def resolve_tickers(content: str) -> list[dict] | None:
+    """
+    Tickers of the explicit symbols of the content, in the format of the LLM extraction,
+    or None when the resolver is unsure.
+    """
+    if not isinstance(content, str) or content.strip() == '':
+        return None
+    # @agent tags are not symbols
+    text = AT_ITEM_PATTERN.sub(' ', content)
+
+    symbols = []
+    for pattern in (SUFFIX_PATTERN, CASH_TAG_PATTERN):
+        for match in pattern.finditer(text):
+            symbols.append(match.group(1).upper())
+        text = pattern.sub(' ', text)
+    # a six digit number may as well be an amount
+    a_share_symbols = _a_share_symbols(text)
+    if a_share_symbols is None:
+        return None
+    symbols.extend(a_share_symbols)
+    text = A_SHARE_PATTERN.sub(' ', text)
+
+    index = get_symbol_index()
+    for match in BARE_SYMBOL_PATTERN.finditer(text):
+        word = match.group(1)
+        if word in STOP_WORDS:
+            continue
+        if index.get(word) is None:
+            # an upper case word that may or may not be a symbol
+            return None
+        symbols.append(word)
+
+    if len(symbols) == 0:
+        return None
+    # the rest of the message may name or refer to another company
+    text = BARE_SYMBOL_PATTERN.sub(' ', text)
+    if CJK_PATTERN.search(text):
+        return None
+    for word in WORD_PATTERN.findall(text):
+        word = word.lower()
+        if word in PRONOUNS or word not in REQUEST_WORDS:
+            return None
+    return [_ticker(symbol) for symbol in dict.fromkeys(symbols)]
@@ -1,6 +1,5 @@
 from langchain.schema import AIMessage
 from langchain_litellm import ChatLiteLLMRouter
-from litellm import Router
 from langchain_core.runnables import RunnableConfig
 from common.settings import Settings
 from mcp import ClientSession
@@ -9,6 +8,12 @@ from mcp.client.streamable_http import streamablehttp_client
 from langchain_mcp_adapters.tools import load_mcp_tools, BaseTool
 from langgraph.prebuilt import create_react_agent
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from llm.router_pool import RouterPool
+from llm import response_cache
+
+# routers reused by the calls with the same model list
+router_pool = RouterPool()
+llm_cache = response_cache.ResponseCache()
 
 
 
@@ -22,17 +27,19 @@ async def get_tools(server_params) -> list[BaseTool]:
             return tools
 
 def get_llm(settings: Settings)->ChatLiteLLMRouter:
-    litellm_router = Router(model_list=settings.get_model_list())
-    llm = ChatLiteLLMRouter(router=litellm_router, model_name=settings.get_intent_recognition_model().get("model", ""))
-    return llm
+    return router_pool.get_llm(settings.get_model_list(), settings.get_intent_recognition_model().get("model", ""))
 
 def get_analyzer(settings: Settings)->ChatLiteLLMRouter:
-    litellm_router = Router(model_list=settings.get_model_list())
-    llm = ChatLiteLLMRouter(router=litellm_router, model_name=settings.get_analysis_model().get("model", ""))
-    return llm
+    return router_pool.get_llm(settings.get_model_list(), settings.get_analysis_model().get("model", ""))
 
 
-async def ainvoke(messages, config: RunnableConfig,  stream=True, analyzer=False):
+async def ainvoke(messages, config: RunnableConfig,  stream=True, analyzer=False, cache=False, similar=False):
+    """
+    Invoke the intent recognition model, or the analysis model when analyzer is True.
+    With cache=True the response is reused from the response cache for the same model and messages,
+    a streamed call answered from the cache streams no tokens. With similar=True a non streamed call
+    also reuses the response of a near duplicate prompt.
+    """
     # create a new UUID
     # if hidden_stream:
     #     run_id = uuid4()
@@ -45,9 +52,29 @@ async def ainvoke(messages, config: RunnableConfig,  stream=True, analyzer=False
     #         "message_id": message_id
     #     })
     settings = Settings(config)
-    if analyzer:
-        return await get_analyzer(settings).ainvoke(messages, config, stream=stream)
-    return await get_llm(settings).ainvoke(messages, config, stream=stream)
+    llm = get_analyzer(settings) if analyzer else get_llm(settings)
+    if not cache or not response_cache.LLM_CACHE_ENABLED:
+        return await llm.ainvoke(messages, config, stream=stream)
+
+    model = settings.get_analysis_model() if analyzer else settings.get_intent_recognition_model()
+    normalized_messages = response_cache.normalize_messages(messages)
+    key = response_cache.get_key(model, normalized_messages, {})
+    response = await llm_cache.get(key)
+    if response is not None:
+        return response
+    embedding = None
+    if similar and not stream:
+        # near duplicate prompts, only for the hidden calls whose answer does not depend on details
+        embedding = await response_cache.get_embedding(normalized_messages)
+        if embedding is not None:
+            response = await llm_cache.get_similar(model.get("model", ""), embedding)
+            if response is not None:
+                return response
+
+    response = await llm.ainvoke(messages, config, stream=stream)
+    if response.content:
+        await llm_cache.set(key, model.get("model", ""), response, embedding)
+    return response
 
 
 async def ainvoke_with_tools(messages, config: RunnableConfig, tools: list[BaseTool], stream=True, analyzer=False):
@@ -0,0 +1,166 @@
+"""
+Local cache of LLM responses, so a repeated prompt does not pay for inference twice. Only the
+calls passing cache=True to ainvoke use it: the ticker extraction, the next step suggestions and
+the persona end_analysis calls.
+
+Responses are keyed by the sha256 of the model parameters (without the api key), the
+normalized messages and the call parameters, and kept in SQLite in the data directory for
+LLM_CACHE_TTL seconds. When LLM_CACHE_EMBEDDING_MODEL is set, the non streamed calls passing
+similar=True (the next step suggestions) that miss the exact key are also looked up by the cosine
+similarity of the prompt embedding. The ticker extraction does not use it, a near duplicate
+prompt naming another company would get the tickers of the cached one.
+
+Configured by environment variables:
+    LLM_CACHE_ENABLED: "false" disables the cache
+    LLM_CACHE_TTL: seconds a response is reused, default 12 hours
+    LLM_CACHE_EMBEDDING_MODEL: litellm embedding model of the similarity lookup, off by default
+    LLM_CACHE_SIMILARITY_THRESHOLD: min cosine similarity of a similar prompt, default 0.97
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage, convert_to_messages, message_to_dict, messages_from_dict
+from litellm import aembedding
+
+from common.storage import get_data_dir
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() not in ('false', '0', 'no')
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 12 * 60 * 60))
+LLM_CACHE_EMBEDDING_MODEL = os.getenv('LLM_CACHE_EMBEDDING_MODEL', '')
+LLM_CACHE_SIMILARITY_THRESHOLD = float(os.getenv('LLM_CACHE_SIMILARITY_THRESHOLD', 0.97))
+
+# model parameters that do not change the response
+_IGNORED_PARAMS = ('api_key',)
+# most recent responses of a model compared by the similarity lookup
+MAX_SIMILARITY_CANDIDATES = 500
+
+
+def normalize_messages(messages) -> list[dict]:
+    """
+    Role and content of the messages, whatever their input format (tuples, dicts or messages).
+    """
+    normalized = []
+    for message in convert_to_messages(messages):
+        content = message.content
+        if isinstance(content, str):
+            # prompts are indented in the source, the indentation does not change their meaning
+            content = '\n'.join(line.strip() for line in content.strip().splitlines())
+        normalized.append({'role': message.type, 'content': content})
+    return normalized
+
+
+def get_key(model: dict, messages: list[dict], params: dict) -> str:
+    model = {key: value for key, value in model.items() if key not in _IGNORED_PARAMS}
+    content = json.dumps({'model': model, 'messages': messages, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class ResponseCache():
+    """
+    SQLite store of the responses, all calls run in a worker thread with their own connection.
+    """
+
+    def __init__(self, path: str = None, ttl: float = LLM_CACHE_TTL):
+        self.path = path or os.path.join(get_data_dir(), 'llm_cache.sqlite')
+        self.ttl = ttl
+        self.initialized = False
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                if not self.initialized:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS responses ("
+                        "key TEXT PRIMARY KEY, model TEXT, created_at REAL, message TEXT, embedding BLOB)"
+                    )
+                    connection.execute("CREATE INDEX IF NOT EXISTS responses_model ON responses (model, created_at)")
+                    self.initialized = True
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _load(message: str) -> BaseMessage:
+        response = messages_from_dict([json.loads(message)])[0]
+        # a new message for the conversation, not the one the response was first added as
+        response.id = None
+        return response
+
+    def _get(self, key: str) -> BaseMessage | None:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT message FROM responses WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        return self._load(row[0]) if row is not None else None
+
+    def _get_similar(self, model: str, embedding: np.ndarray, threshold: float) -> BaseMessage | None:
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT message, embedding FROM responses WHERE model = ? AND created_at > ? AND embedding IS NOT NULL "
+                "ORDER BY created_at DESC LIMIT ?",
+                (model, time.time() - self.ttl, MAX_SIMILARITY_CANDIDATES),
+            ).fetchall()
+        if len(rows) == 0:
+            return None
+        candidates = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        similarities = candidates @ embedding
+        best = int(np.argmax(similarities))
+        return self._load(rows[best][0]) if similarities[best] >= threshold else None
+
+    def _set(self, key: str, model: str, message: BaseMessage, embedding: np.ndarray | None):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, created_at, message, embedding) VALUES (?, ?, ?, ?, ?)",
+                (key, model, now, json.dumps(message_to_dict(message)), embedding.tobytes() if embedding is not None else None),
+            )
+            connection.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+
+    async def get(self, key: str) -> BaseMessage | None:
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except (sqlite3.Error, ValueError) as e:
+            print(f'Failed to read llm cache: {e}')
+            return None
+
+    async def get_similar(self, model: str, embedding: np.ndarray, threshold: float = LLM_CACHE_SIMILARITY_THRESHOLD) -> BaseMessage | None:
+        try:
+            return await asyncio.to_thread(self._get_similar, model, embedding, threshold)
+        except (sqlite3.Error, ValueError) as e:
+            print(f'Failed to read llm cache: {e}')
+            return None
+
+    async def set(self, key: str, model: str, message: BaseMessage, embedding: np.ndarray | None = None):
+        try:
+            await asyncio.to_thread(self._set, key, model, message, embedding)
+        except sqlite3.Error as e:
+            print(f'Failed to write llm cache: {e}')
+
+
+async def get_embedding(messages: list[dict]) -> np.ndarray | None:
+    """
+    Normalized embedding of the messages with LLM_CACHE_EMBEDDING_MODEL, None if it is not set or fails.
+    """
+    if not LLM_CACHE_EMBEDDING_MODEL:
+        return None
+    text = '\n'.join(f"{message['role']}: {message['content']}" for message in messages)
+    try:
+        response = await aembedding(model=LLM_CACHE_EMBEDDING_MODEL, input=[text])
+    except Exception as e:
+        print(f'Failed to embed llm cache prompt: {e}')
+        return None
+    embedding = np.asarray(response.data[0]['embedding'], dtype=np.float32)
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm > 0 else None
@@ -0,0 +1,66 @@
+"""
+Pool of litellm routers, shared by the calls made with the same model list.
+
+Building a Router per call throws away its http clients, cooldown and fallback state, so the
+routers are kept per hash of the model list (the list holds api keys, only its hash is kept as
+the key), bounded to MAX_ROUTERS and evicted after ROUTER_IDLE_TTL without use.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_litellm import ChatLiteLLMRouter
+from litellm import Router
+
+MAX_ROUTERS = 8
+# seconds a router is kept without being used
+ROUTER_IDLE_TTL = 30 * 60
+
+
+class RouterPool():
+    """
+    LRU pool of routers and of their chat models, keyed by the model list hash.
+    """
+
+    def __init__(self, max_size: int = MAX_ROUTERS, idle_ttl: float = ROUTER_IDLE_TTL):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        # key -> (last_used, router, chat models by model name), least recently used first
+        self.entries: OrderedDict[str, tuple[float, Router, dict[str, ChatLiteLLMRouter]]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(model_list: list) -> str:
+        return hashlib.sha256(json.dumps(model_list, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _evict(self, now: float):
+        for key in list(self.entries):
+            last_used = self.entries[key][0]
+            if now - last_used > self.idle_ttl or len(self.entries) > self.max_size:
+                del self.entries[key]
+
+    def get_llm(self, model_list: list, model_name: str) -> ChatLiteLLMRouter:
+        """
+        Get the chat model of model_name, on the router of model_list.
+        """
+        key = self.get_key(model_list)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                entry = (now, Router(model_list=model_list), {})
+            _, router, llms = entry
+            llm = llms.get(model_name)
+            if llm is None:
+                llm = ChatLiteLLMRouter(router=router, model_name=model_name)
+                llms[model_name] = llm
+            self.entries[key] = (now, router, llms)
+            self._evict(now)
+        return llm
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -5,6 +5,7 @@ from llm.llm_model import ainvoke
 from common.util import get_array_json
 from langchain_core.messages import AIMessage, SystemMessage
 from common import markdown
+from common.message_window import build_context
 
 
 
@@ -18,7 +19,6 @@ class NextStepSuggestions():
         if action is not None and action.get("parameters") is not None and action.get("parameters").get("suggestions") is not None:
             suggestions = action.get("parameters").get("suggestions")
         else:
-            messages = state["messages"]
             prompt = f"""Based on current conversation, predict user intent and generate 2 intelligent question suggestions:
     1. Questions should be specific and valuable
     2. Avoid overly broad or repetitive queries
@@ -28,10 +28,10 @@ class NextStepSuggestions():
     Please output in the following JSON format:
     [ "Question 1","Question 2"]
     """
-            messages = state["messages"] + [SystemMessage(content=prompt)]
+            messages = build_context(state["messages"], config) + [SystemMessage(content=prompt)]
 
             # not show in ui and not save in db
-            output = await ainvoke(messages, config, stream=False)
+            output = await ainvoke(messages, config, stream=False, cache=True, similar=True)
             suggestions = get_array_json(output.content)
         content = f"""## 🔍 Next Steps Suggestions
 {markdown.list_str_to_sequence(suggestions)}
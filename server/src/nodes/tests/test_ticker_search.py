@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+from common.symbol_index import SymbolIndex
+from nodes import ticker_search
+from nodes.ticker_search import TickerSearch
+
+
+class Dataset():
+    """
+    Remote lookup answering from a fixed list of tickers, recording the queries.
+    """
+    def __init__(self, tickers: list[dict]):
+        self.tickers = tickers
+        self.queries = []
+
+    async def lookup_ticker(self, query: str) -> list[dict]:
+        self.queries.append(query)
+        return [ticker for ticker in self.tickers if ticker['symbol'].startswith(query.upper())]
+
+
+@pytest.fixture
+def index(monkeypatch, tmp_path) -> SymbolIndex:
+    index = SymbolIndex(path=str(tmp_path / 'symbols.json'), symbol_list_path='')
+    monkeypatch.setattr(ticker_search, 'get_symbol_index', lambda: index)
+    yield index
+    index.flush()
+
+
+def _search(monkeypatch, dataset: Dataset, symbol: str) -> list[str]:
+    """
+    Symbols of the ticker select list of the search.
+    """
+    monkeypatch.setattr(ticker_search, 'AsyncDataset', lambda config: dataset)
+    state = {'action': {'parameters': {'tickers': [{'symbol': symbol}]}}}
+    result = asyncio.run(TickerSearch({})(state, None, None))
+    content = result['messages'][0].content
+    ticker_select = json.loads(content[content.index('{'):content.rindex('}') + 1])
+    return [ticker['symbol'] for ticker in ticker_select['list']]
+
+
+def test_exact_local_match_skips_the_remote_lookup(monkeypatch, index):
+    index.add([{'symbol': 'AAPL', 'short_name': 'Apple Inc.'}])
+    dataset = Dataset([{'symbol': 'AAPL', 'short_name': 'Apple Inc.'}])
+    assert _search(monkeypatch, dataset, 'AAPL') == ['AAPL']
+    assert dataset.queries == []
+
+
+def test_other_listing_of_the_symbol_asks_the_remote_lookup(monkeypatch, index):
+    index.add([{'symbol': 'AAPL.MX', 'short_name': 'Apple Inc.'}])
+    dataset = Dataset([{'symbol': 'AAPL', 'short_name': 'Apple Inc.'}])
+    # local matches first, then the remote ones
+    assert _search(monkeypatch, dataset, 'AAPL') == ['AAPL.MX', 'AAPL']
+    assert dataset.queries == ['AAPL']
+    # the remote result is indexed
+    assert index.match('AAPL')[1]
+
+
+def test_prefix_matches_are_merged_with_the_remote_lookup(monkeypatch, index):
+    index.add([{'symbol': 'TSLA', 'short_name': 'Tesla, Inc.'}])
+    dataset = Dataset([{'symbol': 'T', 'short_name': 'AT&T Inc.'}, {'symbol': 'TSLA', 'short_name': 'Tesla, Inc.'}])
+    assert _search(monkeypatch, dataset, 'T') == ['TSLA', 'T']
+    assert dataset.queries == ['T']
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from typing import Any, Dict, Generic, TypeVar
 from langchain.schema import AIMessage
 from langchain_core.runnables import RunnableConfig
@@ -7,8 +9,10 @@ from common.agent_state import AgentState
 
 import common.markdown as markdown
 from llm.llm_model import ainvoke
-from common.dataset import Dataset
+from common.dataset import AsyncDataset
+from common.symbol_index import SymbolIndex, get_symbol_index
 
+logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 class TickerSearch(Generic[T]):
@@ -22,9 +26,27 @@ class TickerSearch(Generic[T]):
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
+    async def lookup_remote(self, dataset: AsyncDataset, index: SymbolIndex, query: str, local_result: list[dict]) -> list[dict]:
+        """
+        Local prefix or fuzzy matches followed by the remote lookup results they do not hold.
+        The local matches are kept when the remote lookup fails.
+        """
+        try:
+            remote_result = await dataset.lookup_ticker(query)
+        except Exception as e:
+            if len(local_result) == 0:
+                raise
+            logger.warning('Failed to lookup ticker %s, using the local matches: %s', query, e)
+            return local_result
+        await asyncio.to_thread(index.add, remote_result)
+        symbols = {(ticker.get('symbol') or '').upper() for ticker in local_result}
+        return local_result + [ticker for ticker in remote_result if (ticker.get('symbol') or '').upper() not in symbols]
+
     async def __call__(self, state: AgentState, writer: StreamWriter, config: RunnableConfig) -> T:
         tickers = state.get('action').get('parameters').get('tickers')
         json_markdown = ''
+        index = get_symbol_index()
+        dataset = AsyncDataset(config)
         for ticker in tickers:
             query = ticker.get('symbol', '')
             if query == '':
@@ -33,8 +55,10 @@ class TickerSearch(Generic[T]):
                 query = ticker.get('short_name', '')
             lookup_result = []
             if query != '':
-                dataset = Dataset(config)
-                lookup_result = dataset.lookup_ticker(query)
+                # the local index answers offline, the remote lookup runs unless it has an exact match
+                lookup_result, exact = await asyncio.to_thread(index.match, query)
+                if not exact:
+                    lookup_result = await self.lookup_remote(dataset, index, query, lookup_result)
             if len(lookup_result) == 0:
                 json_markdown += f'* {query} not found\n'
             else:
@@ -9,6 +9,9 @@ export interface Settings {
   remoteFinancialDataApiUrl: string;
   remoteFinancialDataApiKey: string;
 
+  // Max number of analysis tasks running at the same time, 1 runs them one by one
+  analysisConcurrency?: number;
+
   // Model settings
   intentRecognitionModel: {
     model: string;